@@ -0,0 +1,187 @@
+#
+# Copyright 2021 Bernhard Walter
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Benchmark Tessellator.tessellate against the former node-by-node implementation
+
+Usage: python benchmarks/tessellator.py [example.py ...]
+
+Without arguments all models in examples/ide are used. The examples are executed with the viewer
+client stubbed out, every shown part is meshed once and then the node, triangle and normal
+extraction is timed with both implementations. Results are checked to be identical.
+"""
+
+from array import array
+import glob
+import os
+import runpy
+import sys
+import time
+
+import numpy as np
+
+from OCP.gp import gp_Vec, gp_Pnt
+from OCP.BRep import BRep_Tool
+from OCP.BRepGProp import BRepGProp_Face
+from OCP.TopLoc import TopLoc_Location
+from OCP.TopAbs import TopAbs_Orientation
+
+import jupyter_cadquery.viewer.client as client
+import jupyter_cadquery.cad_animation as cad_animation
+from jupyter_cadquery.cad_objects import _Part, _PartGroup
+from jupyter_cadquery.cadquery.cad_objects import to_assembly
+from jupyter_cadquery.ocp_utils import get_faces, bounding_box
+from jupyter_cadquery.tessellator import Tessellator, compute_quality
+
+from cadquery.occ_impl.shapes import Compound
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), "..", "examples", "ide")
+REPEAT = 3
+
+
+def legacy_tessellate(shape):
+    """The node-by-node implementation of Tessellator.tessellate up to v2.2.0"""
+    vertices = array("f")
+    triangles = array("f")
+    normals = array("f")
+
+    p_buf = gp_Pnt()
+    n_buf = gp_Vec()
+    loc_buf = TopLoc_Location()
+
+    offset = -1
+
+    for face in get_faces(shape):
+        if face.Orientation() == TopAbs_Orientation.TopAbs_REVERSED:
+            i1, i2 = 2, 1
+        else:
+            i1, i2 = 1, 2
+
+        internal = face.Orientation() == TopAbs_Orientation.TopAbs_INTERNAL
+
+        poly = BRep_Tool.Triangulation_s(face, loc_buf)
+        if poly is not None:
+            Trsf = loc_buf.Transformation()
+
+            items = poly.Nodes()
+            coords = [items.Value(i).Transformed(Trsf).Coord() for i in range(items.Lower(), items.Upper() + 1)]
+            flat = []
+            for coord in coords:
+                flat += coord
+            vertices.extend(flat)
+
+            items = poly.Triangles()
+            coords = [items.Value(i).Get() for i in range(items.Lower(), items.Upper() + 1)]
+            flat = []
+            for coord in coords:
+                flat += (coord[0] + offset, coord[i1] + offset, coord[i2] + offset)
+            triangles.extend(flat)
+
+            if poly.HasUVNodes():
+
+                def extract(uv0, uv1):
+                    prop.Normal(uv0, uv1, p_buf, n_buf)
+                    if n_buf.SquareMagnitude() > 0:
+                        n_buf.Normalize()
+                    return n_buf.Reversed().Coord() if internal else n_buf.Coord()
+
+                prop = BRepGProp_Face(face)
+                items = poly.UVNodes()
+
+                uvs = [items.Value(i).Coord() for i in range(items.Lower(), items.Upper() + 1)]
+                flat = []
+                for uv1, uv2 in uvs:
+                    flat += extract(uv1, uv2)
+                normals.extend(flat)
+
+            offset += poly.NbNodes()
+
+    return (
+        np.asarray(vertices, dtype=np.float32).reshape(-1, 3),
+        np.asarray(triangles, dtype=np.uint32),
+        np.asarray(normals, dtype=np.float32).reshape(-1, 3),
+    )
+
+
+def collect_parts(filename):
+    """Run an example and return the compounds of all parts handed to show()"""
+    shown = []
+
+    def show(*cad_objs, **kwargs):
+        shown.append(to_assembly(*cad_objs))
+
+    client.show = show
+    cad_animation.send = lambda data: None
+
+    runpy.run_path(filename, run_name="__main__")
+
+    def leaves(group):
+        for obj in group.objects:
+            if isinstance(obj, _PartGroup):
+                yield from leaves(obj)
+            elif isinstance(obj, _Part):
+                yield obj
+
+    compounds = []
+    for assembly in shown:
+        for part in leaves(assembly):
+            compounds.append(Compound._makeCompound(part.shape) if len(part.shape) > 1 else part.shape[0])
+    return compounds
+
+
+def timed(func, repeat=REPEAT):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, result
+
+
+def benchmark(filename):
+    compounds = collect_parts(filename)
+
+    t_legacy = t_bulk = 0.0
+    nodes = 0
+    for compound in compounds:
+        quality = compute_quality(bounding_box(compound))
+        tess = Tessellator()
+        tess.compute(compound, quality, 0.2, tessellate=False, compute_edges=False)
+
+        duration, legacy = timed(lambda: legacy_tessellate(compound))
+        t_legacy += duration
+
+        duration, _ = timed(tess.tessellate)
+        t_bulk += duration
+
+        bulk = (tess.get_vertices(), tess.get_triangles(), tess.get_normals())
+        for name, a, b in zip(("vertices", "triangles", "normals"), legacy, bulk):
+            # indices are uint16 for up to 65536 vertices now
+            if a.dtype.kind != b.dtype.kind or not np.array_equal(a, b):
+                raise AssertionError(f"{os.path.basename(filename)}: {name} differ")
+
+        nodes += len(bulk[0])
+
+    print(
+        "%-28s parts: %4d  nodes: %8d  legacy: %8.3f sec  bulk: %8.3f sec  speed-up: %5.2fx"
+        % (os.path.basename(filename), len(compounds), nodes, t_legacy, t_bulk, t_legacy / max(t_bulk, 1e-9))
+    )
+
+
+if __name__ == "__main__":
+    files = sys.argv[1:] or sorted(glob.glob(os.path.join(EXAMPLES, "*.py")))
+    for filename in files:
+        benchmark(filename)
@@ -0,0 +1,101 @@
+#
+# Copyright 2021 Bernhard Walter
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Benchmark reorder_mesh: vertex cache efficiency and compressed size of the index buffers
+
+Usage: python benchmarks/vertex_cache.py [example.py ...]
+
+Without arguments all models in examples/ide are used. Every shown part is meshed with the default
+quality and the average cache miss ratio (ACMR, transformed vertices per triangle) of a simulated FIFO
+post-transform cache is reported for the original and the reordered triangles, together with the
+zlib compressed size of the index buffers as sent to the standalone viewer.
+"""
+
+from collections import deque
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+from jupyter_cadquery.ocp_utils import bounding_box
+from jupyter_cadquery.tessellator import compute_quality, reorder_mesh, tessellate
+from jupyter_cadquery.viewer.protocol import _compress
+
+# shared with the tessellator benchmark in this folder
+from tessellator import EXAMPLES, collect_parts
+
+CACHE_SIZES = (16, 32)
+
+
+def acmr(triangles, cache_size):
+    """Average cache miss ratio of a FIFO vertex cache with cache_size entries"""
+    cache = deque()
+    cached = set()
+    misses = 0
+    for vertex in np.asarray(triangles).ravel().tolist():
+        if vertex not in cached:
+            misses += 1
+            cache.append(vertex)
+            cached.add(vertex)
+            if len(cache) > cache_size:
+                cached.discard(cache.popleft())
+    return misses / max(len(triangles) // 3, 1)
+
+
+def benchmark(filename):
+    compounds = collect_parts(filename)
+
+    triangles = 0
+    duration = 0.0
+    misses = {size: [0.0, 0.0] for size in CACHE_SIZES}
+    sizes = [0, 0]
+    for compound in compounds:
+        quality = compute_quality(bounding_box(compound))
+        mesh = tessellate([compound], quality, 0.2, compute_edges=False)
+        if len(mesh["triangles"]) == 0:
+            continue
+
+        start = time.perf_counter()
+        reordered = reorder_mesh(mesh)
+        duration += time.perf_counter() - start
+
+        count = len(mesh["triangles"]) // 3
+        triangles += count
+        for size in CACHE_SIZES:
+            misses[size][0] += acmr(mesh["triangles"], size) * count
+            misses[size][1] += acmr(reordered["triangles"], size) * count
+        sizes[0] += len(_compress(mesh["triangles"], "zlib"))
+        sizes[1] += len(_compress(reordered["triangles"], "zlib"))
+
+    if triangles == 0:
+        return
+
+    result = "  ".join(
+        "ACMR(%d): %5.3f -> %5.3f" % (size, before / triangles, after / triangles)
+        for size, (before, after) in misses.items()
+    )
+    print(
+        "%-28s triangles: %8d  %s  index zlib: %8d -> %8d bytes  reorder: %7.3f sec"
+        % (os.path.basename(filename), triangles, result, sizes[0], sizes[1], duration)
+    )
+
+
+if __name__ == "__main__":
+    files = sys.argv[1:] or sorted(glob.glob(os.path.join(EXAMPLES, "*.py")))
+    for filename in files:
+        benchmark(filename)
@@ -331,6 +331,11 @@ class CadqueryDisplay(object):
         self.clean = True
         self.splash = False
         self.tree_clipping = None
+        self.tree = None
+        self.tree_handler = None
+        self.signature = None
+        # changes with every clear, e.g. by add_shapes, so that background work can tell the scene was replaced
+        self.scene = 0
 
     def _dump_config(self):
         print("\nCadDisplay:")
@@ -674,6 +679,22 @@ class CadqueryDisplay(object):
                 ]
             )
 
+    def _set_sliders(self):
+        """Set the ranges of the clipping sliders to the bounding box of the scene"""
+
+        def set_slider(i, s_min, s_max):
+            s_min = -0.02 if abs(s_min) < 1e-4 else s_min * self.bb_factor
+            s_max = 0.02 if abs(s_max) < 1e-4 else s_max * self.bb_factor
+            self.clipping.sliders[i].max = 2 ** 31  #  first increase max to avoid traitlet error that min > max
+            self.clipping.sliders[i].min = s_min  # set min which now is always < max
+            self.clipping.sliders[i].max = s_max  # correct max
+            self.clipping.sliders[i].value = s_max
+
+        bb = self.cq_view.bb
+        set_slider(1, bb.xmin, bb.xmax)
+        set_slider(3, bb.ymin, bb.ymax)
+        set_slider(5, bb.zmin, bb.zmax)
+
     def add_shapes(
         self,
         shapes,
@@ -689,13 +710,21 @@ class CadqueryDisplay(object):
         position=None,
         rotation=None,
         zoom=None,
+        batched=None,
     ):
-        self.clear()
+        # The tree widget can only change its state, so it is kept if the tree has the same structure.
+        # The objects then keep their ids of the shown tree
+        ids = self._match_tree(tree)
+        if ids is not None:
+            mapping = {ids[k]: v for k, v in mapping.items()}
+
+        self.clear(keep_tree=ids is not None)
         self.states = {k: v["state"] for k, v in mapping.items()}
         self.paths = {k: v["path"] for k, v in mapping.items()}
 
-        self.tree_view = Output()
-        self.tree_clipping.children = [self.tree_view, self.tree_clipping.children[1]]
+        if ids is None:
+            self.tree_view = Output()
+            self.tree_clipping.children = [self.tree_view, self.tree_clipping.children[1]]
 
         # Force reset of camera to inhereit splash settings for first object
         if self.splash:
@@ -716,43 +745,27 @@ class CadqueryDisplay(object):
                 position=position,
                 rotation=rotation,
                 zoom=zoom,
+                batched=batched,
             )
 
         with Timer(self.timeit, "", "configure display", 2):
-
-            def set_slider(i, s_min, s_max):
-                s_min = -0.02 if abs(s_min) < 1e-4 else s_min * self.bb_factor
-                s_max = 0.02 if abs(s_max) < 1e-4 else s_max * self.bb_factor
-                self.clipping.sliders[i].max = 2 ** 31  #  first increase max to avoid traitlet error that min > max
-                self.clipping.sliders[i].min = s_min  # set min which now is always < max
-                self.clipping.sliders[i].max = s_max  # correct max
-                self.clipping.sliders[i].value = s_max
-
-            bb = self.cq_view.bb
-            set_slider(1, bb.xmin, bb.xmax)
-            set_slider(3, bb.ymin, bb.ymax)
-            set_slider(5, bb.zmin, bb.zmax)
+            self._set_sliders()
 
             # Tree widget to change visibility
-            self.tree_view = TreeView(
-                image_paths=self.image_paths,
-                tree=tree,
-                state=self.states,
-                layout=Layout(height=px(self._tree_height(self.height)), width=px(self.tree_width - 20)),
-            )
-            self.tree_view.add_class("view_tree")
-            self.tree_view.add_class("scroll-area")
-            if self.mac_scrollbar:
-                self.tree_view.add_class("mac-scrollbar")
-
-            self.tree_view.observe(self.cq_view.change_visibility(self.paths), "state")
-            self.tree_clipping.children = [self.tree_view, self.tree_clipping.children[1]]
+            if ids is None:
+                self._set_tree_view(tree)
+            else:
+                self.tree_view.unobserve(self.tree_handler, "state")
+                self.tree_view.state = self.states
+                self.tree_handler = self.cq_view.change_visibility(self.paths)
+                self.tree_view.observe(self.tree_handler, "state")
 
             # Set initial state
 
-            for obj, vals in self.states.items():
-                for i, val in enumerate(vals):
-                    self.cq_view.set_visibility(self.paths[obj], i, val)
+            with self.cq_view.hold_visibility():
+                for obj, vals in self.states.items():
+                    for i, val in enumerate(vals):
+                        self.cq_view.set_visibility(self.paths[obj], i, val)
 
             self._set_checkboxes()
             self.toggle_axes(self.axes)
@@ -764,14 +777,95 @@ class CadqueryDisplay(object):
 
             self.clean = False
 
-    def clear(self):
+    def _set_tree_view(self, tree):
+        self.tree = tree
+        self.tree_view = TreeView(
+            image_paths=self.image_paths,
+            tree=tree,
+            state=self.states,
+            layout=Layout(height=px(self._tree_height(self.height)), width=px(self.tree_width - 20)),
+        )
+        self.tree_view.add_class("view_tree")
+        self.tree_view.add_class("scroll-area")
+        if self.mac_scrollbar:
+            self.tree_view.add_class("mac-scrollbar")
+        self.tree_clipping.children = [self.tree_view, self.tree_clipping.children[1]]
+
+        self.tree_handler = self.cq_view.change_visibility(self.paths)
+        self.tree_view.observe(self.tree_handler, "state")
+
+    def append_shapes(self, shapes, mapping, tree):
+        """Add the single part shapes with its mapping and tree node to the shown scene without rendering the
+        shown parts again, returns False if the scene cannot be changed in place"""
+        if self.clean or self.tree is None or self.cq_view.cq_renderer.batch is not None:
+            return False
+
+        with Timer(self.timeit, "", "append shapes", 2):
+            self.init_progress(1)
+            self.cq_view.append_shape(shapes, self.progress)
+            self._set_sliders()
+
+            self.states = {**self.states, **{k: v["state"] for k, v in mapping.items()}}
+            self.paths = {**self.paths, **{k: v["path"] for k, v in mapping.items()}}
+
+            # The tree widget cannot change its structure, so only the tree widget is created again
+            self.tree_view.unobserve(self.tree_handler, "state")
+            self._set_tree_view({**self.tree, "children": [*self.tree["children"], tree]})
+
+            # the pooled materials already follow the transparent and black edges settings
+            for vals in mapping.values():
+                for i, val in enumerate(vals["state"]):
+                    self.cq_view.set_visibility(vals["path"], i, val)
+        return True
+
+    def update_locations(self, locations):
+        """Move the shown groups and parts, returns False if the scene cannot be changed in place"""
+        if self.clean or self.cq_view.cq_renderer.batch is not None:
+            return False
+
+        with Timer(self.timeit, "", "update locations", 2):
+            if self.cq_view.update_locations(locations):
+                self._set_sliders()
+        return True
+
+    def refine_shapes(self, shapes):
+        """Replace the meshes of the shown parts, returns False if the scene cannot be changed in place"""
+        if self.clean or self.cq_view.cq_renderer.batch is not None:
+            return False
+
+        with Timer(self.timeit, "", "refine shapes", 2):
+            self.cq_view.refine(shapes)
+        return True
+
+    def _match_tree(self, tree):
+        """Map the ids of tree to the ids of the shown tree if both have the same structure, else None"""
+        if self.clean or self.tree is None:
+            return None
+
+        ids = {}
+
+        def match(node1, node2):
+            if any(node1.get(key) != node2.get(key) for key in ("type", "name", "color")):
+                return False
+            ids[str(node2["id"])] = str(node1["id"])
+
+            children1, children2 = node1.get("children", []), node2.get("children", [])
+            return len(children1) == len(children2) and all(match(c1, c2) for c1, c2 in zip(children1, children2))
+
+        return ids if match(self.tree, tree) else None
+
+    def clear(self, keep_tree=False):
+        self.scene += 1
         if not self.clean:
             self.cq_view.clear()
             self.info.clear()
 
             # clear tree
-            self.tree_clipping.children = [Output(), self.tree_clipping.children[1]]
+            if not keep_tree:
+                self.tree_clipping.children = [Output(), self.tree_clipping.children[1]]
+                self.tree = None
 
+            self.signature = None
             self.clean = True
 
     def display(self, widget):
@@ -157,16 +157,12 @@ class Axes(Helpers):
             self.axes[i].visible = change
 
 
-class CustomMaterial(ShaderMaterial):
-    def __init__(self, typ):
-        self.types = {
-            "diffuse": "c",
-            "uvTransform": "m3",
-            "normalScale": "v2",
-            "fogColor": "c",
-            "emissive": "c",
-        }
+# The shader source is prepared once per material type and shared by all CustomMaterials
+SHADERS = {}
+
 
+def _shader(typ):
+    if SHADERS.get(typ) is None:
         shader = ShaderLib[typ]
 
         fragmentShader = """
@@ -181,12 +177,44 @@ class CustomMaterial(ShaderMaterial):
             }"""
         fragmentShader += shader["fragmentShader"].replace(frag_from, frag_to)
 
-        vertexShader = shader["vertexShader"]
-        uniforms = shader["uniforms"]
+        uniforms = dict(shader["uniforms"])
         uniforms["alpha"] = dict(value=0.7)
 
-        super().__init__(uniforms=uniforms, vertexShader=vertexShader, fragmentShader=fragmentShader)
-        self.lights = True
+        SHADERS[typ] = (shader["vertexShader"], fragmentShader, uniforms)
+
+    return SHADERS[typ]
+
+
+class CustomMaterial(ShaderMaterial):
+    types = {
+        "diffuse": "c",
+        "uvTransform": "m3",
+        "normalScale": "v2",
+        "fogColor": "c",
+        "emissive": "c",
+    }
+
+    def __init__(self, typ, uniforms=None, **kwargs):
+        """Create the material with all uniform values (e.g. diffuse, alpha, metalness) set at once.
+        kwargs are passed to ShaderMaterial"""
+        vertexShader, fragmentShader, default_uniforms = _shader(typ)
+
+        super().__init__(
+            uniforms=self._merge(default_uniforms, uniforms or {}),
+            vertexShader=vertexShader,
+            fragmentShader=fragmentShader,
+            lights=True,
+            **kwargs,
+        )
+
+    def _merge(self, uniforms, values):
+        uniforms = dict(**uniforms)
+        for key, value in values.items():
+            if self.types.get(key) is None:
+                uniforms[key] = {"value": value}
+            else:
+                uniforms[key] = {"type": self.types.get(key), "value": value}
+        return uniforms
 
     @property
     def color(self):
@@ -205,10 +233,9 @@ class CustomMaterial(ShaderMaterial):
         self.update("alpha", value)
 
     def update(self, key, value):
-        uniforms = dict(**self.uniforms)
-        if self.types.get(key) is None:
-            uniforms[key] = {"value": value}
-        else:
-            uniforms[key] = {"type": self.types.get(key), "value": value}
-        self.uniforms = uniforms
+        self.update_uniforms({key: value})
+
+    def update_uniforms(self, values):
+        # one sync of the uniforms for all changed values
+        self.uniforms = self._merge(self.uniforms, values)
         self.needsUpdate = True
@@ -14,6 +14,10 @@
 # limitations under the License.
 #
 
+from concurrent.futures import as_completed, Future
+import math
+import threading
+
 from cadquery import Compound, __version__
 
 from jupyter_cadquery.cad_display import (
@@ -22,12 +26,36 @@ from jupyter_cadquery.cad_display import (
     has_sidecar,
 )
 from jupyter_cadquery_widgets.widgets import UNSELECTED, SELECTED, EMPTY
-from jupyter_cadquery.utils import Color, flatten, Timer, warn
-from jupyter_cadquery.ocp_utils import bounding_box, get_point, BoundingBox, loc_to_tq
-from jupyter_cadquery.tessellator import discretize_edge, tessellate, compute_quality
+from jupyter_cadquery.utils import CancellableProgress, Color, quantize_mesh, ShowHandle, Timer, warn
+from jupyter_cadquery.ocp_utils import (
+    bounding_box,
+    points_bounding_box,
+    get_point,
+    BoundingBox,
+    loc_to_tq,
+    split_location,
+    HASH_CODE_MAX,
+)
+from jupyter_cadquery.tessellator import (
+    budget_quality,
+    compute_quality,
+    count_triangles,
+    count_triangles_async,
+    decimate_mesh,
+    discretize_edges,
+    get_executor,
+    reorder_mesh,
+    tessellate,
+    tessellate_async,
+    weld_mesh,
+)
 from jupyter_cadquery.defaults import get_default, split_args
 
 PART_ID = 0
+PART_ID_LOCK = threading.Lock()
+
+# deviation, angular tolerance and edge accuracy of the first display of a progressive show are multiplied by this
+COARSE_FACTOR = 5
 
 
 #
@@ -40,9 +68,12 @@ class _CADObject(object):
         self.color = Color(get_default("default_color"))
 
     def next_id(self):
+        # ids are only allocated in the main process, worker processes of parallel tessellation
+        # receive BREP data and never create parts
         global PART_ID
-        PART_ID += 1
-        return PART_ID
+        with PART_ID_LOCK:
+            PART_ID += 1
+            return PART_ID
 
     def to_nav_dict(self):
         raise NotImplementedError("not implemented yet")
@@ -50,7 +81,17 @@ class _CADObject(object):
     def to_state(self):
         raise NotImplementedError("not implemented yet")
 
-    def collect_shapes(self, loc, quality, deviation, angular_tolerance, edge_accuracy):
+    def collect_shapes(
+        self,
+        loc,
+        quality,
+        deviation,
+        angular_tolerance,
+        edge_accuracy,
+        executor=None,
+        instances=None,
+        min_quality=None,
+    ):
         raise NotImplementedError("not implemented yet")
 
     def to_assembly(self):
@@ -59,6 +100,11 @@ class _CADObject(object):
     def show(self, grid=False, axes=False):
         raise NotImplementedError("not implemented yet")
 
+    def signature(self):
+        """Everything except the locations that determines the rendered objects, see same_signature"""
+        color = [c.web_color for c in self.color] if isinstance(self.color, tuple) else self.color.web_color
+        return (type(self).__name__, self.name, color, tuple(self.to_state()), tuple(self.shape))
+
 
 class _Part(_CADObject):
     def __init__(self, shape, name="Part", color=None, show_faces=True, show_edges=True):
@@ -96,47 +142,127 @@ class _Part(_CADObject):
         render_normals,
         progress=None,
         timeit=False,
+        executor=None,
+        instances=None,
+        min_quality=None,
     ):
 
+        # Repeated parts share one mesh: A single shape is tessellated without its own location,
+        # which is applied by the renderer instead
+        shape, shape_loc = split_location(self.shape[0]) if len(self.shape) == 1 else (None, None)
+        shapes = self.shape if shape_loc is None else [shape]
+
+        if shape_loc is None:
+            mesh_loc = loc
+        else:
+            mesh_loc = shape_loc if loc is None else loc * shape_loc
+
         # A first rough estimate of the bounding box.
-        # Will be too large, but is sufficient for computing the quality
+        # Will be too large, but is sufficient for computing the quality. It is computed without any location and
+        # without the triangulation a previous tessellation left, so that all instances of a shape get the same
+        # quality (and mesh key) in every show
         with Timer(timeit, self.name, "compute quality:", 2) as t:
-            bb = bounding_box(self.shape, loc=loc, optimal=False)
+            bb = bounding_box(shapes, optimal=False)
             quality = compute_quality(bb, deviation=deviation)
             t.info = str(bb)
 
         normals_len = 0 if render_normals is False else quality / deviation * 5
 
+        # see budget_quality, the angular tolerance is coarsened as the linear deflection
+        if min_quality is not None and 0 < quality < min_quality:
+            angular_tolerance = min(angular_tolerance * math.sqrt(min_quality / quality), 1.0)
+            quality = min_quality
+
+        color = [c.web_color for c in self.color] if isinstance(self.color, tuple) else self.color.web_color
+
+        result = {
+            "id": self.id,
+            "type": "shapes",
+            "name": self.name,
+            "shape": None,
+            "color": color,
+            "bb": None,
+            "loc": None if shape_loc is None else loc_to_tq(shape_loc),
+        }
+
+        if executor is not None:
+            future = tessellate_async(
+                executor,
+                shapes,
+                quality=quality,
+                angular_tolerance=angular_tolerance,
+                normals_len=normals_len,
+                debug=timeit,
+                compute_edges=render_edges,
+                instances=instances,
+            )
+            result["shape"] = _PendingMesh(
+                future, lambda mesh: self._add_mesh(result, mesh, shapes, mesh_loc, progress, timeit)
+            )
+            return result
+
         with Timer(timeit, self.name, "tessellate:     ", 2) as t:
             mesh = tessellate(
-                self.shape,
+                shapes,
                 quality=quality,
                 angular_tolerance=angular_tolerance,
                 normals_len=normals_len,
                 debug=timeit,
                 compute_edges=render_edges,
+                instances=instances,
             )
             t.info = f"{{quality:{quality:.4f}, angular_tolerance:{angular_tolerance:.2f}}}"
 
-        # After meshing the non optimal bounding box is much more exact
+        return self._add_mesh(result, mesh, shapes, mesh_loc, progress, timeit)
+
+    def _estimate_triangles(self, deviation, angular_tolerance, timeit, known, executor, progress):
+        """Default linear deflection and triangle count (or its Future) of the coarse mesh, see
+        _PartGroup.estimate_triangles"""
+        if isinstance(progress, CancellableProgress):
+            progress.check()
+
+        shape, shape_loc = split_location(self.shape[0]) if len(self.shape) == 1 else (None, None)
+        shapes = self.shape if shape_loc is None else [shape]
+        compound = Compound._makeCompound(shapes) if len(shapes) > 1 else shapes[0]
+
+        key = compound.HashCode(HASH_CODE_MAX)
+        for other, quality, triangles in known.get(key, []):
+            if other.IsSame(compound):
+                return quality, triangles
+
+        quality = compute_quality(bounding_box(shapes, optimal=False), deviation=deviation)
+        coarse_tolerance = min(angular_tolerance * math.sqrt(COARSE_FACTOR), 1.0)
+        if executor is not None:
+            triangles = count_triangles_async(executor, compound, quality * COARSE_FACTOR, coarse_tolerance)
+        else:
+            with Timer(timeit, self.name, "estimate triangles:", 2) as t:
+                triangles = count_triangles(compound, quality * COARSE_FACTOR, coarse_tolerance)
+                t.info = str(triangles)
+
+        known.setdefault(key, []).append((compound, quality, triangles))
+        return quality, triangles
+
+    def _add_mesh(self, result, mesh, shapes, mesh_loc, progress, timeit):
+        # The bounding box of the mesh is much more exact. It is computed from the vertices, since meshes
+        # taken from the tessellation cache do not leave a triangulation at the shape
         with Timer(timeit, self.name, "bounding box:   ", 2) as t:
-            bb2 = bounding_box(self.shape, loc=loc, optimal=False)
-            bb2.update(bb, minimize=True)
+            if len(mesh["vertices"]) > 0:
+                bb2 = points_bounding_box(mesh["vertices"], loc=mesh_loc)
+            else:
+                bb2 = bounding_box(shapes, loc=mesh_loc, optimal=False)
             t.info = str(bb2)
 
         if progress:
             progress.update()
 
-        color = [c.web_color for c in self.color] if isinstance(self.color, tuple) else self.color.web_color
+        result["shape"] = mesh
+        result["bb"] = bb2.to_dict()
+        return result
 
-        return {
-            "id": self.id,
-            "type": "shapes",
-            "name": self.name,
-            "shape": mesh,
-            "color": color,
-            "bb": bb2.to_dict(),
-        }
+    def signature(self):
+        # a single shape is rendered without its own location (see collect_shapes), so it may move, too
+        shapes = [split_location(self.shape[0])[0]] if len(self.shape) == 1 else self.shape
+        return (*super().signature()[:-1], tuple(shapes))
 
     def compound(self):
         return self.shape[0]
@@ -192,6 +318,9 @@ class _Edges(_CADObject):
         render_normals,
         progress=None,
         timeit=False,
+        executor=None,
+        instances=None,
+        min_quality=None,
     ):
         with Timer(timeit, self.name, "bounding box:", 2) as t:
             bb = bounding_box(self.shape, loc=loc)
@@ -200,7 +329,7 @@ class _Edges(_CADObject):
             t.info = str(bb)
 
         with Timer(timeit, self.name, "discretize:  ", 2):
-            edges = flatten([discretize_edge(edge, deflection) for edge in self.shape])
+            edges = discretize_edges(self.shape, deflection, executor)
 
         if progress:
             progress.update()
@@ -247,6 +376,9 @@ class _Vertices(_CADObject):
         render_normals,
         progress=None,
         timeit=False,
+        executor=None,
+        instances=None,
+        min_quality=None,
     ):
         bb = bounding_box(self.shape, loc=loc)
 
@@ -290,6 +422,9 @@ class _PartGroup(_CADObject):
         render_normals,
         progress=None,
         timeit=False,
+        executor=None,
+        instances=None,
+        min_quality=None,
     ):
         if loc is None and self.loc is None:
             combined_loc = None
@@ -311,10 +446,41 @@ class _PartGroup(_CADObject):
                     render_normals,
                     progress,
                     timeit,
+                    executor,
+                    instances,
+                    min_quality,
                 )
             )
         return result
 
+    def estimate_triangles(self, deviation, angular_tolerance, timeit=False, executor=None, progress=None):
+        """Default linear deflection and estimated triangle count of all parts, see budget_quality.
+
+        The triangles are counted on a coarse mesh and extrapolated to the default deflection. Repeated shapes
+        are meshed once, but counted for every instance. With a process pool executor the coarse meshes are
+        computed by its workers. A cancelled show (see CancellableProgress) stops the estimate.
+        """
+        estimates = self._estimate_triangles(deviation, angular_tolerance, timeit, {}, executor, progress)
+
+        futures = {triangles for _, triangles in estimates if isinstance(triangles, Future)}
+        for _ in as_completed(futures):
+            if isinstance(progress, CancellableProgress):
+                progress.check()
+
+        return [
+            (quality, COARSE_FACTOR * (triangles.result() if isinstance(triangles, Future) else triangles))
+            for quality, triangles in estimates
+        ]
+
+    def _estimate_triangles(self, deviation, angular_tolerance, timeit, known, executor, progress):
+        result = []
+        for obj in self.objects:
+            if isinstance(obj, _PartGroup):
+                result += obj._estimate_triangles(deviation, angular_tolerance, timeit, known, executor, progress)
+            elif isinstance(obj, _Part):
+                result.append(obj._estimate_triangles(deviation, angular_tolerance, timeit, known, executor, progress))
+        return result
+
     def collect_mapped_shapes(
         self,
         mapping,
@@ -326,6 +492,14 @@ class _PartGroup(_CADObject):
         render_normals,
         progress=None,
         timeit=False,
+        parallel=False,
+        triangle_budget=None,
+        weld=False,
+        crease_angle=30,
+        quantize=False,
+        decimate=None,
+        decimate_error=None,
+        reorder=False,
     ):
         def set_paths(shapes, mapping):
             for obj in shapes["parts"]:
@@ -334,20 +508,78 @@ class _PartGroup(_CADObject):
                 else:
                     set_paths(obj, mapping)
 
-        shapes = self.collect_shapes(
-            loc=None,
-            quality=quality,
-            deviation=deviation,
-            angular_tolerance=angular_tolerance,
-            edge_accuracy=edge_accuracy,
-            render_edges=render_edges,
-            render_normals=render_normals,
-            progress=progress,
-            timeit=timeit,
-        )
+        def pending_meshes(shapes):
+            for obj in shapes["parts"]:
+                if obj.get("parts") is None:
+                    if isinstance(obj["shape"], _PendingMesh):
+                        yield obj["shape"]
+                else:
+                    yield from pending_meshes(obj)
+
+        executor = get_executor(parallel)
+        pending = {}
+        try:
+            min_quality = None
+            if triangle_budget is not None:
+                with Timer(timeit, "", "triangle budget", 2) as t:
+                    estimates = self.estimate_triangles(deviation, angular_tolerance, timeit, executor, progress)
+                    min_quality = budget_quality(estimates, triangle_budget)
+                    t.info = f"{{estimated triangles: {sum(e[1] for e in estimates)}, min quality: {min_quality}}}"
+
+            shapes = self.collect_shapes(
+                loc=None,
+                quality=quality,
+                deviation=deviation,
+                angular_tolerance=angular_tolerance,
+                edge_accuracy=edge_accuracy,
+                render_edges=render_edges,
+                render_normals=render_normals,
+                progress=progress,
+                timeit=timeit,
+                executor=executor,
+                instances={},
+                min_quality=min_quality,
+            )
+
+            if executor is not None:
+                with Timer(timeit, "", "parallel tessellation", 2):
+                    # instances share their future
+                    for mesh in pending_meshes(shapes):
+                        pending.setdefault(mesh.future, []).append(mesh)
+                    for future in as_completed(pending):
+                        for mesh in pending[future]:
+                            mesh.resolve()
+        finally:
+            if executor is not None:
+                # after an error, e.g. a cancelled show, the queued tessellations are not needed any more
+                executor.shutdown(cancel_futures=True)
+
         set_paths(shapes, mapping)
+        if weld or quantize or decimate is not None or reorder:
+            with Timer(timeit, "", "postprocess meshes", 2):
+                _postprocess(shapes, weld, crease_angle, quantize, decimate, decimate_error, reorder, timeit)
         return shapes
 
+    def signature(self):
+        return (type(self).__name__, self.name, tuple(obj.signature() for obj in self.objects))
+
+    def collect_locations(self, parents=None):
+        """Locations of all groups in depth first order and of all single shape parts by path.
+
+        These are the "loc" values of collect_shapes without any tessellation.
+        """
+        parents = parents or ()
+        result = {"groups": [None if self.loc is None else loc_to_tq(self.loc)], "parts": {}}
+        for i, obj in enumerate(self.objects):
+            if isinstance(obj, _PartGroup):
+                locations = obj.collect_locations((*parents, i))
+                result["groups"] += locations["groups"]
+                result["parts"].update(locations["parts"])
+            elif isinstance(obj, _Part) and len(obj.shape) == 1:
+                _, loc = split_location(obj.shape[0])
+                result["parts"][(*parents, i)] = None if loc is None else loc_to_tq(loc)
+        return result
+
     def to_state(self, parents=None):
         parents = parents or ()
         result = {}
@@ -374,7 +606,8 @@ class _PartGroup(_CADObject):
     @staticmethod
     def reset_id():
         global PART_ID
-        PART_ID = 0
+        with PART_ID_LOCK:
+            PART_ID = 0
 
     def compounds(self):
         result = []
@@ -386,6 +619,51 @@ class _PartGroup(_CADObject):
         return Compound._makeCompound(self.compounds())
 
 
+class _PendingMesh:
+    """Placeholder for a mesh that is being tessellated in a worker process"""
+
+    def __init__(self, future, add_mesh):
+        self.future = future
+        self.add_mesh = add_mesh
+
+    def resolve(self):
+        return self.add_mesh(self.future.result())
+
+
+def _postprocess(
+    shapes,
+    weld=False,
+    crease_angle=30,
+    quantize=False,
+    decimate=None,
+    decimate_error=None,
+    reorder=False,
+    timeit=False,
+    meshes=None,
+):
+    """Weld (see weld_mesh), decimate (see decimate_mesh), reorder (see reorder_mesh) and quantize (see quantize_mesh)
+    the meshes in shapes, instances keep sharing their mesh
+    """
+    meshes = {} if meshes is None else meshes
+    for shape in shapes["parts"]:
+        if shape.get("parts") is not None:
+            _postprocess(shape, weld, crease_angle, quantize, decimate, decimate_error, reorder, timeit, meshes)
+        elif shape["type"] == "shapes":
+            mesh = shape["shape"]
+            if id(mesh) not in meshes:
+                result = weld_mesh(mesh, crease_angle) if weld else mesh
+                if decimate is not None and len(result["triangles"]) > 3 * decimate:
+                    with Timer(timeit, shape["name"], "decimate:", 3) as t:
+                        before = len(result["triangles"]) // 3
+                        result = decimate_mesh(result, decimate, decimate_error, crease_angle)
+                        t.info = f"{{triangles: {before} -> {len(result['triangles']) // 3}}}"
+                if reorder:
+                    with Timer(timeit, shape["name"], "reorder: ", 3):
+                        result = reorder_mesh(result)
+                meshes[id(mesh)] = quantize_mesh(result) if quantize else result
+            shape["shape"] = meshes[id(mesh)]
+
+
 def _combined_bb(shapes):
     def c_bb(shapes, bb):
         for shape in shapes["parts"]:
@@ -402,7 +680,46 @@ def _combined_bb(shapes):
     return bb
 
 
-def _show(part_group, **kwargs):
+def same_signature(signature1, signature2):
+    """Compare two signatures, shapes are compared with IsSame"""
+    if isinstance(signature1, (tuple, list)):
+        return (
+            isinstance(signature2, (tuple, list))
+            and len(signature1) == len(signature2)
+            and all(same_signature(s1, s2) for s1, s2 in zip(signature1, signature2))
+        )
+    elif hasattr(signature1, "IsSame"):
+        return hasattr(signature2, "IsSame") and signature1.IsSame(signature2)
+    else:
+        return signature1 == signature2
+
+
+def _signature(part_group, config):
+    """Signature of part_group and of all parameters that change the meshes"""
+    preset = lambda key, value: get_default(key) if value is None else value
+
+    params = tuple(
+        preset(key, config.get(key))
+        for key in (
+            "quality",
+            "deviation",
+            "angular_tolerance",
+            "edge_accuracy",
+            "render_edges",
+            "render_normals",
+            "triangle_budget",
+            "weld",
+            "crease_angle",
+            "quantize",
+            "decimate",
+            "decimate_error",
+            "reorder",
+        )
+    )
+    return (part_group.signature(), params)
+
+
+def _validate(kwargs):
     for k in kwargs:
         if get_default(k, "n/a") == "n/a":
             raise KeyError(f"Paramater {k} is not a valid argument for show()")
@@ -419,6 +736,27 @@ def _show(part_group, **kwargs):
         warn("tree_width has to be >= 250, setting to 250")
         kwargs["tree_width"] = 250
 
+
+def _coarse(kwargs):
+    """Tessellation parameters for the first display of a progressive show"""
+    preset = lambda key, value: get_default(key) if value is None else value
+
+    coarse = dict(kwargs)
+    for key in ("quality", "deviation", "edge_accuracy"):
+        value = preset(key, kwargs.get(key))
+        if value is not None:
+            coarse[key] = value * COARSE_FACTOR
+    coarse["angular_tolerance"] = min(preset("angular_tolerance", kwargs.get("angular_tolerance")) * COARSE_FACTOR, 1.0)
+    return coarse
+
+
+def _show(part_group, **kwargs):
+    """Show part_group, with block=False tessellation runs in a worker thread and a ShowHandle is returned.
+
+    With progressive=True a coarse tessellation is shown first and refined in the background (ShowHandle).
+    """
+    _validate(kwargs)
+
     # remove all tessellation and view parameters
     create_args, add_shape_args = split_args(kwargs)
 
@@ -426,37 +764,99 @@ def _show(part_group, **kwargs):
 
     timeit = preset("timeit", kwargs.get("timeit"))
 
-    with Timer(timeit, "", "overall"):
-
-        with Timer(timeit, "", "setup display", 1):
-            num_shapes = part_group.count_shapes()
-            d = get_or_create_display(**create_args)
-            d.init_progress(2 * num_shapes)
-
+    def tessellate(progress, params=kwargs):
         with Timer(timeit, "", "tessellate", 1):
 
             mapping = part_group.to_state()
             shapes = part_group.collect_mapped_shapes(
                 mapping,
-                quality=preset("quality", kwargs.get("quality")),
-                deviation=preset("deviation", kwargs.get("deviation")),
-                angular_tolerance=preset("angular_tolerance", kwargs.get("angular_tolerance")),
-                edge_accuracy=preset("edge_accuracy", kwargs.get("edge_accuracy")),
-                render_edges=preset("render_edges", kwargs.get("render_edges")),
-                render_normals=preset("render_normals", kwargs.get("render_normals")),
-                progress=d.progress,
+                quality=preset("quality", params.get("quality")),
+                deviation=preset("deviation", params.get("deviation")),
+                angular_tolerance=preset("angular_tolerance", params.get("angular_tolerance")),
+                edge_accuracy=preset("edge_accuracy", params.get("edge_accuracy")),
+                render_edges=preset("render_edges", params.get("render_edges")),
+                render_normals=preset("render_normals", params.get("render_normals")),
+                progress=progress,
                 timeit=timeit,
+                parallel=preset("parallel", params.get("parallel")),
+                triangle_budget=preset("triangle_budget", params.get("triangle_budget")),
+                weld=preset("weld", params.get("weld")),
+                crease_angle=preset("crease_angle", params.get("crease_angle")),
+                quantize=preset("quantize", params.get("quantize")),
+                decimate=preset("decimate", params.get("decimate")),
+                decimate_error=preset("decimate_error", params.get("decimate_error")),
+                reorder=preset("reorder", params.get("reorder")),
             )
             tree = part_group.to_nav_dict()
 
+        return mapping, shapes, tree
+
+    def show_shapes(tessellated, params=kwargs, **overrides):
+        mapping, shapes, tree = tessellated
+
         with Timer(timeit, "", "show shapes", 1):
-            d.add_shapes(shapes=shapes, mapping=mapping, tree=tree, bb=_combined_bb(shapes), **add_shape_args)
+            d.add_shapes(
+                shapes=shapes, mapping=mapping, tree=tree, bb=_combined_bb(shapes), **{**add_shape_args, **overrides}
+            )
+            d.signature = _signature(part_group, params)
+
+        d.info.version_msg(__version__)
+        d.info.ready_msg(d.cq_view.grid.step)
+
+        sidecar = has_sidecar()
+        if sidecar is not None:
+            print(f"Done, using side car '{sidecar.title()}'")
+
+        return d
+
+    def refine(tessellated):
+        _, shapes, _ = tessellated
+
+        with Timer(timeit, "", "refine shapes", 1):
+            if d.scene != scene:
+                # another show has replaced the coarse scene meanwhile
+                return d
+
+            if not d.refine_shapes(shapes):
+                # e.g. batched scenes are built again, keeping the camera
+                return show_shapes(tessellated, reset_camera=False)
+            d.signature = _signature(part_group, kwargs)
+
+        return d
+
+    with Timer(timeit, "", "overall"):
+
+        with Timer(timeit, "", "setup display", 1):
+            num_shapes = part_group.count_shapes()
+            d = get_or_create_display(**create_args)
+            d.init_progress(2 * num_shapes)
+
+        if preset("progressive", kwargs.get("progressive")):
+            coarse = _coarse(kwargs)
+            show_shapes(tessellate(d.progress, coarse), coarse)
+            scene = d.scene
+
+            d.init_progress(num_shapes)
+            return ShowHandle(tessellate, refine, d.progress, total=num_shapes)
+
+        if not preset("block", kwargs.get("block")):
+            return ShowHandle(tessellate, show_shapes, d.progress, total=2 * num_shapes)
+
+        return show_shapes(tessellate(d.progress))
+
+
+def _update(d, part_group, **kwargs):
+    """Move the parts shown in display d to the locations in part_group.
+
+    If anything but the locations of groups and parts changed, part_group is shown again instead.
+    """
+    _validate(kwargs)
 
-    d.info.version_msg(__version__)
-    d.info.ready_msg(d.cq_view.grid.step)
+    timeit = get_default("timeit") if kwargs.get("timeit") is None else kwargs.get("timeit")
 
-    sidecar = has_sidecar()
-    if sidecar is not None:
-        print(f"Done, using side car '{sidecar.title()}'")
+    with Timer(timeit, "", "update"):
+        if d is not None and same_signature(d.signature, _signature(part_group, kwargs)):
+            if d.update_locations(part_group.collect_locations()):
+                return d
 
-    return d
+    return _show(part_group, **kwargs)
@@ -14,6 +14,7 @@
 # limitations under the License.
 #
 
+from contextlib import contextmanager
 import numpy as np
 import warnings
 
@@ -37,23 +38,87 @@ from .utils import (
     Color,
     tree_find_single_selector,
     Timer,
+    dequantize_mesh,
+    fingerprint,
+    index_dtype,
+    polyline_segments,
 )
 
+IDENTITY = ((0.0, 0.0, 0.0), (0.0, 0.0, 0.0, 1.0))
 
-def material(color, transparent=False, opacity=1.0):
-    material = CustomMaterial("standard")
-    material.color = color
-    material.clipping = True
-    material.side = "DoubleSide"
-    material.alpha = 0.7
-    material.polygonOffset = True
-    material.polygonOffsetFactor = 1
-    material.polygonOffsetUnits = 1
-    material.transparent = transparent
-    material.opacity = opacity
-    material.update("metalness", 0.3)
-    material.update("roughness", 0.8)
-    return material
+
+def material(color, transparent=False, opacity=1.0, metalness=0.3, roughness=0.8):
+    return CustomMaterial(
+        "standard",
+        uniforms={"diffuse": color, "alpha": 0.7, "metalness": metalness, "roughness": roughness},
+        clipping=True,
+        side="DoubleSide",
+        polygonOffset=True,
+        polygonOffsetFactor=1,
+        polygonOffsetUnits=1,
+        transparent=transparent,
+        opacity=opacity,
+    )
+
+
+class MaterialPool(object):
+    """Materials shared by all objects of the same look, kept across show() calls.
+
+    Transparency and black edges are global view settings, so they are applied to the pooled materials
+    instead of each object in the scene graph. Materials no longer used by the scene are closed with prune().
+    """
+
+    def __init__(self):
+        self.materials = {}
+        self.line_materials = {}
+        self.keys = {}
+        self.transparent = False
+        self.black_edges = False
+
+    def mesh_material(self, color, opacity=1.0, metalness=0.3, roughness=0.8):
+        key = (color, opacity, metalness, roughness)
+        mat = self.materials.get(key)
+        if mat is None:
+            mat = material(color, self.transparent, opacity, metalness, roughness)
+            self.materials[key] = mat
+            self.keys[id(mat)] = key
+        return mat
+
+    def highlighted(self, mat, color):
+        """The pooled material looking like mat, but with the given color"""
+        _, opacity, metalness, roughness = self.keys[id(mat)]
+        return self.mesh_material(color, opacity, metalness, roughness)
+
+    def line_material(self, color, linewidth):
+        key = (color, linewidth)
+        mat = self.line_materials.get(key)
+        if mat is None:
+            mat = LineMaterial(linewidth=linewidth, color=self._line_color(color, linewidth))
+            self.line_materials[key] = mat
+        return mat
+
+    def prune(self, used):
+        """Close and remove all pooled materials whose id is not in used"""
+        for pool in (self.materials, self.line_materials):
+            for key, mat in list(pool.items()):
+                if id(mat) not in used:
+                    del pool[key]
+                    self.keys.pop(id(mat), None)
+                    mat.close()
+
+    def _line_color(self, color, linewidth):
+        # black edges only apply to the edges of shapes
+        return "#000" if self.black_edges and linewidth == 1 else color
+
+    def set_transparent(self, value):
+        self.transparent = value
+        for mat in self.materials.values():
+            mat.transparent = value
+
+    def set_black_edges(self, value):
+        self.black_edges = value
+        for (color, linewidth), mat in self.line_materials.items():
+            mat.color = self._line_color(color, linewidth)
 
 
 class IndexedGroup(Group):
@@ -102,6 +167,282 @@ class IndexedLineSegments2(LineSegments2):
         return f"IndexedLineSegments2(name='{self.name}', ind={self.ind}, position={self.position}, quaternion={self.quaternion})"
 
 
+class BatchedMesh(IndexedMesh):
+    """The merged mesh of all batched parts sharing one material"""
+
+
+#
+# Batched rendering: all parts are merged into one mesh per material and one edge geometry
+#
+
+
+def _rotation_matrix(q):
+    x, y, z, w = q
+    return np.array(
+        [
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+        ]
+    )
+
+
+def _combine(trsf, loc):
+    """Combine a transformation (rotation matrix, translation) with a location (position, quaternion)"""
+    if loc is None:
+        return trsf
+
+    rotation, translation = _rotation_matrix(loc[1]), np.asarray(loc[0], dtype=np.float64)
+    if trsf is None:
+        return rotation, translation
+
+    return trsf[0] @ rotation, trsf[0] @ translation + trsf[1]
+
+
+def _transform(points, trsf, translate=True):
+    points = np.asarray(points, dtype=np.float32)
+    if trsf is None or len(points) == 0:
+        return points
+
+    result = points.reshape(-1, 3) @ trsf[0].T
+    if translate:
+        result += trsf[1]
+    return result.astype(np.float32).reshape(points.shape)
+
+
+class BatchedPart(object):
+    """A part inside the batched geometries, referenced by its ranges in the merged arrays"""
+
+    def __init__(self, index, name, shape_ind, color):
+        self.index = index
+        self.name = name
+        self.ind = {"group": None, "shape": shape_ind}
+        self.color = color
+        self.triangles = (0, 0)
+        self.edges = (0, 0)
+        self.normals = (0, 0)
+        self.visible = {"mesh": True, "edges": True}
+
+    def __repr__(self):
+        return f"BatchedPart(name='{self.name}', ind={self.ind}, color={self.color})"
+
+
+class BatchedShapes(object):
+    def __init__(self, materials, edge_color):
+        self.materials = materials
+        self.edge_color = edge_color
+
+        self.parts = []
+        self.batches = {}
+        self.edges = []
+        self.normals = []
+        self.sizes = {"edges": 0, "normals": 0}
+        self.edge_lines = None
+        self.normal_lines = None
+
+        self.highlighted = None
+        self._held = 0
+        self._dirty = set()
+
+    def add(self, shape, trsf):
+        mesh = shape["shape"]
+        part = BatchedPart(len(self.parts), shape["name"], shape["ind"], shape["color"])
+        self.parts.append(part)
+
+        batch = self.batches.get(part.color)
+        if batch is None:
+            batch = dict(vertices=[], normals=[], triangles=[], part_ids=[], parts=[], offset=0, size=0)
+            self.batches[part.color] = batch
+
+        triangles = np.asarray(mesh["triangles"], dtype=np.uint32) + np.uint32(batch["offset"])
+        part.triangles = (batch["size"], batch["size"] + len(triangles))
+
+        vertices, normals = dequantize_mesh(mesh)
+        batch["vertices"].append(_transform(vertices, trsf))
+        batch["normals"].append(_transform(normals, trsf, translate=False))
+        batch["triangles"].append(triangles)
+        batch["part_ids"].append(np.full(len(mesh["vertices"]), part.index, dtype=np.float32))
+        batch["parts"].append(part)
+        batch["offset"] += len(mesh["vertices"])
+        batch["size"] += len(triangles)
+
+        points, offsets = mesh["edges"]
+        part.edges = self._append("edges", self.edges, polyline_segments(_transform(points, trsf), offsets))
+        part.normals = self._append("normals", self.normals, _transform(mesh["normal_edges"], trsf))
+
+        return part
+
+    def _append(self, kind, arrays, array):
+        array = array.reshape(-1, 2, 3)
+        start = self.sizes[kind]
+        arrays.append(array)
+        self.sizes[kind] += len(array)
+        return (start, start + len(array))
+
+    def build(self):
+        objects = []
+        for color, batch in self.batches.items():
+            for key in ("vertices", "normals", "triangles", "part_ids"):
+                batch[key] = _concat(batch[key], np.float32 if key != "triangles" else index_dtype(batch["offset"]))
+
+            geometry = BufferGeometry(
+                attributes={
+                    "position": BufferAttribute(batch["vertices"]),
+                    "index": BufferAttribute(batch["triangles"]),
+                    "normal": BufferAttribute(batch["normals"]),
+                    "partId": BufferAttribute(batch["part_ids"]),
+                }
+            )
+            batch["index"] = batch["triangles"]
+            batch["geometry"] = geometry
+            batch["mesh"] = BatchedMesh(geometry=geometry, material=self.materials.mesh_material(color))
+            batch["mesh"].name = "batched"
+            batch["mesh"].ind = {"group": None, "shape": None}
+            objects.append(batch["mesh"])
+
+        self.edges = _concat(self.edges, np.float32, (0, 2, 3))
+        self.normals = _concat(self.normals, np.float32, (0, 2, 3))
+        if len(self.edges) > 0:
+            self.edge_lines = LineSegments2(
+                LineSegmentsGeometry(positions=self.edges), self.materials.line_material(self.edge_color, 1)
+            )
+            objects.append(self.edge_lines)
+        if len(self.normals) > 0:
+            self.normal_lines = LineSegments2(
+                LineSegmentsGeometry(positions=self.normals), self.materials.line_material("#9400d3", 2)
+            )
+            objects.append(self.normal_lines)
+
+        return objects
+
+    # Visibility
+
+    @contextmanager
+    def hold(self):
+        """Collect visibility changes and update the geometries once at the end"""
+        self._held += 1
+        try:
+            yield
+        finally:
+            self._held -= 1
+            if self._held == 0:
+                self._update()
+
+    def set_visibility(self, part, feature, visible):
+        if part.visible[feature] != visible:
+            part.visible[feature] = visible
+            self._dirty.add(part.color if feature == "mesh" else "edges")
+            if self._held == 0:
+                self._update()
+
+    def _update(self):
+        for key in self._dirty:
+            if key == "edges":
+                self._update_lines(self.edge_lines, self.edges, "edges")
+                self._update_lines(self.normal_lines, self.normals, "normals")
+            else:
+                self._update_mesh(self.batches[key])
+        self._dirty = set()
+
+    def _update_mesh(self, batch):
+        ranges = [p.triangles for p in batch["parts"] if p.visible["mesh"] and p is not self.highlighted]
+        if len(ranges) == len(batch["parts"]):
+            index = batch["triangles"]
+        else:
+            index = _concat([batch["triangles"][start:end] for start, end in ranges], batch["triangles"].dtype)
+        batch["index"] = index
+        batch["mesh"].visible = len(index) > 0
+        if len(index) > 0:
+            batch["geometry"].attributes["index"].array = index
+
+    def _update_lines(self, lines, positions, kind):
+        if lines is None:
+            return
+        ranges = [getattr(p, kind) for p in self.parts if p.visible["edges"]]
+        positions = _concat([positions[start:end] for start, end in ranges], np.float32, (0, 2, 3))
+        lines.visible = len(positions) > 0
+        if len(positions) > 0:
+            lines.geometry.positions = positions
+
+    # Picking
+
+    def part_at(self, mesh, face_index):
+        for batch in self.batches.values():
+            if batch["mesh"] is mesh:
+                if face_index is None or 3 * face_index >= len(batch["index"]):
+                    return None
+                return self.parts[int(batch["part_ids"][batch["index"][3 * face_index]])]
+        return None
+
+    def highlight(self, part, color):
+        """Replace the part in its batch by a single mesh with the given color"""
+        batch = self.batches[part.color]
+        attributes = batch["geometry"].attributes
+        start, end = part.triangles
+        geometry = BufferGeometry(
+            attributes={
+                "position": attributes["position"],
+                "index": BufferAttribute(batch["triangles"][start:end]),
+                "normal": attributes["normal"],
+            }
+        )
+        mesh = IndexedMesh(geometry=geometry, material=self.materials.mesh_material(color))
+        mesh.name = part.name
+        mesh.ind = part.ind
+
+        self.highlighted = part
+        self._update_mesh(batch)
+        return mesh
+
+    def unhighlight(self):
+        part, self.highlighted = self.highlighted, None
+        if part is not None:
+            self._update_mesh(self.batches[part.color])
+
+
+def _concat(arrays, dtype, empty_shape=(0,)):
+    if len(arrays) == 0:
+        return np.empty(empty_shape, dtype=dtype)
+    return np.concatenate(arrays).astype(dtype, copy=False)
+
+
+def _shape_points(shape):
+    """All points of a rendered part in the coordinates of the part as (n, 3) float64 array"""
+    if shape["type"] == "shapes":
+        points = dequantize_mesh(shape["shape"])[0]
+    else:
+        points = shape["shape"]
+    return np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+
+def _relocate(obj, loc):
+    """Set the location of a group or part, returns whether it changed"""
+    position, quaternion = IDENTITY if loc is None else loc
+    if tuple(obj.position) == tuple(position) and tuple(obj.quaternion) == tuple(quaternion):
+        return False
+    obj.position, obj.quaternion = position, quaternion
+    return True
+
+
+def _mesh_geometry(mesh):
+    if "dequantize" in mesh:
+        # Raycasting and bounding spheres of three.js need float positions, normals are normalized by the shader,
+        # so quantized normals are sent as normalized int8
+        vertices, normals = dequantize_mesh(mesh)
+        normal = BufferAttribute(np.rint(normals * 127).astype(np.int8), normalized=True)
+    else:
+        vertices = mesh["vertices"]
+        normal = BufferAttribute(mesh["normals"])
+
+    return BufferGeometry(
+        attributes={
+            "position": BufferAttribute(vertices),
+            "index": BufferAttribute(mesh["triangles"]),
+            "normal": normal,
+        }
+    )
+
+
 class CadqueryRenderer(object):
     def __init__(
         self,
@@ -112,6 +453,16 @@ class CadqueryRenderer(object):
         self.default_mesh_color = Color(default_mesh_color or (166, 166, 166))
         self.default_edge_color = Color(default_edge_color or (128, 128, 128))
 
+        self.materials = MaterialPool()
+        self.batch = None
+        self._groups = []
+        self._containers = []
+        self._parts = {}
+        self._bounds = {}
+        self._leaves = {}
+        self._widgets = {}
+        self.moved = set()
+
         self.timeit = timeit
 
     def _render_shape(
@@ -124,7 +475,6 @@ class CadqueryRenderer(object):
         vertex_color=None,
         edge_width=1,
         vertex_width=5,
-        transparent=False,
         opacity=1.0,
     ):
 
@@ -140,18 +490,15 @@ class CadqueryRenderer(object):
         if shape is not None:
             # Compute the tesselation and build mesh
             with Timer(self.timeit, "", "build mesh:", 5):
-                edge_list, normals_list = shape["edges"]
-                shape_geometry = BufferGeometry(
-                    attributes={
-                        "position": BufferAttribute(shape["vertices"]),
-                        "index": BufferAttribute(shape["triangles"]),
-                        "normal": BufferAttribute(shape["normals"]),
-                    }
-                )
+                edge_list = polyline_segments(*shape["edges"])
+                normals_list = shape["normal_edges"]
+                shape_geometry = self._geometry(shape, "mesh", lambda: _mesh_geometry(shape))
 
                 if mesh_color is None:
                     mesh_color = self.default_mesh_color
-                shp_material = material(mesh_color, transparent=transparent, opacity=opacity)
+                if isinstance(mesh_color, Color):
+                    mesh_color = mesh_color.web_color
+                shp_material = self.materials.mesh_material(mesh_color, opacity=opacity)
                 shape_mesh = IndexedMesh(geometry=shape_geometry, material=shp_material)
 
         if vertices is not None:
@@ -185,20 +532,32 @@ class CadqueryRenderer(object):
                 mat = LineMaterial(linewidth=edge_width, vertexColors="VertexColors")
                 edge_lines = [IndexedLineSegments2(lines, mat)]
             else:
-                lines = LineSegmentsGeometry(positions=edge_list)
-                mat = LineMaterial(
-                    linewidth=edge_width, color=edge_color.web_color if isinstance(edge_color, Color) else edge_color
+                if shape is None:
+                    lines = LineSegmentsGeometry(positions=edge_list)
+                else:
+                    lines = self._geometry(shape, "edges", lambda: LineSegmentsGeometry(positions=edge_list))
+                mat = self.materials.line_material(
+                    edge_color.web_color if isinstance(edge_color, Color) else edge_color, edge_width
                 )
                 edge_lines = [IndexedLineSegments2(lines, mat)]
 
         if len(normals_list) > 0:
-            lines = LineSegmentsGeometry(positions=normals_list)
-            mat = LineMaterial(linewidth=2, color="#9400d3")
+            lines = self._geometry(shape, "normals", lambda: LineSegmentsGeometry(positions=normals_list))
+            mat = self.materials.line_material("#9400d3", 2)
             normal_lines = [IndexedLineSegments2(lines, mat)]
 
         return shape_mesh, edge_lines, normal_lines, points
 
-    def _render(self, shapes, current, prefix=""):
+    def _geometry(self, mesh, kind, create):
+        # Instances of a part share the same mesh dict, so they can share the geometry widgets, too
+        key = (id(mesh), kind)
+        geometry = self._geometries.get(key)
+        if geometry is None:
+            geometry = create()
+            self._geometries[key] = geometry
+        return geometry
+
+    def _render(self, shapes, current, prefix="", parents=()):
 
         group = IndexedGroup()
         # we need to ensure unique names to enable Threejs animation later which currently doesn't
@@ -206,6 +565,9 @@ class CadqueryRenderer(object):
         _, _, name = shapes["name"].rpartition("/")
         group.name = name if prefix == "" else f"{prefix}\\{name}"
         group.ind = current
+        parents = (*parents, len(self._groups))
+        self._groups.append(group)
+        self._containers.append(group)
 
         if shapes["loc"] is not None:
             group.position, group.quaternion = shapes["loc"]
@@ -213,67 +575,330 @@ class CadqueryRenderer(object):
         # Render all shapes
         for shape in shapes["parts"]:
             if shape.get("parts") is None:
-                self._mapping[shape["ind"]] = {"mesh": None, "edges": None}
+                self._render_leaf(shape, group, current, parents)
+            else:
+                ind = len(group.children)
+                group.add(self._render(shape, (*current, ind), group.name, parents))
 
-                if shape["type"] == "edges":
-                    options = dict(
-                        edges=shape["shape"],
-                        edge_color=shape["color"],
-                        edge_width=3,
-                    )
-                elif shape["type"] == "vertices":
-                    options = dict(
-                        vertices=shape["shape"],
-                        vertex_color=shape["color"],
-                        vertex_width=6,
-                    )
-                else:
-                    options = dict(
-                        shape=shape["shape"],
-                        mesh_color=shape["color"],
-                    )
+        return group
 
-                with Timer(self.timeit, shape["name"], "render shape:", 4):
-                    shape_mesh, edge_lines, normal_lines, points = self._render_shape(**options)
+    def _render_leaf(self, shape, group, current, parents):
+        self._mapping[shape["ind"]] = {"mesh": None, "edges": None}
+
+        if shape["type"] == "edges":
+            options = dict(
+                edges=shape["shape"],
+                edge_color=shape["color"],
+                edge_width=3,
+            )
+        elif shape["type"] == "vertices":
+            options = dict(
+                vertices=shape["shape"],
+                vertex_color=shape["color"],
+                vertex_width=6,
+            )
+        else:
+            options = dict(
+                shape=shape["shape"],
+                mesh_color=shape["color"],
+            )
+
+        # unchanged leaves of the previous scene keep their widgets
+        key = self._leaf_key(shape)
+        widgets = self._reuse(key, shape)
+        if widgets is None:
+            with Timer(self.timeit, shape["name"], "render shape:", 4):
+                widgets = self._render_shape(**options)
+        self._leaves.setdefault(key, []).append(widgets)
+        self._widgets[shape["ind"]] = (key, widgets)
+        self._bounds[shape["ind"]] = (shape, parents)
+        shape_mesh, edge_lines, normal_lines, points = widgets
+
+        # the location of a part instance relative to its group
+        self._parts[shape["ind"]] = [obj for obj in (shape_mesh, *edge_lines, *normal_lines) if obj is not None]
+        for obj in self._parts[shape["ind"]]:
+            obj.position, obj.quaternion = IDENTITY if shape.get("loc") is None else shape["loc"]
+
+        ind = len(group.children)
+        if shape_mesh is not None:
+            shape_mesh.name = shape["name"]
+            shape_mesh.ind = {"group": (*current, ind), "shape": shape["ind"]}
+            shape_mesh.visible = False
+            group.add(shape_mesh)
+            self._mapping[shape["ind"]]["mesh"] = (*current, ind)
+            ind += 1
+
+        if edge_lines or normal_lines:
+            edge_group = IndexedGroup()
+            edge_group.name = "edges"
+            edge_group.ind = (*current, ind)
+            self._containers.append(edge_group)
+            for j, edge in enumerate(edge_lines + normal_lines):
+                edge.name = shape["name"]
+                edge.ind = {"group": (*current, ind, j), "shape": shape["ind"]}
+                edge_group.add(edge)
+            group.add(edge_group)
+            edge_group.visible = False
+            self._mapping[shape["ind"]]["edges"] = (*current, ind)
+            ind += 1
+
+        if points is not None:
+            points.name = shape["name"]
+            points.ind = {"group": (*current, ind), "shape": shape["ind"]}
+            group.add(points)
+            self._mapping[shape["ind"]]["mesh"] = (*current, ind)
+            ind += 1
+
+        self.progress.update()
+
+    def _leaf_key(self, shape):
+        # instances share their mesh dict, so it is hashed only once per render
+        content = self._fingerprints.get(id(shape["shape"]))
+        if content is None:
+            content = self._fingerprints[id(shape["shape"])] = fingerprint(shape["shape"])
+        color = tuple(shape["color"]) if isinstance(shape["color"], list) else shape["color"]
+        return (shape["type"], content, color, str(self.default_edge_color))
+
+    def _reuse(self, key, shape):
+        widgets = self._previous.get(key)
+        if not widgets:
+            return None
+
+        shape_mesh, edge_lines, normal_lines, points = widgets = widgets.pop()
+
+        # new instances of the mesh share the geometries of the reused widgets
+        if shape["type"] == "shapes":
+            for kind, objs in (("mesh", [shape_mesh]), ("edges", edge_lines), ("normals", normal_lines)):
+                if objs and objs[0] is not None:
+                    self._geometries.setdefault((id(shape["shape"]), kind), objs[0].geometry)
+        return widgets
+
+    def _dispose(self, leaves):
+        """Close the widgets of the previous scene that are not used any more"""
+        used = {
+            id(obj.geometry)
+            for stack in self._leaves.values()
+            for widgets in stack
+            for obj in self._objects(widgets)
+        }
+        for stack in leaves.values():
+            for widgets in stack:
+                for obj in self._objects(widgets):
+                    geometry = obj.geometry
+                    obj.close()
+                    if id(geometry) not in used:
+                        geometry.close()
+
+    def _used_materials(self):
+        objects = [obj for stack in self._leaves.values() for widgets in stack for obj in self._objects(widgets)]
+        if self.batch is not None:
+            objects += [batch["mesh"] for batch in self.batch.batches.values()]
+            objects += [obj for obj in (self.batch.edge_lines, self.batch.normal_lines) if obj is not None]
+        return {id(obj.material) for obj in objects}
+
+    @staticmethod
+    def _objects(widgets):
+        shape_mesh, edge_lines, normal_lines, points = widgets
+        return [obj for obj in (shape_mesh, *edge_lines, *normal_lines, points) if obj is not None]
+
+    def _render_batched(self, shapes, group, trsf=None):
+        trsf = _combine(trsf, shapes["loc"])
+
+        for shape in shapes["parts"]:
+            if shape.get("parts") is not None:
+                self._render_batched(shape, group, trsf)
+                continue
+
+            if shape["type"] == "shapes":
+                part = self.batch.add(shape, _combine(trsf, shape.get("loc")))
+                self._mapping[shape["ind"]] = {"mesh": None, "edges": None, "batched": part}
 
-                ind = len(group.children)
-                if shape_mesh is not None:
-                    shape_mesh.name = shape["name"]
-                    shape_mesh.ind = {"group": (*current, ind), "shape": shape["ind"]}
-                    shape_mesh.visible = False
-                    group.add(shape_mesh)
-                    self._mapping[shape["ind"]]["mesh"] = (*current, ind)
-                    ind += 1
-
-                if edge_lines or normal_lines:
-                    edge_group = IndexedGroup()
-                    edge_group.name = "edges"
-                    edge_group.ind = (*current, ind)
-                    for j, edge in enumerate(edge_lines + normal_lines):
-                        edge.name = shape["name"]
-                        edge.ind = {"group": (*current, ind, j), "shape": shape["ind"]}
-                        edge_group.add(edge)
-                    group.add(edge_group)
-                    edge_group.visible = False
-                    self._mapping[shape["ind"]]["edges"] = (*current, ind)
-                    ind += 1
-
-                if points is not None:
-                    points.name = shape["name"]
-                    points.ind = {"group": (*current, ind), "shape": shape["ind"]}
-                    group.add(points)
-                    self._mapping[shape["ind"]]["mesh"] = (*current, ind)
-                    ind += 1
-
-                self.progress.update()
             else:
+                # edges and vertices are not batched, they are added to the root group in world coordinates
+                self._mapping[shape["ind"]] = {"mesh": None, "edges": None}
                 ind = len(group.children)
-                group.add(self._render(shape, (*current, ind), group.name))
+                if shape["type"] == "edges":
+                    _, edge_lines, _, _ = self._render_shape(
+                        edges=_transform(shape["shape"], trsf), edge_color=shape["color"], edge_width=3
+                    )
+                    obj = edge_lines[0]
+                    self._mapping[shape["ind"]]["edges"] = (ind,)
+                else:
+                    _, _, _, obj = self._render_shape(
+                        vertices=_transform(shape["shape"], trsf), vertex_color=shape["color"], vertex_width=6
+                    )
+                    self._mapping[shape["ind"]]["mesh"] = (ind,)
+                obj.name = shape["name"]
+                obj.ind = {"group": (ind,), "shape": shape["ind"]}
+                obj.visible = False
+                group.add(obj)
 
-        return group
+            self.progress.update()
 
-    def render(self, shapes, progress):
+    def render(self, shapes, progress, batched=False):
         self.progress = progress
         self._mapping = {}
-        rendered_objects = self._render(shapes, (), "")
+        self._geometries = {}
+        self._fingerprints = {}
+        self._groups = []
+        self._parts = {}
+        self._bounds = {}
+        self._widgets = {}
+        self.moved = set()
+
+        # Widgets of the previous scene are detached from their groups, so that they can be reused. The groups
+        # are not closed, since the previous root group may still be referenced, e.g. by the picker
+        for group in self._containers:
+            group.children = ()
+        self._containers = []
+        self._previous, self._leaves = self._leaves, {}
+
+        if batched:
+            group = IndexedGroup()
+            _, _, group.name = shapes["name"].rpartition("/")
+            group.ind = ()
+
+            edge_color = self.default_edge_color
+            self.batch = BatchedShapes(
+                self.materials, edge_color.web_color if isinstance(edge_color, Color) else edge_color
+            )
+            with Timer(self.timeit, "", "collect batches", 4):
+                self._render_batched(shapes, group)
+            with Timer(self.timeit, "", "build batches", 4):
+                for obj in self.batch.build():
+                    group.add(obj)
+            rendered_objects = group
+        else:
+            self.batch = None
+            rendered_objects = self._render(shapes, (), "")
+        self._geometries = {}
+
+        with Timer(self.timeit, "", "dispose unused widgets", 4):
+            self._dispose(self._previous)
+            self.materials.prune(self._used_materials())
+        self._previous = {}
+
         return rendered_objects, self._mapping
+
+    def append(self, shape, progress):
+        """Render the single part shape into the root group of the rendered scene.
+
+        The rendered parts are left alone, shape["ind"] has to be the next index of the root group.
+        """
+        self.progress = progress
+        self._geometries = {}
+        self._fingerprints = {}
+        self._previous = {}
+
+        root = self._groups[0]
+        self._render_leaf(shape, root, root.ind, (0,))
+        self._geometries = {}
+
+    def refine(self, shapes, progress=None):
+        """Swap the meshes of the rendered parts for the meshes of the same parts in shapes, e.g. finer ones.
+
+        Only the geometries of the existing widgets are replaced, so camera, clipping and visibility are kept.
+        """
+        self._geometries = {}
+        self._fingerprints = {}
+
+        def refine_leaves(shapes, replaced):
+            for shape in shapes["parts"]:
+                if shape.get("parts") is not None:
+                    refine_leaves(shape, replaced)
+                elif shape["type"] == "shapes" and shape["ind"] in self._widgets:
+                    self._refine(shape, replaced)
+                    if progress is not None:
+                        progress.update()
+
+        replaced = []
+        refine_leaves(shapes, replaced)
+        self._geometries = {}
+
+        # close the replaced geometries unless they are still shown by parts that were not refined
+        used = {id(obj.geometry) for _, widgets in self._widgets.values() for obj in self._objects(widgets)}
+        for geometry in replaced:
+            if id(geometry) not in used:
+                geometry.close()
+
+    def _refine(self, shape, replaced):
+        key, widgets = self._widgets[shape["ind"]]
+        new_key = self._leaf_key(shape)
+        if new_key == key:
+            return
+
+        shape_mesh, edge_lines, normal_lines, _ = widgets
+        mesh = shape["shape"]
+        edge_list = polyline_segments(*mesh["edges"])
+        normals_list = mesh["normal_edges"]
+
+        if shape_mesh is not None:
+            replaced.append(shape_mesh.geometry)
+            shape_mesh.geometry = self._geometry(mesh, "mesh", lambda: _mesh_geometry(mesh))
+        if edge_lines and len(edge_list) > 0:
+            replaced.append(edge_lines[0].geometry)
+            edge_lines[0].geometry = self._geometry(mesh, "edges", lambda: LineSegmentsGeometry(positions=edge_list))
+        if normal_lines and len(normals_list) > 0:
+            replaced.append(normal_lines[0].geometry)
+            normal_lines[0].geometry = self._geometry(
+                mesh, "normals", lambda: LineSegmentsGeometry(positions=normals_list)
+            )
+
+        # the widgets now show the new mesh, so they are reused for it
+        self._leaves[key] = [w for w in self._leaves.get(key, []) if w is not widgets]
+        self._leaves.setdefault(new_key, []).append(widgets)
+        self._widgets[shape["ind"]] = (new_key, widgets)
+        self._bounds[shape["ind"]] = (shape, self._bounds[shape["ind"]][1])
+
+    def update_locations(self, locations):
+        """Move the rendered groups and parts, see _PartGroup.collect_locations.
+
+        Returns the indices of the parts that moved, i.e. whose own location or the location of a parent group
+        changed. They are collected in moved until the next render.
+        """
+        groups = set()
+        for i, (group, loc) in enumerate(zip(self._groups, locations["groups"])):
+            if _relocate(group, loc):
+                groups.add(i)
+
+        moved = {ind for ind, (_, parents) in self._bounds.items() if groups.intersection(parents)}
+        for ind, loc in locations["parts"].items():
+            for obj in self._parts.get(ind, []):
+                if _relocate(obj, loc):
+                    moved.add(ind)
+
+        self.moved |= moved
+        return moved
+
+    def bounding_boxes(self, inds):
+        """Bounding boxes of the rendered parts with the given indices at the current locations.
+
+        They are computed like the bounding boxes of collect_shapes from the points of the parts, transformed by
+        the locations of all parent groups and of the part itself.
+        """
+        result = {}
+        for ind in inds:
+            shape, parents = self._bounds[ind]
+            points = _shape_points(shape)
+            if len(points) == 0:
+                continue
+
+            trsf = None
+            for i in parents:
+                trsf = _combine(trsf, (self._groups[i].position, self._groups[i].quaternion))
+            objs = self._parts.get(ind)
+            if objs:
+                trsf = _combine(trsf, (objs[0].position, objs[0].quaternion))
+
+            if trsf is not None:
+                points = points @ trsf[0].T + trsf[1]
+            mins, maxs = points.min(axis=0), points.max(axis=0)
+            result[ind] = {
+                "xmin": float(mins[0]),
+                "xmax": float(maxs[0]),
+                "ymin": float(mins[1]),
+                "ymax": float(maxs[1]),
+                "zmin": float(mins[2]),
+                "zmax": float(maxs[2]),
+            }
+        return result
@@ -14,6 +14,7 @@
 # limitations under the License.
 #
 
+from contextlib import contextmanager
 import itertools
 import math
 import numpy as np
@@ -25,13 +26,11 @@ with warnings.catch_warnings():
         CombinedCamera,
         Plane,
         Mesh,
-        LineSegments2,
         AmbientLight,
         DirectionalLight,
         Scene,
         Renderer,
         Picker,
-        Group,
     )
 
     try:
@@ -43,7 +42,8 @@ with warnings.catch_warnings():
 from jupyter_cadquery_widgets.widgets import state_diff
 from .cad_helpers import Grid, Axes
 from .utils import rotate, Color, Timer
-from .cad_renderer import CadqueryRenderer, IndexedMesh
+from .cad_renderer import CadqueryRenderer, BatchedMesh, BatchedPart
+from .ocp_utils import BoundingBox
 from .defaults import get_default
 
 
@@ -76,12 +76,15 @@ class CadqueryView(object):
 
         self.pickable_objects = None
         self.pick_last_mesh = None
-        self.pick_last_mesh_color = None
+        self.pick_last_mesh_material = None
+        self.pick_overlay = None
         self.pick_mapping = {}
 
         self.camera = None
         self.axes = None
         self.grid = None
+        self.picker = None
+        self.helpers = None
         self.scene = None
         self.controller = None
         self.renderer = None
@@ -97,8 +100,7 @@ class CadqueryView(object):
         self.savestate = ((0, 0, 0, "XYZ"), (0, 0, 0))
 
     def get_transparent(self):
-        # if one object is transparent, all are
-        return self.pickable_objects.children[0].material.transparent
+        return self.cq_renderer.materials.transparent
 
     def _scale(self, vec):
         r = self.bb.max_dist_from_center() * self.camera_distance_factor
@@ -165,30 +167,27 @@ class CadqueryView(object):
         self.camera.mode = "orthographic" if value else "perspective"
 
     def set_transparent(self, value):
-        def toggle(group, value):
-            for obj in group.children:
-                if isinstance(obj, Group):
-                    toggle(obj, value)
-                else:
-                    if type(obj) is IndexedMesh:
-                        obj.material.transparent = value
-
-        toggle(self.pickable_objects, value)
+        self.cq_renderer.materials.set_transparent(value)
 
     def set_black_edges(self, value):
-        def toggle(group, value):
-            for obj in group.children:
-                if isinstance(obj, Group):
-                    toggle(obj, value)
-                else:
-                    if isinstance(obj, LineSegments2):
-                        if obj.material.linewidth == 1:
-                            obj.material.color = "#000" if value else self.edge_color
+        self.cq_renderer.materials.set_black_edges(value)
 
-        toggle(self.pickable_objects, value)
+    @contextmanager
+    def hold_visibility(self):
+        """Apply all visibility changes at once at the end (for batched rendering)"""
+        if self.cq_renderer.batch is None:
+            yield
+        else:
+            with self.cq_renderer.batch.hold():
+                yield
 
     def set_visibility(self, ind, i, state):
         feature = self.features[i]
+        part = self.pick_mapping[ind].get("batched")
+        if part is not None:
+            self.cq_renderer.batch.set_visibility(part, feature, state == 1)
+            return
+
         group_index = self.pick_mapping[ind][feature]
         group = self._get_group(group_index)
         if group is not None:
@@ -197,9 +196,10 @@ class CadqueryView(object):
     def change_visibility(self, paths):
         def f(states):
             diffs = state_diff(states.get("old"), states.get("new"))
-            for diff in diffs:
-                [[obj, val]] = diff.items()
-                self.set_visibility(paths[obj], val["icon"], val["new"])
+            with self.hold_visibility():
+                for diff in diffs:
+                    [[obj, val]] = diff.items()
+                    self.set_visibility(paths[obj], val["icon"], val["new"])
 
         return f
 
@@ -231,17 +231,21 @@ class CadqueryView(object):
         return shape
 
     def pick(self, value):
-        if self.pick_last_mesh != value.owner.object:
+        picked = value.owner.object
+        if isinstance(picked, BatchedMesh):
+            picked = self.cq_renderer.batch.part_at(picked, value.owner.faceIndex)
+        elif picked is not None and picked is self.pick_overlay:
+            picked = self.pick_last_mesh
+
+        if self.pick_last_mesh != picked:
             # Reset
-            if value.owner.object is None or self.pick_last_mesh is not None:
-                self.pick_last_mesh.material.color = self.pick_last_mesh_color
-                self.pick_last_mesh = None
-                self.pick_last_mesh_color = None
+            if self.pick_last_mesh is not None:
+                self._unhighlight()
 
             # Change highlighted mesh
-            if isinstance(value.owner.object, Mesh):
-                self.pick_last_mesh = value.owner.object
-                shape = self._get_bb(value.owner.object.ind["shape"])
+            if isinstance(picked, (Mesh, BatchedPart)):
+                self.pick_last_mesh = picked
+                shape = self._get_bb(picked.ind["shape"])
                 bbox = shape["bb"]
 
                 self.info.bb_info(
@@ -257,8 +261,29 @@ class CadqueryView(object):
                         ),
                     ),
                 )
-                self.pick_last_mesh_color = self.pick_last_mesh.material.color
-                self.pick_last_mesh.material.color = self.pick_color.web_color
+                self._highlight()
+
+    def _highlight(self):
+        if isinstance(self.pick_last_mesh, BatchedPart):
+            # batched parts are cut out of their batch and shown as a separate highlighted mesh
+            self.pick_overlay = self.cq_renderer.batch.highlight(self.pick_last_mesh, self.pick_color.web_color)
+            self.pickable_objects.add(self.pick_overlay)
+        else:
+            # materials are shared, so the picked mesh gets a highlighted material instead of changing its own
+            self.pick_last_mesh_material = self.pick_last_mesh.material
+            self.pick_last_mesh.material = self.cq_renderer.materials.highlighted(
+                self.pick_last_mesh_material, self.pick_color.web_color
+            )
+
+    def _unhighlight(self):
+        if isinstance(self.pick_last_mesh, BatchedPart):
+            self.pickable_objects.remove(self.pick_overlay)
+            self.cq_renderer.batch.unhighlight()
+        else:
+            self.pick_last_mesh.material = self.pick_last_mesh_material
+        self.pick_last_mesh = None
+        self.pick_last_mesh_material = None
+        self.pick_overlay = None
 
     def clip(self, index):
         def f(change):
@@ -272,7 +297,7 @@ class CadqueryView(object):
         return self.camera.mode == "orthographic"
 
     def is_transparent(self):
-        return self.pickable_objects.children[0].material.transparent
+        return self.cq_renderer.materials.transparent
 
     def create(self):
         self.cq_renderer = CadqueryRenderer(
@@ -331,6 +356,7 @@ class CadqueryView(object):
         rotation=None,
         zoom=None,
         reset_camera=True,
+        batched=None,
     ):
 
         preset = lambda key, value: get_default(key) if value is None else value
@@ -345,9 +371,18 @@ class CadqueryView(object):
         self.bbs = self._filter_shapes(shapes)
         self.bb = bb
 
+        # Reused meshes must not keep the highlighted material
+        if self.pick_last_mesh is not None:
+            self._unhighlight()
+
         # Render Shapes
         with Timer(self.timeit, "", "overall render", 3):
-            self.pickable_objects, self.pick_mapping = self.cq_renderer.render(shapes, progress)
+            self.pickable_objects, self.pick_mapping = self.cq_renderer.render(
+                shapes, progress, batched=preset("batched", batched)
+            )
+            self.pick_last_mesh = None
+            self.pick_last_mesh_material = None
+            self.pick_overlay = None
 
         with Timer(self.timeit, "", "configure view", 3):
             bb_max = self.bb.max_dist_from_center()
@@ -383,34 +418,19 @@ class CadqueryView(object):
                 if self.initial_zoom is None:
                     self.initial_zoom = self.zoom
 
-            # Set up Helpers relative to bounding box
-            xy_max = max(abs(self.bb.xmin), abs(self.bb.xmax), abs(self.bb.ymin), abs(self.bb.ymax)) * 1.2
-            self.grid = Grid(
-                bb_center=self.bb.center, maximum=xy_max, colorCenterLine="#aaa", colorGrid="#ddd", ticks=ticks
-            )
-            self.grid.set_visibility(False)
-
-            self.axes = Axes(bb_center=self.bb.center, length=self.grid.grid.size / 2)
-            self.axes.set_visibility(False)
+            # Set up Helpers and lights relative to bounding box
+            self._set_helpers(bb_factor, ticks, ambient_intensity, direct_intensity)
 
             # Set up the controller relative to bounding box
             self.controller.target = self.bb.center
             self.controller.target0 = self.bb.center
             self.controller.panSpeed = (self.bb.xsize + self.bb.ysize + self.bb.zsize) / 300
 
-            # Set up lights in every of the 8 corners of the global bounding box
-            positions = list(itertools.product(*[(-orbit_radius, orbit_radius)] * 3))
-
-            self.amb_light = AmbientLight(intensity=ambient_intensity)
-            self.key_lights = [
-                DirectionalLight(color="white", position=position, intensity=direct_intensity)
-                for position in positions
-            ]
-
-            # Set up Picker
+            # Set up Picker, replacing the one of the previous objects
+            controls = [control for control in self.renderer.controls if control is not self.picker]
             self.picker = Picker(controlling=self.pickable_objects, event="dblclick")
             self.picker.observe(self.pick)
-            self.renderer.controls = self.renderer.controls + [self.picker]
+            self.renderer.controls = controls + [self.picker]
 
             # Set up camera
             self.update_camera(self.position, self.zoom, orbit_radius)
@@ -435,6 +455,108 @@ class CadqueryView(object):
 
         return self.renderer
 
+    def _set_helpers(self, bb_factor, ticks, ambient_intensity, direct_intensity):
+        """Create grid, axes and lights for the bounding box, they are kept when bounding box and settings are
+        unchanged. Returns whether new helpers were created"""
+        helpers = (tuple(sorted(self.bb.to_dict().items())), bb_factor, ticks, ambient_intensity, direct_intensity)
+        if helpers == self.helpers:
+            return False
+        self.helpers = helpers
+
+        xy_max = max(abs(self.bb.xmin), abs(self.bb.xmax), abs(self.bb.ymin), abs(self.bb.ymax)) * 1.2
+        self.grid = Grid(
+            bb_center=self.bb.center, maximum=xy_max, colorCenterLine="#aaa", colorGrid="#ddd", ticks=ticks
+        )
+        self.grid.set_visibility(False)
+
+        self.axes = Axes(bb_center=self.bb.center, length=self.grid.grid.size / 2)
+        self.axes.set_visibility(False)
+
+        # Set up lights in every of the 8 corners of the global bounding box
+        orbit_radius = 4 * bb_factor * self.bb.max_dist_from_center()
+        positions = list(itertools.product(*[(-orbit_radius, orbit_radius)] * 3))
+
+        self.amb_light = AmbientLight(intensity=ambient_intensity)
+        self.key_lights = [
+            DirectionalLight(color="white", position=position, intensity=direct_intensity) for position in positions
+        ]
+        return True
+
+    def _update_bbs(self, inds):
+        """Replace the bounding boxes of the given parts by the ones at their current locations"""
+        for ind, bb in self.cq_renderer.bounding_boxes(inds).items():
+            self._get_bb(ind)["bb"] = bb
+
+    def _combined_bb(self, shapes, bb=None):
+        for shape in shapes["parts"]:
+            if shape.get("parts") is not None:
+                bb = self._combined_bb(shape, bb)
+            elif bb is None:
+                bb = BoundingBox(shape["bb"])
+            else:
+                bb.update(shape["bb"])
+        return bb
+
+    def update_locations(self, locations):
+        """Move the rendered groups and parts and fit bounding boxes, helpers and camera target to the new locations.
+
+        Returns whether anything moved. The clipping planes follow the sliders of the display.
+        """
+        moved = self.cq_renderer.update_locations(locations)
+        if not moved:
+            return False
+
+        self._update_bbs(moved)
+        old_center = self.bb.center
+        self.bb = self._combined_bb(self.bbs)
+        self._fit_to_bb(old_center)
+        return True
+
+    def append_shape(self, shape, progress):
+        """Render the single part shape into the shown scene and fit bounding box, helpers and camera target to it.
+
+        The rendered parts are kept, shape["ind"] has to be the next index of the root group.
+        """
+        self.cq_renderer.append(shape, progress)
+        self.bbs["parts"] += self._filter_shapes({"parts": [shape]})["parts"]
+
+        old_center = self.bb.center
+        self.bb = BoundingBox(self.bb)
+        self.bb.update(shape["bb"])
+        self._fit_to_bb(old_center)
+
+    def _fit_to_bb(self, old_center):
+        """Fit helpers and camera target to the changed bounding box self.bb"""
+        # Grid, axes and lights are exchanged in the scene, keeping their visibility
+        old_helpers = (self.amb_light, self.key_lights, self.axes, self.grid)
+        _, bb_factor, ticks, ambient_intensity, direct_intensity = self.helpers
+        if self._set_helpers(bb_factor, ticks, ambient_intensity, direct_intensity):
+            amb_light, key_lights, axes, grid = old_helpers
+            for obj in (amb_light, key_lights, axes.axes, grid.grid):
+                self.scene.remove(obj)
+            for obj in (self.amb_light, self.key_lights, self.axes.axes, self.grid.grid):
+                self.scene.add(obj)
+
+            self.grid.set_rotation((math.pi / 2.0, 0, 0, "XYZ"))
+            self.grid.set_visibility(grid.get_visibility())
+            self.grid.set_center(grid.is_center())
+            self.axes.set_visibility(axes.get_visibility())
+            self.axes.set_center(axes.is_center())
+
+        # The camera keeps its position, but orbits around and resets to the new center
+        self.controller.target = self.bb.center
+        self.controller.target0 = self.bb.center
+        self.controller.panSpeed = (self.bb.xsize + self.bb.ysize + self.bb.zsize) / 300
+        self.initial_position = self._add(self.bb.center, self._scale(self._sub(self.initial_position, old_center)))
+        self.savestate = (self.savestate[0], self.bb.center)
+        self.update_camera(self.camera.position, self.camera.zoom, 4 * bb_factor * self.bb.max_dist_from_center())
+
+    def refine(self, shapes):
+        self.cq_renderer.refine(shapes)
+        self.bbs = self._filter_shapes(shapes)
+        # the bounding boxes of shapes are the ones of the original locations
+        self._update_bbs(self.cq_renderer.moved)
+
     def update_camera(self, position, zoom, orbit_radius):
         self.camera.position = position
         self.camera.zoom = zoom
@@ -22,11 +22,13 @@ from .cad_objects import (
     Edges,
     Vertices,
     show,
+    update,
     auto_show,
     show_accuracy,
     show_constraints,
 )
 from .replay import replay, enable_replay, disable_replay, reset_replay
+from ..tessellator import reset_cache, toggle_cache, cache_info
 
 try:
     from IPython import get_ipython
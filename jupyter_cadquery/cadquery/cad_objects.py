@@ -33,6 +33,7 @@ from jupyter_cadquery.cad_objects import (
     _Faces,
     _Vertices,
     _show,
+    _update,
 )
 
 from jupyter_cadquery.cad_display import get_default
@@ -384,6 +385,16 @@ def show(*cad_objs, render_mates=None, mate_scale=None, **kwargs):
     - edge_accuracy:     Presicion of edge discretizaion (default=None)
                          If None, uses: quality / 100
     - optimal_bb:        Use optimal bounding box (default=False)
+    - parallel:          Tessellate parts in parallel processes, True or number of processes (default=False)
+    - triangle_budget:   Approximate maximum number of triangles, small parts are meshed coarser (default=None)
+    - weld:              Merge vertices shared by adjacent faces unless it is a crease (default=False)
+    - crease_angle:      Angle in degrees between normals marking a sharp edge for weld and decimate (default=30)
+    - decimate:          Reduce parts with more triangles to this number by edge collapses (default=None)
+    - decimate_error:    Maximum distance a decimated surface may move, stops decimate earlier (default=None)
+    - reorder:           Reorder triangles and vertices for the GPU vertex cache and less overdraw (default=False)
+    - quantize:          Send int16 vertices, oct encoded normals, error < 0.004*quality/deviation (default=False)
+    - block:             Wait for the objects being shown, else return a handle with result(), cancel() (default=True)
+    - progressive:       Show a coarse mesh first and refine it in the background, returns a handle (default=False)
     - axes:              Show axes (default=False)
     - axes0:             Show axes at (0,0,0) (default=False)
     - grid:              Show grid (default=False)
@@ -396,6 +407,7 @@ def show(*cad_objs, render_mates=None, mate_scale=None, **kwargs):
     - rotation:          z, y and y rotation angles to apply to position vector (default=(0, 0, 0))
     - zoom:              Zoom factor of view (default=2.5)
     - reset_camera:      Reset camera position, rotation and zoom to default (default=True)
+    - batched:           Merge all parts into one mesh per color, for large assemblies; no animation (default=False)
     - mac_scrollbar:     Prettify scrollbars (default=True)
     - display:           Select display: "sidecar", "cell", "html"
     - tools:             Show the viewer tools like the object tree
@@ -405,6 +417,20 @@ def show(*cad_objs, render_mates=None, mate_scale=None, **kwargs):
     - position = (1, 1, 1)
     - position = (0, 0, 1) and rotation = (45, 35.264389682, 0)
     """
+    return _show(_to_part_group(cad_objs, render_mates, mate_scale, kwargs), **kwargs)
+
+
+def update(d, *cad_objs, render_mates=None, mate_scale=None, **kwargs):
+    """Update the CAD objects shown in display d (the result of show) and return the display
+
+    If only the locations of assemblies or parts changed (e.g. after relocating a MAssembly), the shown parts
+    are moved without tessellating and rendering them again. Otherwise this is the same as show.
+    Valid keywords are the same as for show.
+    """
+    return _update(d, _to_part_group(cad_objs, render_mates, mate_scale, kwargs), **kwargs)
+
+
+def _to_part_group(cad_objs, render_mates, mate_scale, kwargs):
     render_mates = render_mates or get_default("render_mates")
     mate_scale = mate_scale or get_default("mate_scale")
     default_color = kwargs.get("default_color") or get_default("default_color")
@@ -416,9 +442,9 @@ def show(*cad_objs, render_mates=None, mate_scale=None, **kwargs):
 
     if len(assembly.objects) == 1 and isinstance(assembly.objects[0], PartGroup):
         # omit leading "PartGroup" group
-        return _show(assembly.objects[0], **kwargs)
+        return assembly.objects[0]
     else:
-        return _show(assembly, **kwargs)
+        return assembly
 
 
 def auto_show():
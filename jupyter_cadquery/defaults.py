@@ -46,6 +46,22 @@ class Defaults:
         - edge_accuracy:     Presicion of edge discretizaion (default=None)
                              If None, uses: quality / 100
         - optimal_bb:        Use optimal bounding box (default=False)
+        - parallel:          Tessellate parts in parallel processes, True or number of processes (default=False)
+        - triangle_budget:   Approximate maximum number of triangles, small parts are meshed coarser (default=None)
+        - weld:              Merge vertices shared by adjacent faces unless it is a crease (default=False)
+        - crease_angle:      Angle in degrees between normals marking a sharp edge for weld and decimate (default=30)
+        - decimate:          Reduce parts with more triangles to this number by edge collapses (default=None)
+        - decimate_error:    Maximum distance a decimated surface may move, stops decimate earlier (default=None)
+        - reorder:           Reorder triangles and vertices for the GPU vertex cache and less overdraw (default=False)
+        - quantize:          Send int16 vertices, oct encoded normals, error < 0.004*quality/deviation (default=False)
+        - compression:       Viewer uploads: "zlib", "lz4", "zstd", "auto" (slow links only) or False (default="auto")
+        - block:             Wait for the objects being shown, else return a handle with result(), cancel() (default=True)
+        - progressive:       Show a coarse mesh first and refine it in the background, returns a handle (default=False)
+        - cache_size:        Maximum size in bytes of the tessellation cache (default=512MB)
+        - mesh_cache_dir:    Folder to persist tessellation results across sessions (default=None)
+        - mesh_cache_size:   Maximum size in bytes of the folder mesh_cache_dir (default=2GB)
+        - mesh_cache_age:    Remove meshes from mesh_cache_dir not used for this number of days (default=30)
+        - keep_triangulation: Reuse triangulations of faces fine enough instead of meshing again (default=False)
         - axes:              Show axes (default=False)
         - axes0:             Show axes at (0,0,0) (default=False)
         - grid:              Show grid (default=False)
@@ -58,6 +74,7 @@ class Defaults:
         - rotation:          z, y and y rotation angles to apply to position vector (default=(0, 0, 0))
         - zoom:              Zoom factor of view (default=2.5)
         - reset_camera:      Reset camera position, rotation and zoom to default (default=True)
+        - batched:           Merge all parts into one mesh per color, for large assemblies; no animation (default=False)
         - mac_scrollbar:     Prettify scrollbars (default=True)
         - display:           Select display: "sidecar", "cell", "html"
         - theme:             Theme "light" or "dark" (default="light")
@@ -102,6 +119,22 @@ class Defaults:
             "angular_tolerance": 0.2,
             "edge_accuracy": None,
             "optimal_bb": False,
+            "parallel": False,
+            "triangle_budget": None,
+            "weld": False,
+            "crease_angle": 30,
+            "decimate": None,
+            "decimate_error": None,
+            "reorder": False,
+            "quantize": False,
+            "compression": "auto",
+            "block": True,
+            "progressive": False,
+            "cache_size": 512 * 1024 ** 2,
+            "mesh_cache_dir": None,
+            "mesh_cache_size": 2 * 1024 ** 3,
+            "mesh_cache_age": 30,
+            "keep_triangulation": False,
             "axes": False,
             "axes0": False,
             "grid": False,
@@ -115,6 +148,7 @@ class Defaults:
             "rotation": (0, 0, 0),
             "zoom": 2.5,
             "reset_camera": True,
+            "batched": False,
             "mac_scrollbar": True,
             "display": "cell",
             "theme": "light",
@@ -174,6 +208,7 @@ def split_args(config):
             "rotation",
             "zoom",
             "reset_camera",
+            "batched",
         ]
     }
     return create_args, add_shape_args
@@ -1 +1 @@
-LOGO_DATA = 'gASV5hEBAAAAAAB9lCiMBGRhdGGUfZQojAdtYXBwaW5nlH2UKIwBMZR9lCiMBHBhdGiUSwCFlIwFc3RhdGWUXZQoSwFLAWV1jAEylH2UKGgHSwGFlGgJXZQoSwFLAWV1dYwGc2hhcGVzlH2UKIwFcGFydHOUXZQofZQojAJpZJRLAYwEdHlwZZRoD4wEbmFtZZSMB2p1cHl0ZXKUjAVzaGFwZZR9lCiMCHZlcnRpY2VzlIwVbnVtcHkuY29yZS5tdWx0aWFycmF5lIwMX3JlY29uc3RydWN0lJOUjAVudW1weZSMB25kYXJyYXmUk5RLAIWUQwFilIeUUpQoSwFNGAJLA4aUaB6MBWR0eXBllJOUjAJmNJSJiIeUUpQoSwOMATyUTk5OSv////9K/////0sAdJRiiUIgGQAAAACAv4usLLqw7lzBAACAP4usLLqw7lzBAACAPxfX7T8DGlzBAACAP+0pa0C8p1nBAACAPwEfr0Cgk1XBAACAP6YU50AJ70/BAACAP9CEDkFzzEjBAACAPzfEJUHmLUHBAACAP0niO0HHgjjBAACAP+C8UEFF4y7BAACAPzo2ZEHbaSTBAACAP/81dkF5MhnBAACAP/hUg0F9WQ3BAACAPxLDikGx+gDBAACAP/pokEHCZOzAAACAP6yQlUEV89XAAACAv6yQlUEV89XAAACAvxfX7T8DGlzBAACAv+0pa0C8p1nBAACAvwEfr0Cgk1XBAACAv6YU50AJ70/BAACAv9CEDkFzzEjBAACAvzfEJUHmLUHBAACAv0niO0HHgjjBAACAv+C8UEFF4y7BAACAvzo2ZEHbaSTBAACAv/81dkF5MhnBAACAv/hUg0F9WQ3BAACAvxLDikGx+gDBAACAv/pokEHCZOzAAACAv6yQlUEV89XAAACAP6yQlUEV89XAAACAPz8qkUHRWgDBAACAP3sGjEGm9BTBAACAP38fhkEI3SjBAACAP88Ef0FX4DvBAACAPw30cUFEI0zBAACAP4DYY0GOhFvBAACAP17BVEHQ8mnBAACAP67mRUHfdHbBAACAP+NANkEaCoHBAACAv+NANkEaCoHBAACAvz8qkUHRWgDBAACAv3sGjEGm9BTBAACAv38fhkEI3SjBAACAv88Ef0FX4DvBAACAvw30cUFEI0zBAACAv4DYY0GOhFvBAACAv17BVEHQ8mnBAACAv67mRUHfdHbBAACAv+NANkEaCoHBAACAP+NANkEaCoHBAACAP2TQIkEpTIfBAACAPyKbDkEu0IzBAACAP9AV80DSm5HBAACAP2ylx0BmoZXBAACAPxCen0DMkZjBAACAP2DFbUBi2ZrBAACAP0dAG0BfdZzBAACAPwDKmz+vWJ3BAACAP4usLLrppJ3BAACAv4usLLrppJ3BAACAv2TQIkEpTIfBAACAvyKbDkEu0IzBAACAv9AV80DSm5HBAACAv2ylx0BmoZXBAACAvxCen0DMkZjBAACAv2DFbUBi2ZrBAACAv0dAG0BfdZzBAACAvwDKmz+vWJ3BAACAv4usLLrppJ3BAACAP4usLLrppJ3BAACAP67quL+uOZ3BAACAPzcBOMBG+pvBAACAP7mIicD+5JnBAACAP+BftsAt/ZbBAACAPwrx3cCerpPBAACAPwRKAsHRu4/BAACAP9QOFcHiKIvBAACAP37xJcHLXIbBAACAP+pFNsEaCoHBAACAv+pFNsEaCoHBAACAv67quL+uOZ3BAACAvzcBOMBG+pvBAACAv7mIicD+5JnBAACAv+BftsAt/ZbBAACAvwrx3cCerpPBAACAvwRKAsHRu4/BAACAv9QOFcHiKIvBAACAv37xJcHLXIbBAACAv+pFNsEaCoHBAACAP+pFNsEaCoHBAACAPyLBSMElMHTBAACAPyMcWsGzD2XBAACAP0ppasHtoVTBAACAPzB9ecEwDUPBAACAP+D4gsGPUTLBAACAP3CkiMFmzCDBAACAP8e6jcHOkA7BAACAP5vqkcH4FfrAAACAPyuTlcEV89XAAACAvyuTlcEV89XAAACAvyLBSMElMHTBAACAvyMcWsGzD2XBAACAv0ppasHtoVTBAACAvzB9ecEwDUPBAACAv+D4gsGPUTLBAACAv3CkiMFmzCDBAACAv8e6jcHOkA7BAACAv5vqkcH4FfrAAACAvyuTlcEV89XAAACAPyuTlcEV89XAAACAP9fyjsFxWfLAAACAPxuLh8GxpQbBAACAP7cOfsEe4BPBAACAPw4ja8FbbSDBAACAP7JgVsGzKSzBAACAP8PdP8E38DbBAACAP+W4J8FInEDBAACAP28YDsEhC0nBAACAPwNS5sAtHVDBAACAPw3rs8BEOVXBAACAP7QBgMAJFFnBAACAP2fDFcCDoFvBAACAPz/glr9tmlzBAACAP4usLLqw7lzBAACAv4usLLqw7lzBAACAv9fyjsFxWfLAAACAvxuLh8GxpQbBAACAv7cOfsEe4BPBAACAvw4ja8FbbSDBAACAv7JgVsGzKSzBAACAv8PdP8E38DbBAACAv+W4J8FInEDBAACAv28YDsEhC0nBAACAvwNS5sAtHVDBAACAvw3rs8BEOVXBAACAv7QBgMAJFFnBAACAv2fDFcCDoFvBAACAvz/glr9tmlzBAACAv4usLLqw7lzBAACAvxfX7T8DGlzBAACAv+0pa0C8p1nBAACAvwEfr0Cgk1XBAACAv6YU50AJ70/BAACAv9CEDkFzzEjBAACAvzfEJUHmLUHBAACAv0niO0HHgjjBAACAv+C8UEFF4y7BAACAvzo2ZEHbaSTBAACAv/81dkF5MhnBAACAv/hUg0F9WQ3BAACAvxLDikGx+gDBAACAv/pokEHCZOzAAACAv6yQlUEV89XAAACAvz8qkUHRWgDBAACAv3sGjEGm9BTBAACAv38fhkEI3SjBAACAv88Ef0FX4DvBAACAvw30cUFEI0zBAACAv4DYY0GOhFvBAACAv17BVEHQ8mnBAACAv67mRUHfdHbBAACAv+NANkEaCoHBAACAv2TQIkEpTIfBAACAvyKbDkEu0IzBAACAv9AV80DSm5HBAACAv2ylx0BmoZXBAACAvxCen0DMkZjBAACAv2DFbUBi2ZrBAACAv0dAG0BfdZzBAACAvwDKmz+vWJ3BAACAv4usLLrppJ3BAACAv67quL+uOZ3BAACAvzcBOMBG+pvBAACAv7mIicD+5JnBAACAv+BftsAt/ZbBAACAvwrx3cCerpPBAACAvwRKAsHRu4/BAACAv9QOFcHiKIvBAACAv37xJcHLXIbBAACAv+pFNsEaCoHBAACAvyLBSMElMHTBAACAvyMcWsGzD2XBAACAv0ppasHtoVTBAACAvzB9ecEwDUPBAACAv+D4gsGPUTLBAACAv3CkiMFmzCDBAACAv8e6jcHOkA7BAACAv5vqkcH4FfrAAACAvyuTlcEV89XAAACAv9fyjsFxWfLAAACAvxuLh8GxpQbBAACAv7cOfsEe4BPBAACAvw4ja8FbbSDBAACAv7JgVsGzKSzBAACAv8PdP8E38DbBAACAv+W4J8FInEDBAACAv28YDsEhC0nBAACAvwNS5sAtHVDBAACAvw3rs8BEOVXBAACAv7QBgMAJFFnBAACAv2fDFcCDoFvBAACAvz/glr9tmlzBAACAP4usLLqw7lzBAACAPxfX7T8DGlzBAACAP+0pa0C8p1nBAACAPwEfr0Cgk1XBAACAP6YU50AJ70/BAACAP9CEDkFzzEjBAACAPzfEJUHmLUHBAACAP0niO0HHgjjBAACAP+C8UEFF4y7BAACAPzo2ZEHbaSTBAACAP/81dkF5MhnBAACAP/hUg0F9WQ3BAACAPxLDikGx+gDBAACAP/pokEHCZOzAAACAP6yQlUEV89XAAACAPz8qkUHRWgDBAACAP3sGjEGm9BTBAACAP38fhkEI3SjBAACAP88Ef0FX4DvBAACAPw30cUFEI0zBAACAP4DYY0GOhFvBAACAP17BVEHQ8mnBAACAP67mRUHfdHbBAACAP+NANkEaCoHBAACAP2TQIkEpTIfBAACAPyKbDkEu0IzBAACAP9AV80DSm5HBAACAP2ylx0BmoZXBAACAPxCen0DMkZjBAACAP2DFbUBi2ZrBAACAP0dAG0BfdZzBAACAPwDKmz+vWJ3BAACAP4usLLrppJ3BAACAP67quL+uOZ3BAACAPzcBOMBG+pvBAACAP7mIicD+5JnBAACAP+BftsAt/ZbBAACAPwrx3cCerpPBAACAPwRKAsHRu4/BAACAP9QOFcHiKIvBAACAP37xJcHLXIbBAACAP+pFNsEaCoHBAACAPyLBSMElMHTBAACAPyMcWsGzD2XBAACAP0ppasHtoVTBAACAPzB9ecEwDUPBAACAP+D4gsGPUTLBAACAP3CkiMFmzCDBAACAP8e6jcHOkA7BAACAP5vqkcH4FfrAAACAPyuTlcEV89XAAACAP9fyjsFxWfLAAACAPxuLh8GxpQbBAACAP7cOfsEe4BPBAACAPw4ja8FbbSDBAACAP7JgVsGzKSzBAACAP8PdP8E38DbBAACAP+W4J8FInEDBAACAP28YDsEhC0nBAACAPwNS5sAtHVDBAACAPw3rs8BEOVXBAACAP7QBgMAJFFnBAACAP2fDFcCDoFvBAACAPz/glr9tmlzBAACAv4usLLrj6FxBAACAP4usLLrj6FxBAACAP4sB7r82FFxBAACAP9g+a8DvoVlBAACAP1cpr8DSjVVBAACAP+Ie58A76U9BAACAP+SJDsGjxkhBAACAP0TJJcEVKEFBAACAP1DnO8H0fDhBAACAP+PBUMFu3S5BAACAPzo7ZMEBZCRBAACAP/46dsGbLBlBAACAP3ZXg8GcUw1BAACAP5DFisHL9ABBAACAP3hrkMHxWOxAAACAPyuTlcE859VAAACAvyuTlcE859VAAACAv4sB7r82FFxBAACAv9g+a8DvoVlBAACAv1cpr8DSjVVBAACAv+Ie58A76U9BAACAv+SJDsGjxkhBAACAv0TJJcEVKEFBAACAv1DnO8H0fDhBAACAv+PBUMFu3S5BAACAvzo7ZMEBZCRBAACAv/46dsGbLBlBAACAv3ZXg8GcUw1BAACAv5DFisHL9ABBAACAv3hrkMHxWOxAAACAvyuTlcE859VAAACAPyuTlcE859VAAACAP9AskcHFVABBAACAPx8JjMF87hRBAACAPzUihsHG1ihBAACAP1sKf8EC2jtBAACAP7L5ccHiHExBAACAPzveY8ElfltBAACAPyzHVMFl7GlBAACAPx/sRcHIbnZBAACAP+pFNsE0B4FBAACAv+pFNsE0B4FBAACAv9AskcHFVABBAACAvx8JjMF87hRBAACAvzUihsHG1ihBAACAv1sKf8EC2jtBAACAv7L5ccHiHExBAACAvzveY8ElfltBAACAvyzHVMFl7GlBAACAvx/sRcHIbnZBAACAv+pFNsE0B4FBAACAP+pFNsE0B4FBAACAP9rVIsEsSYdBAACAPwKhDsEdzYxBAACAPwEi88C9mJFBAACAP96xx8BRnpVBAACAP5mqn8C7jphBAACAP3nebcBY1ppBAACAP05ZG8BbcpxBAACAP334m7+1VZ1BAACAP4usLLrzoZ1BAACAv4usLLrzoZ1BAACAv9rVIsEsSYdBAACAvwKhDsEdzYxBAACAvwEi88C9mJFBAACAv96xx8BRnpVBAACAv5mqn8C7jphBAACAv3nebcBY1ppBAACAv05ZG8BbcpxBAACAv334m7+1VZ1BAACAv4usLLrzoZ1BAACAP4usLLrzoZ1BAACAP17BuD+3Np1BAACAP0TtN0BP95tBAACAP9F+iUAI4plBAACAP/BVtkA5+pZBAACAPwrn3UCtq5NBAACAPwBFAkHhuI9BAACAP9MJFUHzJYtBAACAP3XsJUHgWYZBAACAP+NANkE0B4FBAACAv+NANkE0B4FBAACAv17BuD+3Np1BAACAv0TtN0BP95tBAACAv9F+iUAI4plBAACAv/BVtkA5+pZBAACAvwrn3UCtq5NBAACAvwBFAkHhuI9BAACAv9MJFUHzJYtBAACAv3XsJUHgWYZBAACAv+NANkE0B4FBAACAP+NANkE0B4FBAACAPxW8SEFSKnRBAACAPxMXWkHYCWVBAACAPzpkakEGnFRBAACAPyV4eUE5B0NBAACAP172gkGGSzJBAACAP/ShiEFHxiBBAACAP1K4jUGTig5BAACAPyDokUHPCfpAAACAP6yQlUE859VAAACAv6yQlUE859VAAACAvxW8SEFSKnRBAACAvxMXWkHYCWVBAACAvzpkakEGnFRBAACAvyV4eUE5B0NBAACAv172gkGGSzJBAACAv/ShiEFHxiBBAACAv1K4jUGTig5BAACAvyDokUHPCfpAAACAv6yQlUE859VAAACAP6yQlUE859VAAACAP0f0jkH3PfJAAACAP5yPh0E8kgZBAACAP9YZfkGayhNBAACAP3gta0HhVyBBAACAPwRoVkHDFSxBAACAPz/gP0G63jZBAACAP6i1J0GdjUBBAACAP5EPDkE0/0hBAACAPz835kCaE1BBAACAP+nLs0BMMVVBAACAP93Ff0AuDVlBAACAP0KSFUBRmltBAACAP0KXlj+ElFxBAACAP4usLLrj6FxBAACAv4usLLrj6FxBAACAv0f0jkH3PfJAAACAv5yPh0E8kgZBAACAv9YZfkGayhNBAACAv3gta0HhVyBBAACAvwRoVkHDFSxBAACAvz/gP0G63jZBAACAv6i1J0GdjUBBAACAv5EPDkE0/0hBAACAvz835kCaE1BBAACAv+nLs0BMMVVBAACAv93Ff0AuDVlBAACAv0KSFUBRmltBAACAv0KXlj+ElFxBAACAv4usLLrj6FxBAACAv4sB7r82FFxBAACAv9g+a8DvoVlBAACAv1cpr8DSjVVBAACAv+Ie58A76U9BAACAv+SJDsGjxkhBAACAv0TJJcEVKEFBAACAv1DnO8H0fDhBAACAv+PBUMFu3S5BAACAvzo7ZMEBZCRBAACAv/46dsGbLBlBAACAv3ZXg8GcUw1BAACAv5DFisHL9ABBAACAv3hrkMHxWOxAAACAvyuTlcE859VAAACAv9AskcHFVABBAACAvx8JjMF87hRBAACAvzUihsHG1ihBAACAv1sKf8EC2jtBAACAv7L5ccHiHExBAACAvzveY8ElfltBAACAvyzHVMFl7GlBAACAvx/sRcHIbnZBAACAv+pFNsE0B4FBAACAv9rVIsEsSYdBAACAvwKhDsEdzYxBAACAvwEi88C9mJFBAACAv96xx8BRnpVBAACAv5mqn8C7jphBAACAv3nebcBY1ppBAACAv05ZG8BbcpxBAACAv334m7+1VZ1BAACAv4usLLrzoZ1BAACAv17BuD+3Np1BAACAv0TtN0BP95tBAACAv9F+iUAI4plBAACAv/BVtkA5+pZBAACAvwrn3UCtq5NBAACAvwBFAkHhuI9BAACAv9MJFUHzJYtBAACAv3XsJUHgWYZBAACAv+NANkE0B4FBAACAvxW8SEFSKnRBAACAvxMXWkHYCWVBAACAvzpkakEGnFRBAACAvyV4eUE5B0NBAACAv172gkGGSzJBAACAv/ShiEFHxiBBAACAv1K4jUGTig5BAACAvyDokUHPCfpAAACAv6yQlUE859VAAACAv0f0jkH3PfJAAACAv5yPh0E8kgZBAACAv9YZfkGayhNBAACAv3gta0HhVyBBAACAvwRoVkHDFSxBAACAvz/gP0G63jZBAACAv6i1J0GdjUBBAACAv5EPDkE0/0hBAACAvz835kCaE1BBAACAv+nLs0BMMVVBAACAv93Ff0AuDVlBAACAv0KSFUBRmltBAACAv0KXlj+ElFxBAACAP4usLLrj6FxBAACAP4sB7r82FFxBAACAP9g+a8DvoVlBAACAP1cpr8DSjVVBAACAP+Ie58A76U9BAACAP+SJDsGjxkhBAACAP0TJJcEVKEFBAACAP1DnO8H0fDhBAACAP+PBUMFu3S5BAACAPzo7ZMEBZCRBAACAP/46dsGbLBlBAACAP3ZXg8GcUw1BAACAP5DFisHL9ABBAACAP3hrkMHxWOxAAACAPyuTlcE859VAAACAP9AskcHFVABBAACAPx8JjMF87hRBAACAPzUihsHG1ihBAACAP1sKf8EC2jtBAACAP7L5ccHiHExBAACAPzveY8ElfltBAACAPyzHVMFl7GlBAACAPx/sRcHIbnZBAACAP+pFNsE0B4FBAACAP9rVIsEsSYdBAACAPwKhDsEdzYxBAACAPwEi88C9mJFBAACAP96xx8BRnpVBAACAP5mqn8C7jphBAACAP3nebcBY1ppBAACAP05ZG8BbcpxBAACAP334m7+1VZ1BAACAP4usLLrzoZ1BAACAP17BuD+3Np1BAACAP0TtN0BP95tBAACAP9F+iUAI4plBAACAP/BVtkA5+pZBAACAPwrn3UCtq5NBAACAPwBFAkHhuI9BAACAP9MJFUHzJYtBAACAP3XsJUHgWYZBAACAP+NANkE0B4FBAACAPxW8SEFSKnRBAACAPxMXWkHYCWVBAACAPzpkakEGnFRBAACAPyV4eUE5B0NBAACAP172gkGGSzJBAACAP/ShiEFHxiBBAACAP1K4jUGTig5BAACAPyDokUHPCfpAAACAP6yQlUE859VAAACAP0f0jkH3PfJAAACAP5yPh0E8kgZBAACAP9YZfkGayhNBAACAP3gta0HhVyBBAACAPwRoVkHDFSxBAACAPz/gP0G63jZBAACAP6i1J0GdjUBBAACAP5EPDkE0/0hBAACAPz835kCaE1BBAACAP+nLs0BMMVVBAACAP93Ff0AuDVlBAACAP0KSFUBRmltBAACAP0KXlj+ElFxBlHSUYowJdHJpYW5nbGVzlGgdaCBLAIWUaCKHlFKUKEsBTegFhZRoJ4wCdTSUiYiHlFKUKEsDaCtOTk5K/////0r/////SwB0lGKJQqAXAAARAAAAAAAAAAEAAAARAAAAAQAAAAIAAAASAAAAAgAAAAMAAAASAAAAEQAAAAIAAAATAAAAAwAAAAQAAAATAAAABAAAAAUAAAATAAAAEgAAAAMAAAAUAAAAEwAAAAUAAAAVAAAABQAAAAYAAAAVAAAAFAAAAAUAAAAWAAAABgAAAAcAAAAWAAAAFQAAAAYAAAAXAAAABwAAAAgAAAAXAAAAFgAAAAcAAAAYAAAACAAAAAkAAAAYAAAAFwAAAAgAAAAZAAAACQAAAAoAAAAZAAAAGAAAAAkAAAAaAAAACgAAAAsAAAAaAAAAGQAAAAoAAAAbAAAACwAAAAwAAAAbAAAAGgAAAAsAAAAcAAAADAAAAA0AAAAcAAAAGwAAAAwAAAAdAAAADQAAAA4AAAAdAAAAHAAAAA0AAAAQAAAADgAAAA8AAAAQAAAAHQAAAA4AAAAqAAAAHgAAAB8AAAAqAAAAHwAAACAAAAArAAAAIAAAACEAAAArAAAAKgAAACAAAAAsAAAAIQAAACIAAAAsAAAAKwAAACEAAAAtAAAAIgAAACMAAAAtAAAALAAAACIAAAAuAAAAIwAAACQAAAAuAAAALQAAACMAAAAvAAAAJAAAACUAAAAvAAAALgAAACQAAAAwAAAAJQAAACYAAAAwAAAALwAAACUAAAAxAAAAJgAAACcAAAAxAAAAJwAAACgAAAAxAAAAMAAAACYAAAApAAAAMQAAACgAAAA+AAAAMgAAADMAAAA+AAAAMwAAADQAAAA/AAAANAAAADUAAAA/AAAAPgAAADQAAABAAAAANQAAADYAAABAAAAAPwAAADUAAABBAAAANgAAADcAAABBAAAAQAAAADYAAABCAAAANwAAADgAAABCAAAAQQAAADcAAABDAAAAOAAAADkAAABDAAAAQgAAADgAAABEAAAAOQAAADoAAABEAAAAOgAAADsAAABEAAAAQwAAADkAAABFAAAARAAAADsAAAA9AAAAOwAAADwAAAA9AAAARQAAADsAAABSAAAARgAAAEcAAABSAAAARwAAAEgAAABTAAAASAAAAEkAAABTAAAAUgAAAEgAAABUAAAASQAAAEoAAABUAAAAUwAAAEkAAABVAAAASgAAAEsAAABVAAAAVAAAAEoAAABWAAAASwAAAEwAAABWAAAATAAAAE0AAABWAAAAVQAAAEsAAABXAAAAVgAAAE0AAABYAAAATQAAAE4AAABYAAAAVwAAAE0AAABZAAAATgAAAE8AAABZAAAATwAAAFAAAABZAAAAWAAAAE4AAABRAAAAWQAAAFAAAABmAAAAWgAAAFsAAABmAAAAWwAAAFwAAABnAAAAXAAAAF0AAABnAAAAXQAAAF4AAABnAAAAZgAAAFwAAABoAAAAZwAAAF4AAABpAAAAXgAAAF8AAABpAAAAXwAAAGAAAABpAAAAaAAAAF4AAABqAAAAaQAAAGAAAABrAAAAYAAAAGEAAABrAAAAagAAAGAAAABsAAAAYQAAAGIAAABsAAAAawAAAGEAAABtAAAAYgAAAGMAAABtAAAAYwAAAGQAAABtAAAAbAAAAGIAAABlAAAAbQAAAGQAAABuAAAAbwAAAHAAAAB/AAAAcAAAAHEAAAB/AAAAbgAAAHAAAACAAAAAcQAAAHIAAACAAAAAfwAAAHEAAACBAAAAcgAAAHMAAACBAAAAgAAAAHIAAACCAAAAgQAAAHMAAACDAAAAcwAAAHQAAACDAAAAggAAAHMAAACEAAAAdAAAAHUAAACEAAAAgwAAAHQAAACFAAAAdQAAAHYAAACFAAAAdgAAAHcAAACFAAAAhAAAAHUAAACGAAAAhQAAAHcAAACHAAAAdwAAAHgAAACHAAAAhgAAAHcAAACIAAAAeAAAAHkAAACIAAAAhwAAAHgAAACJAAAAeQAAAHoAAACJAAAAiAAAAHkAAACKAAAAegAAAHsAAACKAAAAewAAAHwAAACKAAAAiQAAAHoAAACLAAAAigAAAHwAAAB+AAAAfAAAAH0AAAB+AAAAiwAAAHwAAACYAAAAmwAAAJwAAACYAAAAmQAAAJsAAACaAAAAmwAAAJkAAACXAAAAnAAAAJ0AAACXAAAAmAAAAJwAAACWAAAAnQAAAJ4AAACWAAAAlwAAAJ0AAACVAAAAngAAAJ8AAACVAAAAlgAAAJ4AAACUAAAAnwAAAKAAAACUAAAAlQAAAJ8AAACTAAAAoAAAAKEAAACTAAAAlAAAAKAAAACSAAAAoQAAAKIAAACSAAAAogAAAKMAAACSAAAAkwAAAKEAAACRAAAAowAAAKQAAACRAAAAkgAAAKMAAACQAAAAkQAAAKQAAACQAAAApAAAAKUAAACQAAAApQAAAKYAAACPAAAApgAAAKcAAACPAAAAkAAAAKYAAACOAAAAjwAAAKcAAACOAAAApwAAAKgAAACOAAAAqAAAAKkAAACNAAAAjgAAAKkAAACNAAAAqQAAAKoAAACNAAAAqgAAAKsAAACMAAAAjQAAAKsAAACMAAAAqwAAAKwAAACMAAAArAAAAK0AAADLAAAArQAAAK4AAADLAAAAjAAAAK0AAADKAAAArgAAAK8AAADKAAAAywAAAK4AAADJAAAArwAAALAAAADJAAAAygAAAK8AAADIAAAAsAAAALEAAADIAAAAsQAAALIAAADIAAAAyQAAALAAAADHAAAAyAAAALIAAADHAAAAsgAAALMAAADGAAAAswAAALQAAADGAAAAtAAAALUAAADGAAAAxwAAALMAAADFAAAAtQAAALYAAADFAAAAxgAAALUAAAC3AAAAxQAAALYAAADEAAAAxQAAALcAAAC4AAAAxAAAALcAAADDAAAAxAAAALgAAAC5AAAAwwAAALgAAADCAAAAwwAAALkAAAC6AAAAwgAAALkAAADBAAAAwgAAALoAAAC7AAAAwQAAALoAAADAAAAAwQAAALsAAAC8AAAAwAAAALsAAAC/AAAAwAAAALwAAAC9AAAAvwAAALwAAAC+AAAAvwAAAL0AAADYAAAA3AAAANsAAADYAAAA2wAAANkAAADaAAAA2QAAANsAAADXAAAA3QAAANwAAADXAAAA3AAAANgAAADWAAAA3gAAAN0AAADWAAAA3QAAANcAAADVAAAA3wAAAN4AAADVAAAA3gAAANYAAADUAAAA4AAAAN8AAADUAAAA3wAAANUAAADTAAAA4QAAAOAAAADTAAAA4AAAANQAAADSAAAA4gAAAOEAAADSAAAA4wAAAOIAAADSAAAA4QAAANMAAADRAAAA5AAAAOMAAADRAAAA4wAAANIAAADQAAAA5AAAANEAAADQAAAA5QAAAOQAAADQAAAA5gAAAOUAAADPAAAA5wAAAOYAAADPAAAA5gAAANAAAADOAAAA5wAAAM8AAADOAAAA6AAAAOcAAADOAAAA6QAAAOgAAADNAAAA6QAAAM4AAADNAAAA6gAAAOkAAADNAAAA6wAAAOoAAADMAAAA6wAAAM0AAADMAAAA7AAAAOsAAADMAAAA7QAAAOwAAAALAQAA7gAAAO0AAAALAQAA7QAAAMwAAAAKAQAA7wAAAO4AAAAKAQAA7gAAAAsBAAAJAQAA8AAAAO8AAAAJAQAA7wAAAAoBAAAIAQAA8QAAAPAAAAAIAQAA8gAAAPEAAAAIAQAA8AAAAAkBAAAHAQAA8gAAAAgBAAAHAQAA8wAAAPIAAAAGAQAA9AAAAPMAAAAGAQAA9QAAAPQAAAAGAQAA8wAAAAcBAAAFAQAA9gAAAPUAAAAFAQAA9QAAAAYBAAD3AAAA9gAAAAUBAAAEAQAA9wAAAAUBAAD4AAAA9wAAAAQBAAADAQAA+AAAAAQBAAD5AAAA+AAAAAMBAAACAQAA+QAAAAMBAAD6AAAA+QAAAAIBAAABAQAA+gAAAAIBAAD7AAAA+gAAAAEBAAAAAQAA+wAAAAEBAAD8AAAA+wAAAAABAAD/AAAA/AAAAAABAAD9AAAA/AAAAP8AAAD+AAAA/QAAAP8AAAAdAQAADAEAAA0BAAAdAQAADQEAAA4BAAAeAQAADgEAAA8BAAAeAQAAHQEAAA4BAAAfAQAADwEAABABAAAfAQAAHgEAAA8BAAAgAQAAEAEAABEBAAAgAQAAHwEAABABAAAhAQAAEQEAABIBAAAhAQAAIAEAABEBAAAiAQAAEgEAABMBAAAiAQAAIQEAABIBAAAjAQAAEwEAABQBAAAjAQAAIgEAABMBAAAkAQAAFAEAABUBAAAkAQAAIwEAABQBAAAlAQAAFQEAABYBAAAlAQAAJAEAABUBAAAmAQAAFgEAABcBAAAmAQAAJQEAABYBAAAnAQAAFwEAABgBAAAnAQAAGAEAABkBAAAnAQAAJgEAABcBAAAoAQAAJwEAABkBAAApAQAAGQEAABoBAAApAQAAKAEAABkBAAAcAQAAGgEAABsBAAAcAQAAKQEAABoBAAA2AQAAKgEAACsBAAA2AQAAKwEAACwBAAA3AQAALAEAAC0BAAA3AQAANgEAACwBAAA4AQAALQEAAC4BAAA4AQAANwEAAC0BAAA5AQAALgEAAC8BAAA5AQAAOAEAAC4BAAA6AQAALwEAADABAAA6AQAAOQEAAC8BAAA7AQAAMAEAADEBAAA7AQAAOgEAADABAAA8AQAAMQEAADIBAAA8AQAAOwEAADEBAAA9AQAAMgEAADMBAAA9AQAAMwEAADQBAAA9AQAAPAEAADIBAAA1AQAAPQEAADQBAABKAQAAPgEAAD8BAABKAQAAPwEAAEABAABLAQAAQAEAAEEBAABLAQAASgEAAEABAABMAQAAQQEAAEIBAABMAQAASwEAAEEBAABNAQAAQgEAAEMBAABNAQAAQwEAAEQBAABNAQAATAEAAEIBAABOAQAATQEAAEQBAABPAQAARAEAAEUBAABPAQAATgEAAEQBAABQAQAARQEAAEYBAABQAQAATwEAAEUBAABRAQAARgEAAEcBAABRAQAARwEAAEgBAABRAQAAUAEAAEYBAABJAQAAUQEAAEgBAABeAQAAUgEAAFMBAABeAQAAUwEAAFQBAABfAQAAVAEAAFUBAABfAQAAXgEAAFQBAABgAQAAVQEAAFYBAABgAQAAXwEAAFUBAABhAQAAVgEAAFcBAABhAQAAVwEAAFgBAABhAQAAYAEAAFYBAABiAQAAYQEAAFgBAABjAQAAWAEAAFkBAABjAQAAYgEAAFgBAABkAQAAWQEAAFoBAABkAQAAYwEAAFkBAABlAQAAWgEAAFsBAABlAQAAZAEAAFoBAABdAQAAWwEAAFwBAABdAQAAZQEAAFsBAAByAQAAZgEAAGcBAAByAQAAZwEAAGgBAABzAQAAaAEAAGkBAABzAQAAcgEAAGgBAAB0AQAAaQEAAGoBAAB0AQAAcwEAAGkBAAB1AQAAagEAAGsBAAB1AQAAdAEAAGoBAAB2AQAAawEAAGwBAAB2AQAAdQEAAGsBAAB3AQAAbAEAAG0BAAB3AQAAdgEAAGwBAAB4AQAAbQEAAG4BAAB4AQAAdwEAAG0BAAB5AQAAbgEAAG8BAAB5AQAAeAEAAG4BAABxAQAAbwEAAHABAABxAQAAeQEAAG8BAACLAQAAegEAAHsBAACLAQAAewEAAHwBAACMAQAAfAEAAH0BAACMAQAAiwEAAHwBAACNAQAAfQEAAH4BAACNAQAAfgEAAH8BAACNAQAAjAEAAH0BAACOAQAAjQEAAH8BAACPAQAAfwEAAIABAACPAQAAjgEAAH8BAACQAQAAgAEAAIEBAACQAQAAjwEAAIABAACRAQAAgQEAAIIBAACRAQAAggEAAIMBAACRAQAAkAEAAIEBAACSAQAAkQEAAIMBAACTAQAAgwEAAIQBAACTAQAAhAEAAIUBAACTAQAAkgEAAIMBAACUAQAAkwEAAIUBAACVAQAAhQEAAIYBAACVAQAAlAEAAIUBAACWAQAAhgEAAIcBAACWAQAAlQEAAIYBAACXAQAAhwEAAIgBAACXAQAAlgEAAIcBAACKAQAAiAEAAIkBAACKAQAAlwEAAIgBAADLAQAAyQEAAMoBAADIAQAAyQEAAMsBAADMAQAAyAEAAMsBAADHAQAAyAEAAMwBAADNAQAAxwEAAMwBAADGAQAAxwEAAM0BAADOAQAAxgEAAM0BAADFAQAAxgEAAM4BAADPAQAAxQEAAM4BAADEAQAAxQEAAM8BAADQAQAAxAEAAM8BAADDAQAAxAEAANABAADRAQAAwwEAANABAADCAQAAwwEAANEBAADBAQAA0QEAANIBAADBAQAAwgEAANEBAADAAQAAwQEAANIBAAC/AQAA0gEAANMBAAC/AQAAwAEAANIBAAC+AQAAvwEAANMBAAC+AQAA0wEAANQBAAC9AQAAvgEAANQBAAC8AQAAvQEAANQBAAC8AQAA1AEAANUBAAC7AQAAvAEAANUBAAC7AQAA1QEAANYBAAC6AQAAuwEAANYBAAC6AQAA1gEAANcBAAC5AQAAugEAANcBAAC5AQAA1wEAAJgBAAC4AQAAuQEAAJgBAAC3AQAAmAEAAJkBAAC3AQAAuAEAAJgBAAC2AQAAtwEAAJkBAAC1AQAAmQEAAJoBAAC1AQAAtgEAAJkBAAC0AQAAtQEAAJoBAACzAQAAmgEAAJsBAACzAQAAtAEAAJoBAACyAQAAmwEAAJwBAACyAQAAswEAAJsBAACnAQAApAEAAKUBAACnAQAApQEAAKYBAACxAQAAsgEAAJwBAACoAQAAowEAAKQBAACoAQAApAEAAKcBAACwAQAAnAEAAJ0BAACwAQAAsQEAAJwBAACpAQAAogEAAKMBAACpAQAAowEAAKgBAACvAQAAnQEAAJ4BAACvAQAAsAEAAJ0BAACqAQAAoQEAAKIBAACqAQAAogEAAKkBAACuAQAArwEAAJ4BAACrAQAAoAEAAKEBAACrAQAAoQEAAKoBAACtAQAArgEAAJ4BAACtAQAAngEAAJ8BAACsAQAAnwEAAKABAACsAQAAoAEAAKsBAACsAQAArQEAAJ8BAAALAgAACgIAAAkCAAAIAgAACwIAAAkCAAAMAgAACwIAAAgCAAAHAgAADAIAAAgCAAANAgAADAIAAAcCAAAGAgAADQIAAAcCAAAOAgAADQIAAAYCAAAFAgAADgIAAAYCAAAPAgAADgIAAAUCAAAEAgAADwIAAAUCAAAQAgAADwIAAAQCAAADAgAAEAIAAAQCAAARAgAAEAIAAAMCAAACAgAAEQIAAAMCAAABAgAAEgIAABECAAABAgAAEQIAAAICAAAAAgAAEgIAAAECAAD/AQAAEwIAABICAAD/AQAAEgIAAAACAAD+AQAAEwIAAP8BAAD+AQAAFAIAABMCAAD9AQAAFAIAAP4BAAD8AQAAFAIAAP0BAAD8AQAAFQIAABQCAAD7AQAAFQIAAPwBAAD7AQAAFgIAABUCAAD6AQAAFgIAAPsBAAD6AQAAFwIAABYCAAD5AQAAFwIAAPoBAAD5AQAA2AEAABcCAAD4AQAA2AEAAPkBAAD3AQAA2QEAANgBAAD3AQAA2AEAAPgBAAD2AQAA2QEAAPcBAAD1AQAA2gEAANkBAAD1AQAA2QEAAPYBAAD0AQAA2gEAAPUBAADzAQAA2wEAANoBAADzAQAA2gEAAPQBAADyAQAA3AEAANsBAADyAQAA2wEAAPMBAADnAQAA5QEAAOQBAADnAQAA5gEAAOUBAADxAQAA3AEAAPIBAADoAQAA5AEAAOMBAADoAQAA5wEAAOQBAADwAQAA3QEAANwBAADwAQAA3AEAAPEBAADpAQAA4wEAAOIBAADpAQAA6AEAAOMBAADvAQAA3gEAAN0BAADvAQAA3QEAAPABAADqAQAA4gEAAOEBAADqAQAA6QEAAOIBAADuAQAA3gEAAO8BAADrAQAA4QEAAOABAADrAQAA6gEAAOEBAADtAQAA3gEAAO4BAADtAQAA3wEAAN4BAADsAQAA4AEAAN8BAADsAQAA6wEAAOABAADsAQAA3wEAAO0BAACUdJRijAdub3JtYWxzlGgdaCBLAIWUaCKHlFKUKEsBTRgCSwOGlGgqiUIgGQAAAAAApSCYfwoAAIA/AAAApSCYfwoAAIA/kfcGpZlfZb0pmX8/KIYNpc5B5b0XZH4/L8oTpa0LLb5zUXw/Ka4ZpVMXaL59Vnk/8Ssfpbbrkb4IYnU/Sb4jpXgirb5W63A/Vu0npUasyL6JhGs/u6wrpROI5L5sFWU/KewupYZWAL/MgV0/uJYxpZODDr/cqVQ/X5IzpZC5HL8ua0o/zb80pS3dKr9toj4/EgM1pW2kNr+3YTM/En00pTtXQr/ooiY/En00pTtXQr/ooiY/kfcGpZlfZb0pmX8/KIYNpc5B5b0XZH4/L8oTpa0LLb5zUXw/Ka4ZpVMXaL59Vnk/8Ssfpbbrkb4IYnU/Sb4jpXgirb5W63A/Vu0npUasyL6JhGs/u6wrpROI5L5sFWU/KewupYZWAL/MgV0/uJYxpZODDr/cqVQ/X5IzpZC5HL8ua0o/zb80pS3dKr9toj4/EgM1pW2kNr+3YTM/ynMkJREbcD8EmbG+ynMkJREbcD8EmbG++n8pJR8LaT+r6dO+iKQtJajKYD/P/PS+FOUwJf9QVz8qeQq/bDczJWazTD9zuxm/uX80JR83Qj9TyCa/cgI1JWrkNj95IDO/qb40JUrHKj8Jtj6/lM0zJZbaHj+SwEi/GzAyJeBLEj9WFFK/GzAyJeBLEj9WFFK/+n8pJR8LaT+r6dO+iKQtJajKYD/P/PS+FOUwJf9QVz8qeQq/bDczJWazTD9zuxm/uX80JR83Qj9TyCa/cgI1JWrkNj95IDO/qb40JUrHKj8Jtj6/lM0zJZbaHj+SwEi//S8yJR9LEj/cFFK//S8yJR9LEj/cFFK/zGgvJWmxAj8wIFy/3LkrJfvw5D47+2S/Hx8nJVAgwz4Xrmy/MqIhJVNDoD66InO/BPYbJUMjgD5o2ne/Ep4VJa7jPj44g3u//qAOJXlK+T2sGH6/RJQHJTouej2khX+/AAAAJafl3ykAAIC/AAAAJafl3ykAAIC/zGgvJWmxAj8wIFy/3LkrJfvw5D47+2S/Hx8nJVAgwz4Xrmy/MqIhJVNDoD66InO/BPYbJUMjgD5o2ne/Ep4VJa7jPj44g3u//qAOJXlK+T2sGH6/RJQHJTouej2khX+/AAAAJRDn36kAAIC/AAAAJRDn36kAAIC/7cjsJHNXlL3cU3+/g2jYJAqqE74GU32/HsrCJBHDXL7i+nm/tCGsJHpekr7xUHW/TPKWJKkfsr4hAnC/NRqBJJUi0b5/q2m/EmJVJPJE776CU2K/1N0qJL8wBb+pn1q/WiL/I81LEr9jFFK/WiL/I81LEr9jFFK/7cjsJHNXlL3cU3+/g2jYJAqqE74GU32/HsrCJBHDXL7i+nm/tCGsJHpekr7xUHW/TPKWJKkfsr4hAnC/NRqBJJUi0b5/q2m/EmJVJPJE776CU2K/1N0qJL8wBb+pn1q/4yP/I5NLEr+LFFK/4yP/I5NLEr+LFFK/AjiXI5wgIb+c7ka/v6a7ImsPL7/XyTq/Y7fookUlPL/PmS2/XQajoyw/SL+UfR+/4VwApCs+Ur+7DxK/ILEupFRYW7/E/wO/7kxcpEODY7+Yueq+f/CCpCg8ar9Tl86+uU+XpGIbcL9Rl7G+uU+XpGIbcL9Rl7G+AjiXI5wgIb+c7ka/v6a7ImsPL7/XyTq/Y7fookUlPL/PmS2/XQajoyw/SL+UfR+/4VwApCs+Ur+7DxK/ILEupFRYW7/E/wO/7kxcpEODY7+Yueq+f/CCpCg8ar9Tl86+O55gI0WDQj9+byY/O55gI0WDQj9+byY/vEWmoTa3Mz9NUDY/Us94o6/MJD+Z5kM/TXPqozNTFT8G8E8/R/copMDHBT9jQ1o/54dZpI2M7D46CmM/rouDpMe/zT6Ra2o/meyYpEU7rz48inA/EgGtpP8FkT4RhHU/xOG/pBhAZj7JcXk/xenPpJ7xMD4tJnw/lhbfpOUy+D3zHH4/pnLtpClkjz0rX38/cOL2pLdWDz3c138/AAAApYN3fgoAAIA/AAAApYN3fgoAAIA/vEWmoTa3Mz9NUDY/Us94o6/MJD+Z5kM/TXPqozNTFT8G8E8/R/copMDHBT9jQ1o/54dZpI2M7D46CmM/rouDpMe/zT6Ra2o/meyYpEU7rz48inA/EgGtpP8FkT4RhHU/xOG/pBhAZj7JcXk/xenPpJ7xMD4tJnw/lhbfpOUy+D3zHH4/pnLtpClkjz0rX38/cOL2pLdWDz3c138/AACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAAAAJfGYf4oAAIC/AAAAJfGYf4oAAIC/lvcGJURgZT0pmX+/MYYNJWpC5T0VZH6/OsoTJRkMLT5uUXy/Na4ZJdYXaD51Vnm//ysfJQHskT79YXW/Vr4jJckirT5H63C/Yu0nJZqsyD53hGu/xqwrJWiI5D5XFWW/MuwuJbBWAD+0gV2/vpYxJbuDDj/BqVS/Y5IzJba5HD8Ra0q/z780JU/dKj9Poj6/EgM1JYqkNj+ZYTO/EH00JVJXQj/Noia/EH00JVJXQj/Noia/lvcGJURgZT0pmX+/MYYNJWpC5T0VZH6/OsoTJRkMLT5uUXy/Na4ZJdYXaD51Vnm//ysfJQHskT79YXW/Vr4jJckirT5H63C/Yu0nJZqsyD53hGu/xqwrJWiI5D5XFWW/MuwuJbBWAD+0gV2/vpYxJbuDDj/BqVS/Y5IzJba5HD8Ra0q/z780JU/dKj9Poj6/EgM1JYqkNj+ZYTO/eHMkpXEbcL8Bl7E+eHMkpXEbcL8Bl7E+vn8ppYMLab/z59M+XaQtpQ7LYL9Z+/Q++eQwpWNRV7+OeAo/XDczpcazTL/yuhk/sn80pX03Qr/nxyY/cQI1pcXkNr8cIDM/rr40paTHKr+4tT4/lc0zpZ7aHr+LwEg/DzAypZNLEr+LFFI/DzAypZNLEr+LFFI/vn8ppYMLab/z59M+XaQtpQ7LYL9Z+/Q++eQwpWNRV7+OeAo/XDczpcazTL/yuhk/sn80pX03Qr/nxyY/cQI1pcXkNr8cIDM/rr40paTHKr+4tT4/lc0zpZ7aHr+LwEg/IDAypQRMEr88FFI/IDAypQRMEr88FFI/8GgvpRiyAr/IH1w/BLorpTby5L7s+mQ/SB8npWQhw77erWw/X6IhpV9EoL6OInM/OfYbpVwkgL5D2nc/UJ4VpQ/mPr4cg3s/RqEOpaVP+b2YGH4/bJQHpZQzer2ehX8/AAAApT5mewoAAIA/AAAApT5mewoAAIA/8GgvpRiyAr/IH1w/BLorpTby5L7s+mQ/SB8npWQhw77erWw/X6IhpV9EoL6OInM/OfYbpVwkgL5D2nc/UJ4VpQ/mPr4cg3s/RqEOpaVP+b2YGH4/bJQHpZQzer2ehX8/AAAApapkewoAAIA/AAAApapkewoAAIA/E8nspFtWlD3eU38/rmjYpHapEz4LU30/S8rCpH7CXD7r+nk/2SGspEBekj75UHU/avKWpH0fsj4pAnA/UhqBpG0i0T6Iq2k/ZGJVpLxE7z6QU2I/o94qpH8wBT/Rn1o/fSX/o1ZLEj+2FFI/fSX/o1ZLEj+2FFI/E8nspFtWlD3eU38/rmjYpHapEz4LU30/S8rCpH7CXD7r+nk/2SGspEBekj75UHU/avKWpH0fsj4pAnA/UhqBpG0i0T6Iq2k/ZGJVpLxE7z6QU2I/o94qpH8wBT/Rn1o/1yH/o+BLEj9WFFI/1yH/o+BLEj9WFFI/9DWXo+QgIT9h7kY/+J67oqsPLz+byTo/W77oInolPD+VmS0/yQejI1Q/SD9ifR8/ZF0AJEY+Uj+UDxI/ZLEuJGFYWz+v/wM/6UxcJEKDYz+bueo+BfCCJAM8aj/8l84+xk6XJCAbcD+0mLE+xk6XJCAbcD+0mLE+9DWXo+QgIT9h7kY/+J67oqsPLz+byTo/W77oInolPD+VmS0/yQejI1Q/SD9ifR8/ZF0AJEY+Uj+UDxI/ZLEuJGFYWz+v/wM/6UxcJEKDYz+bueo+BfCCJAM8aj/8l84+7yJho+uKQr+NZia/7yJho+uKQr+NZia/39elIRS4M79zTza/W+t4I8fKJL8z6EO/hYrqI9JPFb9z8k+/0v8oJBrFBb8DRVq/9ohZJNuL7L5pCmO/pIeDJGTFzb5Wamq/ROSYJHxHr74CiHC/hPWsJNYXkb5vgXW/l9S/JOdqZr5Rb3m/sdzPJCAeMb45JHy/NAvfJBGE+L22G36/gmrtJAKhj72jXn+/z932JFGeD72013+/AAAAJbN2fooAAIC/AAAAJbN2fooAAIC/39elIRS4M79zTza/W+t4I8fKJL8z6EO/hYrqI9JPFb9z8k+/0v8oJBrFBb8DRVq/9ohZJNuL7L5pCmO/pIeDJGTFzb5Wamq/ROSYJHxHr74CiHC/hPWsJNYXkb5vgXW/l9S/JOdqZr5Rb3m/sdzPJCAeMb45JHy/NAvfJBGE+L22G36/gmrtJAKhj72jXn+/z932JFGeD72013+/AACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAvwAAACUAAAClAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAlAACAPwAAAKUAAAAllHSUYowFZWRnZXOUaB1oIEsAhZRoIoeUUpQoSwFNDAFLAksDh5RoKolCIBkAAAAAgL+LrCy6sO5cwQAAgD+LrCy6sO5cwQAAgL+skJVBFfPVwAAAgD+skJVBFfPVwAAAgL+LrCy6sO5cwQAAgL8X1+0/AxpcwQAAgL8X1+0/AxpcwQAAgL/tKWtAvKdZwQAAgL/tKWtAvKdZwQAAgL8BH69AoJNVwQAAgL8BH69AoJNVwQAAgL+mFOdACe9PwQAAgL+mFOdACe9PwQAAgL/QhA5Bc8xIwQAAgL/QhA5Bc8xIwQAAgL83xCVB5i1BwQAAgL83xCVB5i1BwQAAgL9J4jtBx4I4wQAAgL9J4jtBx4I4wQAAgL/gvFBBReMuwQAAgL/gvFBBReMuwQAAgL86NmRB22kkwQAAgL86NmRB22kkwQAAgL//NXZBeTIZwQAAgL//NXZBeTIZwQAAgL/4VINBfVkNwQAAgL/4VINBfVkNwQAAgL8Sw4pBsfoAwQAAgL8Sw4pBsfoAwQAAgL/6aJBBwmTswAAAgL/6aJBBwmTswAAAgL+skJVBFfPVwAAAgD+LrCy6sO5cwQAAgD8X1+0/AxpcwQAAgD8X1+0/AxpcwQAAgD/tKWtAvKdZwQAAgD/tKWtAvKdZwQAAgD8BH69AoJNVwQAAgD8BH69AoJNVwQAAgD+mFOdACe9PwQAAgD+mFOdACe9PwQAAgD/QhA5Bc8xIwQAAgD/QhA5Bc8xIwQAAgD83xCVB5i1BwQAAgD83xCVB5i1BwQAAgD9J4jtBx4I4wQAAgD9J4jtBx4I4wQAAgD/gvFBBReMuwQAAgD/gvFBBReMuwQAAgD86NmRB22kkwQAAgD86NmRB22kkwQAAgD//NXZBeTIZwQAAgD//NXZBeTIZwQAAgD/4VINBfVkNwQAAgD/4VINBfVkNwQAAgD8Sw4pBsfoAwQAAgD8Sw4pBsfoAwQAAgD/6aJBBwmTswAAAgD/6aJBBwmTswAAAgD+skJVBFfPVwAAAgL/jQDZBGgqBwQAAgD/jQDZBGgqBwQAAgL+skJVBFfPVwAAAgL8/KpFB0VoAwQAAgL8/KpFB0VoAwQAAgL97BoxBpvQUwQAAgL97BoxBpvQUwQAAgL9/H4ZBCN0owQAAgL9/H4ZBCN0owQAAgL/PBH9BV+A7wQAAgL/PBH9BV+A7wQAAgL8N9HFBRCNMwQAAgL8N9HFBRCNMwQAAgL+A2GNBjoRbwQAAgL+A2GNBjoRbwQAAgL9ewVRB0PJpwQAAgL9ewVRB0PJpwQAAgL+u5kVB33R2wQAAgL+u5kVB33R2wQAAgL/jQDZBGgqBwQAAgD+skJVBFfPVwAAAgD8/KpFB0VoAwQAAgD8/KpFB0VoAwQAAgD97BoxBpvQUwQAAgD97BoxBpvQUwQAAgD9/H4ZBCN0owQAAgD9/H4ZBCN0owQAAgD/PBH9BV+A7wQAAgD/PBH9BV+A7wQAAgD8N9HFBRCNMwQAAgD8N9HFBRCNMwQAAgD+A2GNBjoRbwQAAgD+A2GNBjoRbwQAAgD9ewVRB0PJpwQAAgD9ewVRB0PJpwQAAgD+u5kVB33R2wQAAgD+u5kVB33R2wQAAgD/jQDZBGgqBwQAAgL+LrCy66aSdwQAAgD+LrCy66aSdwQAAgL/jQDZBGgqBwQAAgL9k0CJBKUyHwQAAgL9k0CJBKUyHwQAAgL8imw5BLtCMwQAAgL8imw5BLtCMwQAAgL/QFfNA0puRwQAAgL/QFfNA0puRwQAAgL9spcdAZqGVwQAAgL9spcdAZqGVwQAAgL8Qnp9AzJGYwQAAgL8Qnp9AzJGYwQAAgL9gxW1AYtmawQAAgL9gxW1AYtmawQAAgL9HQBtAX3WcwQAAgL9HQBtAX3WcwQAAgL8Ayps/r1idwQAAgL8Ayps/r1idwQAAgL+LrCy66aSdwQAAgD/jQDZBGgqBwQAAgD9k0CJBKUyHwQAAgD9k0CJBKUyHwQAAgD8imw5BLtCMwQAAgD8imw5BLtCMwQAAgD/QFfNA0puRwQAAgD/QFfNA0puRwQAAgD9spcdAZqGVwQAAgD9spcdAZqGVwQAAgD8Qnp9AzJGYwQAAgD8Qnp9AzJGYwQAAgD9gxW1AYtmawQAAgD9gxW1AYtmawQAAgD9HQBtAX3WcwQAAgD9HQBtAX3WcwQAAgD8Ayps/r1idwQAAgD8Ayps/r1idwQAAgD+LrCy66aSdwQAAgL/qRTbBGgqBwQAAgD/qRTbBGgqBwQAAgL+LrCy66aSdwQAAgL+u6ri/rjmdwQAAgL+u6ri/rjmdwQAAgL83ATjARvqbwQAAgL83ATjARvqbwQAAgL+5iInA/uSZwQAAgL+5iInA/uSZwQAAgL/gX7bALf2WwQAAgL/gX7bALf2WwQAAgL8K8d3Anq6TwQAAgL8K8d3Anq6TwQAAgL8ESgLB0buPwQAAgL8ESgLB0buPwQAAgL/UDhXB4iiLwQAAgL/UDhXB4iiLwQAAgL9+8SXBy1yGwQAAgL9+8SXBy1yGwQAAgL/qRTbBGgqBwQAAgD+LrCy66aSdwQAAgD+u6ri/rjmdwQAAgD+u6ri/rjmdwQAAgD83ATjARvqbwQAAgD83ATjARvqbwQAAgD+5iInA/uSZwQAAgD+5iInA/uSZwQAAgD/gX7bALf2WwQAAgD/gX7bALf2WwQAAgD8K8d3Anq6TwQAAgD8K8d3Anq6TwQAAgD8ESgLB0buPwQAAgD8ESgLB0buPwQAAgD/UDhXB4iiLwQAAgD/UDhXB4iiLwQAAgD9+8SXBy1yGwQAAgD9+8SXBy1yGwQAAgD/qRTbBGgqBwQAAgL8rk5XBFfPVwAAAgD8rk5XBFfPVwAAAgL/qRTbBGgqBwQAAgL8iwUjBJTB0wQAAgL8iwUjBJTB0wQAAgL8jHFrBsw9lwQAAgL8jHFrBsw9lwQAAgL9KaWrB7aFUwQAAgL9KaWrB7aFUwQAAgL8wfXnBMA1DwQAAgL8wfXnBMA1DwQAAgL/g+ILBj1EywQAAgL/g+ILBj1EywQAAgL9wpIjBZswgwQAAgL9wpIjBZswgwQAAgL/Huo3BzpAOwQAAgL/Huo3BzpAOwQAAgL+b6pHB+BX6wAAAgL+b6pHB+BX6wAAAgL8rk5XBFfPVwAAAgD/qRTbBGgqBwQAAgD8iwUjBJTB0wQAAgD8iwUjBJTB0wQAAgD8jHFrBsw9lwQAAgD8jHFrBsw9lwQAAgD9KaWrB7aFUwQAAgD9KaWrB7aFUwQAAgD8wfXnBMA1DwQAAgD8wfXnBMA1DwQAAgD/g+ILBj1EywQAAgD/g+ILBj1EywQAAgD9wpIjBZswgwQAAgD9wpIjBZswgwQAAgD/Huo3BzpAOwQAAgD/Huo3BzpAOwQAAgD+b6pHB+BX6wAAAgD+b6pHB+BX6wAAAgD8rk5XBFfPVwAAAgL8rk5XBFfPVwAAAgL/X8o7BcVnywAAAgL/X8o7BcVnywAAAgL8bi4fBsaUGwQAAgL8bi4fBsaUGwQAAgL+3Dn7BHuATwQAAgL+3Dn7BHuATwQAAgL8OI2vBW20gwQAAgL8OI2vBW20gwQAAgL+yYFbBsykswQAAgL+yYFbBsykswQAAgL/D3T/BN/A2wQAAgL/D3T/BN/A2wQAAgL/luCfBSJxAwQAAgL/luCfBSJxAwQAAgL9vGA7BIQtJwQAAgL9vGA7BIQtJwQAAgL8DUubALR1QwQAAgL8DUubALR1QwQAAgL8N67PARDlVwQAAgL8N67PARDlVwQAAgL+0AYDACRRZwQAAgL+0AYDACRRZwQAAgL9nwxXAg6BbwQAAgL9nwxXAg6BbwQAAgL8/4Ja/bZpcwQAAgL8/4Ja/bZpcwQAAgL+LrCy6sO5cwQAAgD8rk5XBFfPVwAAAgD/X8o7BcVnywAAAgD/X8o7BcVnywAAAgD8bi4fBsaUGwQAAgD8bi4fBsaUGwQAAgD+3Dn7BHuATwQAAgD+3Dn7BHuATwQAAgD8OI2vBW20gwQAAgD8OI2vBW20gwQAAgD+yYFbBsykswQAAgD+yYFbBsykswQAAgD/D3T/BN/A2wQAAgD/D3T/BN/A2wQAAgD/luCfBSJxAwQAAgD/luCfBSJxAwQAAgD9vGA7BIQtJwQAAgD9vGA7BIQtJwQAAgD8DUubALR1QwQAAgD8DUubALR1QwQAAgD8N67PARDlVwQAAgD8N67PARDlVwQAAgD+0AYDACRRZwQAAgD+0AYDACRRZwQAAgD9nwxXAg6BbwQAAgD9nwxXAg6BbwQAAgD8/4Ja/bZpcwQAAgD8/4Ja/bZpcwQAAgD+LrCy6sO5cwQAAgL+LrCy64+hcQQAAgD+LrCy64+hcQQAAgL8rk5XBPOfVQAAAgD8rk5XBPOfVQAAAgL+LrCy64+hcQQAAgL+LAe6/NhRcQQAAgL+LAe6/NhRcQQAAgL/YPmvA76FZQQAAgL/YPmvA76FZQQAAgL9XKa/A0o1VQQAAgL9XKa/A0o1VQQAAgL/iHufAO+lPQQAAgL/iHufAO+lPQQAAgL/kiQ7Bo8ZIQQAAgL/kiQ7Bo8ZIQQAAgL9EySXBFShBQQAAgL9EySXBFShBQQAAgL9Q5zvB9Hw4QQAAgL9Q5zvB9Hw4QQAAgL/jwVDBbt0uQQAAgL/jwVDBbt0uQQAAgL86O2TBAWQkQQAAgL86O2TBAWQkQQAAgL/+OnbBmywZQQAAgL/+OnbBmywZQQAAgL92V4PBnFMNQQAAgL92V4PBnFMNQQAAgL+QxYrBy/QAQQAAgL+QxYrBy/QAQQAAgL94a5DB8VjsQAAAgL94a5DB8VjsQAAAgL8rk5XBPOfVQAAAgD+LrCy64+hcQQAAgD+LAe6/NhRcQQAAgD+LAe6/NhRcQQAAgD/YPmvA76FZQQAAgD/YPmvA76FZQQAAgD9XKa/A0o1VQQAAgD9XKa/A0o1VQQAAgD/iHufAO+lPQQAAgD/iHufAO+lPQQAAgD/kiQ7Bo8ZIQQAAgD/kiQ7Bo8ZIQQAAgD9EySXBFShBQQAAgD9EySXBFShBQQAAgD9Q5zvB9Hw4QQAAgD9Q5zvB9Hw4QQAAgD/jwVDBbt0uQQAAgD/jwVDBbt0uQQAAgD86O2TBAWQkQQAAgD86O2TBAWQkQQAAgD/+OnbBmywZQQAAgD/+OnbBmywZQQAAgD92V4PBnFMNQQAAgD92V4PBnFMNQQAAgD+QxYrBy/QAQQAAgD+QxYrBy/QAQQAAgD94a5DB8VjsQAAAgD94a5DB8VjsQAAAgD8rk5XBPOfVQAAAgL/qRTbBNAeBQQAAgD/qRTbBNAeBQQAAgL8rk5XBPOfVQAAAgL/QLJHBxVQAQQAAgL/QLJHBxVQAQQAAgL8fCYzBfO4UQQAAgL8fCYzBfO4UQQAAgL81IobBxtYoQQAAgL81IobBxtYoQQAAgL9bCn/BAto7QQAAgL9bCn/BAto7QQAAgL+y+XHB4hxMQQAAgL+y+XHB4hxMQQAAgL873mPBJX5bQQAAgL873mPBJX5bQQAAgL8sx1TBZexpQQAAgL8sx1TBZexpQQAAgL8f7EXByG52QQAAgL8f7EXByG52QQAAgL/qRTbBNAeBQQAAgD8rk5XBPOfVQAAAgD/QLJHBxVQAQQAAgD/QLJHBxVQAQQAAgD8fCYzBfO4UQQAAgD8fCYzBfO4UQQAAgD81IobBxtYoQQAAgD81IobBxtYoQQAAgD9bCn/BAto7QQAAgD9bCn/BAto7QQAAgD+y+XHB4hxMQQAAgD+y+XHB4hxMQQAAgD873mPBJX5bQQAAgD873mPBJX5bQQAAgD8sx1TBZexpQQAAgD8sx1TBZexpQQAAgD8f7EXByG52QQAAgD8f7EXByG52QQAAgD/qRTbBNAeBQQAAgL+LrCy686GdQQAAgD+LrCy686GdQQAAgL/qRTbBNAeBQQAAgL/a1SLBLEmHQQAAgL/a1SLBLEmHQQAAgL8CoQ7BHc2MQQAAgL8CoQ7BHc2MQQAAgL8BIvPAvZiRQQAAgL8BIvPAvZiRQQAAgL/escfAUZ6VQQAAgL/escfAUZ6VQQAAgL+Zqp/Au46YQQAAgL+Zqp/Au46YQQAAgL953m3AWNaaQQAAgL953m3AWNaaQQAAgL9OWRvAW3KcQQAAgL9OWRvAW3KcQQAAgL99+Ju/tVWdQQAAgL99+Ju/tVWdQQAAgL+LrCy686GdQQAAgD/qRTbBNAeBQQAAgD/a1SLBLEmHQQAAgD/a1SLBLEmHQQAAgD8CoQ7BHc2MQQAAgD8CoQ7BHc2MQQAAgD8BIvPAvZiRQQAAgD8BIvPAvZiRQQAAgD/escfAUZ6VQQAAgD/escfAUZ6VQQAAgD+Zqp/Au46YQQAAgD+Zqp/Au46YQQAAgD953m3AWNaaQQAAgD953m3AWNaaQQAAgD9OWRvAW3KcQQAAgD9OWRvAW3KcQQAAgD99+Ju/tVWdQQAAgD99+Ju/tVWdQQAAgD+LrCy686GdQQAAgL/jQDZBNAeBQQAAgD/jQDZBNAeBQQAAgL+LrCy686GdQQAAgL9ewbg/tzadQQAAgL9ewbg/tzadQQAAgL9E7TdAT/ebQQAAgL9E7TdAT/ebQQAAgL/RfolACOKZQQAAgL/RfolACOKZQQAAgL/wVbZAOfqWQQAAgL/wVbZAOfqWQQAAgL8K591ArauTQQAAgL8K591ArauTQQAAgL8ARQJB4biPQQAAgL8ARQJB4biPQQAAgL/TCRVB8yWLQQAAgL/TCRVB8yWLQQAAgL917CVB4FmGQQAAgL917CVB4FmGQQAAgL/jQDZBNAeBQQAAgD+LrCy686GdQQAAgD9ewbg/tzadQQAAgD9ewbg/tzadQQAAgD9E7TdAT/ebQQAAgD9E7TdAT/ebQQAAgD/RfolACOKZQQAAgD/RfolACOKZQQAAgD/wVbZAOfqWQQAAgD/wVbZAOfqWQQAAgD8K591ArauTQQAAgD8K591ArauTQQAAgD8ARQJB4biPQQAAgD8ARQJB4biPQQAAgD/TCRVB8yWLQQAAgD/TCRVB8yWLQQAAgD917CVB4FmGQQAAgD917CVB4FmGQQAAgD/jQDZBNAeBQQAAgL+skJVBPOfVQAAAgD+skJVBPOfVQAAAgL/jQDZBNAeBQQAAgL8VvEhBUip0QQAAgL8VvEhBUip0QQAAgL8TF1pB2AllQQAAgL8TF1pB2AllQQAAgL86ZGpBBpxUQQAAgL86ZGpBBpxUQQAAgL8leHlBOQdDQQAAgL8leHlBOQdDQQAAgL9e9oJBhksyQQAAgL9e9oJBhksyQQAAgL/0oYhBR8YgQQAAgL/0oYhBR8YgQQAAgL9SuI1Bk4oOQQAAgL9SuI1Bk4oOQQAAgL8g6JFBzwn6QAAAgL8g6JFBzwn6QAAAgL+skJVBPOfVQAAAgD/jQDZBNAeBQQAAgD8VvEhBUip0QQAAgD8VvEhBUip0QQAAgD8TF1pB2AllQQAAgD8TF1pB2AllQQAAgD86ZGpBBpxUQQAAgD86ZGpBBpxUQQAAgD8leHlBOQdDQQAAgD8leHlBOQdDQQAAgD9e9oJBhksyQQAAgD9e9oJBhksyQQAAgD/0oYhBR8YgQQAAgD/0oYhBR8YgQQAAgD9SuI1Bk4oOQQAAgD9SuI1Bk4oOQQAAgD8g6JFBzwn6QAAAgD8g6JFBzwn6QAAAgD+skJVBPOfVQAAAgL+skJVBPOfVQAAAgL9H9I5B9z3yQAAAgL9H9I5B9z3yQAAAgL+cj4dBPJIGQQAAgL+cj4dBPJIGQQAAgL/WGX5BmsoTQQAAgL/WGX5BmsoTQQAAgL94LWtB4VcgQQAAgL94LWtB4VcgQQAAgL8EaFZBwxUsQQAAgL8EaFZBwxUsQQAAgL8/4D9But42QQAAgL8/4D9But42QQAAgL+otSdBnY1AQQAAgL+otSdBnY1AQQAAgL+RDw5BNP9IQQAAgL+RDw5BNP9IQQAAgL8/N+ZAmhNQQQAAgL8/N+ZAmhNQQQAAgL/py7NATDFVQQAAgL/py7NATDFVQQAAgL/dxX9ALg1ZQQAAgL/dxX9ALg1ZQQAAgL9CkhVAUZpbQQAAgL9CkhVAUZpbQQAAgL9Cl5Y/hJRcQQAAgL9Cl5Y/hJRcQQAAgL+LrCy64+hcQQAAgD+skJVBPOfVQAAAgD9H9I5B9z3yQAAAgD9H9I5B9z3yQAAAgD+cj4dBPJIGQQAAgD+cj4dBPJIGQQAAgD/WGX5BmsoTQQAAgD/WGX5BmsoTQQAAgD94LWtB4VcgQQAAgD94LWtB4VcgQQAAgD8EaFZBwxUsQQAAgD8EaFZBwxUsQQAAgD8/4D9But42QQAAgD8/4D9But42QQAAgD+otSdBnY1AQQAAgD+otSdBnY1AQQAAgD+RDw5BNP9IQQAAgD+RDw5BNP9IQQAAgD8/N+ZAmhNQQQAAgD8/N+ZAmhNQQQAAgD/py7NATDFVQQAAgD/py7NATDFVQQAAgD/dxX9ALg1ZQQAAgD/dxX9ALg1ZQQAAgD9CkhVAUZpbQQAAgD9CkhVAUZpbQQAAgD9Cl5Y/hJRcQQAAgD9Cl5Y/hJRcQQAAgD+LrCy64+hcQZR0lGJdlIaUdYwFY29sb3KUjAcjMjk4MGI5lIwCYmKUfZQojAR4bWlulEe/8GuXb3JB/IwEeG1heJRHP/Brl29yQf+MBHltaW6UR8AyuR7L4VRgjAR5bWF4lEdAMrjPA1Sh84wEem1pbpRHwDO7Vp7gYQOMBHptYXiUR0AzuvfaulgkdYwDaW5klGgIdX2UKGgUSwJoFWgPaBaMCGNhZHF1ZXJ5lGgYfZQoaBpoHWggSwCFlGgih5RSlChLAU3iBEsDhpRoKolCmDoAAAAAgL+r/OLAuyRawAAAgD+r/OLAuyRawAAAgD825NnAtVZZwAAAgD+0LNLA+zxXwAAAgD8InMvAqTtUwAAAgD+FZ8XA/ytQwAAAgD8tj7/A/A1LwAAAgD9Dm7rA1ItFwAAAgD/5ZbbAdds/wAAAgD8ASbTAgZg8wAAAgD+rPLLAuyQ5wAAAgL+rPLLAuyQ5wAAAgL825NnAtVZZwAAAgL+0LNLA+zxXwAAAgL8InMvAqTtUwAAAgL+FZ8XA/ytQwAAAgL8tj7/A/A1LwAAAgL9Dm7rA1ItFwAAAgL/5ZbbAdds/wAAAgL8ASbTAgZg8wAAAgL+rPLLAuyQ5wAAAgD+rPLLAuyQ5wAAAgD8SZq7A+sMxwAAAgD/d+qrAduEpwAAAgD8M+6fAL30hwAAAgD+fZqXAJJcYwAAAgD+WPaPAVS8PwAAAgD/wf6HAxEUFwAAAgD+vLaDA3rT1vwAAgD/RRp/ArtrfvwAAgD9N7J7A44XRvwAAgD+rvJ7Ad8nCvwAAgL+rvJ7Ad8nCvwAAgL8SZq7A+sMxwAAAgL/d+qrAduEpwAAAgL8M+6fAL30hwAAAgL+fZqXAJJcYwAAAgL+WPaPAVS8PwAAAgL/wf6HAxEUFwAAAgL+vLaDA3rT1vwAAgL/RRp/ArtrfvwAAgL9N7J7A44XRvwAAgL+rvJ7Ad8nCvwAAgD+rvJ7Ad8nCvwAAgD+rcuS/d8nCvwAAgL+rcuS/d8nCvwAAgL+rcuS/d8nCvwAAgD+rcuS/d8nCvwAAgD+xZee/o1f5vwAAgD8xPe+/KCsXwAAAgD8t+fu/vuIwwAAAgD/SzAbAldJJwAAAgD9A1RHA7othwAAAgD9WOR/Au4R4wAAAgL9WOR/Au4R4wAAAgL+xZee/o1f5vwAAgL8xPe+/KCsXwAAAgL8t+fu/vuIwwAAAgL/SzAbAldJJwAAAgL9A1RHA7othwAAAgL9WOR/Au4R4wAAAgD9WOR/Au4R4wAAAgD/15C7AWUeHwAAAgD9fYUDASXGRwAAAgD+UrlPAMMCawAAAgD+UzGjADDSjwAAAgD+/q3/AK8iqwAAAgD+rLIzAXoKxwAAAgL+rLIzAXoKxwAAAgL/15C7AWUeHwAAAgL9fYUDASXGRwAAAgL+UrlPAMMCawAAAgL+UzGjADDSjwAAAgL+/q3/AK8iqwAAAgL+rLIzAXoKxwAAAgD+rLIzAXoKxwAAAgD89OpvA3xS4wAAAgD/n36rAI0K9wAAAgD+oHbvAKgrBwAAAgD+A88vA9GzDwAAAgD9DbNbAAzHEwAAAgD+rHOHAXnLEwAAAgL+rHOHAXnLEwAAAgL89OpvA3xS4wAAAgL/n36rAI0K9wAAAgL+oHbvAKgrBwAAAgL+A88vA9GzDwAAAgL9DbNbAAzHEwAAAgL+rHOHAXnLEwAAAgD+rHOHAXnLEwAAAgD+I9/TAiLDDwAAAgD9q6APBBWvBwAAAgD/QcQzB/NS9wAAAgD8avBPBA2y5wAAAgD8dpxrBPOSzwAAAgD/YMiHBpj2twAAAgD9NXyfBQnilwAAAgD96LC3BD5ScwAAAgD85SDHB8CuVwAAAgD9VLjXBXiKNwAAAgL9VLjXBXiKNwAAAgL+I9/TAiLDDwAAAgL9q6APBBWvBwAAAgL/QcQzB/NS9wAAAgL8avBPBA2y5wAAAgL8dpxrBPOSzwAAAgL/YMiHBpj2twAAAgL9NXyfBQnilwAAAgL96LC3BD5ScwAAAgL85SDHB8CuVwAAAgL9VLjXBXiKNwAAAgD9VLjXBXiKNwAAAgD+BSjrBLcKAwAAAgD8a0j7BDtFmwAAAgD8jxULB1SpKwAAAgD+aI0bBsJErwAAAgD+A7UjBoAULwAAAgD/VIkvBRg3RvwAAgD+Yw0zBdimIvwAAgD/Kz03BNX/tvgAAgD+yLk7BwyNlvQAAgD9VTk7BJNq6PgAAgL9VTk7BJNq6PgAAgL+BSjrBLcKAwAAAgL8a0j7BDtFmwAAAgL8jxULB1SpKwAAAgL+aI0bBsJErwAAAgL+A7UjBoAULwAAAgL/VIkvBRg3RvwAAgL+Yw0zBdimIvwAAgL/Kz03BNX/tvgAAgL+yLk7BwyNlvQAAgL9VTk7BJNq6PgAAgD9VTk7BJNq6PgAAgD9VTk7BEm0WPwAAgL9VTk7BEm0WPwAAgL9VTk7BEm0WPwAAgD9VTk7BEm0WPwAAgD9q7U3BoFKlPwAAgD+pykzBH9X6PwAAgD+rAEvBlw4kQAAAgD9olEjB1+hHQAAAgD821UXB8nRmQAAAgD+xjELB86+BQAAAgD/Xuj7B2lSPQAAAgD+pXzrBLimcQAAAgD/r8DfBoWaiQAAAgD9VXjXBom2oQAAAgL9VXjXBom2oQAAAgL9q7U3BoFKlPwAAgL+pykzBH9X6PwAAgL+rAEvBlw4kQAAAgL9olEjB1+hHQAAAgL821UXB8nRmQAAAgL+xjELB86+BQAAAgL/Xuj7B2lSPQAAAgL+pXzrBLimcQAAAgL/r8DfBoWaiQAAAgL9VXjXBom2oQAAAgD9VXjXBom2oQAAAgD/Wwy/BsdizQAAAgD92uinBA/a9QAAAgD83QiPBlsXGQAAAgD8YWxzBbEfOQAAAgD8aBRXBhXvUQAAAgD88QA3B32HZQAAAgD9+DAXBfPrcQAAAgD/B0/jAW0XfQAAAgD8chO3AkAvgQAAAgD+r3OHAok3gQAAAgL+r3OHAok3gQAAAgL/Wwy/BsdizQAAAgL92uinBA/a9QAAAgL83QiPBlsXGQAAAgL8YWxzBbEfOQAAAgL8aBRXBhXvUQAAAgL88QA3B32HZQAAAgL9+DAXBfPrcQAAAgL/B0/jAW0XfQAAAgL8chO3AkAvgQAAAgL+r3OHAok3gQAAAgD+r3OHAok3gQAAAgD9uQs7AzIvfQAAAgD9jtrvASkbdQAAAgD+LOKrAG33ZQAAAgD+AYZvAYcnUQAAAgD99wY7AjIHPQAAAgD/A0oLAXDvJQAAAgD+TKm/A0vbBQAAAgD84+17A7sO7QAAAgD9WmU/Aov20QAAAgL9WmU/Aov20QAAAgL9uQs7AzIvfQAAAgL9jtrvASkbdQAAAgL+LOKrAG33ZQAAAgL+AYZvAYcnUQAAAgL99wY7AjIHPQAAAgL/A0oLAXDvJQAAAgL+TKm/A0vbBQAAAgL84+17A7sO7QAAAgL9WmU/Aov20QAAAgD9WmU/Aov20QAAAgD/vrzzAeDurQAAAgD+i6SvAo8ugQAAAgD9vRh3AJa6VQAAAgD9VxhDA/OKJQAAAgD9UaQbAUtR6QAAAgD/bXvy/WIdgQAAAgD9AMfC/Ct9EQAAAgD/YSei/Z9snQAAAgD9tmuW/f9kVQAAAgD+rcuS/RVsDQAAAgL+rcuS/RVsDQAAAgL/vrzzAeDurQAAAgL+i6SvAo8ugQAAAgL9vRh3AJa6VQAAAgL9VxhDA/OKJQAAAgL9UaQbAUtR6QAAAgL/bXvy/WIdgQAAAgL9AMfC/Ct9EQAAAgL/YSei/Z9snQAAAgL9tmuW/f9kVQAAAgL+rcuS/RVsDQAAAgD+rcuS/RVsDQAAAgD+rvJ7ARVsDQAAAgL+rvJ7ARVsDQAAAgL+rvJ7ARVsDQAAAgD+rvJ7ARVsDQAAAgD8aW5/AWIgVQAAAgD90xKDAGasmQAAAgD8ot6LAeTM1QAAAgD+FBKXAXY9BQAAAgD8D16fAhjxNQAAAgD+jLqvA8jpYQAAAgD9Gg67AOj1hQAAAgD+rPLLARbtpQAAAgL+rPLLARbtpQAAAgL8aW5/AWIgVQAAAgL90xKDAGasmQAAAgL8ot6LAeTM1QAAAgL+FBKXAXY9BQAAAgL8D16fAhjxNQAAAgL+jLqvA8jpYQAAAgL9Gg67AOj1hQAAAgL+rPLLARbtpQAAAgD+rPLLARbtpQAAAgD9iNLbAxmJxQAAAgD+VbLrAtDZ4QAAAgD9C5b7ADTd+QAAAgD9rnsPA6bGBQAAAgD8QmMjAgd6DQAAAgD8v0s3ATqGFQAAAgD/KTNPAUvqGQAAAgD/gB9nAi+mHQAAAgD9ESd7AnGSIQAAAgD+rvOPAoo2IQAAAgL+rvOPAoo2IQAAAgL9iNLbAxmJxQAAAgL+VbLrAtDZ4QAAAgL9C5b7ADTd+QAAAgL9rnsPA6bGBQAAAgL8QmMjAgd6DQAAAgL8v0s3ATqGFQAAAgL/KTNPAUvqGQAAAgL/gB9nAi+mHQAAAgL9ESd7AnGSIQAAAgL+rvOPAoo2IQAAAgD+rvOPAoo2IQAAAgD9hnuzAnyaIQAAAgD8WJvTAwhmHQAAAgD/vjPrAGZmFQAAAgD9fTADBRJGDQAAAgD/43QLB2EmBQAAAgD9IDgXBTL59QAAAgD+8IAfBiTd4QAAAgD9SFQnBZf9xQAAAgD8K7ArB4hVrQAAAgD/mpAzB/3pjQAAAgD90kg3B29deQAAAgD9Vdg7BRftZQAAAgL9Vdg7BRftZQAAAgL9hnuzAnyaIQAAAgL8WJvTAwhmHQAAAgL/vjPrAGZmFQAAAgL9fTADBRJGDQAAAgL/43QLB2EmBQAAAgL9IDgXBTL59QAAAgL+8IAfBiTd4QAAAgL9SFQnBZf9xQAAAgL8K7ArB4hVrQAAAgL/mpAzB/3pjQAAAgL90kg3B29deQAAAgL9Vdg7BRftZQAAAgD9Vdg7BRftZQAAAgD8q9w/B3pVQQAAAgD90VxHBNElGQAAAgD8zlxLBSBU7QAAAgD9othPBGvouQAAAgD8TtRTBqfchQAAAgD8D1hXBVjcPQAAAgD/q1RbBF2fwPwAAgD87uRfB1bSsPwAAgD8PBRjB47l9PwAAgD9VHhjBEm0cPwAAgL9VHhjBEm0cPwAAgL8q9w/B3pVQQAAAgL90VxHBNElGQAAAgL8zlxLBSBU7QAAAgL9othPBGvouQAAAgL8TtRTBqfchQAAAgL8D1hXBVjcPQAAAgL/q1RbBF2fwPwAAgL87uRfB1bSsPwAAgL8PBRjB47l9PwAAgL9VHhjBEm0cPwAAgD9VHhjBEm0cPwAAgD9VHhjBJNqEPgAAgL9VHhjBJNqEPgAAgL9VHhjBJNqEPgAAgD9VHhjBJNqEPgAAgD9qvRfBMpDzvgAAgD+pmhbBf9SPvwAAgD/09hTBBwHQvwAAgD9iMxPBeY79vwAAgD9jfBHBQh4PwAAAgD93FhDBlr8ZwAAAgD9Vjg7Bu2QjwAAAgL9Vjg7Bu2QjwAAAgL9qvRfBMpDzvgAAgL+pmhbBf9SPvwAAgL/09hTBBwHQvwAAgL9iMxPBeY79vwAAgL9jfBHBQh4PwAAAgL93FhDBlr8ZwAAAgL9Vjg7Bu2QjwAAAgD9Vjg7Bu2QjwAAAgD8l2QzB7VoswAAAgD/E/grBN4Q0wAAAgD8y/wjBmeA7wAAAgD9u2gbBE3BCwAAAgD96kATBpTJIwAAAgD9UIQLBTyhNwAAAgD/6Gf/AElFRwAAAgD/rpvnA7KxUwAAAgD956fPA3ztXwAAAgD+l4e3A6v1YwAAAgD/piejAB9tZwAAAgD+r/OLAuyRawAAAgL+r/OLAuyRawAAAgL8l2QzB7VoswAAAgL/E/grBN4Q0wAAAgL8y/wjBmeA7wAAAgL9u2gbBE3BCwAAAgL96kATBpTJIwAAAgL9UIQLBTyhNwAAAgL/6Gf/AElFRwAAAgL/rpvnA7KxUwAAAgL956fPA3ztXwAAAgL+l4e3A6v1YwAAAgL/piejAB9tZwAAAgL9Vjg7Bu2QjwAAAgL8l2QzB7VoswAAAgL/E/grBN4Q0wAAAgL8y/wjBmeA7wAAAgL9u2gbBE3BCwAAAgL96kATBpTJIwAAAgL9UIQLBTyhNwAAAgL/6Gf/AElFRwAAAgL/rpvnA7KxUwAAAgL956fPA3ztXwAAAgL+l4e3A6v1YwAAAgL/piejAB9tZwAAAgL+r/OLAuyRawAAAgL9VHhjBJNqEPgAAgL9qvRfBMpDzvgAAgL+pmhbBf9SPvwAAgL/09hTBBwHQvwAAgL9iMxPBeY79vwAAgL9jfBHBQh4PwAAAgL93FhDBlr8ZwAAAgL9VHhjBEm0cPwAAgL9Vdg7BRftZQAAAgL8q9w/B3pVQQAAAgL90VxHBNElGQAAAgL8zlxLBSBU7QAAAgL9othPBGvouQAAAgL8TtRTBqfchQAAAgL8D1hXBVjcPQAAAgL/q1RbBF2fwPwAAgL87uRfB1bSsPwAAgL8PBRjB47l9PwAAgL+rvOPAoo2IQAAAgL9hnuzAnyaIQAAAgL8WJvTAwhmHQAAAgL/vjPrAGZmFQAAAgL9fTADBRJGDQAAAgL/43QLB2EmBQAAAgL9IDgXBTL59QAAAgL+8IAfBiTd4QAAAgL9SFQnBZf9xQAAAgL8K7ArB4hVrQAAAgL/mpAzB/3pjQAAAgL90kg3B29deQAAAgL+rPLLARbtpQAAAgL9iNLbAxmJxQAAAgL+VbLrAtDZ4QAAAgL9C5b7ADTd+QAAAgL9rnsPA6bGBQAAAgL8QmMjAgd6DQAAAgL8v0s3ATqGFQAAAgL/KTNPAUvqGQAAAgL/gB9nAi+mHQAAAgL9ESd7AnGSIQAAAgL+rvJ7ARVsDQAAAgL8aW5/AWIgVQAAAgL90xKDAGasmQAAAgL8ot6LAeTM1QAAAgL+FBKXAXY9BQAAAgL8D16fAhjxNQAAAgL+jLqvA8jpYQAAAgL9Gg67AOj1hQAAAgL+rcuS/RVsDQAAAgL9WmU/Aov20QAAAgL/vrzzAeDurQAAAgL+i6SvAo8ugQAAAgL9vRh3AJa6VQAAAgL9VxhDA/OKJQAAAgL9UaQbAUtR6QAAAgL/bXvy/WIdgQAAAgL9AMfC/Ct9EQAAAgL/YSei/Z9snQAAAgL9tmuW/f9kVQAAAgL+r3OHAok3gQAAAgL9uQs7AzIvfQAAAgL9jtrvASkbdQAAAgL+LOKrAG33ZQAAAgL+AYZvAYcnUQAAAgL99wY7AjIHPQAAAgL/A0oLAXDvJQAAAgL+TKm/A0vbBQAAAgL84+17A7sO7QAAAgL9VXjXBom2oQAAAgL/Wwy/BsdizQAAAgL92uinBA/a9QAAAgL83QiPBlsXGQAAAgL8YWxzBbEfOQAAAgL8aBRXBhXvUQAAAgL88QA3B32HZQAAAgL9+DAXBfPrcQAAAgL/B0/jAW0XfQAAAgL8chO3AkAvgQAAAgL9VTk7BEm0WPwAAgL9q7U3BoFKlPwAAgL+pykzBH9X6PwAAgL+rAEvBlw4kQAAAgL9olEjB1+hHQAAAgL821UXB8nRmQAAAgL+xjELB86+BQAAAgL/Xuj7B2lSPQAAAgL+pXzrBLimcQAAAgL/r8DfBoWaiQAAAgL9VTk7BJNq6PgAAgL9VLjXBXiKNwAAAgL+BSjrBLcKAwAAAgL8a0j7BDtFmwAAAgL8jxULB1SpKwAAAgL+aI0bBsJErwAAAgL+A7UjBoAULwAAAgL/VIkvBRg3RvwAAgL+Yw0zBdimIvwAAgL/Kz03BNX/tvgAAgL+yLk7BwyNlvQAAgL+rHOHAXnLEwAAAgL+I9/TAiLDDwAAAgL9q6APBBWvBwAAAgL/QcQzB/NS9wAAAgL8avBPBA2y5wAAAgL8dpxrBPOSzwAAAgL/YMiHBpj2twAAAgL9NXyfBQnilwAAAgL96LC3BD5ScwAAAgL85SDHB8CuVwAAAgL+rLIzAXoKxwAAAgL89OpvA3xS4wAAAgL/n36rAI0K9wAAAgL+oHbvAKgrBwAAAgL+A88vA9GzDwAAAgL9DbNbAAzHEwAAAgL9WOR/Au4R4wAAAgL/15C7AWUeHwAAAgL9fYUDASXGRwAAAgL+UrlPAMMCawAAAgL+UzGjADDSjwAAAgL+/q3/AK8iqwAAAgL+rcuS/d8nCvwAAgL+xZee/o1f5vwAAgL8xPe+/KCsXwAAAgL8t+fu/vuIwwAAAgL/SzAbAldJJwAAAgL9A1RHA7othwAAAgL+rvJ7Ad8nCvwAAgL+rPLLAuyQ5wAAAgL8SZq7A+sMxwAAAgL/d+qrAduEpwAAAgL8M+6fAL30hwAAAgL+fZqXAJJcYwAAAgL+WPaPAVS8PwAAAgL/wf6HAxEUFwAAAgL+vLaDA3rT1vwAAgL/RRp/ArtrfvwAAgL9N7J7A44XRvwAAgL825NnAtVZZwAAAgL+0LNLA+zxXwAAAgL8InMvAqTtUwAAAgL+FZ8XA/ytQwAAAgL8tj7/A/A1LwAAAgL9Dm7rA1ItFwAAAgL/5ZbbAdds/wAAAgL8ASbTAgZg8wAAAgD9Vjg7Bu2QjwAAAgD8l2QzB7VoswAAAgD/E/grBN4Q0wAAAgD8y/wjBmeA7wAAAgD9u2gbBE3BCwAAAgD96kATBpTJIwAAAgD9UIQLBTyhNwAAAgD/6Gf/AElFRwAAAgD/rpvnA7KxUwAAAgD956fPA3ztXwAAAgD+l4e3A6v1YwAAAgD/piejAB9tZwAAAgD+r/OLAuyRawAAAgD9VHhjBJNqEPgAAgD9qvRfBMpDzvgAAgD+pmhbBf9SPvwAAgD/09hTBBwHQvwAAgD9iMxPBeY79vwAAgD9jfBHBQh4PwAAAgD93FhDBlr8ZwAAAgD9VHhjBEm0cPwAAgD9Vdg7BRftZQAAAgD8q9w/B3pVQQAAAgD90VxHBNElGQAAAgD8zlxLBSBU7QAAAgD9othPBGvouQAAAgD8TtRTBqfchQAAAgD8D1hXBVjcPQAAAgD/q1RbBF2fwPwAAgD87uRfB1bSsPwAAgD8PBRjB47l9PwAAgD+rvOPAoo2IQAAAgD9hnuzAnyaIQAAAgD8WJvTAwhmHQAAAgD/vjPrAGZmFQAAAgD9fTADBRJGDQAAAgD/43QLB2EmBQAAAgD9IDgXBTL59QAAAgD+8IAfBiTd4QAAAgD9SFQnBZf9xQAAAgD8K7ArB4hVrQAAAgD/mpAzB/3pjQAAAgD90kg3B29deQAAAgD+rPLLARbtpQAAAgD9iNLbAxmJxQAAAgD+VbLrAtDZ4QAAAgD9C5b7ADTd+QAAAgD9rnsPA6bGBQAAAgD8QmMjAgd6DQAAAgD8v0s3ATqGFQAAAgD/KTNPAUvqGQAAAgD/gB9nAi+mHQAAAgD9ESd7AnGSIQAAAgD+rvJ7ARVsDQAAAgD8aW5/AWIgVQAAAgD90xKDAGasmQAAAgD8ot6LAeTM1QAAAgD+FBKXAXY9BQAAAgD8D16fAhjxNQAAAgD+jLqvA8jpYQAAAgD9Gg67AOj1hQAAAgD+rcuS/RVsDQAAAgD9WmU/Aov20QAAAgD/vrzzAeDurQAAAgD+i6SvAo8ugQAAAgD9vRh3AJa6VQAAAgD9VxhDA/OKJQAAAgD9UaQbAUtR6QAAAgD/bXvy/WIdgQAAAgD9AMfC/Ct9EQAAAgD/YSei/Z9snQAAAgD9tmuW/f9kVQAAAgD+r3OHAok3gQAAAgD9uQs7AzIvfQAAAgD9jtrvASkbdQAAAgD+LOKrAG33ZQAAAgD+AYZvAYcnUQAAAgD99wY7AjIHPQAAAgD/A0oLAXDvJQAAAgD+TKm/A0vbBQAAAgD84+17A7sO7QAAAgD9VXjXBom2oQAAAgD/Wwy/BsdizQAAAgD92uinBA/a9QAAAgD83QiPBlsXGQAAAgD8YWxzBbEfOQAAAgD8aBRXBhXvUQAAAgD88QA3B32HZQAAAgD9+DAXBfPrcQAAAgD/B0/jAW0XfQAAAgD8chO3AkAvgQAAAgD9VTk7BEm0WPwAAgD9q7U3BoFKlPwAAgD+pykzBH9X6PwAAgD+rAEvBlw4kQAAAgD9olEjB1+hHQAAAgD821UXB8nRmQAAAgD+xjELB86+BQAAAgD/Xuj7B2lSPQAAAgD+pXzrBLimcQAAAgD/r8DfBoWaiQAAAgD9VTk7BJNq6PgAAgD9VLjXBXiKNwAAAgD+BSjrBLcKAwAAAgD8a0j7BDtFmwAAAgD8jxULB1SpKwAAAgD+aI0bBsJErwAAAgD+A7UjBoAULwAAAgD/VIkvBRg3RvwAAgD+Yw0zBdimIvwAAgD/Kz03BNX/tvgAAgD+yLk7BwyNlvQAAgD+rHOHAXnLEwAAAgD+I9/TAiLDDwAAAgD9q6APBBWvBwAAAgD/QcQzB/NS9wAAAgD8avBPBA2y5wAAAgD8dpxrBPOSzwAAAgD/YMiHBpj2twAAAgD9NXyfBQnilwAAAgD96LC3BD5ScwAAAgD85SDHB8CuVwAAAgD+rLIzAXoKxwAAAgD89OpvA3xS4wAAAgD/n36rAI0K9wAAAgD+oHbvAKgrBwAAAgD+A88vA9GzDwAAAgD9DbNbAAzHEwAAAgD9WOR/Au4R4wAAAgD/15C7AWUeHwAAAgD9fYUDASXGRwAAAgD+UrlPAMMCawAAAgD+UzGjADDSjwAAAgD+/q3/AK8iqwAAAgD+rcuS/d8nCvwAAgD+xZee/o1f5vwAAgD8xPe+/KCsXwAAAgD8t+fu/vuIwwAAAgD/SzAbAldJJwAAAgD9A1RHA7othwAAAgD+rvJ7Ad8nCvwAAgD+rPLLAuyQ5wAAAgD8SZq7A+sMxwAAAgD/d+qrAduEpwAAAgD8M+6fAL30hwAAAgD+fZqXAJJcYwAAAgD+WPaPAVS8PwAAAgD/wf6HAxEUFwAAAgD+vLaDA3rT1vwAAgD/RRp/ArtrfvwAAgD9N7J7A44XRvwAAgD825NnAtVZZwAAAgD+0LNLA+zxXwAAAgD8InMvAqTtUwAAAgD+FZ8XA/ytQwAAAgD8tj7/A/A1LwAAAgD9Dm7rA1ItFwAAAgD/5ZbbAdds/wAAAgD8ASbTAgZg8wAAAgL+tysG+Em0NPwAAgD+tysG+Em0NPwAAgD9LrbW+WOSpPwAAgD8kVZG+Iq4DQAAAgD+2NzG+TkktQAAAgD+oN8W84WtTQAAAgD97liQ+FV52QAAAgD9TXbg+uumJQAAAgD+WOhc/vLKXQAAAgD/Vl0M/MXegQAAAgD+pmnM/os2oQAAAgL+pmnM/os2oQAAAgL9LrbW+WOSpPwAAgL8kVZG+Iq4DQAAAgL+2NzG+TkktQAAAgL+oN8W84WtTQAAAgL97liQ+FV52QAAAgL9TXbg+uumJQAAAgL+WOhc/vLKXQAAAgL/Vl0M/MXegQAAAgL+pmnM/os2oQAAAgD+pmnM/os2oQAAAgD/vB6I/Xay0QAAAgD+8Bck//iK+QAAAgD/vXu4/dKrFQAAAgD+o7QpAU0LMQAAAgD9vvR9AmurRQAAAgD/NnjVASaPWQAAAgD/CkUxAYGzaQAAAgD9OlmRA30XdQAAAgD9xrH1Axi/fQAAAgD/544hAKwbgQAAAgD9VQ5NAok3gQAAAgL9VQ5NAok3gQAAAgL/vB6I/Xay0QAAAgL+8Bck//iK+QAAAgL/vXu4/dKrFQAAAgL+o7QpAU0LMQAAAgL9vvR9AmurRQAAAgL/NnjVASaPWQAAAgL/CkUxAYGzaQAAAgL9OlmRA30XdQAAAgL9xrH1Axi/fQAAAgL/544hAKwbgQAAAgL9VQ5NAok3gQAAAgD9VQ5NAok3gQAAAgD8n8KJAzIvfQAAAgD/AWrBA4pHdQAAAgD+P3rtAFL7aQAAAgD+W2sZA7OvWQAAAgD/VTtFAahvSQAAAgD9LO9tAjUzMQAAAgD/6n+RAVn/FQAAAgD/gfO1AxbO9QAAAgD+sf/RAz2m2QAAAgD9VI/tAom2uQAAAgL9VI/tAom2uQAAAgL8n8KJAzIvfQAAAgL/AWrBA4pHdQAAAgL+P3rtAFL7aQAAAgL+W2sZA7OvWQAAAgL/VTtFAahvSQAAAgL9LO9tAjUzMQAAAgL/6n+RAVn/FQAAAgL/gfO1AxbO9QAAAgL+sf/RAz2m2QAAAgL9VI/tAom2uQAAAgD9VI/tAom2uQAAAgD+rIQFBos3YQAAAgL+rIQFBos3YQAAAgL+rIQFBos3YQAAAgD+rIQFBos3YQAAAgD+rwTBBos3YQAAAgL+rwTBBos3YQAAAgL+rwTBBos3YQAAAgD+rwTBBos3YQAAAgD+rwTBBL3kswQAAgL+rwTBBL3kswQAAgL+rwTBBL3kswQAAgD+rwTBBL3kswQAAgD9Vw/RAL3kswQAAgL9Vw/RAL3kswQAAgL9Vw/RAL3kswQAAgD9Vw/RAL3kswQAAgD9Vw/RAXhKawAAAgL9Vw/RAXhKawAAAgL9Vw/RAXhKawAAAgD9Vw/RAXhKawAAAgD/PvetANlejwAAAgD8HFuNAsrSqwAAAgD+w3NpAEouwwAAAgD8NOtJAi6G1wAAAgD8gLslAHfi5wAAAgD/puL9AyI69wAAAgD9o2rVAjWXAwAAAgD+bkqtAa3zCwAAAgD+F4aBAY9PDwAAAgD88yJlAn0rEwAAAgD9Vg5JAXnLEwAAAgL9Vg5JAXnLEwAAAgL/PvetANlejwAAAgL8HFuNAsrSqwAAAgL+w3NpAEouwwAAAgL8NOtJAi6G1wAAAgL8gLslAHfi5wAAAgL/puL9AyI69wAAAgL9o2rVAjWXAwAAAgL+bkqtAa3zCwAAAgL+F4aBAY9PDwAAAgL88yJlAn0rEwAAAgL9Vg5JAXnLEwAAAgD9Vg5JAXnLEwAAAgD/bHIJAiLDDwAAAgD8qDWhAnrbBwAAAgD8ayU9A0OK+wAAAgD+PjThAqBC7wAAAgD+MWiJAJUC2wAAAgD8PMA1ASXGwwAAAgD8zHPI/EqSpwAAAgD9V6cs/gdihwAAAgD+Ex6c/lg6ZwAAAgD97e5E/0NWSwAAAgD+pGng/XjKMwAAAgL+pGng/XjKMwAAAgL/bHIJAiLDDwAAAgL8qDWhAnrbBwAAAgL8ayU9A0OK+wAAAgL+PjThAqBC7wAAAgL+MWiJAJUC2wAAAgL8PMA1ASXGwwAAAgL8zHPI/EqSpwAAAgL9V6cs/gdihwAAAgL+Ex6c/lg6ZwAAAgL97e5E/0NWSwAAAgL+pGng/XjKMwAAAgD+pGng/XjKMwAAAgD8t+S8/NmJ+wAAAgD+IleA+tCZiwAAAgD++PWQ+N7JDwAAAgD/2ciQ9vQQjwAAAgD/lb+C9SB4AwAAAgD9RwGe+rv21vwAAgD9PXqa+5k0ovwAAgD+W77q+9F2IvQAAgD+tysG+Em0NPwAAgL+tysG+Em0NPwAAgL8t+S8/NmJ+wAAAgL+IleA+tCZiwAAAgL++PWQ+N7JDwAAAgL/2ciQ9vQQjwAAAgL/lb+C9SB4AwAAAgL9RwGe+rv21vwAAgL9PXqa+5k0ovwAAgL+W77q+9F2IvQAAgL+qhkBAJNqcPgAAgD+qhkBAJNqcPgAAgD9XCkJAubW4vgAAgD9clUZAvq92vwAAgD+aWE1AyGO6vwAAgD8oqVRAHXjovwAAgD9PplxAzA8HwAAAgD9sumJAjKESwAAAgD+qZmlAu2QdwAAAgL+qZmlAu2QdwAAAgL9XCkJAubW4vgAAgL9clUZAvq92vwAAgL+aWE1AyGO6vwAAgL8oqVRAHXjovwAAgL9PplxAzA8HwAAAgL9sumJAjKESwAAAgL+qZmlAu2QdwAAAgD+qZmlAu2QdwAAAgD9mxnBABIQnwAAAgD/Hp3hAT7cwwAAAgD9nhYBAnf44wAAAgD+994RA7llAwAAAgD/nqolAQ8lGwAAAgD/jno5AmkxMwAAAgD+y05NA9ONQwAAAgD9USZlAUo9UwAAAgD/K/55Ask5XwAAAgD8S96RAFSJZwAAAgD9wi6lAEuRZwAAAgD9VQ65AuyRawAAAgL9VQ65AuyRawAAAgL9mxnBABIQnwAAAgL/Hp3hAT7cwwAAAgL9nhYBAnf44wAAAgL+994RA7llAwAAAgL/nqolAQ8lGwAAAgL/jno5AmkxMwAAAgL+y05NA9ONQwAAAgL9USZlAUo9UwAAAgL/K/55Ask5XwAAAgL8S96RAFSJZwAAAgL9wi6lAEuRZwAAAgL9VQ65AuyRawAAAgD9VQ65AuyRawAAAgD9+DLlAYSZZwAAAgD+DIcJAhY5WwAAAgD9pzMlAvthSwAAAgD8GStBAlGROwAAAgD9uzNVASXtJwAAAgD9F/tpAArdDwAAAgD+L399AwRc9wAAAgD8/cORAhJ01wAAAgD9hsOhATUgtwAAAgD/yn+xAGhgkwAAAgD/xPvBA7QwawAAAgD+olPJA4o0SwAAAgD9Vw/RAu6QKwAAAgL9Vw/RAu6QKwAAAgL9+DLlAYSZZwAAAgL+DIcJAhY5WwAAAgL9pzMlAvthSwAAAgL8GStBAlGROwAAAgL9uzNVASXtJwAAAgL9F/tpAArdDwAAAgL+L399AwRc9wAAAgL8/cORAhJ01wAAAgL9hsOhATUgtwAAAgL/yn+xAGhgkwAAAgL/xPvBA7QwawAAAgL+olPJA4o0SwAAAgL9Vw/RAu6QKwAAAgD9Vw/RAu6QKwAAAgD9Vw/RARZtEQAAAgL9Vw/RARZtEQAAAgL9Vw/RARZtEQAAAgD9Vw/RARZtEQAAAgD+NpfFAYWFPQAAAgD/FN+5AQlZZQAAAgD/9eepA6HliQAAAgD80bOZAUsxqQAAAgD9sDuJAgU1yQAAAgD+jYN1AdP14QAAAgD/aYthALNx+QAAAgD8RFdNA1PSBQAAAgD9Id81A9RKEQAAAgD9/icdAd8iFQAAAgD+1S8FAXBWHQAAAgD/rvbpAo/mHQAAAgD/r/LRAo2iIQAAAgD9VA69Aoo2IQAAAgL9VA69Aoo2IQAAAgL+NpfFAYWFPQAAAgL/FN+5AQlZZQAAAgL/9eepA6HliQAAAgL80bOZAUsxqQAAAgL9sDuJAgU1yQAAAgL+jYN1AdP14QAAAgL/aYthALNx+QAAAgL8RFdNA1PSBQAAAgL9Id81A9RKEQAAAgL9/icdAd8iFQAAAgL+1S8FAXBWHQAAAgL/rvbpAo/mHQAAAgL/r/LRAo2iIQAAAgL9VA69Aoo2IQAAAgD9VA69Aoo2IQAAAgD94kKhAz1GIQAAAgD8TYKJAVJ6HQAAAgD8ocpxAM3OGQAAAgD+2xpZAa9CEQAAAgD++XZFA+7WCQAAAgD8+N4xA5SOAQAAAgD84U4dAUDR6QAAAgD+rsYJAiDFzQAAAgD8tpXxAcT9rQAAAgD/4a3RADV5iQAAAgD+2+G5AWpdbQAAAgD+qxmlARVtUQAAAgL+qxmlARVtUQAAAgL94kKhAz1GIQAAAgL8TYKJAVJ6HQAAAgL8ocpxAM3OGQAAAgL+2xpZAa9CEQAAAgL++XZFA+7WCQAAAgL8+N4xA5SOAQAAAgL84U4dAUDR6QAAAgL+rsYJAiDFzQAAAgL8tpXxAcT9rQAAAgL/4a3RADV5iQAAAgL+2+G5AWpdbQAAAgL+qxmlARVtUQAAAgD+qxmlARVtUQAAAgD8DoWFA6exGQAAAgD+UYFpAoPI3QAAAgD9eBVRAaWwnQAAAgD9hj05ARFoVQAAAgD+c/klAMbwBQAAAgD/TTEVAZ1jKPwAAgD/p60FAu4GDPwAAgD/630BAUiEtPwAAgD+qhkBAJNqcPgAAgL+qhkBAJNqcPgAAgL8DoWFA6exGQAAAgL+UYFpAoPI3QAAAgL9eBVRAaWwnQAAAgL9hj05ARFoVQAAAgL+c/klAMbwBQAAAgL/TTEVAZ1jKPwAAgL/p60FAu4GDPwAAgL/630BAUiEtPwAAgL+pGng/XjKMwAAAgL8t+S8/NmJ+wAAAgL+IleA+tCZiwAAAgL++PWQ+N7JDwAAAgL/2ciQ9vQQjwAAAgL/lb+C9SB4AwAAAgL9RwGe+rv21vwAAgL9PXqa+5k0ovwAAgL+W77q+9F2IvQAAgL+tysG+Em0NPwAAgL9Vg5JAXnLEwAAAgL/bHIJAiLDDwAAAgL8qDWhAnrbBwAAAgL8ayU9A0OK+wAAAgL+PjThAqBC7wAAAgL+MWiJAJUC2wAAAgL8PMA1ASXGwwAAAgL8zHPI/EqSpwAAAgL9V6cs/gdihwAAAgL+Ex6c/lg6ZwAAAgL97e5E/0NWSwAAAgL9Vw/RAXhKawAAAgL/PvetANlejwAAAgL8HFuNAsrSqwAAAgL+w3NpAEouwwAAAgL8NOtJAi6G1wAAAgL8gLslAHfi5wAAAgL/puL9AyI69wAAAgL9o2rVAjWXAwAAAgL+bkqtAa3zCwAAAgL+F4aBAY9PDwAAAgL88yJlAn0rEwAAAgL9Vw/RAL3kswQAAgL+rwTBBL3kswQAAgL+rwTBBos3YQAAAgL+rIQFBos3YQAAAgL9VI/tAom2uQAAAgL9VQ5NAok3gQAAAgL8n8KJAzIvfQAAAgL/AWrBA4pHdQAAAgL+P3rtAFL7aQAAAgL+W2sZA7OvWQAAAgL/VTtFAahvSQAAAgL9LO9tAjUzMQAAAgL/6n+RAVn/FQAAAgL/gfO1AxbO9QAAAgL+sf/RAz2m2QAAAgL+pmnM/os2oQAAAgL/vB6I/Xay0QAAAgL+8Bck//iK+QAAAgL/vXu4/dKrFQAAAgL+o7QpAU0LMQAAAgL9vvR9AmurRQAAAgL/NnjVASaPWQAAAgL/CkUxAYGzaQAAAgL9OlmRA30XdQAAAgL9xrH1Axi/fQAAAgL/544hAKwbgQAAAgL9LrbW+WOSpPwAAgL8kVZG+Iq4DQAAAgL+2NzG+TkktQAAAgL+oN8W84WtTQAAAgL97liQ+FV52QAAAgL9TXbg+uumJQAAAgL+WOhc/vLKXQAAAgL/Vl0M/MXegQAAAgL+qxmlARVtUQAAAgL8DoWFA6exGQAAAgL+UYFpAoPI3QAAAgL9eBVRAaWwnQAAAgL9hj05ARFoVQAAAgL+c/klAMbwBQAAAgL/TTEVAZ1jKPwAAgL/p60FAu4GDPwAAgL/630BAUiEtPwAAgL+qhkBAJNqcPgAAgL9VA69Aoo2IQAAAgL94kKhAz1GIQAAAgL8TYKJAVJ6HQAAAgL8ocpxAM3OGQAAAgL+2xpZAa9CEQAAAgL++XZFA+7WCQAAAgL8+N4xA5SOAQAAAgL84U4dAUDR6QAAAgL+rsYJAiDFzQAAAgL8tpXxAcT9rQAAAgL/4a3RADV5iQAAAgL+2+G5AWpdbQAAAgL9Vw/RARZtEQAAAgL+NpfFAYWFPQAAAgL/FN+5AQlZZQAAAgL/9eepA6HliQAAAgL80bOZAUsxqQAAAgL9sDuJAgU1yQAAAgL+jYN1AdP14QAAAgL/aYthALNx+QAAAgL8RFdNA1PSBQAAAgL9Id81A9RKEQAAAgL9/icdAd8iFQAAAgL+1S8FAXBWHQAAAgL/rvbpAo/mHQAAAgL/r/LRAo2iIQAAAgL9Vw/RAu6QKwAAAgL9VQ65AuyRawAAAgL9+DLlAYSZZwAAAgL+DIcJAhY5WwAAAgL9pzMlAvthSwAAAgL8GStBAlGROwAAAgL9uzNVASXtJwAAAgL9F/tpAArdDwAAAgL+L399AwRc9wAAAgL8/cORAhJ01wAAAgL9hsOhATUgtwAAAgL/yn+xAGhgkwAAAgL/xPvBA7QwawAAAgL+olPJA4o0SwAAAgL+qZmlAu2QdwAAAgL9mxnBABIQnwAAAgL/Hp3hAT7cwwAAAgL9nhYBAnf44wAAAgL+994RA7llAwAAAgL/nqolAQ8lGwAAAgL/jno5AmkxMwAAAgL+y05NA9ONQwAAAgL9USZlAUo9UwAAAgL/K/55Ask5XwAAAgL8S96RAFSJZwAAAgL9wi6lAEuRZwAAAgL9XCkJAubW4vgAAgL9clUZAvq92vwAAgL+aWE1AyGO6vwAAgL8oqVRAHXjovwAAgL9PplxAzA8HwAAAgL9sumJAjKESwAAAgD+pGng/XjKMwAAAgD8t+S8/NmJ+wAAAgD+IleA+tCZiwAAAgD++PWQ+N7JDwAAAgD/2ciQ9vQQjwAAAgD/lb+C9SB4AwAAAgD9RwGe+rv21vwAAgD9PXqa+5k0ovwAAgD+W77q+9F2IvQAAgD+tysG+Em0NPwAAgD9Vg5JAXnLEwAAAgD/bHIJAiLDDwAAAgD8qDWhAnrbBwAAAgD8ayU9A0OK+wAAAgD+PjThAqBC7wAAAgD+MWiJAJUC2wAAAgD8PMA1ASXGwwAAAgD8zHPI/EqSpwAAAgD9V6cs/gdihwAAAgD+Ex6c/lg6ZwAAAgD97e5E/0NWSwAAAgD9Vw/RAXhKawAAAgD/PvetANlejwAAAgD8HFuNAsrSqwAAAgD+w3NpAEouwwAAAgD8NOtJAi6G1wAAAgD8gLslAHfi5wAAAgD/puL9AyI69wAAAgD9o2rVAjWXAwAAAgD+bkqtAa3zCwAAAgD+F4aBAY9PDwAAAgD88yJlAn0rEwAAAgD9Vw/RAL3kswQAAgD+rwTBBL3kswQAAgD+rwTBBos3YQAAAgD+rIQFBos3YQAAAgD9VI/tAom2uQAAAgD9VQ5NAok3gQAAAgD8n8KJAzIvfQAAAgD/AWrBA4pHdQAAAgD+P3rtAFL7aQAAAgD+W2sZA7OvWQAAAgD/VTtFAahvSQAAAgD9LO9tAjUzMQAAAgD/6n+RAVn/FQAAAgD/gfO1AxbO9QAAAgD+sf/RAz2m2QAAAgD+pmnM/os2oQAAAgD/vB6I/Xay0QAAAgD+8Bck//iK+QAAAgD/vXu4/dKrFQAAAgD+o7QpAU0LMQAAAgD9vvR9AmurRQAAAgD/NnjVASaPWQAAAgD/CkUxAYGzaQAAAgD9OlmRA30XdQAAAgD9xrH1Axi/fQAAAgD/544hAKwbgQAAAgD9LrbW+WOSpPwAAgD8kVZG+Iq4DQAAAgD+2NzG+TkktQAAAgD+oN8W84WtTQAAAgD97liQ+FV52QAAAgD9TXbg+uumJQAAAgD+WOhc/vLKXQAAAgD/Vl0M/MXegQAAAgD+qxmlARVtUQAAAgD8DoWFA6exGQAAAgD+UYFpAoPI3QAAAgD9eBVRAaWwnQAAAgD9hj05ARFoVQAAAgD+c/klAMbwBQAAAgD/TTEVAZ1jKPwAAgD/p60FAu4GDPwAAgD/630BAUiEtPwAAgD+qhkBAJNqcPgAAgD9VA69Aoo2IQAAAgD94kKhAz1GIQAAAgD8TYKJAVJ6HQAAAgD8ocpxAM3OGQAAAgD+2xpZAa9CEQAAAgD++XZFA+7WCQAAAgD8+N4xA5SOAQAAAgD84U4dAUDR6QAAAgD+rsYJAiDFzQAAAgD8tpXxAcT9rQAAAgD/4a3RADV5iQAAAgD+2+G5AWpdbQAAAgD9Vw/RARZtEQAAAgD+NpfFAYWFPQAAAgD/FN+5AQlZZQAAAgD/9eepA6HliQAAAgD80bOZAUsxqQAAAgD9sDuJAgU1yQAAAgD+jYN1AdP14QAAAgD/aYthALNx+QAAAgD8RFdNA1PSBQAAAgD9Id81A9RKEQAAAgD9/icdAd8iFQAAAgD+1S8FAXBWHQAAAgD/rvbpAo/mHQAAAgD/r/LRAo2iIQAAAgD9Vw/RAu6QKwAAAgD9VQ65AuyRawAAAgD9+DLlAYSZZwAAAgD+DIcJAhY5WwAAAgD9pzMlAvthSwAAAgD8GStBAlGROwAAAgD9uzNVASXtJwAAAgD9F/tpAArdDwAAAgD+L399AwRc9wAAAgD8/cORAhJ01wAAAgD9hsOhATUgtwAAAgD/yn+xAGhgkwAAAgD/xPvBA7QwawAAAgD+olPJA4o0SwAAAgD+qZmlAu2QdwAAAgD9mxnBABIQnwAAAgD/Hp3hAT7cwwAAAgD9nhYBAnf44wAAAgD+994RA7llAwAAAgD/nqolAQ8lGwAAAgD/jno5AmkxMwAAAgD+y05NA9ONQwAAAgD9USZlAUo9UwAAAgD/K/55Ask5XwAAAgD8S96RAFSJZwAAAgD9wi6lAEuRZwAAAgD9XCkJAubW4vgAAgD9clUZAvq92vwAAgD+aWE1AyGO6vwAAgD8oqVRAHXjovwAAgD9PplxAzA8HwAAAgD9sumJAjKESwJR0lGJoL2gdaCBLAIWUaCKHlFKUKEsBTbANhZRoNolCwDYAAAwAAAAAAAAAAQAAAAwAAAABAAAAAgAAAA0AAAACAAAAAwAAAA0AAAAMAAAAAgAAAA4AAAADAAAABAAAAA4AAAANAAAAAwAAAA8AAAAEAAAABQAAAA8AAAAOAAAABAAAABAAAAAFAAAABgAAABAAAAAPAAAABQAAABEAAAAGAAAABwAAABEAAAAQAAAABgAAABIAAAAHAAAACAAAABIAAAARAAAABwAAABMAAAAIAAAACQAAABMAAAASAAAACAAAAAsAAAAJAAAACgAAAAsAAAATAAAACQAAACEAAAAUAAAAFQAAACEAAAAVAAAAFgAAACIAAAAWAAAAFwAAACIAAAAhAAAAFgAAACMAAAAXAAAAGAAAACMAAAAiAAAAFwAAACQAAAAYAAAAGQAAACQAAAAjAAAAGAAAACUAAAAZAAAAGgAAACUAAAAkAAAAGQAAACYAAAAaAAAAGwAAACYAAAAlAAAAGgAAACcAAAAbAAAAHAAAACcAAAAmAAAAGwAAACgAAAAcAAAAHQAAACgAAAAnAAAAHAAAACkAAAAdAAAAHgAAACkAAAAoAAAAHQAAACAAAAAeAAAAHwAAACAAAAApAAAAHgAAAC0AAAAqAAAAKwAAAC0AAAArAAAALAAAADcAAAAuAAAALwAAADcAAAAvAAAAMAAAADgAAAAwAAAAMQAAADgAAAA3AAAAMAAAADkAAAAxAAAAMgAAADkAAAA4AAAAMQAAADoAAAAyAAAAMwAAADoAAAA5AAAAMgAAADsAAAAzAAAANAAAADsAAAA6AAAAMwAAADYAAAA0AAAANQAAADYAAAA7AAAANAAAAEUAAAA8AAAAPQAAAEUAAAA9AAAAPgAAAEYAAAA+AAAAPwAAAEYAAABFAAAAPgAAAEcAAAA/AAAAQAAAAEcAAABGAAAAPwAAAEgAAABAAAAAQQAAAEgAAABHAAAAQAAAAEkAAABBAAAAQgAAAEkAAABIAAAAQQAAAEQAAABCAAAAQwAAAEQAAABJAAAAQgAAAFMAAABKAAAASwAAAFMAAABLAAAATAAAAFQAAABMAAAATQAAAFQAAABTAAAATAAAAFUAAABNAAAATgAAAFUAAABUAAAATQAAAFYAAABOAAAATwAAAFYAAABVAAAATgAAAFcAAABPAAAAUAAAAFcAAABWAAAATwAAAFIAAABQAAAAUQAAAFIAAABXAAAAUAAAAGUAAABYAAAAWQAAAGUAAABZAAAAWgAAAGYAAABaAAAAWwAAAGYAAABlAAAAWgAAAGcAAABbAAAAXAAAAGcAAABmAAAAWwAAAGgAAABcAAAAXQAAAGgAAABnAAAAXAAAAGkAAABdAAAAXgAAAGkAAABeAAAAXwAAAGkAAABoAAAAXQAAAGoAAABpAAAAXwAAAGsAAABfAAAAYAAAAGsAAABqAAAAXwAAAGwAAABgAAAAYQAAAGwAAABrAAAAYAAAAG0AAABhAAAAYgAAAG0AAABsAAAAYQAAAGQAAABiAAAAYwAAAGQAAABtAAAAYgAAAHsAAABuAAAAbwAAAHsAAABvAAAAcAAAAHwAAABwAAAAcQAAAHwAAAB7AAAAcAAAAH0AAABxAAAAcgAAAH0AAAB8AAAAcQAAAH4AAAByAAAAcwAAAH4AAAB9AAAAcgAAAH8AAABzAAAAdAAAAH8AAAB0AAAAdQAAAH8AAAB+AAAAcwAAAIAAAAB/AAAAdQAAAIEAAAB1AAAAdgAAAIEAAACAAAAAdQAAAIIAAAB2AAAAdwAAAIIAAACBAAAAdgAAAIMAAAB3AAAAeAAAAIMAAACCAAAAdwAAAHoAAAB4AAAAeQAAAHoAAACDAAAAeAAAAIcAAACEAAAAhQAAAIcAAACFAAAAhgAAAJUAAACIAAAAiQAAAJUAAACJAAAAigAAAJYAAACKAAAAiwAAAJYAAACVAAAAigAAAJcAAACLAAAAjAAAAJcAAACWAAAAiwAAAJgAAACMAAAAjQAAAJgAAACXAAAAjAAAAJkAAACNAAAAjgAAAJkAAACOAAAAjwAAAJkAAACYAAAAjQAAAJoAAACZAAAAjwAAAJsAAACPAAAAkAAAAJsAAACaAAAAjwAAAJwAAACQAAAAkQAAAJwAAACbAAAAkAAAAJ0AAACRAAAAkgAAAJ0AAACcAAAAkQAAAJQAAACSAAAAkwAAAJQAAACdAAAAkgAAAKsAAACeAAAAnwAAAKsAAACfAAAAoAAAAKwAAACgAAAAoQAAAKwAAACrAAAAoAAAAK0AAAChAAAAogAAAK0AAACsAAAAoQAAAK4AAACiAAAAowAAAK4AAACtAAAAogAAAK8AAACjAAAApAAAAK8AAACkAAAApQAAAK8AAACuAAAAowAAALAAAACvAAAApQAAALEAAAClAAAApgAAALEAAACwAAAApQAAALIAAACmAAAApwAAALIAAACxAAAApgAAALMAAACnAAAAqAAAALMAAACyAAAApwAAAKoAAACoAAAAqQAAAKoAAACzAAAAqAAAAMAAAAC0AAAAtQAAAMAAAAC1AAAAtgAAAMEAAAC2AAAAtwAAAMEAAADAAAAAtgAAAMIAAAC3AAAAuAAAAMIAAADBAAAAtwAAAMMAAAC4AAAAuQAAAMMAAADCAAAAuAAAAMQAAAC5AAAAugAAAMQAAAC6AAAAuwAAAMQAAADDAAAAuQAAAMUAAADEAAAAuwAAAMYAAAC7AAAAvAAAAMYAAADFAAAAuwAAAMcAAAC8AAAAvQAAAMcAAADGAAAAvAAAAL8AAAC9AAAAvgAAAL8AAADHAAAAvQAAANUAAADIAAAAyQAAANUAAADJAAAAygAAANYAAADKAAAAywAAANYAAADVAAAAygAAANcAAADLAAAAzAAAANcAAADWAAAAywAAANgAAADMAAAAzQAAANgAAADXAAAAzAAAANkAAADNAAAAzgAAANkAAADYAAAAzQAAANoAAADOAAAAzwAAANoAAADPAAAA0AAAANoAAADZAAAAzgAAANsAAADaAAAA0AAAANwAAADQAAAA0QAAANwAAADbAAAA0AAAAN0AAADRAAAA0gAAAN0AAADcAAAA0QAAANQAAADSAAAA0wAAANQAAADdAAAA0gAAAOEAAADeAAAA3wAAAOEAAADfAAAA4AAAAO0AAADiAAAA4wAAAO0AAADjAAAA5AAAAO4AAADkAAAA5QAAAO4AAADtAAAA5AAAAO8AAADlAAAA5gAAAO8AAADuAAAA5QAAAPAAAADmAAAA5wAAAPAAAADvAAAA5gAAAPEAAADnAAAA6AAAAPEAAADwAAAA5wAAAPIAAADoAAAA6QAAAPIAAADxAAAA6AAAAPMAAADpAAAA6gAAAPMAAADyAAAA6QAAAOwAAADqAAAA6wAAAOwAAADzAAAA6gAAAAEBAAD0AAAA9QAAAAEBAAD1AAAA9gAAAAIBAAD2AAAA9wAAAAIBAAABAQAA9gAAAAMBAAD3AAAA+AAAAAMBAAACAQAA9wAAAAQBAAD4AAAA+QAAAAQBAAADAQAA+AAAAAUBAAD5AAAA+gAAAAUBAAAEAQAA+QAAAAYBAAD6AAAA+wAAAAYBAAAFAQAA+gAAAAcBAAD7AAAA/AAAAAcBAAAGAQAA+wAAAAgBAAD8AAAA/QAAAAgBAAAHAQAA/AAAAAkBAAD9AAAA/gAAAAkBAAAIAQAA/QAAAAABAAD+AAAA/wAAAAABAAAJAQAA/gAAABkBAAAKAQAACwEAABkBAAALAQAADAEAABoBAAAMAQAADQEAABoBAAAZAQAADAEAABsBAAANAQAADgEAABsBAAAaAQAADQEAABwBAAAOAQAADwEAABwBAAAbAQAADgEAAB0BAAAPAQAAEAEAAB0BAAAcAQAADwEAAB4BAAAQAQAAEQEAAB4BAAAdAQAAEAEAAB8BAAARAQAAEgEAAB8BAAAeAQAAEQEAACABAAASAQAAEwEAACABAAAfAQAAEgEAACEBAAATAQAAFAEAACEBAAAgAQAAEwEAACIBAAAUAQAAFQEAACIBAAAhAQAAFAEAACMBAAAVAQAAFgEAACMBAAAiAQAAFQEAABgBAAAWAQAAFwEAABgBAAAjAQAAFgEAADEBAAAkAQAAJQEAADEBAAAlAQAAJgEAADIBAAAmAQAAJwEAADIBAAAxAQAAJgEAADMBAAAnAQAAKAEAADMBAAAyAQAAJwEAADQBAAAoAQAAKQEAADQBAAAzAQAAKAEAADUBAAApAQAAKgEAADUBAAA0AQAAKQEAADYBAAAqAQAAKwEAADYBAAA1AQAAKgEAADcBAAArAQAALAEAADcBAAA2AQAAKwEAADgBAAAsAQAALQEAADgBAAA3AQAALAEAADkBAAAtAQAALgEAADkBAAA4AQAALQEAADABAAAuAQAALwEAADABAAA5AQAALgEAAD0BAAA6AQAAOwEAAD0BAAA7AQAAPAEAAEgBAAA+AQAAPwEAAEgBAAA/AQAAQAEAAEkBAABAAQAAQQEAAEkBAABIAQAAQAEAAEoBAABBAQAAQgEAAEoBAABJAQAAQQEAAEsBAABCAQAAQwEAAEsBAABKAQAAQgEAAEwBAABDAQAARAEAAEwBAABLAQAAQwEAAE0BAABEAQAARQEAAE0BAABMAQAARAEAAEcBAABFAQAARgEAAEcBAABNAQAARQEAAF0BAABOAQAATwEAAF0BAABPAQAAUAEAAF4BAABQAQAAUQEAAF4BAABdAQAAUAEAAF8BAABRAQAAUgEAAF8BAABeAQAAUQEAAGABAABSAQAAUwEAAGABAABfAQAAUgEAAGEBAABTAQAAVAEAAGEBAABgAQAAUwEAAGIBAABUAQAAVQEAAGIBAABhAQAAVAEAAGMBAABVAQAAVgEAAGMBAABiAQAAVQEAAGQBAABWAQAAVwEAAGQBAABjAQAAVgEAAGUBAABXAQAAWAEAAGUBAABkAQAAVwEAAGYBAABYAQAAWQEAAGYBAABlAQAAWAEAAGcBAABZAQAAWgEAAGcBAABmAQAAWQEAAFwBAABaAQAAWwEAAFwBAABnAQAAWgEAAGoBAADfAQAA4AEAAGsBAADeAQAA3wEAAGsBAADfAQAAagEAAGkBAADgAQAA4QEAAGkBAABqAQAA4AEAAGwBAADdAQAA3gEAAGwBAADeAQAAawEAAGgBAABpAQAA4QEAAGgBAADhAQAAzgEAAG0BAADcAQAA3QEAAG0BAADdAQAAbAEAAHsBAADOAQAAzwEAAHsBAABoAQAAzgEAAG4BAADbAQAA3AEAAG4BAADcAQAAbQEAAHoBAADPAQAA0AEAAHoBAAB7AQAAzwEAAG8BAADbAQAAbgEAAHkBAADQAQAA0QEAAHkBAAB6AQAA0AEAAHABAADaAQAA2wEAAHABAADbAQAAbwEAAHEBAADZAQAA2gEAAHEBAADaAQAAcAEAAHgBAADRAQAA0gEAAHgBAADSAQAA0wEAAHgBAAB5AQAA0QEAAHIBAADZAQAAcQEAAHMBAADYAQAA2QEAAHMBAADZAQAAcgEAAHcBAADTAQAA1AEAAHcBAADUAQAA1QEAAHcBAAB4AQAA0wEAAHQBAADnAQAA2AEAAHQBAADYAQAAcwEAAP8BAADmAQAA5wEAAP8BAADnAQAAdAEAAHYBAADVAQAA1gEAAHYBAADWAQAA1wEAAHYBAAB3AQAA1QEAAAACAADlAQAA5gEAAAACAADmAQAA/wEAAAECAADkAQAA5QEAAAECAADlAQAAAAIAAAICAADjAQAA5AEAAAICAADkAQAAAQIAAHUBAADXAQAAzQEAAHUBAAB2AQAA1wEAAAMCAADjAQAAAgIAAAQCAADiAQAA4wEAAAQCAADjAQAAAwIAAHwBAADNAQAAwwEAAHwBAAB1AQAAzQEAAAUCAADtAQAA4gEAAAUCAADiAQAABAIAAAYCAADtAQAABQIAAIYBAAB8AQAAwwEAAIYBAADDAQAAxAEAAPUBAADsAQAA7QEAAPUBAADtAQAABgIAAPYBAADsAQAA9QEAAOsBAADsAQAA9gEAAIUBAACGAQAAxAEAAIUBAADEAQAAxQEAAPcBAADrAQAA9gEAAOoBAADrAQAA9wEAAOoBAAD3AQAA+AEAAIQBAACFAQAAxQEAAIQBAADFAQAAxgEAAIMBAADGAQAAxwEAAIMBAACEAQAAxgEAAOkBAADqAQAA+AEAAOkBAAD4AQAA+QEAAIIBAACDAQAAxwEAAIIBAADHAQAAyAEAAIEBAACCAQAAyAEAAIEBAADIAQAAyQEAAOgBAADpAQAA+QEAAOgBAAD5AQAA+gEAAIABAACBAQAAyQEAAIABAADJAQAAygEAAH8BAACAAQAAygEAAH8BAADKAQAAywEAAPMBAADoAQAA+gEAAH4BAAB/AQAAywEAAH4BAADLAQAAzAEAAH0BAAB+AQAAzAEAAH0BAADMAQAAuQEAAJIBAAB9AQAAuQEAALoBAACSAQAAuQEAAPIBAAD6AQAA+wEAAPIBAADzAQAA+gEAAJEBAACSAQAAugEAAJABAACRAQAAugEAAPEBAADyAQAA+wEAAPEBAAD7AQAA/AEAALsBAACPAQAAkAEAALsBAACQAQAAugEAAPABAADxAQAA/AEAAPABAAD8AQAA/QEAALwBAACOAQAAjwEAALwBAACPAQAAuwEAAO8BAADwAQAA/QEAAO8BAAD9AQAA/gEAAO8BAAD+AQAA9AEAAL0BAACNAQAAjgEAAL0BAACOAQAAvAEAAO4BAADvAQAA9AEAAL4BAACLAQAAjAEAAL4BAACMAQAAjQEAAL4BAACNAQAAvQEAAL8BAACKAQAAiwEAAL8BAACLAQAAvgEAAMABAACJAQAAigEAAMABAACKAQAAvwEAAMEBAACIAQAAiQEAAMEBAACJAQAAwAEAAMIBAACIAQAAwQEAAMIBAACHAQAAiAEAALABAACHAQAAwgEAALABAACcAQAAhwEAALEBAACcAQAAsAEAALEBAACaAQAAmwEAALEBAACbAQAAnAEAAK8BAACdAQAAngEAAK8BAAClAQAAnQEAAK4BAACvAQAAngEAALIBAACaAQAAsQEAALIBAACYAQAAmQEAALIBAACZAQAAmgEAAK0BAACuAQAAngEAAK0BAACeAQAAnwEAALMBAACYAQAAsgEAALMBAACXAQAAmAEAAKwBAACtAQAAnwEAAKwBAACfAQAAoAEAALQBAACWAQAAlwEAALQBAACXAQAAswEAAKsBAACsAQAAoAEAAKsBAACgAQAAoQEAALUBAACVAQAAlgEAALUBAACWAQAAtAEAAKoBAACrAQAAoQEAALYBAACVAQAAtQEAALYBAACUAQAAlQEAAKkBAACqAQAAoQEAAKkBAAChAQAAogEAALcBAACTAQAAlAEAALcBAACUAQAAtgEAAKgBAACpAQAAogEAAKgBAACiAQAAowEAALgBAACTAQAAtwEAAKcBAACjAQAApAEAAKcBAACoAQAAowEAAKYBAACkAQAAkwEAAKYBAACnAQAApAEAAKYBAACTAQAAuAEAAAkCAAB/AgAAfgIAAAoCAAB+AgAAfQIAAAoCAAAJAgAAfgIAAAgCAACAAgAAfwIAAAgCAAB/AgAACQIAAAsCAAB9AgAAfAIAAAsCAAAKAgAAfQIAAAcCAACAAgAACAIAAAcCAABtAgAAgAIAAAwCAAB8AgAAewIAAAwCAAALAgAAfAIAABoCAABuAgAAbQIAABoCAABtAgAABwIAAA0CAAB7AgAAegIAAA0CAAAMAgAAewIAABkCAABvAgAAbgIAABkCAABuAgAAGgIAAA4CAAANAgAAegIAABgCAABwAgAAbwIAABgCAABvAgAAGQIAAA8CAAB6AgAAeQIAAA8CAAAOAgAAegIAABACAAB5AgAAeAIAABACAAAPAgAAeQIAABcCAABxAgAAcAIAABcCAAByAgAAcQIAABcCAABwAgAAGAIAABECAAAQAgAAeAIAABICAAB4AgAAdwIAABICAAARAgAAeAIAABYCAABzAgAAcgIAABYCAAB0AgAAcwIAABYCAAByAgAAFwIAABMCAAB3AgAAhgIAABMCAAASAgAAdwIAAJ4CAACGAgAAhQIAAJ4CAAATAgAAhgIAABUCAAB1AgAAdAIAABUCAAB2AgAAdQIAABUCAAB0AgAAFgIAAJ8CAACFAgAAhAIAAJ8CAACeAgAAhQIAAKACAACEAgAAgwIAAKACAACfAgAAhAIAAKECAACDAgAAggIAAKECAACgAgAAgwIAABQCAABsAgAAdgIAABQCAAB2AgAAFQIAAKICAAChAgAAggIAAKMCAACCAgAAgQIAAKMCAACiAgAAggIAABsCAABiAgAAbAIAABsCAABsAgAAFAIAAKQCAACBAgAAjAIAAKQCAACjAgAAgQIAAKUCAACkAgAAjAIAACUCAABiAgAAGwIAACUCAABjAgAAYgIAAJQCAACMAgAAiwIAAJQCAAClAgAAjAIAAJUCAACUAgAAiwIAAIoCAACVAgAAiwIAACQCAABjAgAAJQIAACQCAABkAgAAYwIAAJYCAACVAgAAigIAAIkCAACWAgAAigIAAIkCAACXAgAAlgIAACMCAABkAgAAJAIAACMCAABlAgAAZAIAACICAABmAgAAZQIAACICAABlAgAAIwIAAIgCAACXAgAAiQIAAIgCAACYAgAAlwIAACECAABmAgAAIgIAACECAABnAgAAZgIAACACAABnAgAAIQIAACACAABoAgAAZwIAAIcCAACYAgAAiAIAAIcCAACZAgAAmAIAAB8CAABoAgAAIAIAAB8CAABpAgAAaAIAAB4CAABpAgAAHwIAAB4CAABqAgAAaQIAAJICAACZAgAAhwIAAB0CAABqAgAAHgIAAB0CAABrAgAAagIAABwCAABrAgAAHQIAABwCAABYAgAAawIAADECAABYAgAAHAIAAFkCAABYAgAAMQIAAJECAACaAgAAmQIAAJECAACZAgAAkgIAADACAABZAgAAMQIAAC8CAABZAgAAMAIAAJACAACaAgAAkQIAAJACAACbAgAAmgIAAFoCAAAvAgAALgIAAFoCAABZAgAALwIAAI8CAACbAgAAkAIAAI8CAACcAgAAmwIAAFsCAAAuAgAALQIAAFsCAABaAgAALgIAAI4CAACcAgAAjwIAAI4CAACdAgAAnAIAAI4CAACTAgAAnQIAAFwCAAAtAgAALAIAAFwCAABbAgAALQIAAI0CAACTAgAAjgIAAF0CAAArAgAAKgIAAF0CAAAsAgAAKwIAAF0CAABcAgAALAIAAF4CAAAqAgAAKQIAAF4CAABdAgAAKgIAAF8CAAApAgAAKAIAAF8CAABeAgAAKQIAAGACAAAoAgAAJwIAAGACAABfAgAAKAIAAGECAABgAgAAJwIAAGECAAAnAgAAJgIAAE8CAABhAgAAJgIAAE8CAAAmAgAAOwIAAFACAABPAgAAOwIAAFACAAA6AgAAOQIAAFACAAA7AgAAOgIAAE4CAAA9AgAAPAIAAE4CAAA8AgAARAIAAE0CAAA9AgAATgIAAFECAABQAgAAOQIAAFECAAA4AgAANwIAAFECAAA5AgAAOAIAAEwCAAA9AgAATQIAAEwCAAA+AgAAPQIAAFICAABRAgAANwIAAFICAAA3AgAANgIAAEsCAAA+AgAATAIAAEsCAAA/AgAAPgIAAFMCAAA2AgAANQIAAFMCAABSAgAANgIAAEoCAAA/AgAASwIAAEoCAABAAgAAPwIAAFQCAAA1AgAANAIAAFQCAABTAgAANQIAAEkCAABAAgAASgIAAFUCAABUAgAANAIAAFUCAAA0AgAAMwIAAEgCAABAAgAASQIAAEgCAABBAgAAQAIAAFYCAAAzAgAAMgIAAFYCAABVAgAAMwIAAEcCAABBAgAASAIAAEcCAABCAgAAQQIAAFcCAABWAgAAMgIAAEYCAABDAgAAQgIAAEYCAABCAgAARwIAAEUCAAAyAgAAQwIAAEUCAABDAgAARgIAAEUCAABXAgAAMgIAALICAACmAgAApwIAALICAACnAgAAqAIAALMCAACoAgAAqQIAALMCAACyAgAAqAIAALQCAACpAgAAqgIAALQCAACzAgAAqQIAALUCAACqAgAAqwIAALUCAAC0AgAAqgIAALYCAACrAgAArAIAALYCAAC1AgAAqwIAALcCAACsAgAArQIAALcCAAC2AgAArAIAALgCAACtAgAArgIAALgCAAC3AgAArQIAALkCAACuAgAArwIAALkCAAC4AgAArgIAALECAACvAgAAsAIAALECAAC5AgAArwIAAMgCAAC6AgAAuwIAAMgCAAC7AgAAvAIAAMkCAAC8AgAAvQIAAMkCAADIAgAAvAIAAMoCAAC9AgAAvgIAAMoCAADJAgAAvQIAAMsCAAC+AgAAvwIAAMsCAADKAgAAvgIAAMwCAAC/AgAAwAIAAMwCAADLAgAAvwIAAM0CAADAAgAAwQIAAM0CAADMAgAAwAIAAM4CAADBAgAAwgIAAM4CAADCAgAAwwIAAM4CAADNAgAAwQIAAM8CAADOAgAAwwIAANACAADDAgAAxAIAANACAADPAgAAwwIAANECAADEAgAAxQIAANECAADQAgAAxAIAAMcCAADFAgAAxgIAAMcCAADRAgAAxQIAAN8CAADSAgAA0wIAAN8CAADTAgAA1AIAAOACAADUAgAA1QIAAOACAADfAgAA1AIAAOECAADVAgAA1gIAAOECAADgAgAA1QIAAOICAADWAgAA1wIAAOICAADhAgAA1gIAAOMCAADXAgAA2AIAAOMCAADiAgAA1wIAAOQCAADYAgAA2QIAAOQCAADjAgAA2AIAAOUCAADZAgAA2gIAAOUCAADaAgAA2wIAAOUCAADkAgAA2QIAAOYCAADlAgAA2wIAAOcCAADbAgAA3AIAAOcCAADmAgAA2wIAAN4CAADcAgAA3QIAAN4CAADnAgAA3AIAAOsCAADoAgAA6QIAAOsCAADpAgAA6gIAAO8CAADsAgAA7QIAAO8CAADtAgAA7gIAAPMCAADwAgAA8QIAAPMCAADxAgAA8gIAAPcCAAD0AgAA9QIAAPcCAAD1AgAA9gIAAPsCAAD4AgAA+QIAAPsCAAD5AgAA+gIAAAoDAAD8AgAA/QIAAAoDAAD9AgAA/gIAAAsDAAD+AgAA/wIAAAsDAAAKAwAA/gIAAAwDAAD/AgAAAAMAAAwDAAALAwAA/wIAAA0DAAAAAwAAAQMAAA0DAAAMAwAAAAMAAA4DAAABAwAAAgMAAA4DAAANAwAAAQMAAA8DAAACAwAAAwMAAA8DAAAOAwAAAgMAABADAAADAwAABAMAABADAAAPAwAAAwMAABEDAAAEAwAABQMAABEDAAAFAwAABgMAABEDAAAQAwAABAMAABIDAAARAwAABgMAABMDAAAGAwAABwMAABMDAAASAwAABgMAAAkDAAAHAwAACAMAAAkDAAATAwAABwMAACIDAAAUAwAAFQMAACIDAAAVAwAAFgMAACMDAAAWAwAAFwMAACMDAAAiAwAAFgMAACQDAAAXAwAAGAMAACQDAAAYAwAAGQMAACQDAAAjAwAAFwMAACUDAAAkAwAAGQMAACYDAAAZAwAAGgMAACYDAAAlAwAAGQMAACcDAAAaAwAAGwMAACcDAAAmAwAAGgMAACgDAAAbAwAAHAMAACgDAAAcAwAAHQMAACgDAAAnAwAAGwMAACkDAAAoAwAAHQMAACoDAAAdAwAAHgMAACoDAAApAwAAHQMAACsDAAAeAwAAHwMAACsDAAAqAwAAHgMAACEDAAAfAwAAIAMAACEDAAArAwAAHwMAADgDAAAsAwAALQMAADgDAAAtAwAALgMAADkDAAAuAwAALwMAADkDAAA4AwAALgMAADoDAAAvAwAAMAMAADoDAAA5AwAALwMAADsDAAAwAwAAMQMAADsDAAA6AwAAMAMAADwDAAAxAwAAMgMAADwDAAAyAwAAMwMAADwDAAA7AwAAMQMAAD0DAAA8AwAAMwMAAD4DAAAzAwAANAMAAD4DAAA9AwAAMwMAAD8DAAA0AwAANQMAAD8DAAA+AwAANAMAADcDAAA1AwAANgMAADcDAAA/AwAANQMAAEoDAABAAwAAQQMAAEoDAABBAwAAQgMAAEsDAABCAwAAQwMAAEsDAABKAwAAQgMAAEwDAABDAwAARAMAAEwDAABLAwAAQwMAAE0DAABEAwAARQMAAE0DAABMAwAARAMAAE4DAABFAwAARgMAAE4DAABNAwAARQMAAE8DAABGAwAARwMAAE8DAABOAwAARgMAAEkDAABHAwAASAMAAEkDAABPAwAARwMAAF8DAABQAwAAUQMAAF8DAABRAwAAUgMAAGADAABSAwAAUwMAAGADAABfAwAAUgMAAGEDAABTAwAAVAMAAGEDAABgAwAAUwMAAGIDAABUAwAAVQMAAGIDAABhAwAAVAMAAGMDAABVAwAAVgMAAGMDAABiAwAAVQMAAGQDAABWAwAAVwMAAGQDAABjAwAAVgMAAGUDAABXAwAAWAMAAGUDAABkAwAAVwMAAGYDAABYAwAAWQMAAGYDAABlAwAAWAMAAGcDAABZAwAAWgMAAGcDAABmAwAAWQMAAGgDAABaAwAAWwMAAGgDAABnAwAAWgMAAGkDAABbAwAAXAMAAGkDAABoAwAAWwMAAF4DAABcAwAAXQMAAF4DAABpAwAAXAMAAHoDAABqAwAAawMAAHoDAABrAwAAbAMAAHsDAABsAwAAbQMAAHsDAAB6AwAAbAMAAHwDAABtAwAAbgMAAHwDAAB7AwAAbQMAAH0DAABuAwAAbwMAAH0DAAB8AwAAbgMAAH4DAABvAwAAcAMAAH4DAAB9AwAAbwMAAH8DAABwAwAAcQMAAH8DAAB+AwAAcAMAAIADAABxAwAAcgMAAIADAAB/AwAAcQMAAIEDAAByAwAAcwMAAIEDAACAAwAAcgMAAIIDAABzAwAAdAMAAIIDAACBAwAAcwMAAIMDAAB0AwAAdQMAAIMDAACCAwAAdAMAAIQDAAB1AwAAdgMAAIQDAACDAwAAdQMAAIUDAAB2AwAAdwMAAIUDAACEAwAAdgMAAHkDAAB3AwAAeAMAAHkDAACFAwAAdwMAAIkDAACGAwAAhwMAAIkDAACHAwAAiAMAAJsDAACKAwAAiwMAAJsDAACLAwAAjAMAAJwDAACMAwAAjQMAAJwDAACbAwAAjAMAAJ0DAACNAwAAjgMAAJ0DAACcAwAAjQMAAJ4DAACOAwAAjwMAAJ4DAACdAwAAjgMAAJ8DAACPAwAAkAMAAJ8DAACeAwAAjwMAAKADAACQAwAAkQMAAKADAACfAwAAkAMAAKEDAACRAwAAkgMAAKEDAACgAwAAkQMAAKIDAACSAwAAkwMAAKIDAAChAwAAkgMAAKMDAACTAwAAlAMAAKMDAACiAwAAkwMAAKQDAACUAwAAlQMAAKQDAACjAwAAlAMAAKUDAACVAwAAlgMAAKUDAACkAwAAlQMAAKYDAACWAwAAlwMAAKYDAAClAwAAlgMAAKcDAACXAwAAmAMAAKcDAACmAwAAlwMAAJoDAACYAwAAmQMAAJoDAACnAwAAmAMAALcDAACoAwAAqQMAALcDAACpAwAAqgMAALgDAACqAwAAqwMAALgDAAC3AwAAqgMAALkDAACrAwAArAMAALkDAAC4AwAAqwMAALoDAACsAwAArQMAALoDAAC5AwAArAMAALsDAACtAwAArgMAALsDAAC6AwAArQMAALwDAACuAwAArwMAALwDAAC7AwAArgMAAL0DAACvAwAAsAMAAL0DAAC8AwAArwMAAL4DAACwAwAAsQMAAL4DAAC9AwAAsAMAAL8DAACxAwAAsgMAAL8DAAC+AwAAsQMAAMADAACyAwAAswMAAMADAAC/AwAAsgMAAMEDAACzAwAAtAMAAMEDAADAAwAAswMAALYDAAC0AwAAtQMAALYDAADBAwAAtAMAAM4DAADCAwAAwwMAAM4DAADDAwAAxAMAAM8DAADEAwAAxQMAAM8DAADOAwAAxAMAANADAADFAwAAxgMAANADAADPAwAAxQMAANEDAADGAwAAxwMAANEDAADQAwAAxgMAANIDAADHAwAAyAMAANIDAADRAwAAxwMAANMDAADIAwAAyQMAANMDAADSAwAAyAMAANQDAADJAwAAygMAANQDAADTAwAAyQMAANUDAADKAwAAywMAANUDAADLAwAAzAMAANUDAADUAwAAygMAAM0DAADVAwAAzAMAAEwEAADnAwAA6AMAAEwEAADoAwAA6QMAAE0EAADmAwAA5wMAAE0EAADnAwAATAQAAEsEAADpAwAA6gMAAEsEAABMBAAA6QMAAE4EAADkAwAA5QMAAE4EAADlAwAA5gMAAE4EAADmAwAATQQAAEoEAADqAwAA1gMAAEoEAABLBAAA6gMAAE8EAADjAwAA5AMAAE8EAADkAwAATgQAAFsEAADWAwAA1wMAAFsEAABKBAAA1gMAAFAEAADiAwAA4wMAAFAEAADjAwAATwQAAFoEAABbBAAA1wMAAFoEAADXAwAA2AMAAFEEAADhAwAA4gMAAFEEAADiAwAAUAQAAFIEAADgAwAA4QMAAFIEAADhAwAAUQQAAFkEAADYAwAA2QMAAFkEAADZAwAA2gMAAFkEAABaBAAA2AMAAFMEAADgAwAAUgQAAFMEAAD0AwAA9QMAAFMEAAD1AwAA4AMAAFgEAADaAwAA2wMAAFgEAABZBAAA2gMAAFQEAADzAwAA9AMAAFQEAAD0AwAAUwQAAFUEAADyAwAA8wMAAFUEAADzAwAAVAQAAD0EAADxAwAA8gMAAD0EAADyAwAAVQQAAFcEAADbAwAA3AMAAFcEAABYBAAA2wMAAD4EAADxAwAAPQQAAD4EAADvAwAA8AMAAD4EAADwAwAA8QMAAFYEAADcAwAA3QMAAFYEAADdAwAA3gMAAFYEAABXBAAA3AMAAD8EAADtAwAA7gMAAD8EAADuAwAA7wMAAD8EAADvAwAAPgQAAEAEAADsAwAA7QMAAEAEAADtAwAAPwQAAEEEAADsAwAAQAQAAEEEAADrAwAA7AMAACEEAADeAwAA3wMAACEEAABWBAAA3gMAAEIEAADrAwAAQQQAACAEAAAhBAAA3wMAACAEAADfAwAAEAQAAEMEAADrAwAAQgQAAEQEAADrAwAAQwQAAB8EAAAgBAAAEAQAAEUEAADrAwAARAQAAEYEAADrAwAARQQAAB4EAAAfBAAAEAQAAB4EAAAQBAAAEQQAAEcEAADrAwAARgQAAEgEAADrAwAARwQAAB0EAAARBAAAEgQAAB0EAAAeBAAAEQQAAEkEAADrAwAASAQAADwEAAD3AwAA6wMAADwEAADrAwAASQQAABwEAAASBAAAEwQAABwEAAAdBAAAEgQAABsEAAATBAAAFAQAABsEAAAcBAAAEwQAABoEAAAUBAAAFQQAABoEAAAbBAAAFAQAABkEAAAVBAAAFgQAABkEAAAWBAAAFwQAABkEAAAaBAAAFQQAABgEAAAZBAAAFwQAABgEAAAXBAAABQQAAC0EAAAYBAAABQQAAC0EAAAFBAAABgQAACwEAAAtBAAABgQAAAcEAAAsBAAABgQAACsEAAAsBAAABwQAAAgEAAArBAAABwQAAAkEAAArBAAACAQAAAkEAAAqBAAAKwQAAAoEAAAqBAAACQQAAAoEAAApBAAAKgQAAAsEAAApBAAACgQAAAsEAAAoBAAAKQQAAAwEAAAoBAAACwQAAA0EAAAoBAAADAQAAA0EAAAnBAAAKAQAAA4EAAAnBAAADQQAAA4EAAAmBAAAJwQAAA8EAAAmBAAADgQAAA8EAAAlBAAAJgQAAPsDAAAlBAAADwQAAPsDAAAkBAAAJQQAAPwDAAAjBAAAJAQAAPwDAAAkBAAA+wMAAP0DAAAjBAAA/AMAAP0DAAAiBAAAIwQAAP4DAAA7BAAAIgQAAP4DAAAiBAAA/QMAAP8DAAA7BAAA/gMAAP8DAAA6BAAAOwQAAAAEAAA6BAAA/wMAAAEEAAA6BAAAAAQAAAEEAAA5BAAAOgQAAPoDAAAuBAAALwQAAPoDAAAvBAAAMAQAAPoDAAAwBAAAMQQAAPoDAAAxBAAAMgQAAPoDAAAyBAAAMwQAAPoDAAAzBAAANAQAAPoDAAA0BAAANQQAAPoDAAA1BAAANgQAAAIEAAA5BAAAAQQAAAIEAAA4BAAAOQQAAAQEAAD6AwAANgQAAAQEAAA2BAAANwQAAAMEAAA3BAAAOAQAAAMEAAA4BAAAAgQAAAMEAAAEBAAANwQAAPgDAAA8BAAALgQAAPgDAAD6AwAA+QMAAPgDAAAuBAAA+gMAAPgDAAD3AwAAPAQAAOsDAAD3AwAA9gMAANIEAABuBAAAbQQAANIEAABvBAAAbgQAANMEAABtBAAAbAQAANMEAADSBAAAbQQAANEEAABwBAAAbwQAANEEAABvBAAA0gQAANQEAABrBAAAagQAANQEAABsBAAAawQAANQEAADTBAAAbAQAANAEAABcBAAAcAQAANAEAABwBAAA0QQAANUEAABqBAAAaQQAANUEAADUBAAAagQAAOEEAABdBAAAXAQAAOEEAABcBAAA0AQAANYEAABpBAAAaAQAANYEAADVBAAAaQQAAOAEAABdBAAA4QQAAOAEAABeBAAAXQQAANcEAABoBAAAZwQAANcEAADWBAAAaAQAANgEAABnBAAAZgQAANgEAADXBAAAZwQAAN8EAABfBAAAXgQAAN8EAABgBAAAXwQAAN8EAABeBAAA4AQAANkEAADYBAAAZgQAANkEAAB7BAAAegQAANkEAABmBAAAewQAAN4EAABhBAAAYAQAAN4EAABgBAAA3wQAANoEAAB6BAAAeQQAANoEAADZBAAAegQAANsEAAB5BAAAeAQAANsEAADaBAAAeQQAAMMEAAB4BAAAdwQAAMMEAADbBAAAeAQAAN0EAABiBAAAYQQAAN0EAABhBAAA3gQAAMQEAADDBAAAdwQAAMQEAAB2BAAAdQQAAMQEAAB3BAAAdgQAANwEAABjBAAAYgQAANwEAABkBAAAYwQAANwEAABiBAAA3QQAAMUEAAB0BAAAcwQAAMUEAAB1BAAAdAQAAMUEAADEBAAAdQQAAMYEAABzBAAAcgQAAMYEAADFBAAAcwQAAMcEAADGBAAAcgQAAMcEAAByBAAAcQQAAKcEAABlBAAAZAQAAKcEAABkBAAA3AQAAMgEAADHBAAAcQQAAKYEAABlBAAApwQAAKYEAACWBAAAZQQAAMkEAADIBAAAcQQAAMoEAADJBAAAcQQAAKUEAACWBAAApgQAAMsEAADKBAAAcQQAAMwEAADLBAAAcQQAAKQEAACWBAAApQQAAKQEAACXBAAAlgQAAM0EAADMBAAAcQQAAM4EAADNBAAAcQQAAKMEAACYBAAAlwQAAKMEAACXBAAApAQAAM8EAADOBAAAcQQAAMIEAABxBAAAfQQAAMIEAADPBAAAcQQAAKIEAACZBAAAmAQAAKIEAACYBAAAowQAAKEEAACaBAAAmQQAAKEEAACZBAAAogQAAKAEAACbBAAAmgQAAKAEAACaBAAAoQQAAJ8EAACcBAAAmwQAAJ8EAACdBAAAnAQAAJ8EAACbBAAAoAQAAJ4EAACdBAAAnwQAAJ4EAACLBAAAnQQAALMEAACLBAAAngQAALMEAACMBAAAiwQAALIEAACMBAAAswQAAI0EAACMBAAAsgQAALEEAACNBAAAsgQAAI4EAACNBAAAsQQAAI8EAACOBAAAsQQAAI8EAACxBAAAsAQAAJAEAACPBAAAsAQAAJAEAACwBAAArwQAAJEEAACQBAAArwQAAJEEAACvBAAArgQAAJIEAACRBAAArgQAAJMEAACSBAAArgQAAJMEAACuBAAArQQAAJQEAACTBAAArQQAAJQEAACtBAAArAQAAJUEAACUBAAArAQAAJUEAACsBAAAqwQAAIEEAACVBAAAqwQAAIEEAACrBAAAqgQAAIIEAACqBAAAqQQAAIIEAACBBAAAqgQAAIMEAACCBAAAqQQAAIMEAACpBAAAqAQAAIQEAACoBAAAwQQAAIQEAACDBAAAqAQAAIUEAACEBAAAwQQAAIUEAADBBAAAwAQAAIYEAACFBAAAwAQAAIcEAACGBAAAwAQAAIcEAADABAAAvwQAAIAEAAC1BAAAtAQAAIAEAAC2BAAAtQQAAIAEAAC3BAAAtgQAAIAEAAC4BAAAtwQAAIAEAAC5BAAAuAQAAIAEAAC6BAAAuQQAAIAEAAC7BAAAugQAAIAEAAC8BAAAuwQAAIgEAACHBAAAvwQAAIgEAAC/BAAAvgQAAIoEAAC8BAAAgAQAAIoEAAC9BAAAvAQAAIkEAAC+BAAAvQQAAIkEAACIBAAAvgQAAIkEAAC9BAAAigQAAH4EAAC0BAAAwgQAAH4EAAB/BAAAgAQAAH4EAACABAAAtAQAAH4EAADCBAAAfQQAAHEEAAB8BAAAfQQAAJR0lGJoOmgdaCBLAIWUaCKHlFKUKEsBTeIESwOGlGgqiUKYOgAAAAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAMkSur3y8H4/AAAAAEjwOL5Ryns/AAAAAPWGiL4Vu3Y/AAAAABY5tr7cPG8/AAAAAMlU5L41ImU/AAAAALV+Br/V0lk/AAAAAOr8F7/K/00/AAAAAIm7IL9PQEc/AAAAAOkeKb/DLkA/AAAAAOkeKb/DLkA/AAAAAMkSur3y8H4/AAAAAEjwOL5Ryns/AAAAAPWGiL4Vu3Y/AAAAABY5tr7cPG8/AAAAAMlU5L41ImU/AAAAALV+Br/V0lk/AAAAAOr8F7/K/00/AAAAAIm7IL9PQEc/AAAAAOkeKb/DLkA/AAAAAOkeKb/DLkA/AAAAAB2DOb+BaTA/AAAAAEcDSb8khh4/AAAAAC8ZV7/Mzwo/AAAAAPNRY79meOs+AAAAAONebb/Cvb8+AAAAAAofdb9oq5M+AAAAAN+eer970VA+AAAAAGYPfr+apPs9AAAAAAlMf79mq5c9AAAAAGvnf7+rWuA8AAAAAGvnf7+rWuA8AAAAAB2DOb+BaTA/AAAAAEcDSb8khh4/AAAAAC8ZV7/Mzwo/AAAAAPNRY79meOs+AAAAAONebb/Cvb8+AAAAAAofdb9oq5M+AAAAAN+eer970VA+AAAAAGYPfr+apPs9AAAAAAlMf79mq5c9AAAAAAAAAIAAAIA/AAAAAAAAAIAAAIA/AAAAAAAAAIAAAIA/AAAAAAAAAIAAAIA/AAAAAEv9fz928BS8AAAAAEv9fz928BS8AAAAAJa4fj/sdcy9AAAAAL8rez8E9UW+AAAAAHA5dT+v+5K+AAAAAD/1bD+oxcG+AAAAAC7YYj9OTO2+AAAAAIYmVz8duwq/AAAAAIYmVz8duwq/AAAAAJa4fj/sdcy9AAAAAL8rez8E9UW+AAAAAHA5dT+v+5K+AAAAAD/1bD+oxcG+AAAAAC7YYj9OTO2+AAAAAIYmVz8duwq/AAAAAIYmVz8duwq/AAAAAPaZST9Wxh2/AAAAADYZOj8jyy+/AAAAAKr+KD8fS0C/AAAAALjDFj9w5U6/AAAAACb9Az/nWVu/AAAAAOtH4j48pGW/AAAAAOtH4j48pGW/AAAAAPaZST9Wxh2/AAAAADYZOj8jyy+/AAAAAKr+KD8fS0C/AAAAALjDFj9w5U6/AAAAACb9Az/nWVu/AAAAAOtH4j48pGW/AAAAAOtH4j48pGW/AAAAAFYAtz7UFm+/AAAAAPZ4ij6pdXa/AAAAALyxOz6vqXu/AAAAAKzUyD0jxH6/AAAAAHptRT3Us3+/AAAAAAAAAAAAAIC/AAAAAAAAAAAAAIC/AAAAAFYAtz7UFm+/AAAAAPZ4ij6pdXa/AAAAALyxOz6vqXu/AAAAAKzUyD0jxH6/AAAAAHptRT3Us3+/AAAAAAAAAAAAAIC/AAAAAAAAAAAAAIC/AAAAADnGn71COH+/AAAAAF/LJr7FlHy/AAAAADBTf74Z6ne/AAAAABwPqb5NpHG/AAAAAPoF077APmm/AAAAAMeB/L6ls16/AAAAAHIzEr9XJVK/AAAAAKPWJL843kO/AAAAADa1Mb91RTi/AAAAAJd7Pb/qIyy/AAAAAJd7Pb/qIyy/AAAAADnGn71COH+/AAAAAF/LJr7FlHy/AAAAADBTf74Z6ne/AAAAABwPqb5NpHG/AAAAAPoF077APmm/AAAAAMeB/L6ls16/AAAAAHIzEr9XJVK/AAAAAKPWJL843kO/AAAAADa1Mb91RTi/AAAAAJd7Pb/qIyy/AAAAAJd7Pb/qIyy/AAAAAHrbTL8Hhhm/AAAAAJtHWr/ewAW/AAAAAH6DZb+izOK+AAAAAJt/br8ZD7q+AAAAAD5Udb9USJK+AAAAAJU2er9ofli+AAAAAPhrfb/N9hC+AAAAAMU+f78tJ529AAAAAITSf788lBi9AAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAHrbTL8Hhhm/AAAAAJtHWr/ewAW/AAAAAH6DZb+izOK+AAAAAJt/br8ZD7q+AAAAAD5Udb9USJK+AAAAAJU2er9ofli+AAAAAPhrfb/N9hC+AAAAAMU+f78tJ529AAAAAITSf788lBi9AAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAJ9kf79I8Yw9AAAAAEFUfb81iBM+AAAAAACmeb+er2I+AAAAANsXdL+/VJo+AAAAACE6bb9jc8A+AAAAAP53ZL8e++Y+AAAAAHTNWb9rhwY/AAAAABtWTb/b4Rg/AAAAAPRXRr/s2SE/AAAAAJj7Pr99eSo/AAAAAJj7Pr99eSo/AAAAAJ9kf79I8Yw9AAAAAEFUfb81iBM+AAAAAACmeb+er2I+AAAAANsXdL+/VJo+AAAAACE6bb9jc8A+AAAAAP53ZL8e++Y+AAAAAHTNWb9rhwY/AAAAABtWTb/b4Rg/AAAAAPRXRr/s2SE/AAAAAJj7Pr99eSo/AAAAAJj7Pr99eSo/AAAAAAPULb+A7zs/AAAAABF3Gr/3JUw/AAAAAN1VBb8IiVo/AAAAALga3r6dqGY/AAAAAMigsL7USHA/AAAAAACbg74CZnc/AAAAAFNjML5oLHw/AAAAAL/7vL1i6H4/AAAAAFHwN73jvX8/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAPULb+A7zs/AAAAABF3Gr/3JUw/AAAAAN1VBb8IiVo/AAAAALga3r6dqGY/AAAAAMigsL7USHA/AAAAAACbg74CZnc/AAAAAFNjML5oLHw/AAAAAL/7vL1i6H4/AAAAAFHwN73jvX8/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAgLsUoj1xMn8/AAAAgM27KT5vdXw/AAAAgClzhD4pSXc/AAAAgGkpsT6tL3A/AAAAgCP72T7Uo2c/AAAAgFoqAT+KBl0/AAAAgICVFD++d1A/AAAAgAaOIj90xEU/AAAAgIqeLz9NQzo/AAAAgIqeLz9NQzo/AAAAgLsUoj1xMn8/AAAAgM27KT5vdXw/AAAAgClzhD4pSXc/AAAAgGkpsT6tL3A/AAAAgCP72T7Uo2c/AAAAgFoqAT+KBl0/AAAAgICVFD++d1A/AAAAgAaOIj90xEU/AAAAgIqeLz9NQzo/AAAAgIqeLz9NQzo/AAAAgKrYPz+NgCk/AAAAgBbkTj+UxRY/AAAAgDtDXD9RdgI/AAAAgDCWZz8YNdo+AAAAgKOncD9+ma4+AAAAgKFwdz8IS4M+AAAAgO8SfD8mpjI+AAAAgCrNfj+U8sU9AAAAgH+lfz+gMFc9AAAAgHL8fz9MqCo8AAAAgHL8fz9MqCo8AAAAgKrYPz+NgCk/AAAAgBbkTj+UxRY/AAAAgDtDXD9RdgI/AAAAgDCWZz8YNdo+AAAAgKOncD9+ma4+AAAAgKFwdz8IS4M+AAAAgO8SfD8mpjI+AAAAgCrNfj+U8sU9AAAAgH+lfz+gMFc9AAAAAAAAAAAAAIC/AAAAAAAAAAAAAIC/AAAAAAAAAAAAAIC/AAAAAAAAAAAAAIC/AAAAAG/tf78L/sK8AAAAAG/tf78L/sK8AAAAAOdSfr+u+em9AAAAAF0ler/hu1m+AAAAABm1c78swJy+AAAAADV8a79X08i+AAAAALrkYL8HnfS+AAAAAAEOVL8Uaw+/AAAAADRMR7/JrCC/AAAAABphOb8+jTC/AAAAABphOb8+jTC/AAAAAOdSfr+u+em9AAAAAF0ler/hu1m+AAAAABm1c78swJy+AAAAADV8a79X08i+AAAAALrkYL8HnfS+AAAAAAEOVL8Uaw+/AAAAADRMR7/JrCC/AAAAABphOb8+jTC/AAAAABphOb8+jTC/AAAAALiZKb9rwj+/AAAAADIGGL/x+E2/AAAAAMv0BL8lxFq/AAAAAIml4b4qzGW/AAAAADxBuL4u2W6/AAAAAF/Fjr6A2HW/AAAAAMpITL6i2nq/AAAAAGSS/L22C36/AAAAAOXJdL3cin+/AAAAAAAAAAAAAIC/AAAAAAAAAAAAAIC/AAAAALiZKb9rwj+/AAAAADIGGL/x+E2/AAAAAMv0BL8lxFq/AAAAAIml4b4qzGW/AAAAADxBuL4u2W6/AAAAAF/Fjr6A2HW/AAAAAMpITL6i2nq/AAAAAGSS/L22C36/AAAAAOXJdL3cin+/AAAAAAAAAAAAAIC/AAAAAAAAAAAAAIC/AAAAADyVvj2e436/AAAAAI5vPT7OlHu/AAAAAGvNiz6YRXa/AAAAAPVzuj7pa26/AAAAAC2w5D5rC2W/AAAAAFP5BD9kwVq/AAAAAJPRFj9X206/AAAAABOBJz/fl0G/AAAAAOi7Nj/MSTO/AAAAAEZQRD++TiS/AAAAAH9ESz9Pnxu/AAAAAAaoUT/u5hK/AAAAAAaoUT/u5hK/AAAAADyVvj2e436/AAAAAI5vPT7OlHu/AAAAAGvNiz6YRXa/AAAAAPVzuj7pa26/AAAAAC2w5D5rC2W/AAAAAFP5BD9kwVq/AAAAAJPRFj9X206/AAAAABOBJz/fl0G/AAAAAOi7Nj/MSTO/AAAAAEZQRD++TiS/AAAAAH9ESz9Pnxu/AAAAAAaoUT/u5hK/AAAAAAaoUT/u5hK/AAAAABf9XD+EOgG/AAAAABsJZj+irOC+AAAAANQfbT/d9MC+AAAAACuWcj+ojqO+AAAAAFy6dj8ujIi+AAAAALylej+JTVC+AAAAAMlvfT//ixC+AAAAAP9afz+ePJG9AAAAAGbbfz+R4Ai9AAAAgAAAgD8AAAAAAAAAgAAAgD8AAAAAAAAAABf9XD+EOgG/AAAAABsJZj+irOC+AAAAANQfbT/d9MC+AAAAACuWcj+ojqO+AAAAAFy6dj8ujIi+AAAAALylej+JTVC+AAAAAMlvfT//ixC+AAAAAP9afz+ePJG9AAAAAGbbfz+R4Ai9AAAAAAAAgD8AAAAAAAAAAAAAgD8AAAAAAAAAAAAAgD8AAAAAAAAAAAAAgD8AAAAAAAAAgAAAgD8AAAAAAAAAgAAAgD8AAAAAAAAAgBpnfz+C0Is9AAAAgM/qfD+xbx4+AAAAgDzQdz/YcYA+AAAAgLhOcD+1gLA+AAAAgFvmZj+FGd0+AAAAgFGjXT+bHAA/AAAAgLzbUT8FnRI/AAAAgLzbUT8FnRI/AAAAgBpnfz+C0Is9AAAAgM/qfD+xbx4+AAAAgDzQdz/YcYA+AAAAgLhOcD+1gLA+AAAAgFvmZj+FGd0+AAAAgFGjXT+bHAA/AAAAgLzbUT8FnRI/AAAAgLzbUT8FnRI/AAAAgJnPRD8ltiM/AAAAgGmzNT/VVTQ/AAAAgBewJD+j/kM/AAAAgN4VEj/oOVI/AAAAgHOs/D6Lp14/AAAAgK3t0z42Cmk/AAAAgIkBqz6PTHE/AAAAgDbhgj6kfnc/AAAAgA6tOD5nzXs/AAAAgMzH3z2Yd34/AAAAgBEwWD2npH8/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAgJnPRD8ltiM/AAAAgGmzNT/VVTQ/AAAAgBewJD+j/kM/AAAAgN4VEj/oOVI/AAAAgHOs/D6Lp14/AAAAgK3t0z42Cmk/AAAAgIkBqz6PTHE/AAAAgDbhgj6kfnc/AAAAgA6tOD5nzXs/AAAAgMzH3z2Yd34/AAAAgBEwWD2npH8/AACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAMx+f79DiYA9AAAAAAK+fb/2sgc+AAAAAOCPer+18FE+AAAAAAqndb9bGJA+AAAAAG7Ebr+yrLg+AAAAAOKOZr96hd4+AAAAAHZKXL8bagI/AAAAAPstVL/COw8/AAAAACEkS7+MyRs/AAAAACEkS7+MyRs/AAAAAMx+f79DiYA9AAAAAAK+fb/2sgc+AAAAAOCPer+18FE+AAAAAAqndb9bGJA+AAAAAG7Ebr+yrLg+AAAAAOKOZr96hd4+AAAAAHZKXL8bagI/AAAAAPstVL/COw8/AAAAACEkS7+MyRs/AAAAACEkS7+MyRs/AAAAAF24Or8PIi8/AAAAAG9OKb/mBEA/AAAAAB6kF78xQU4/AAAAABxhBL+iHVs/AAAAAKvh376OOmY/AAAAADCstb6lV28/AAAAAHQ2i774WnY/AAAAAOgGQ75pUHs/AAAAANqr5b2YYn4/AAAAANyUX71Lnn8/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAF24Or8PIi8/AAAAAG9OKb/mBEA/AAAAAB6kF78xQU4/AAAAABxhBL+iHVs/AAAAAKvh376OOmY/AAAAADCstb6lV28/AAAAAHQ2i774WnY/AAAAAOgGQ75pUHs/AAAAANqr5b2YYn4/AAAAANyUX71Lnn8/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAgKEZyj0fwH4/AAAAgKu8Rj7kIXs/AAAAgJoWkT6dgXU/AAAAgA9Mvz7RdW0/AAAAgJir7D4kAmM/AAAAgGrvCz+BXlY/AAAAgBjeHz8n8kc/AAAAgKm2MT8PRDg/AAAAgH/hPj+0lio/AAAAgMlmSj89vxw/AAAAgMlmSj89vxw/AAAAgKEZyj0fwH4/AAAAgKu8Rj7kIXs/AAAAgJoWkT6dgXU/AAAAgA9Mvz7RdW0/AAAAgJir7D4kAmM/AAAAgGrvCz+BXlY/AAAAgBjeHz8n8kc/AAAAgKm2MT8PRDg/AAAAgH/hPj+0lio/AAAAAMp0fL8myyk+AAAAAMp0fL8myyk+AAAAAMp0fL8myyk+AAAAAMp0fL8myyk+AAAAAAAAAIAAAIA/AAAAAAAAAIAAAIA/AAAAAAAAAIAAAIA/AAAAAAAAAIAAAIA/AAAAAAAAgD8AAAAAAAAAAAAAgD8AAAAAAAAAAAAAgD8AAAAAAAAAAAAAgD8AAAAAAAAAAAAAAAAAAIC/AAAAAAAAAAAAAIC/AAAAAAAAAAAAAIC/AAAAAAAAAAAAAIC/AAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAPO1Pz/Qpym/AAAAAPO1Pz/Qpym/AAAAAC6DLj/jTDu/AAAAAFnJHD/0Xkq/AAAAANM3Cz/p1Va/AAAAAKLa8D7U52G/AAAAAB6byT6EUWu/AAAAAJSSoT4763K/AAAAAFZIcz6Qq3i/AAAAAOc7JT4tpXy/AAAAAPmhtD2YAH+/AAAAALPfMD3fwn+/AAAAAAAAAAAAAIC/AAAAAAAAAAAAAIC/AAAAAC6DLj/jTDu/AAAAAFnJHD/0Xkq/AAAAANM3Cz/p1Va/AAAAAKLa8D7U52G/AAAAAB6byT6EUWu/AAAAAJSSoT4763K/AAAAAFZIcz6Qq3i/AAAAAOc7JT4tpXy/AAAAAPmhtD2YAH+/AAAAALPfMD3fwn+/AAAAAAAAAAAAAIC/AAAAAAAAAAAAAIC/AAAAAEHlwL2p3H6/AAAAABtHPb61lnu/AAAAAJEFir7XhXa/AAAAAPbutb72Sm+/AAAAADBB4b7G5GW/AAAAAE1rBb/ze1q/AAAAALLTGL+lYE2/AAAAAKF0Kr/u/z6/AAAAAKQQOr811C+/AAAAAEINQ7+yzSW/AAAAAMkpS78rwhu/AAAAAMkpS78rwhu/AAAAAEHlwL2p3H6/AAAAABtHPb61lnu/AAAAAJEFir7XhXa/AAAAAPbutb72Sm+/AAAAADBB4b7G5GW/AAAAAE1rBb/ze1q/AAAAALLTGL+lYE2/AAAAAKF0Kr/u/z6/AAAAAKQQOr811C+/AAAAAEINQ7+yzSW/AAAAAMkpS78rwhu/AAAAAMkpS78rwhu/AAAAAKn+WL/+0we/AAAAAClfZL9BXee+AAAAAC1dbb83xr++AAAAAFkudL8txpm+AAAAAJwceb+Q8Wu+AAAAALF4fL8mbim+AAAAADrnfr9cX729AAAAAOC/f7+tJjW9AAAAAAAAgL9dOKGkAAAAAAAAgL9dOKGkAAAAAKn+WL/+0we/AAAAAClfZL9BXee+AAAAAC1dbb83xr++AAAAAFkudL8txpm+AAAAAJwceb+Q8Wu+AAAAALF4fL8mbim+AAAAADrnfr9cX729AAAAAOC/f7+tJjW9AAAAgAAAgD8AAAAAAAAAgAAAgD8AAAAAAAAAgMFKfz9kNZg9AAAAgASNfD/Qhic+AAAAgL45dz8X5oQ+AAAAgOYAcD9JJrI+AAAAgK2HZj9Xo94+AAAAgL1PXj/34P0+AAAAgNdlVD/e6A4/AAAAgNdlVD/e6A4/AAAAgMFKfz9kNZg9AAAAgASNfD/Qhic+AAAAgL45dz8X5oQ+AAAAgOYAcD9JJrI+AAAAgK2HZj9Xo94+AAAAgL1PXj/34P0+AAAAgNdlVD/e6A4/AAAAgNdlVD/e6A4/AAAAgHvuSD9/oB4/AAAAgPRlOz9DaC4/AAAAgFbCKz8P1D0/AAAAgA0dGj/0aUw/AAAAgEm4Bj8+r1k/AAAAgIT64z6tOGU/AAAAgE3kuD6ruW4/AAAAgFNTjT7uDXY/AAAAgJ3CRD7LOns/AAAAgCn34z28aH4/AAAAgFU3Xj18n38/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAgHvuSD9/oB4/AAAAgPRlOz9DaC4/AAAAgFbCKz8P1D0/AAAAgA0dGj/0aUw/AAAAgEm4Bj8+r1k/AAAAgIT64z6tOGU/AAAAgE3kuD6ruW4/AAAAgFNTjT7uDXY/AAAAgJ3CRD7LOns/AAAAgCn34z28aH4/AAAAgFU3Xj18n38/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAOJkwr0b2H4/AAAAABVqQr4BWHs/AAAAAC0/kL5YoXU/AAAAAN1YvL6NDG4/AAAAANKG5L68FWU/AAAAAJYVBr+bE1o/AAAAABMgGb+5J00/AAAAAH3oKr9JmD4/AAAAALoLO78DyS4/AAAAAEpISb97Lh4/AAAAALGBVb9uPw0/AAAAAJrVXL/zfQE/AAAAAJM7Y7+6zus+AAAAAJM7Y7+6zus+AAAAAOJkwr0b2H4/AAAAABVqQr4BWHs/AAAAAC0/kL5YoXU/AAAAAN1YvL6NDG4/AAAAANKG5L68FWU/AAAAAJYVBr+bE1o/AAAAABMgGb+5J00/AAAAAH3oKr9JmD4/AAAAALoLO78DyS4/AAAAAEpISb97Lh4/AAAAALGBVb9uPw0/AAAAAJrVXL/zfQE/AAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAO0/Yr/7ju++AAAAAO0/Yr/7ju++AAAAABB1WL/brgi/AAAAAG+0TL8Ruhm/AAAAAMD1Pr8JgCq/AAAAAClRL78kjDq/AAAAAOECHr+Gakm/AAAAAHtoC79atla/AAAAAArv7755JmK/AAAAAA5fyL74lGu/AAAAACUWob7j/3K/AAAAAH7Odb7Wg3i/AAAAAK/pLL7nUny/AAAAAHC00L3Rqn6/AAAAAASlSb2JsH+/AAAAAAAAAAAAAIC/AAAAAAAAAAAAAIC/AAAAABB1WL/brgi/AAAAAG+0TL8Ruhm/AAAAAMD1Pr8JgCq/AAAAAClRL78kjDq/AAAAAOECHr+Gakm/AAAAAHtoC79atla/AAAAAArv7755JmK/AAAAAA5fyL74lGu/AAAAACUWob7j/3K/AAAAAH7Odb7Wg3i/AAAAAK/pLL7nUny/AAAAAHC00L3Rqn6/AAAAAASlSb2JsH+/AAAAAAAAAAAAAIC/AAAAAAAAAAAAAIC/AAAAALESlz10TX+/AAAAAGQhHD7AAX2/AAAAAHukcD6m1Hi/AAAAACW3oz5Xj3K/AAAAAHM3zz7JGGq/AAAAAOut+T5Rf1+/AAAAAHT9ED+v+1K/AAAAAHaUIz+a60S/AAAAAFBEND/KxDW/AAAAAJreQj+FBCa/AAAAANzVSz+44Bq/AAAAAFjKUz/tzg+/AAAAAFjKUz/tzg+/AAAAALESlz10TX+/AAAAAGQhHD7AAX2/AAAAAHukcD6m1Hi/AAAAACW3oz5Xj3K/AAAAAHM3zz7JGGq/AAAAAOut+T5Rf1+/AAAAAHT9ED+v+1K/AAAAAHaUIz+a60S/AAAAAFBEND/KxDW/AAAAAJreQj+FBCa/AAAAANzVSz+44Bq/AAAAAFjKUz/tzg+/AAAAAFjKUz/tzg+/AAAAAC8QYT/z/PO+AAAAAMACaz9UCcu+AAAAAK5Bcj+egKW+AAAAACNldz+NoYO+AAAAADXvej/lskq+AAAAAEbbfT/eOwS+AAAAAPl6fz+PbIK9AAAAAA7ifz/qnPe8AAAAAAAAgD8QPnikAAAAAAAAgD8QPnikAAAAAC8QYT/z/PO+AAAAAMACaz9UCcu+AAAAAK5Bcj+egKW+AAAAACNldz+NoYO+AAAAADXvej/lskq+AAAAAEbbfT/eOwS+AAAAAPl6fz+PbIK9AAAAAA7ifz/qnPe8AACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAvwAAAIAAAACAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAlHSUYpXQPgAAAAAAAGhBaB1oIEsAhZRoIoeUUpQoSwFNcQJLAksDh5RoKolCmDoAAAAAgL+r/OLAuyRawAAAgD+r/OLAuyRawAAAgL+rPLLAuyQ5wAAAgD+rPLLAuyQ5wAAAgL+r/OLAuyRawAAAgL825NnAtVZZwAAAgL825NnAtVZZwAAAgL+0LNLA+zxXwAAAgL+0LNLA+zxXwAAAgL8InMvAqTtUwAAAgL8InMvAqTtUwAAAgL+FZ8XA/ytQwAAAgL+FZ8XA/ytQwAAAgL8tj7/A/A1LwAAAgL8tj7/A/A1LwAAAgL9Dm7rA1ItFwAAAgL9Dm7rA1ItFwAAAgL/5ZbbAdds/wAAAgL/5ZbbAdds/wAAAgL8ASbTAgZg8wAAAgL8ASbTAgZg8wAAAgL+rPLLAuyQ5wAAAgD+r/OLAuyRawAAAgD825NnAtVZZwAAAgD825NnAtVZZwAAAgD+0LNLA+zxXwAAAgD+0LNLA+zxXwAAAgD8InMvAqTtUwAAAgD8InMvAqTtUwAAAgD+FZ8XA/ytQwAAAgD+FZ8XA/ytQwAAAgD8tj7/A/A1LwAAAgD8tj7/A/A1LwAAAgD9Dm7rA1ItFwAAAgD9Dm7rA1ItFwAAAgD/5ZbbAdds/wAAAgD/5ZbbAdds/wAAAgD8ASbTAgZg8wAAAgD8ASbTAgZg8wAAAgD+rPLLAuyQ5wAAAgL+rvJ7Ad8nCvwAAgD+rvJ7Ad8nCvwAAgL+rPLLAuyQ5wAAAgL8SZq7A+sMxwAAAgL8SZq7A+sMxwAAAgL/d+qrAduEpwAAAgL/d+qrAduEpwAAAgL8M+6fAL30hwAAAgL8M+6fAL30hwAAAgL+fZqXAJJcYwAAAgL+fZqXAJJcYwAAAgL+WPaPAVS8PwAAAgL+WPaPAVS8PwAAAgL/wf6HAxEUFwAAAgL/wf6HAxEUFwAAAgL+vLaDA3rT1vwAAgL+vLaDA3rT1vwAAgL/RRp/ArtrfvwAAgL/RRp/ArtrfvwAAgL9N7J7A44XRvwAAgL9N7J7A44XRvwAAgL+rvJ7Ad8nCvwAAgD+rPLLAuyQ5wAAAgD8SZq7A+sMxwAAAgD8SZq7A+sMxwAAAgD/d+qrAduEpwAAAgD/d+qrAduEpwAAAgD8M+6fAL30hwAAAgD8M+6fAL30hwAAAgD+fZqXAJJcYwAAAgD+fZqXAJJcYwAAAgD+WPaPAVS8PwAAAgD+WPaPAVS8PwAAAgD/wf6HAxEUFwAAAgD/wf6HAxEUFwAAAgD+vLaDA3rT1vwAAgD+vLaDA3rT1vwAAgD/RRp/ArtrfvwAAgD/RRp/ArtrfvwAAgD9N7J7A44XRvwAAgD9N7J7A44XRvwAAgD+rvJ7Ad8nCvwAAgL+rcuS/d8nCvwAAgD+rcuS/d8nCvwAAgL+rvJ7Ad8nCvwAAgL+rcuS/d8nCvwAAgD+rvJ7Ad8nCvwAAgD+rcuS/d8nCvwAAgL9WOR/Au4R4wAAAgD9WOR/Au4R4wAAAgL+rcuS/d8nCvwAAgL+xZee/o1f5vwAAgL+xZee/o1f5vwAAgL8xPe+/KCsXwAAAgL8xPe+/KCsXwAAAgL8t+fu/vuIwwAAAgL8t+fu/vuIwwAAAgL/SzAbAldJJwAAAgL/SzAbAldJJwAAAgL9A1RHA7othwAAAgL9A1RHA7othwAAAgL9WOR/Au4R4wAAAgD+rcuS/d8nCvwAAgD+xZee/o1f5vwAAgD+xZee/o1f5vwAAgD8xPe+/KCsXwAAAgD8xPe+/KCsXwAAAgD8t+fu/vuIwwAAAgD8t+fu/vuIwwAAAgD/SzAbAldJJwAAAgD/SzAbAldJJwAAAgD9A1RHA7othwAAAgD9A1RHA7othwAAAgD9WOR/Au4R4wAAAgL+rLIzAXoKxwAAAgD+rLIzAXoKxwAAAgL9WOR/Au4R4wAAAgL/15C7AWUeHwAAAgL/15C7AWUeHwAAAgL9fYUDASXGRwAAAgL9fYUDASXGRwAAAgL+UrlPAMMCawAAAgL+UrlPAMMCawAAAgL+UzGjADDSjwAAAgL+UzGjADDSjwAAAgL+/q3/AK8iqwAAAgL+/q3/AK8iqwAAAgL+rLIzAXoKxwAAAgD9WOR/Au4R4wAAAgD/15C7AWUeHwAAAgD/15C7AWUeHwAAAgD9fYUDASXGRwAAAgD9fYUDASXGRwAAAgD+UrlPAMMCawAAAgD+UrlPAMMCawAAAgD+UzGjADDSjwAAAgD+UzGjADDSjwAAAgD+/q3/AK8iqwAAAgD+/q3/AK8iqwAAAgD+rLIzAXoKxwAAAgL+rHOHAXnLEwAAAgD+rHOHAXnLEwAAAgL+rLIzAXoKxwAAAgL89OpvA3xS4wAAAgL89OpvA3xS4wAAAgL/n36rAI0K9wAAAgL/n36rAI0K9wAAAgL+oHbvAKgrBwAAAgL+oHbvAKgrBwAAAgL+A88vA9GzDwAAAgL+A88vA9GzDwAAAgL9DbNbAAzHEwAAAgL9DbNbAAzHEwAAAgL+rHOHAXnLEwAAAgD+rLIzAXoKxwAAAgD89OpvA3xS4wAAAgD89OpvA3xS4wAAAgD/n36rAI0K9wAAAgD/n36rAI0K9wAAAgD+oHbvAKgrBwAAAgD+oHbvAKgrBwAAAgD+A88vA9GzDwAAAgD+A88vA9GzDwAAAgD9DbNbAAzHEwAAAgD9DbNbAAzHEwAAAgD+rHOHAXnLEwAAAgL9VLjXBXiKNwAAAgD9VLjXBXiKNwAAAgL+rHOHAXnLEwAAAgL+I9/TAiLDDwAAAgL+I9/TAiLDDwAAAgL9q6APBBWvBwAAAgL9q6APBBWvBwAAAgL/QcQzB/NS9wAAAgL/QcQzB/NS9wAAAgL8avBPBA2y5wAAAgL8avBPBA2y5wAAAgL8dpxrBPOSzwAAAgL8dpxrBPOSzwAAAgL/YMiHBpj2twAAAgL/YMiHBpj2twAAAgL9NXyfBQnilwAAAgL9NXyfBQnilwAAAgL96LC3BD5ScwAAAgL96LC3BD5ScwAAAgL85SDHB8CuVwAAAgL85SDHB8CuVwAAAgL9VLjXBXiKNwAAAgD+rHOHAXnLEwAAAgD+I9/TAiLDDwAAAgD+I9/TAiLDDwAAAgD9q6APBBWvBwAAAgD9q6APBBWvBwAAAgD/QcQzB/NS9wAAAgD/QcQzB/NS9wAAAgD8avBPBA2y5wAAAgD8avBPBA2y5wAAAgD8dpxrBPOSzwAAAgD8dpxrBPOSzwAAAgD/YMiHBpj2twAAAgD/YMiHBpj2twAAAgD9NXyfBQnilwAAAgD9NXyfBQnilwAAAgD96LC3BD5ScwAAAgD96LC3BD5ScwAAAgD85SDHB8CuVwAAAgD85SDHB8CuVwAAAgD9VLjXBXiKNwAAAgL9VTk7BJNq6PgAAgD9VTk7BJNq6PgAAgL9VLjXBXiKNwAAAgL+BSjrBLcKAwAAAgL+BSjrBLcKAwAAAgL8a0j7BDtFmwAAAgL8a0j7BDtFmwAAAgL8jxULB1SpKwAAAgL8jxULB1SpKwAAAgL+aI0bBsJErwAAAgL+aI0bBsJErwAAAgL+A7UjBoAULwAAAgL+A7UjBoAULwAAAgL/VIkvBRg3RvwAAgL/VIkvBRg3RvwAAgL+Yw0zBdimIvwAAgL+Yw0zBdimIvwAAgL/Kz03BNX/tvgAAgL/Kz03BNX/tvgAAgL+yLk7BwyNlvQAAgL+yLk7BwyNlvQAAgL9VTk7BJNq6PgAAgD9VLjXBXiKNwAAAgD+BSjrBLcKAwAAAgD+BSjrBLcKAwAAAgD8a0j7BDtFmwAAAgD8a0j7BDtFmwAAAgD8jxULB1SpKwAAAgD8jxULB1SpKwAAAgD+aI0bBsJErwAAAgD+aI0bBsJErwAAAgD+A7UjBoAULwAAAgD+A7UjBoAULwAAAgD/VIkvBRg3RvwAAgD/VIkvBRg3RvwAAgD+Yw0zBdimIvwAAgD+Yw0zBdimIvwAAgD/Kz03BNX/tvgAAgD/Kz03BNX/tvgAAgD+yLk7BwyNlvQAAgD+yLk7BwyNlvQAAgD9VTk7BJNq6PgAAgL9VTk7BEm0WPwAAgD9VTk7BEm0WPwAAgL9VTk7BJNq6PgAAgL9VTk7BEm0WPwAAgD9VTk7BJNq6PgAAgD9VTk7BEm0WPwAAgL9VXjXBom2oQAAAgD9VXjXBom2oQAAAgL9VTk7BEm0WPwAAgL9q7U3BoFKlPwAAgL9q7U3BoFKlPwAAgL+pykzBH9X6PwAAgL+pykzBH9X6PwAAgL+rAEvBlw4kQAAAgL+rAEvBlw4kQAAAgL9olEjB1+hHQAAAgL9olEjB1+hHQAAAgL821UXB8nRmQAAAgL821UXB8nRmQAAAgL+xjELB86+BQAAAgL+xjELB86+BQAAAgL/Xuj7B2lSPQAAAgL/Xuj7B2lSPQAAAgL+pXzrBLimcQAAAgL+pXzrBLimcQAAAgL/r8DfBoWaiQAAAgL/r8DfBoWaiQAAAgL9VXjXBom2oQAAAgD9VTk7BEm0WPwAAgD9q7U3BoFKlPwAAgD9q7U3BoFKlPwAAgD+pykzBH9X6PwAAgD+pykzBH9X6PwAAgD+rAEvBlw4kQAAAgD+rAEvBlw4kQAAAgD9olEjB1+hHQAAAgD9olEjB1+hHQAAAgD821UXB8nRmQAAAgD821UXB8nRmQAAAgD+xjELB86+BQAAAgD+xjELB86+BQAAAgD/Xuj7B2lSPQAAAgD/Xuj7B2lSPQAAAgD+pXzrBLimcQAAAgD+pXzrBLimcQAAAgD/r8DfBoWaiQAAAgD/r8DfBoWaiQAAAgD9VXjXBom2oQAAAgL+r3OHAok3gQAAAgD+r3OHAok3gQAAAgL9VXjXBom2oQAAAgL/Wwy/BsdizQAAAgL/Wwy/BsdizQAAAgL92uinBA/a9QAAAgL92uinBA/a9QAAAgL83QiPBlsXGQAAAgL83QiPBlsXGQAAAgL8YWxzBbEfOQAAAgL8YWxzBbEfOQAAAgL8aBRXBhXvUQAAAgL8aBRXBhXvUQAAAgL88QA3B32HZQAAAgL88QA3B32HZQAAAgL9+DAXBfPrcQAAAgL9+DAXBfPrcQAAAgL/B0/jAW0XfQAAAgL/B0/jAW0XfQAAAgL8chO3AkAvgQAAAgL8chO3AkAvgQAAAgL+r3OHAok3gQAAAgD9VXjXBom2oQAAAgD/Wwy/BsdizQAAAgD/Wwy/BsdizQAAAgD92uinBA/a9QAAAgD92uinBA/a9QAAAgD83QiPBlsXGQAAAgD83QiPBlsXGQAAAgD8YWxzBbEfOQAAAgD8YWxzBbEfOQAAAgD8aBRXBhXvUQAAAgD8aBRXBhXvUQAAAgD88QA3B32HZQAAAgD88QA3B32HZQAAAgD9+DAXBfPrcQAAAgD9+DAXBfPrcQAAAgD/B0/jAW0XfQAAAgD/B0/jAW0XfQAAAgD8chO3AkAvgQAAAgD8chO3AkAvgQAAAgD+r3OHAok3gQAAAgL9WmU/Aov20QAAAgD9WmU/Aov20QAAAgL+r3OHAok3gQAAAgL9uQs7AzIvfQAAAgL9uQs7AzIvfQAAAgL9jtrvASkbdQAAAgL9jtrvASkbdQAAAgL+LOKrAG33ZQAAAgL+LOKrAG33ZQAAAgL+AYZvAYcnUQAAAgL+AYZvAYcnUQAAAgL99wY7AjIHPQAAAgL99wY7AjIHPQAAAgL/A0oLAXDvJQAAAgL/A0oLAXDvJQAAAgL+TKm/A0vbBQAAAgL+TKm/A0vbBQAAAgL84+17A7sO7QAAAgL84+17A7sO7QAAAgL9WmU/Aov20QAAAgD+r3OHAok3gQAAAgD9uQs7AzIvfQAAAgD9uQs7AzIvfQAAAgD9jtrvASkbdQAAAgD9jtrvASkbdQAAAgD+LOKrAG33ZQAAAgD+LOKrAG33ZQAAAgD+AYZvAYcnUQAAAgD+AYZvAYcnUQAAAgD99wY7AjIHPQAAAgD99wY7AjIHPQAAAgD/A0oLAXDvJQAAAgD/A0oLAXDvJQAAAgD+TKm/A0vbBQAAAgD+TKm/A0vbBQAAAgD84+17A7sO7QAAAgD84+17A7sO7QAAAgD9WmU/Aov20QAAAgL+rcuS/RVsDQAAAgD+rcuS/RVsDQAAAgL9WmU/Aov20QAAAgL/vrzzAeDurQAAAgL/vrzzAeDurQAAAgL+i6SvAo8ugQAAAgL+i6SvAo8ugQAAAgL9vRh3AJa6VQAAAgL9vRh3AJa6VQAAAgL9VxhDA/OKJQAAAgL9VxhDA/OKJQAAAgL9UaQbAUtR6QAAAgL9UaQbAUtR6QAAAgL/bXvy/WIdgQAAAgL/bXvy/WIdgQAAAgL9AMfC/Ct9EQAAAgL9AMfC/Ct9EQAAAgL/YSei/Z9snQAAAgL/YSei/Z9snQAAAgL9tmuW/f9kVQAAAgL9tmuW/f9kVQAAAgL+rcuS/RVsDQAAAgD9WmU/Aov20QAAAgD/vrzzAeDurQAAAgD/vrzzAeDurQAAAgD+i6SvAo8ugQAAAgD+i6SvAo8ugQAAAgD9vRh3AJa6VQAAAgD9vRh3AJa6VQAAAgD9VxhDA/OKJQAAAgD9VxhDA/OKJQAAAgD9UaQbAUtR6QAAAgD9UaQbAUtR6QAAAgD/bXvy/WIdgQAAAgD/bXvy/WIdgQAAAgD9AMfC/Ct9EQAAAgD9AMfC/Ct9EQAAAgD/YSei/Z9snQAAAgD/YSei/Z9snQAAAgD9tmuW/f9kVQAAAgD9tmuW/f9kVQAAAgD+rcuS/RVsDQAAAgL+rvJ7ARVsDQAAAgD+rvJ7ARVsDQAAAgL+rcuS/RVsDQAAAgL+rvJ7ARVsDQAAAgD+rcuS/RVsDQAAAgD+rvJ7ARVsDQAAAgL+rPLLARbtpQAAAgD+rPLLARbtpQAAAgL+rvJ7ARVsDQAAAgL8aW5/AWIgVQAAAgL8aW5/AWIgVQAAAgL90xKDAGasmQAAAgL90xKDAGasmQAAAgL8ot6LAeTM1QAAAgL8ot6LAeTM1QAAAgL+FBKXAXY9BQAAAgL+FBKXAXY9BQAAAgL8D16fAhjxNQAAAgL8D16fAhjxNQAAAgL+jLqvA8jpYQAAAgL+jLqvA8jpYQAAAgL9Gg67AOj1hQAAAgL9Gg67AOj1hQAAAgL+rPLLARbtpQAAAgD+rvJ7ARVsDQAAAgD8aW5/AWIgVQAAAgD8aW5/AWIgVQAAAgD90xKDAGasmQAAAgD90xKDAGasmQAAAgD8ot6LAeTM1QAAAgD8ot6LAeTM1QAAAgD+FBKXAXY9BQAAAgD+FBKXAXY9BQAAAgD8D16fAhjxNQAAAgD8D16fAhjxNQAAAgD+jLqvA8jpYQAAAgD+jLqvA8jpYQAAAgD9Gg67AOj1hQAAAgD9Gg67AOj1hQAAAgD+rPLLARbtpQAAAgL+rvOPAoo2IQAAAgD+rvOPAoo2IQAAAgL+rPLLARbtpQAAAgL9iNLbAxmJxQAAAgL9iNLbAxmJxQAAAgL+VbLrAtDZ4QAAAgL+VbLrAtDZ4QAAAgL9C5b7ADTd+QAAAgL9C5b7ADTd+QAAAgL9rnsPA6bGBQAAAgL9rnsPA6bGBQAAAgL8QmMjAgd6DQAAAgL8QmMjAgd6DQAAAgL8v0s3ATqGFQAAAgL8v0s3ATqGFQAAAgL/KTNPAUvqGQAAAgL/KTNPAUvqGQAAAgL/gB9nAi+mHQAAAgL/gB9nAi+mHQAAAgL9ESd7AnGSIQAAAgL9ESd7AnGSIQAAAgL+rvOPAoo2IQAAAgD+rPLLARbtpQAAAgD9iNLbAxmJxQAAAgD9iNLbAxmJxQAAAgD+VbLrAtDZ4QAAAgD+VbLrAtDZ4QAAAgD9C5b7ADTd+QAAAgD9C5b7ADTd+QAAAgD9rnsPA6bGBQAAAgD9rnsPA6bGBQAAAgD8QmMjAgd6DQAAAgD8QmMjAgd6DQAAAgD8v0s3ATqGFQAAAgD8v0s3ATqGFQAAAgD/KTNPAUvqGQAAAgD/KTNPAUvqGQAAAgD/gB9nAi+mHQAAAgD/gB9nAi+mHQAAAgD9ESd7AnGSIQAAAgD9ESd7AnGSIQAAAgD+rvOPAoo2IQAAAgL9Vdg7BRftZQAAAgD9Vdg7BRftZQAAAgL+rvOPAoo2IQAAAgL9hnuzAnyaIQAAAgL9hnuzAnyaIQAAAgL8WJvTAwhmHQAAAgL8WJvTAwhmHQAAAgL/vjPrAGZmFQAAAgL/vjPrAGZmFQAAAgL9fTADBRJGDQAAAgL9fTADBRJGDQAAAgL/43QLB2EmBQAAAgL/43QLB2EmBQAAAgL9IDgXBTL59QAAAgL9IDgXBTL59QAAAgL+8IAfBiTd4QAAAgL+8IAfBiTd4QAAAgL9SFQnBZf9xQAAAgL9SFQnBZf9xQAAAgL8K7ArB4hVrQAAAgL8K7ArB4hVrQAAAgL/mpAzB/3pjQAAAgL/mpAzB/3pjQAAAgL90kg3B29deQAAAgL90kg3B29deQAAAgL9Vdg7BRftZQAAAgD+rvOPAoo2IQAAAgD9hnuzAnyaIQAAAgD9hnuzAnyaIQAAAgD8WJvTAwhmHQAAAgD8WJvTAwhmHQAAAgD/vjPrAGZmFQAAAgD/vjPrAGZmFQAAAgD9fTADBRJGDQAAAgD9fTADBRJGDQAAAgD/43QLB2EmBQAAAgD/43QLB2EmBQAAAgD9IDgXBTL59QAAAgD9IDgXBTL59QAAAgD+8IAfBiTd4QAAAgD+8IAfBiTd4QAAAgD9SFQnBZf9xQAAAgD9SFQnBZf9xQAAAgD8K7ArB4hVrQAAAgD8K7ArB4hVrQAAAgD/mpAzB/3pjQAAAgD/mpAzB/3pjQAAAgD90kg3B29deQAAAgD90kg3B29deQAAAgD9Vdg7BRftZQAAAgL9VHhjBEm0cPwAAgD9VHhjBEm0cPwAAgL9Vdg7BRftZQAAAgL8q9w/B3pVQQAAAgL8q9w/B3pVQQAAAgL90VxHBNElGQAAAgL90VxHBNElGQAAAgL8zlxLBSBU7QAAAgL8zlxLBSBU7QAAAgL9othPBGvouQAAAgL9othPBGvouQAAAgL8TtRTBqfchQAAAgL8TtRTBqfchQAAAgL8D1hXBVjcPQAAAgL8D1hXBVjcPQAAAgL/q1RbBF2fwPwAAgL/q1RbBF2fwPwAAgL87uRfB1bSsPwAAgL87uRfB1bSsPwAAgL8PBRjB47l9PwAAgL8PBRjB47l9PwAAgL9VHhjBEm0cPwAAgD9Vdg7BRftZQAAAgD8q9w/B3pVQQAAAgD8q9w/B3pVQQAAAgD90VxHBNElGQAAAgD90VxHBNElGQAAAgD8zlxLBSBU7QAAAgD8zlxLBSBU7QAAAgD9othPBGvouQAAAgD9othPBGvouQAAAgD8TtRTBqfchQAAAgD8TtRTBqfchQAAAgD8D1hXBVjcPQAAAgD8D1hXBVjcPQAAAgD/q1RbBF2fwPwAAgD/q1RbBF2fwPwAAgD87uRfB1bSsPwAAgD87uRfB1bSsPwAAgD8PBRjB47l9PwAAgD8PBRjB47l9PwAAgD9VHhjBEm0cPwAAgL9VHhjBJNqEPgAAgD9VHhjBJNqEPgAAgL9VHhjBEm0cPwAAgL9VHhjBJNqEPgAAgD9VHhjBEm0cPwAAgD9VHhjBJNqEPgAAgL9Vjg7Bu2QjwAAAgD9Vjg7Bu2QjwAAAgL9VHhjBJNqEPgAAgL9qvRfBMpDzvgAAgL9qvRfBMpDzvgAAgL+pmhbBf9SPvwAAgL+pmhbBf9SPvwAAgL/09hTBBwHQvwAAgL/09hTBBwHQvwAAgL9iMxPBeY79vwAAgL9iMxPBeY79vwAAgL9jfBHBQh4PwAAAgL9jfBHBQh4PwAAAgL93FhDBlr8ZwAAAgL93FhDBlr8ZwAAAgL9Vjg7Bu2QjwAAAgD9VHhjBJNqEPgAAgD9qvRfBMpDzvgAAgD9qvRfBMpDzvgAAgD+pmhbBf9SPvwAAgD+pmhbBf9SPvwAAgD/09hTBBwHQvwAAgD/09hTBBwHQvwAAgD9iMxPBeY79vwAAgD9iMxPBeY79vwAAgD9jfBHBQh4PwAAAgD9jfBHBQh4PwAAAgD93FhDBlr8ZwAAAgD93FhDBlr8ZwAAAgD9Vjg7Bu2QjwAAAgL9Vjg7Bu2QjwAAAgL8l2QzB7VoswAAAgL8l2QzB7VoswAAAgL/E/grBN4Q0wAAAgL/E/grBN4Q0wAAAgL8y/wjBmeA7wAAAgL8y/wjBmeA7wAAAgL9u2gbBE3BCwAAAgL9u2gbBE3BCwAAAgL96kATBpTJIwAAAgL96kATBpTJIwAAAgL9UIQLBTyhNwAAAgL9UIQLBTyhNwAAAgL/6Gf/AElFRwAAAgL/6Gf/AElFRwAAAgL/rpvnA7KxUwAAAgL/rpvnA7KxUwAAAgL956fPA3ztXwAAAgL956fPA3ztXwAAAgL+l4e3A6v1YwAAAgL+l4e3A6v1YwAAAgL/piejAB9tZwAAAgL/piejAB9tZwAAAgL+r/OLAuyRawAAAgD9Vjg7Bu2QjwAAAgD8l2QzB7VoswAAAgD8l2QzB7VoswAAAgD/E/grBN4Q0wAAAgD/E/grBN4Q0wAAAgD8y/wjBmeA7wAAAgD8y/wjBmeA7wAAAgD9u2gbBE3BCwAAAgD9u2gbBE3BCwAAAgD96kATBpTJIwAAAgD96kATBpTJIwAAAgD9UIQLBTyhNwAAAgD9UIQLBTyhNwAAAgD/6Gf/AElFRwAAAgD/6Gf/AElFRwAAAgD/rpvnA7KxUwAAAgD/rpvnA7KxUwAAAgD956fPA3ztXwAAAgD956fPA3ztXwAAAgD+l4e3A6v1YwAAAgD+l4e3A6v1YwAAAgD/piejAB9tZwAAAgD/piejAB9tZwAAAgD+r/OLAuyRawAAAgL+tysG+Em0NPwAAgD+tysG+Em0NPwAAgL+pmnM/os2oQAAAgD+pmnM/os2oQAAAgL+tysG+Em0NPwAAgL9LrbW+WOSpPwAAgL9LrbW+WOSpPwAAgL8kVZG+Iq4DQAAAgL8kVZG+Iq4DQAAAgL+2NzG+TkktQAAAgL+2NzG+TkktQAAAgL+oN8W84WtTQAAAgL+oN8W84WtTQAAAgL97liQ+FV52QAAAgL97liQ+FV52QAAAgL9TXbg+uumJQAAAgL9TXbg+uumJQAAAgL+WOhc/vLKXQAAAgL+WOhc/vLKXQAAAgL/Vl0M/MXegQAAAgL/Vl0M/MXegQAAAgL+pmnM/os2oQAAAgD+tysG+Em0NPwAAgD9LrbW+WOSpPwAAgD9LrbW+WOSpPwAAgD8kVZG+Iq4DQAAAgD8kVZG+Iq4DQAAAgD+2NzG+TkktQAAAgD+2NzG+TkktQAAAgD+oN8W84WtTQAAAgD+oN8W84WtTQAAAgD97liQ+FV52QAAAgD97liQ+FV52QAAAgD9TXbg+uumJQAAAgD9TXbg+uumJQAAAgD+WOhc/vLKXQAAAgD+WOhc/vLKXQAAAgD/Vl0M/MXegQAAAgD/Vl0M/MXegQAAAgD+pmnM/os2oQAAAgL9VQ5NAok3gQAAAgD9VQ5NAok3gQAAAgL+pmnM/os2oQAAAgL/vB6I/Xay0QAAAgL/vB6I/Xay0QAAAgL+8Bck//iK+QAAAgL+8Bck//iK+QAAAgL/vXu4/dKrFQAAAgL/vXu4/dKrFQAAAgL+o7QpAU0LMQAAAgL+o7QpAU0LMQAAAgL9vvR9AmurRQAAAgL9vvR9AmurRQAAAgL/NnjVASaPWQAAAgL/NnjVASaPWQAAAgL/CkUxAYGzaQAAAgL/CkUxAYGzaQAAAgL9OlmRA30XdQAAAgL9OlmRA30XdQAAAgL9xrH1Axi/fQAAAgL9xrH1Axi/fQAAAgL/544hAKwbgQAAAgL/544hAKwbgQAAAgL9VQ5NAok3gQAAAgD+pmnM/os2oQAAAgD/vB6I/Xay0QAAAgD/vB6I/Xay0QAAAgD+8Bck//iK+QAAAgD+8Bck//iK+QAAAgD/vXu4/dKrFQAAAgD/vXu4/dKrFQAAAgD+o7QpAU0LMQAAAgD+o7QpAU0LMQAAAgD9vvR9AmurRQAAAgD9vvR9AmurRQAAAgD/NnjVASaPWQAAAgD/NnjVASaPWQAAAgD/CkUxAYGzaQAAAgD/CkUxAYGzaQAAAgD9OlmRA30XdQAAAgD9OlmRA30XdQAAAgD9xrH1Axi/fQAAAgD9xrH1Axi/fQAAAgD/544hAKwbgQAAAgD/544hAKwbgQAAAgD9VQ5NAok3gQAAAgL9VI/tAom2uQAAAgD9VI/tAom2uQAAAgL9VQ5NAok3gQAAAgL8n8KJAzIvfQAAAgL8n8KJAzIvfQAAAgL/AWrBA4pHdQAAAgL/AWrBA4pHdQAAAgL+P3rtAFL7aQAAAgL+P3rtAFL7aQAAAgL+W2sZA7OvWQAAAgL+W2sZA7OvWQAAAgL/VTtFAahvSQAAAgL/VTtFAahvSQAAAgL9LO9tAjUzMQAAAgL9LO9tAjUzMQAAAgL/6n+RAVn/FQAAAgL/6n+RAVn/FQAAAgL/gfO1AxbO9QAAAgL/gfO1AxbO9QAAAgL+sf/RAz2m2QAAAgL+sf/RAz2m2QAAAgL9VI/tAom2uQAAAgD9VQ5NAok3gQAAAgD8n8KJAzIvfQAAAgD8n8KJAzIvfQAAAgD/AWrBA4pHdQAAAgD/AWrBA4pHdQAAAgD+P3rtAFL7aQAAAgD+P3rtAFL7aQAAAgD+W2sZA7OvWQAAAgD+W2sZA7OvWQAAAgD/VTtFAahvSQAAAgD/VTtFAahvSQAAAgD9LO9tAjUzMQAAAgD9LO9tAjUzMQAAAgD/6n+RAVn/FQAAAgD/6n+RAVn/FQAAAgD/gfO1AxbO9QAAAgD/gfO1AxbO9QAAAgD+sf/RAz2m2QAAAgD+sf/RAz2m2QAAAgD9VI/tAom2uQAAAgL+rIQFBos3YQAAAgD+rIQFBos3YQAAAgL9VI/tAom2uQAAAgL+rIQFBos3YQAAAgD9VI/tAom2uQAAAgD+rIQFBos3YQAAAgL+rwTBBos3YQAAAgD+rwTBBos3YQAAAgL+rIQFBos3YQAAAgL+rwTBBos3YQAAAgD+rIQFBos3YQAAAgD+rwTBBos3YQAAAgL+rwTBBL3kswQAAgD+rwTBBL3kswQAAgL+rwTBBos3YQAAAgL+rwTBBL3kswQAAgD+rwTBBos3YQAAAgD+rwTBBL3kswQAAgL9Vw/RAL3kswQAAgD9Vw/RAL3kswQAAgL+rwTBBL3kswQAAgL9Vw/RAL3kswQAAgD+rwTBBL3kswQAAgD9Vw/RAL3kswQAAgL9Vw/RAXhKawAAAgD9Vw/RAXhKawAAAgL9Vw/RAL3kswQAAgL9Vw/RAXhKawAAAgD9Vw/RAL3kswQAAgD9Vw/RAXhKawAAAgL9Vg5JAXnLEwAAAgD9Vg5JAXnLEwAAAgL9Vw/RAXhKawAAAgL/PvetANlejwAAAgL/PvetANlejwAAAgL8HFuNAsrSqwAAAgL8HFuNAsrSqwAAAgL+w3NpAEouwwAAAgL+w3NpAEouwwAAAgL8NOtJAi6G1wAAAgL8NOtJAi6G1wAAAgL8gLslAHfi5wAAAgL8gLslAHfi5wAAAgL/puL9AyI69wAAAgL/puL9AyI69wAAAgL9o2rVAjWXAwAAAgL9o2rVAjWXAwAAAgL+bkqtAa3zCwAAAgL+bkqtAa3zCwAAAgL+F4aBAY9PDwAAAgL+F4aBAY9PDwAAAgL88yJlAn0rEwAAAgL88yJlAn0rEwAAAgL9Vg5JAXnLEwAAAgD9Vw/RAXhKawAAAgD/PvetANlejwAAAgD/PvetANlejwAAAgD8HFuNAsrSqwAAAgD8HFuNAsrSqwAAAgD+w3NpAEouwwAAAgD+w3NpAEouwwAAAgD8NOtJAi6G1wAAAgD8NOtJAi6G1wAAAgD8gLslAHfi5wAAAgD8gLslAHfi5wAAAgD/puL9AyI69wAAAgD/puL9AyI69wAAAgD9o2rVAjWXAwAAAgD9o2rVAjWXAwAAAgD+bkqtAa3zCwAAAgD+bkqtAa3zCwAAAgD+F4aBAY9PDwAAAgD+F4aBAY9PDwAAAgD88yJlAn0rEwAAAgD88yJlAn0rEwAAAgD9Vg5JAXnLEwAAAgL+pGng/XjKMwAAAgD+pGng/XjKMwAAAgL9Vg5JAXnLEwAAAgL/bHIJAiLDDwAAAgL/bHIJAiLDDwAAAgL8qDWhAnrbBwAAAgL8qDWhAnrbBwAAAgL8ayU9A0OK+wAAAgL8ayU9A0OK+wAAAgL+PjThAqBC7wAAAgL+PjThAqBC7wAAAgL+MWiJAJUC2wAAAgL+MWiJAJUC2wAAAgL8PMA1ASXGwwAAAgL8PMA1ASXGwwAAAgL8zHPI/EqSpwAAAgL8zHPI/EqSpwAAAgL9V6cs/gdihwAAAgL9V6cs/gdihwAAAgL+Ex6c/lg6ZwAAAgL+Ex6c/lg6ZwAAAgL97e5E/0NWSwAAAgL97e5E/0NWSwAAAgL+pGng/XjKMwAAAgD9Vg5JAXnLEwAAAgD/bHIJAiLDDwAAAgD/bHIJAiLDDwAAAgD8qDWhAnrbBwAAAgD8qDWhAnrbBwAAAgD8ayU9A0OK+wAAAgD8ayU9A0OK+wAAAgD+PjThAqBC7wAAAgD+PjThAqBC7wAAAgD+MWiJAJUC2wAAAgD+MWiJAJUC2wAAAgD8PMA1ASXGwwAAAgD8PMA1ASXGwwAAAgD8zHPI/EqSpwAAAgD8zHPI/EqSpwAAAgD9V6cs/gdihwAAAgD9V6cs/gdihwAAAgD+Ex6c/lg6ZwAAAgD+Ex6c/lg6ZwAAAgD97e5E/0NWSwAAAgD97e5E/0NWSwAAAgD+pGng/XjKMwAAAgL+pGng/XjKMwAAAgL8t+S8/NmJ+wAAAgL8t+S8/NmJ+wAAAgL+IleA+tCZiwAAAgL+IleA+tCZiwAAAgL++PWQ+N7JDwAAAgL++PWQ+N7JDwAAAgL/2ciQ9vQQjwAAAgL/2ciQ9vQQjwAAAgL/lb+C9SB4AwAAAgL/lb+C9SB4AwAAAgL9RwGe+rv21vwAAgL9RwGe+rv21vwAAgL9PXqa+5k0ovwAAgL9PXqa+5k0ovwAAgL+W77q+9F2IvQAAgL+W77q+9F2IvQAAgL+tysG+Em0NPwAAgD+pGng/XjKMwAAAgD8t+S8/NmJ+wAAAgD8t+S8/NmJ+wAAAgD+IleA+tCZiwAAAgD+IleA+tCZiwAAAgD++PWQ+N7JDwAAAgD++PWQ+N7JDwAAAgD/2ciQ9vQQjwAAAgD/2ciQ9vQQjwAAAgD/lb+C9SB4AwAAAgD/lb+C9SB4AwAAAgD9RwGe+rv21vwAAgD9RwGe+rv21vwAAgD9PXqa+5k0ovwAAgD9PXqa+5k0ovwAAgD+W77q+9F2IvQAAgD+W77q+9F2IvQAAgD+tysG+Em0NPwAAgL+qhkBAJNqcPgAAgD+qhkBAJNqcPgAAgL+qZmlAu2QdwAAAgD+qZmlAu2QdwAAAgL+qhkBAJNqcPgAAgL9XCkJAubW4vgAAgL9XCkJAubW4vgAAgL9clUZAvq92vwAAgL9clUZAvq92vwAAgL+aWE1AyGO6vwAAgL+aWE1AyGO6vwAAgL8oqVRAHXjovwAAgL8oqVRAHXjovwAAgL9PplxAzA8HwAAAgL9PplxAzA8HwAAAgL9sumJAjKESwAAAgL9sumJAjKESwAAAgL+qZmlAu2QdwAAAgD+qhkBAJNqcPgAAgD9XCkJAubW4vgAAgD9XCkJAubW4vgAAgD9clUZAvq92vwAAgD9clUZAvq92vwAAgD+aWE1AyGO6vwAAgD+aWE1AyGO6vwAAgD8oqVRAHXjovwAAgD8oqVRAHXjovwAAgD9PplxAzA8HwAAAgD9PplxAzA8HwAAAgD9sumJAjKESwAAAgD9sumJAjKESwAAAgD+qZmlAu2QdwAAAgL9VQ65AuyRawAAAgD9VQ65AuyRawAAAgL+qZmlAu2QdwAAAgL9mxnBABIQnwAAAgL9mxnBABIQnwAAAgL/Hp3hAT7cwwAAAgL/Hp3hAT7cwwAAAgL9nhYBAnf44wAAAgL9nhYBAnf44wAAAgL+994RA7llAwAAAgL+994RA7llAwAAAgL/nqolAQ8lGwAAAgL/nqolAQ8lGwAAAgL/jno5AmkxMwAAAgL/jno5AmkxMwAAAgL+y05NA9ONQwAAAgL+y05NA9ONQwAAAgL9USZlAUo9UwAAAgL9USZlAUo9UwAAAgL/K/55Ask5XwAAAgL/K/55Ask5XwAAAgL8S96RAFSJZwAAAgL8S96RAFSJZwAAAgL9wi6lAEuRZwAAAgL9wi6lAEuRZwAAAgL9VQ65AuyRawAAAgD+qZmlAu2QdwAAAgD9mxnBABIQnwAAAgD9mxnBABIQnwAAAgD/Hp3hAT7cwwAAAgD/Hp3hAT7cwwAAAgD9nhYBAnf44wAAAgD9nhYBAnf44wAAAgD+994RA7llAwAAAgD+994RA7llAwAAAgD/nqolAQ8lGwAAAgD/nqolAQ8lGwAAAgD/jno5AmkxMwAAAgD/jno5AmkxMwAAAgD+y05NA9ONQwAAAgD+y05NA9ONQwAAAgD9USZlAUo9UwAAAgD9USZlAUo9UwAAAgD/K/55Ask5XwAAAgD/K/55Ask5XwAAAgD8S96RAFSJZwAAAgD8S96RAFSJZwAAAgD9wi6lAEuRZwAAAgD9wi6lAEuRZwAAAgD9VQ65AuyRawAAAgL9Vw/RAu6QKwAAAgD9Vw/RAu6QKwAAAgL9VQ65AuyRawAAAgL9+DLlAYSZZwAAAgL9+DLlAYSZZwAAAgL+DIcJAhY5WwAAAgL+DIcJAhY5WwAAAgL9pzMlAvthSwAAAgL9pzMlAvthSwAAAgL8GStBAlGROwAAAgL8GStBAlGROwAAAgL9uzNVASXtJwAAAgL9uzNVASXtJwAAAgL9F/tpAArdDwAAAgL9F/tpAArdDwAAAgL+L399AwRc9wAAAgL+L399AwRc9wAAAgL8/cORAhJ01wAAAgL8/cORAhJ01wAAAgL9hsOhATUgtwAAAgL9hsOhATUgtwAAAgL/yn+xAGhgkwAAAgL/yn+xAGhgkwAAAgL/xPvBA7QwawAAAgL/xPvBA7QwawAAAgL+olPJA4o0SwAAAgL+olPJA4o0SwAAAgL9Vw/RAu6QKwAAAgD9VQ65AuyRawAAAgD9+DLlAYSZZwAAAgD9+DLlAYSZZwAAAgD+DIcJAhY5WwAAAgD+DIcJAhY5WwAAAgD9pzMlAvthSwAAAgD9pzMlAvthSwAAAgD8GStBAlGROwAAAgD8GStBAlGROwAAAgD9uzNVASXtJwAAAgD9uzNVASXtJwAAAgD9F/tpAArdDwAAAgD9F/tpAArdDwAAAgD+L399AwRc9wAAAgD+L399AwRc9wAAAgD8/cORAhJ01wAAAgD8/cORAhJ01wAAAgD9hsOhATUgtwAAAgD9hsOhATUgtwAAAgD/yn+xAGhgkwAAAgD/yn+xAGhgkwAAAgD/xPvBA7QwawAAAgD/xPvBA7QwawAAAgD+olPJA4o0SwAAAgD+olPJA4o0SwAAAgD9Vw/RAu6QKwAAAgL9Vw/RARZtEQAAAgD9Vw/RARZtEQAAAgL9Vw/RAu6QKwAAAgL9Vw/RARZtEQAAAgD9Vw/RAu6QKwAAAgD9Vw/RARZtEQAAAgL9VA69Aoo2IQAAAgD9VA69Aoo2IQAAAgL9Vw/RARZtEQAAAgL+NpfFAYWFPQAAAgL+NpfFAYWFPQAAAgL/FN+5AQlZZQAAAgL/FN+5AQlZZQAAAgL/9eepA6HliQAAAgL/9eepA6HliQAAAgL80bOZAUsxqQAAAgL80bOZAUsxqQAAAgL9sDuJAgU1yQAAAgL9sDuJAgU1yQAAAgL+jYN1AdP14QAAAgL+jYN1AdP14QAAAgL/aYthALNx+QAAAgL/aYthALNx+QAAAgL8RFdNA1PSBQAAAgL8RFdNA1PSBQAAAgL9Id81A9RKEQAAAgL9Id81A9RKEQAAAgL9/icdAd8iFQAAAgL9/icdAd8iFQAAAgL+1S8FAXBWHQAAAgL+1S8FAXBWHQAAAgL/rvbpAo/mHQAAAgL/rvbpAo/mHQAAAgL/r/LRAo2iIQAAAgL/r/LRAo2iIQAAAgL9VA69Aoo2IQAAAgD9Vw/RARZtEQAAAgD+NpfFAYWFPQAAAgD+NpfFAYWFPQAAAgD/FN+5AQlZZQAAAgD/FN+5AQlZZQAAAgD/9eepA6HliQAAAgD/9eepA6HliQAAAgD80bOZAUsxqQAAAgD80bOZAUsxqQAAAgD9sDuJAgU1yQAAAgD9sDuJAgU1yQAAAgD+jYN1AdP14QAAAgD+jYN1AdP14QAAAgD/aYthALNx+QAAAgD/aYthALNx+QAAAgD8RFdNA1PSBQAAAgD8RFdNA1PSBQAAAgD9Id81A9RKEQAAAgD9Id81A9RKEQAAAgD9/icdAd8iFQAAAgD9/icdAd8iFQAAAgD+1S8FAXBWHQAAAgD+1S8FAXBWHQAAAgD/rvbpAo/mHQAAAgD/rvbpAo/mHQAAAgD/r/LRAo2iIQAAAgD/r/LRAo2iIQAAAgD9VA69Aoo2IQAAAgL+qxmlARVtUQAAAgD+qxmlARVtUQAAAgL9VA69Aoo2IQAAAgL94kKhAz1GIQAAAgL94kKhAz1GIQAAAgL8TYKJAVJ6HQAAAgL8TYKJAVJ6HQAAAgL8ocpxAM3OGQAAAgL8ocpxAM3OGQAAAgL+2xpZAa9CEQAAAgL+2xpZAa9CEQAAAgL++XZFA+7WCQAAAgL++XZFA+7WCQAAAgL8+N4xA5SOAQAAAgL8+N4xA5SOAQAAAgL84U4dAUDR6QAAAgL84U4dAUDR6QAAAgL+rsYJAiDFzQAAAgL+rsYJAiDFzQAAAgL8tpXxAcT9rQAAAgL8tpXxAcT9rQAAAgL/4a3RADV5iQAAAgL/4a3RADV5iQAAAgL+2+G5AWpdbQAAAgL+2+G5AWpdbQAAAgL+qxmlARVtUQAAAgD9VA69Aoo2IQAAAgD94kKhAz1GIQAAAgD94kKhAz1GIQAAAgD8TYKJAVJ6HQAAAgD8TYKJAVJ6HQAAAgD8ocpxAM3OGQAAAgD8ocpxAM3OGQAAAgD+2xpZAa9CEQAAAgD+2xpZAa9CEQAAAgD++XZFA+7WCQAAAgD++XZFA+7WCQAAAgD8+N4xA5SOAQAAAgD8+N4xA5SOAQAAAgD84U4dAUDR6QAAAgD84U4dAUDR6QAAAgD+rsYJAiDFzQAAAgD+rsYJAiDFzQAAAgD8tpXxAcT9rQAAAgD8tpXxAcT9rQAAAgD/4a3RADV5iQAAAgD/4a3RADV5iQAAAgD+2+G5AWpdbQAAAgD+2+G5AWpdbQAAAgD+qxmlARVtUQAAAgL+qxmlARVtUQAAAgL8DoWFA6exGQAAAgL8DoWFA6exGQAAAgL+UYFpAoPI3QAAAgL+UYFpAoPI3QAAAgL9eBVRAaWwnQAAAgL9eBVRAaWwnQAAAgL9hj05ARFoVQAAAgL9hj05ARFoVQAAAgL+c/klAMbwBQAAAgL+c/klAMbwBQAAAgL/TTEVAZ1jKPwAAgL/TTEVAZ1jKPwAAgL/p60FAu4GDPwAAgL/p60FAu4GDPwAAgL/630BAUiEtPwAAgL/630BAUiEtPwAAgL+qhkBAJNqcPgAAgD+qxmlARVtUQAAAgD8DoWFA6exGQAAAgD8DoWFA6exGQAAAgD+UYFpAoPI3QAAAgD+UYFpAoPI3QAAAgD9eBVRAaWwnQAAAgD9eBVRAaWwnQAAAgD9hj05ARFoVQAAAgD9hj05ARFoVQAAAgD+c/klAMbwBQAAAgD+c/klAMbwBQAAAgD/TTEVAZ1jKPwAAgD/TTEVAZ1jKPwAAgD/p60FAu4GDPwAAgD/p60FAu4GDPwAAgD/630BAUiEtPwAAgD/630BAUiEtPwAAgD+qhkBAJNqcPpR0lGJdlIaUdWhKjAcjZmZmZmZmlGhMfZQoaE5Hv/A7tQMA/5hoT0c/8Du1AwD/gGhQR8Ap0UFNj37GaFFHQCYfq/MwwR5oUkfAJZacfAdO+mhTR0AcGKGJceHTdWhUaA11ZYwDbG9jlE5oFowQanVweXRlciBjYWRxdWVyeZR1jAR0cmVllH2UKGgVjARub2RllGgWaHVoFEsDjAhjaGlsZHJlbpRdlCh9lChoFYwEbGVhZpRoFmgXaBRLAWhKjAcjMjk4MGI5lHV9lChoFWh8aBZoVmgUSwJoSowHI2ZmZmZmZpR1ZXVoTIwaanVweXRlcl9jYWRxdWVyeS5vY3BfdXRpbHOUjAtCb3VuZGluZ0JveJSTlCmBlH2UKIwHb3B0aW1hbJSJjAN0b2yURz7k+LWI42jxaE5Hv/Brl29yQfxoT0c/8GuXb3JB/2hQR8AyuR7L4VRgaFFHQDK4zwNUofNoUkfAM7tWnuBhA2hTR0AzuvfaulgkjAV4c2l6ZZRHQABrl29yQf6MBXlzaXpllEdAQrj255r7KowFenNpemWUR0BDuyc8zVyUjAZjZW50ZXKURzzAAAAAAAAAR79D8iMsmwAAR79HsQmCN4AAh5SMA21heJRHQDO7Vp7gYQN1YnVoFWgBjAZjb25maWeUfZQojAZoZWlnaHSUTVgCjAp0cmVlX3dpZHRolEv6jAljYWRfd2lkdGiUTSADjAliYl9mYWN0b3KURz/wAAAAAAAAjA1kZWZhdWx0X2NvbG9ylEvoS7BLJIeUjBFkZWZhdWx0X2VkZ2Vjb2xvcpRLwEvAS8CHlIwMcmVuZGVyX2VkZ2VzlIiMDnJlbmRlcl9ub3JtYWxzlImMDHJlbmRlcl9tYXRlc5SJjAptYXRlX3NjYWxllEsBjAdxdWFsaXR5lE6MCWRldmlhdGlvbpRHP7mZmZmZmZqMEWFuZ3VsYXJfdG9sZXJhbmNllEc/yZmZmZmZmowNZWRnZV9hY2N1cmFjeZROjApvcHRpbWFsX2JilImMBGF4ZXOUiYwFYXhlczCUiYwEZ3JpZJSIjAV0aWNrc5RLA4wFb3J0aG+UiYwLdHJhbnNwYXJlbnSUiYwLYmxhY2tfZWRnZXOUiYwRYW1iaWVudF9pbnRlbnNpdHmURz/wAAAAAAAAjBBkaXJlY3RfaW50ZW5zaXR5lEc/vrhR64UeuIwMcmVzZXRfY2FtZXJhlIiMDW1hY19zY3JvbGxiYXKUiIwHZGlzcGxheZSMB3NpZGVjYXKUjAV0b29sc5SIjAZ0aW1laXSUiYwIcG9zaXRpb26UR0BgRMzMzMzNR0BVM9cKPXCkR0BI1cKPXCj2h5SMBHpvb22UR0ABmZmZmZmadYwFY291bnSUSwJ1Lg=='
\ No newline at end of file
+LOGO_DATA = 'gASVyAMBAAAAAAB9lCiMBGRhdGGUfZQojAdtYXBwaW5nlH2UKIwBMZR9lCiMBHBhdGiUSwCFlIwFc3RhdGWUXZQoSwFLAWV1jAEylH2UKGgHSwGFlGgJXZQoSwFLAWV1dYwGc2hhcGVzlH2UKIwFcGFydHOUXZQofZQojAJpZJRLAYwEdHlwZZRoD4wEbmFtZZSMB2p1cHl0ZXKUjAVzaGFwZZR9lCiMCHZlcnRpY2VzlIwWbnVtcHkuX2NvcmUubXVsdGlhcnJheZSMDF9yZWNvbnN0cnVjdJSTlIwFbnVtcHmUjAduZGFycmF5lJOUSwCFlEMBYpSHlFKUKEsBTRgCSwOGlGgejAVkdHlwZZSTlIwCZjSUiYiHlFKUKEsDjAE8lE5OTkr/////Sv////9LAHSUYolCIBkAAAAAgL+LrCy6sO5cwQAAgD+LrCy6sO5cwQAAgD8X1+0/AxpcwQAAgD/tKWtAvKdZwQAAgD8BH69AoJNVwQAAgD+mFOdACe9PwQAAgD/QhA5Bc8xIwQAAgD83xCVB5i1BwQAAgD9J4jtBx4I4wQAAgD/gvFBBReMuwQAAgD86NmRB22kkwQAAgD//NXZBeTIZwQAAgD/4VINBfVkNwQAAgD8Sw4pBsfoAwQAAgD/6aJBBwmTswAAAgD+skJVBFfPVwAAAgL+skJVBFfPVwAAAgL8X1+0/AxpcwQAAgL/tKWtAvKdZwQAAgL8BH69AoJNVwQAAgL+mFOdACe9PwQAAgL/QhA5Bc8xIwQAAgL83xCVB5i1BwQAAgL9J4jtBx4I4wQAAgL/gvFBBReMuwQAAgL86NmRB22kkwQAAgL//NXZBeTIZwQAAgL/4VINBfVkNwQAAgL8Sw4pBsfoAwQAAgL/6aJBBwmTswAAAgL+skJVBFfPVwAAAgD+skJVBFfPVwAAAgD8/KpFB0VoAwQAAgD97BoxBpvQUwQAAgD9/H4ZBCN0owQAAgD/PBH9BV+A7wQAAgD8N9HFBRCNMwQAAgD+A2GNBjoRbwQAAgD9ewVRB0PJpwQAAgD+u5kVB33R2wQAAgD/jQDZBGgqBwQAAgL/jQDZBGgqBwQAAgL8/KpFB0VoAwQAAgL97BoxBpvQUwQAAgL9/H4ZBCN0owQAAgL/PBH9BV+A7wQAAgL8N9HFBRCNMwQAAgL+A2GNBjoRbwQAAgL9ewVRB0PJpwQAAgL+u5kVB33R2wQAAgL/jQDZBGgqBwQAAgD/jQDZBGgqBwQAAgD9k0CJBKUyHwQAAgD8imw5BLtCMwQAAgD/QFfNA0puRwQAAgD9spcdAZqGVwQAAgD8Qnp9AzJGYwQAAgD9gxW1AYtmawQAAgD9HQBtAX3WcwQAAgD8Ayps/r1idwQAAgD+LrCy66aSdwQAAgL+LrCy66aSdwQAAgL9k0CJBKUyHwQAAgL8imw5BLtCMwQAAgL/QFfNA0puRwQAAgL9spcdAZqGVwQAAgL8Qnp9AzJGYwQAAgL9gxW1AYtmawQAAgL9HQBtAX3WcwQAAgL8Ayps/r1idwQAAgL+LrCy66aSdwQAAgD+LrCy66aSdwQAAgD+u6ri/rjmdwQAAgD83ATjARvqbwQAAgD+5iInA/uSZwQAAgD/gX7bALf2WwQAAgD8K8d3Anq6TwQAAgD8ESgLB0buPwQAAgD/UDhXB4iiLwQAAgD9+8SXBy1yGwQAAgD/qRTbBGgqBwQAAgL/qRTbBGgqBwQAAgL+u6ri/rjmdwQAAgL83ATjARvqbwQAAgL+5iInA/uSZwQAAgL/gX7bALf2WwQAAgL8K8d3Anq6TwQAAgL8ESgLB0buPwQAAgL/UDhXB4iiLwQAAgL9+8SXBy1yGwQAAgL/qRTbBGgqBwQAAgD/qRTbBGgqBwQAAgD8iwUjBJTB0wQAAgD8jHFrBsw9lwQAAgD9KaWrB7aFUwQAAgD8wfXnBMA1DwQAAgD/g+ILBj1EywQAAgD9wpIjBZswgwQAAgD/Huo3BzpAOwQAAgD+b6pHB+BX6wAAAgD8rk5XBFfPVwAAAgL8rk5XBFfPVwAAAgL8iwUjBJTB0wQAAgL8jHFrBsw9lwQAAgL9KaWrB7aFUwQAAgL8wfXnBMA1DwQAAgL/g+ILBj1EywQAAgL9wpIjBZswgwQAAgL/Huo3BzpAOwQAAgL+b6pHB+BX6wAAAgL8rk5XBFfPVwAAAgD8rk5XBFfPVwAAAgD/X8o7BcVnywAAAgD8bi4fBsaUGwQAAgD+3Dn7BHuATwQAAgD8OI2vBW20gwQAAgD+yYFbBsykswQAAgD/D3T/BN/A2wQAAgD/luCfBSJxAwQAAgD9vGA7BIQtJwQAAgD8DUubALR1QwQAAgD8N67PARDlVwQAAgD+0AYDACRRZwQAAgD9nwxXAg6BbwQAAgD8/4Ja/bZpcwQAAgD+LrCy6sO5cwQAAgL+LrCy6sO5cwQAAgL/X8o7BcVnywAAAgL8bi4fBsaUGwQAAgL+3Dn7BHuATwQAAgL8OI2vBW20gwQAAgL+yYFbBsykswQAAgL/D3T/BN/A2wQAAgL/luCfBSJxAwQAAgL9vGA7BIQtJwQAAgL8DUubALR1QwQAAgL8N67PARDlVwQAAgL+0AYDACRRZwQAAgL9nwxXAg6BbwQAAgL8/4Ja/bZpcwQAAgL+LrCy6sO5cwQAAgL8X1+0/AxpcwQAAgL/tKWtAvKdZwQAAgL8BH69AoJNVwQAAgL+mFOdACe9PwQAAgL/QhA5Bc8xIwQAAgL83xCVB5i1BwQAAgL9J4jtBx4I4wQAAgL/gvFBBReMuwQAAgL86NmRB22kkwQAAgL//NXZBeTIZwQAAgL/4VINBfVkNwQAAgL8Sw4pBsfoAwQAAgL/6aJBBwmTswAAAgL+skJVBFfPVwAAAgL8/KpFB0VoAwQAAgL97BoxBpvQUwQAAgL9/H4ZBCN0owQAAgL/PBH9BV+A7wQAAgL8N9HFBRCNMwQAAgL+A2GNBjoRbwQAAgL9ewVRB0PJpwQAAgL+u5kVB33R2wQAAgL/jQDZBGgqBwQAAgL9k0CJBKUyHwQAAgL8imw5BLtCMwQAAgL/QFfNA0puRwQAAgL9spcdAZqGVwQAAgL8Qnp9AzJGYwQAAgL9gxW1AYtmawQAAgL9HQBtAX3WcwQAAgL8Ayps/r1idwQAAgL+LrCy66aSdwQAAgL+u6ri/rjmdwQAAgL83ATjARvqbwQAAgL+5iInA/uSZwQAAgL/gX7bALf2WwQAAgL8K8d3Anq6TwQAAgL8ESgLB0buPwQAAgL/UDhXB4iiLwQAAgL9+8SXBy1yGwQAAgL/qRTbBGgqBwQAAgL8iwUjBJTB0wQAAgL8jHFrBsw9lwQAAgL9KaWrB7aFUwQAAgL8wfXnBMA1DwQAAgL/g+ILBj1EywQAAgL9wpIjBZswgwQAAgL/Huo3BzpAOwQAAgL+b6pHB+BX6wAAAgL8rk5XBFfPVwAAAgL/X8o7BcVnywAAAgL8bi4fBsaUGwQAAgL+3Dn7BHuATwQAAgL8OI2vBW20gwQAAgL+yYFbBsykswQAAgL/D3T/BN/A2wQAAgL/luCfBSJxAwQAAgL9vGA7BIQtJwQAAgL8DUubALR1QwQAAgL8N67PARDlVwQAAgL+0AYDACRRZwQAAgL9nwxXAg6BbwQAAgL8/4Ja/bZpcwQAAgD+LrCy6sO5cwQAAgD8X1+0/AxpcwQAAgD/tKWtAvKdZwQAAgD8BH69AoJNVwQAAgD+mFOdACe9PwQAAgD/QhA5Bc8xIwQAAgD83xCVB5i1BwQAAgD9J4jtBx4I4wQAAgD/gvFBBReMuwQAAgD86NmRB22kkwQAAgD//NXZBeTIZwQAAgD/4VINBfVkNwQAAgD8Sw4pBsfoAwQAAgD/6aJBBwmTswAAAgD+skJVBFfPVwAAAgD8/KpFB0VoAwQAAgD97BoxBpvQUwQAAgD9/H4ZBCN0owQAAgD/PBH9BV+A7wQAAgD8N9HFBRCNMwQAAgD+A2GNBjoRbwQAAgD9ewVRB0PJpwQAAgD+u5kVB33R2wQAAgD/jQDZBGgqBwQAAgD9k0CJBKUyHwQAAgD8imw5BLtCMwQAAgD/QFfNA0puRwQAAgD9spcdAZqGVwQAAgD8Qnp9AzJGYwQAAgD9gxW1AYtmawQAAgD9HQBtAX3WcwQAAgD8Ayps/r1idwQAAgD+LrCy66aSdwQAAgD+u6ri/rjmdwQAAgD83ATjARvqbwQAAgD+5iInA/uSZwQAAgD/gX7bALf2WwQAAgD8K8d3Anq6TwQAAgD8ESgLB0buPwQAAgD/UDhXB4iiLwQAAgD9+8SXBy1yGwQAAgD/qRTbBGgqBwQAAgD8iwUjBJTB0wQAAgD8jHFrBsw9lwQAAgD9KaWrB7aFUwQAAgD8wfXnBMA1DwQAAgD/g+ILBj1EywQAAgD9wpIjBZswgwQAAgD/Huo3BzpAOwQAAgD+b6pHB+BX6wAAAgD8rk5XBFfPVwAAAgD/X8o7BcVnywAAAgD8bi4fBsaUGwQAAgD+3Dn7BHuATwQAAgD8OI2vBW20gwQAAgD+yYFbBsykswQAAgD/D3T/BN/A2wQAAgD/luCfBSJxAwQAAgD9vGA7BIQtJwQAAgD8DUubALR1QwQAAgD8N67PARDlVwQAAgD+0AYDACRRZwQAAgD9nwxXAg6BbwQAAgD8/4Ja/bZpcwQAAgL+LrCy64+hcQQAAgD+LrCy64+hcQQAAgD+LAe6/NhRcQQAAgD/YPmvA76FZQQAAgD9XKa/A0o1VQQAAgD/iHufAO+lPQQAAgD/kiQ7Bo8ZIQQAAgD9EySXBFShBQQAAgD9Q5zvB9Hw4QQAAgD/jwVDBbt0uQQAAgD86O2TBAWQkQQAAgD/+OnbBmywZQQAAgD92V4PBnFMNQQAAgD+QxYrBy/QAQQAAgD94a5DB8VjsQAAAgD8rk5XBPOfVQAAAgL8rk5XBPOfVQAAAgL+LAe6/NhRcQQAAgL/YPmvA76FZQQAAgL9XKa/A0o1VQQAAgL/iHufAO+lPQQAAgL/kiQ7Bo8ZIQQAAgL9EySXBFShBQQAAgL9Q5zvB9Hw4QQAAgL/jwVDBbt0uQQAAgL86O2TBAWQkQQAAgL/+OnbBmywZQQAAgL92V4PBnFMNQQAAgL+QxYrBy/QAQQAAgL94a5DB8VjsQAAAgL8rk5XBPOfVQAAAgD8rk5XBPOfVQAAAgD/QLJHBxVQAQQAAgD8fCYzBfO4UQQAAgD81IobBxtYoQQAAgD9bCn/BAto7QQAAgD+y+XHB4hxMQQAAgD873mPBJX5bQQAAgD8sx1TBZexpQQAAgD8f7EXByG52QQAAgD/qRTbBNAeBQQAAgL/qRTbBNAeBQQAAgL/QLJHBxVQAQQAAgL8fCYzBfO4UQQAAgL81IobBxtYoQQAAgL9bCn/BAto7QQAAgL+y+XHB4hxMQQAAgL873mPBJX5bQQAAgL8sx1TBZexpQQAAgL8f7EXByG52QQAAgL/qRTbBNAeBQQAAgD/qRTbBNAeBQQAAgD/a1SLBLEmHQQAAgD8CoQ7BHc2MQQAAgD8BIvPAvZiRQQAAgD/escfAUZ6VQQAAgD+Zqp/Au46YQQAAgD953m3AWNaaQQAAgD9OWRvAW3KcQQAAgD99+Ju/tVWdQQAAgD+LrCy686GdQQAAgL+LrCy686GdQQAAgL/a1SLBLEmHQQAAgL8CoQ7BHc2MQQAAgL8BIvPAvZiRQQAAgL/escfAUZ6VQQAAgL+Zqp/Au46YQQAAgL953m3AWNaaQQAAgL9OWRvAW3KcQQAAgL99+Ju/tVWdQQAAgL+LrCy686GdQQAAgD+LrCy686GdQQAAgD9ewbg/tzadQQAAgD9E7TdAT/ebQQAAgD/RfolACOKZQQAAgD/wVbZAOfqWQQAAgD8K591ArauTQQAAgD8ARQJB4biPQQAAgD/TCRVB8yWLQQAAgD917CVB4FmGQQAAgD/jQDZBNAeBQQAAgL/jQDZBNAeBQQAAgL9ewbg/tzadQQAAgL9E7TdAT/ebQQAAgL/RfolACOKZQQAAgL/wVbZAOfqWQQAAgL8K591ArauTQQAAgL8ARQJB4biPQQAAgL/TCRVB8yWLQQAAgL917CVB4FmGQQAAgL/jQDZBNAeBQQAAgD/jQDZBNAeBQQAAgD8VvEhBUip0QQAAgD8TF1pB2AllQQAAgD86ZGpBBpxUQQAAgD8leHlBOQdDQQAAgD9e9oJBhksyQQAAgD/0oYhBR8YgQQAAgD9SuI1Bk4oOQQAAgD8g6JFBzwn6QAAAgD+skJVBPOfVQAAAgL+skJVBPOfVQAAAgL8VvEhBUip0QQAAgL8TF1pB2AllQQAAgL86ZGpBBpxUQQAAgL8leHlBOQdDQQAAgL9e9oJBhksyQQAAgL/0oYhBR8YgQQAAgL9SuI1Bk4oOQQAAgL8g6JFBzwn6QAAAgL+skJVBPOfVQAAAgD+skJVBPOfVQAAAgD9H9I5B9z3yQAAAgD+cj4dBPJIGQQAAgD/WGX5BmsoTQQAAgD94LWtB4VcgQQAAgD8EaFZBwxUsQQAAgD8/4D9But42QQAAgD+otSdBnY1AQQAAgD+RDw5BNP9IQQAAgD8/N+ZAmhNQQQAAgD/py7NATDFVQQAAgD/dxX9ALg1ZQQAAgD9CkhVAUZpbQQAAgD9Cl5Y/hJRcQQAAgD+LrCy64+hcQQAAgL+LrCy64+hcQQAAgL9H9I5B9z3yQAAAgL+cj4dBPJIGQQAAgL/WGX5BmsoTQQAAgL94LWtB4VcgQQAAgL8EaFZBwxUsQQAAgL8/4D9But42QQAAgL+otSdBnY1AQQAAgL+RDw5BNP9IQQAAgL8/N+ZAmhNQQQAAgL/py7NATDFVQQAAgL/dxX9ALg1ZQQAAgL9CkhVAUZpbQQAAgL9Cl5Y/hJRcQQAAgL+LrCy64+hcQQAAgL+LAe6/NhRcQQAAgL/YPmvA76FZQQAAgL9XKa/A0o1VQQAAgL/iHufAO+lPQQAAgL/kiQ7Bo8ZIQQAAgL9EySXBFShBQQAAgL9Q5zvB9Hw4QQAAgL/jwVDBbt0uQQAAgL86O2TBAWQkQQAAgL/+OnbBmywZQQAAgL92V4PBnFMNQQAAgL+QxYrBy/QAQQAAgL94a5DB8VjsQAAAgL8rk5XBPOfVQAAAgL/QLJHBxVQAQQAAgL8fCYzBfO4UQQAAgL81IobBxtYoQQAAgL9bCn/BAto7QQAAgL+y+XHB4hxMQQAAgL873mPBJX5bQQAAgL8sx1TBZexpQQAAgL8f7EXByG52QQAAgL/qRTbBNAeBQQAAgL/a1SLBLEmHQQAAgL8CoQ7BHc2MQQAAgL8BIvPAvZiRQQAAgL/escfAUZ6VQQAAgL+Zqp/Au46YQQAAgL953m3AWNaaQQAAgL9OWRvAW3KcQQAAgL99+Ju/tVWdQQAAgL+LrCy686GdQQAAgL9ewbg/tzadQQAAgL9E7TdAT/ebQQAAgL/RfolACOKZQQAAgL/wVbZAOfqWQQAAgL8K591ArauTQQAAgL8ARQJB4biPQQAAgL/TCRVB8yWLQQAAgL917CVB4FmGQQAAgL/jQDZBNAeBQQAAgL8VvEhBUip0QQAAgL8TF1pB2AllQQAAgL86ZGpBBpxUQQAAgL8leHlBOQdDQQAAgL9e9oJBhksyQQAAgL/0oYhBR8YgQQAAgL9SuI1Bk4oOQQAAgL8g6JFBzwn6QAAAgL+skJVBPOfVQAAAgL9H9I5B9z3yQAAAgL+cj4dBPJIGQQAAgL/WGX5BmsoTQQAAgL94LWtB4VcgQQAAgL8EaFZBwxUsQQAAgL8/4D9But42QQAAgL+otSdBnY1AQQAAgL+RDw5BNP9IQQAAgL8/N+ZAmhNQQQAAgL/py7NATDFVQQAAgL/dxX9ALg1ZQQAAgL9CkhVAUZpbQQAAgL9Cl5Y/hJRcQQAAgD+LrCy64+hcQQAAgD+LAe6/NhRcQQAAgD/YPmvA76FZQQAAgD9XKa/A0o1VQQAAgD/iHufAO+lPQQAAgD/kiQ7Bo8ZIQQAAgD9EySXBFShBQQAAgD9Q5zvB9Hw4QQAAgD/jwVDBbt0uQQAAgD86O2TBAWQkQQAAgD/+OnbBmywZQQAAgD92V4PBnFMNQQAAgD+QxYrBy/QAQQAAgD94a5DB8VjsQAAAgD8rk5XBPOfVQAAAgD/QLJHBxVQAQQAAgD8fCYzBfO4UQQAAgD81IobBxtYoQQAAgD9bCn/BAto7QQAAgD+y+XHB4hxMQQAAgD873mPBJX5bQQAAgD8sx1TBZexpQQAAgD8f7EXByG52QQAAgD/qRTbBNAeBQQAAgD/a1SLBLEmHQQAAgD8CoQ7BHc2MQQAAgD8BIvPAvZiRQQAAgD/escfAUZ6VQQAAgD+Zqp/Au46YQQAAgD953m3AWNaaQQAAgD9OWRvAW3KcQQAAgD99+Ju/tVWdQQAAgD+LrCy686GdQQAAgD9ewbg/tzadQQAAgD9E7TdAT/ebQQAAgD/RfolACOKZQQAAgD/wVbZAOfqWQQAAgD8K591ArauTQQAAgD8ARQJB4biPQQAAgD/TCRVB8yWLQQAAgD917CVB4FmGQQAAgD/jQDZBNAeBQQAAgD8VvEhBUip0QQAAgD8TF1pB2AllQQAAgD86ZGpBBpxUQQAAgD8leHlBOQdDQQAAgD9e9oJBhksyQQAAgD/0oYhBR8YgQQAAgD9SuI1Bk4oOQQAAgD8g6JFBzwn6QAAAgD+skJVBPOfVQAAAgD9H9I5B9z3yQAAAgD+cj4dBPJIGQQAAgD/WGX5BmsoTQQAAgD94LWtB4VcgQQAAgD8EaFZBwxUsQQAAgD8/4D9But42QQAAgD+otSdBnY1AQQAAgD+RDw5BNP9IQQAAgD8/N+ZAmhNQQQAAgD/py7NATDFVQQAAgD/dxX9ALg1ZQQAAgD9CkhVAUZpbQQAAgD9Cl5Y/hJRcQZR0lGKMCXRyaWFuZ2xlc5RoHWggSwCFlGgih5RSlChLAU3oBYWUaCeMAnUylImIh5RSlChLA2grTk5OSv////9K/////0sAdJRiiULQCwAAEQAAAAEAEQABAAIAEgACAAMAEgARAAIAEwADAAQAEwAEAAUAEwASAAMAFAATAAUAFQAFAAYAFQAUAAUAFgAGAAcAFgAVAAYAFwAHAAgAFwAWAAcAGAAIAAkAGAAXAAgAGQAJAAoAGQAYAAkAGgAKAAsAGgAZAAoAGwALAAwAGwAaAAsAHAAMAA0AHAAbAAwAHQANAA4AHQAcAA0AEAAOAA8AEAAdAA4AKgAeAB8AKgAfACAAKwAgACEAKwAqACAALAAhACIALAArACEALQAiACMALQAsACIALgAjACQALgAtACMALwAkACUALwAuACQAMAAlACYAMAAvACUAMQAmACcAMQAnACgAMQAwACYAKQAxACgAPgAyADMAPgAzADQAPwA0ADUAPwA+ADQAQAA1ADYAQAA/ADUAQQA2ADcAQQBAADYAQgA3ADgAQgBBADcAQwA4ADkAQwBCADgARAA5ADoARAA6ADsARABDADkARQBEADsAPQA7ADwAPQBFADsAUgBGAEcAUgBHAEgAUwBIAEkAUwBSAEgAVABJAEoAVABTAEkAVQBKAEsAVQBUAEoAVgBLAEwAVgBMAE0AVgBVAEsAVwBWAE0AWABNAE4AWABXAE0AWQBOAE8AWQBPAFAAWQBYAE4AUQBZAFAAZgBaAFsAZgBbAFwAZwBcAF0AZwBdAF4AZwBmAFwAaABnAF4AaQBeAF8AaQBfAGAAaQBoAF4AagBpAGAAawBgAGEAawBqAGAAbABhAGIAbABrAGEAbQBiAGMAbQBjAGQAbQBsAGIAZQBtAGQAbgBvAHAAfwBwAHEAfwBuAHAAgABxAHIAgAB/AHEAgQByAHMAgQCAAHIAggCBAHMAgwBzAHQAgwCCAHMAhAB0AHUAhACDAHQAhQB1AHYAhQB2AHcAhQCEAHUAhgCFAHcAhwB3AHgAhwCGAHcAiAB4AHkAiACHAHgAiQB5AHoAiQCIAHkAigB6AHsAigB7AHwAigCJAHoAiwCKAHwAfgB8AH0AfgCLAHwAmACbAJwAmACZAJsAmgCbAJkAlwCcAJ0AlwCYAJwAlgCdAJ4AlgCXAJ0AlQCeAJ8AlQCWAJ4AlACfAKAAlACVAJ8AkwCgAKEAkwCUAKAAkgChAKIAkgCiAKMAkgCTAKEAkQCjAKQAkQCSAKMAkACRAKQAkACkAKUAkAClAKYAjwCmAKcAjwCQAKYAjgCPAKcAjgCnAKgAjgCoAKkAjQCOAKkAjQCpAKoAjQCqAKsAjACNAKsAjACrAKwAjACsAK0AywCtAK4AywCMAK0AygCuAK8AygDLAK4AyQCvALAAyQDKAK8AyACwALEAyACxALIAyADJALAAxwDIALIAxwCyALMAxgCzALQAxgC0ALUAxgDHALMAxQC1ALYAxQDGALUAtwDFALYAxADFALcAuADEALcAwwDEALgAuQDDALgAwgDDALkAugDCALkAwQDCALoAuwDBALoAwADBALsAvADAALsAvwDAALwAvQC/ALwAvgC/AL0A2ADcANsA2ADbANkA2gDZANsA1wDdANwA1wDcANgA1gDeAN0A1gDdANcA1QDfAN4A1QDeANYA1ADgAN8A1ADfANUA0wDhAOAA0wDgANQA0gDiAOEA0gDjAOIA0gDhANMA0QDkAOMA0QDjANIA0ADkANEA0ADlAOQA0ADmAOUAzwDnAOYAzwDmANAAzgDnAM8AzgDoAOcAzgDpAOgAzQDpAM4AzQDqAOkAzQDrAOoAzADrAM0AzADsAOsAzADtAOwACwHuAO0ACwHtAMwACgHvAO4ACgHuAAsBCQHwAO8ACQHvAAoBCAHxAPAACAHyAPEACAHwAAkBBwHyAAgBBwHzAPIABgH0APMABgH1APQABgHzAAcBBQH2APUABQH1AAYB9wD2AAUBBAH3AAUB+AD3AAQBAwH4AAQB+QD4AAMBAgH5AAMB+gD5AAIBAQH6AAIB+wD6AAEBAAH7AAEB/AD7AAAB/wD8AAAB/QD8AP8A/gD9AP8AHQEMAQ0BHQENAQ4BHgEOAQ8BHgEdAQ4BHwEPARABHwEeAQ8BIAEQAREBIAEfARABIQERARIBIQEgAREBIgESARMBIgEhARIBIwETARQBIwEiARMBJAEUARUBJAEjARQBJQEVARYBJQEkARUBJgEWARcBJgElARYBJwEXARgBJwEYARkBJwEmARcBKAEnARkBKQEZARoBKQEoARkBHAEaARsBHAEpARoBNgEqASsBNgErASwBNwEsAS0BNwE2ASwBOAEtAS4BOAE3AS0BOQEuAS8BOQE4AS4BOgEvATABOgE5AS8BOwEwATEBOwE6ATABPAExATIBPAE7ATEBPQEyATMBPQEzATQBPQE8ATIBNQE9ATQBSgE+AT8BSgE/AUABSwFAAUEBSwFKAUABTAFBAUIBTAFLAUEBTQFCAUMBTQFDAUQBTQFMAUIBTgFNAUQBTwFEAUUBTwFOAUQBUAFFAUYBUAFPAUUBUQFGAUcBUQFHAUgBUQFQAUYBSQFRAUgBXgFSAVMBXgFTAVQBXwFUAVUBXwFeAVQBYAFVAVYBYAFfAVUBYQFWAVcBYQFXAVgBYQFgAVYBYgFhAVgBYwFYAVkBYwFiAVgBZAFZAVoBZAFjAVkBZQFaAVsBZQFkAVoBXQFbAVwBXQFlAVsBcgFmAWcBcgFnAWgBcwFoAWkBcwFyAWgBdAFpAWoBdAFzAWkBdQFqAWsBdQF0AWoBdgFrAWwBdgF1AWsBdwFsAW0BdwF2AWwBeAFtAW4BeAF3AW0BeQFuAW8BeQF4AW4BcQFvAXABcQF5AW8BiwF6AXsBiwF7AXwBjAF8AX0BjAGLAXwBjQF9AX4BjQF+AX8BjQGMAX0BjgGNAX8BjwF/AYABjwGOAX8BkAGAAYEBkAGPAYABkQGBAYIBkQGCAYMBkQGQAYEBkgGRAYMBkwGDAYQBkwGEAYUBkwGSAYMBlAGTAYUBlQGFAYYBlQGUAYUBlgGGAYcBlgGVAYYBlwGHAYgBlwGWAYcBigGIAYkBigGXAYgBywHJAcoByAHJAcsBzAHIAcsBxwHIAcwBzQHHAcwBxgHHAc0BzgHGAc0BxQHGAc4BzwHFAc4BxAHFAc8B0AHEAc8BwwHEAdAB0QHDAdABwgHDAdEBwQHRAdIBwQHCAdEBwAHBAdIBvwHSAdMBvwHAAdIBvgG/AdMBvgHTAdQBvQG+AdQBvAG9AdQBvAHUAdUBuwG8AdUBuwHVAdYBugG7AdYBugHWAdcBuQG6AdcBuQHXAZgBuAG5AZgBtwGYAZkBtwG4AZgBtgG3AZkBtQGZAZoBtQG2AZkBtAG1AZoBswGaAZsBswG0AZoBsgGbAZwBsgGzAZsBpwGkAaUBpwGlAaYBsQGyAZwBqAGjAaQBqAGkAacBsAGcAZ0BsAGxAZwBqQGiAaMBqQGjAagBrwGdAZ4BrwGwAZ0BqgGhAaIBqgGiAakBrgGvAZ4BqwGgAaEBqwGhAaoBrQGuAZ4BrQGeAZ8BrAGfAaABrAGgAasBrAGtAZ8BCwIKAgkCCAILAgkCDAILAggCBwIMAggCDQIMAgcCBgINAgcCDgINAgYCBQIOAgYCDwIOAgUCBAIPAgUCEAIPAgQCAwIQAgQCEQIQAgMCAgIRAgMCAQISAhECAQIRAgICAAISAgEC/wETAhIC/wESAgAC/gETAv8B/gEUAhMC/QEUAv4B/AEUAv0B/AEVAhQC+wEVAvwB+wEWAhUC+gEWAvsB+gEXAhYC+QEXAvoB+QHYARcC+AHYAfkB9wHZAdgB9wHYAfgB9gHZAfcB9QHaAdkB9QHZAfYB9AHaAfUB8wHbAdoB8wHaAfQB8gHcAdsB8gHbAfMB5wHlAeQB5wHmAeUB8QHcAfIB6AHkAeMB6AHnAeQB8AHdAdwB8AHcAfEB6QHjAeIB6QHoAeMB7wHeAd0B7wHdAfAB6gHiAeEB6gHpAeIB7gHeAe8B6wHhAeAB6wHqAeEB7QHeAe4B7QHfAd4B7AHgAd8B7AHrAeAB7AHfAe0BlHSUYowHbm9ybWFsc5RoHWggSwCFlGgih5RSlChLAU0YAksDhpRoKolCIBkAAAAAAKUgmH8KAACAPwAAAKUgmH8KAACAP5H3BqWZX2W9KZl/PyiGDaXOQeW9F2R+Py/KE6WtCy2+c1F8PymuGaVTF2i+fVZ5P/ErH6W265G+CGJ1P0m+I6V4Iq2+VutwP1btJ6VGrMi+iYRrP7usK6UTiOS+bBVlPynsLqWGVgC/zIFdP7iWMaWTgw6/3KlUP1+SM6WQuRy/LmtKP82/NKUt3Sq/baI+PxIDNaVtpDa/t2EzPxJ9NKU7V0K/6KImPxJ9NKU7V0K/6KImP5H3BqWZX2W9KZl/PyiGDaXOQeW9F2R+Py/KE6WtCy2+c1F8PymuGaVTF2i+fVZ5P/ErH6W265G+CGJ1P0m+I6V4Iq2+VutwP1btJ6VGrMi+iYRrP7usK6UTiOS+bBVlPynsLqWGVgC/zIFdP7iWMaWTgw6/3KlUP1+SM6WQuRy/LmtKP82/NKUt3Sq/baI+PxIDNaVtpDa/t2EzP8pzJCURG3A/BJmxvspzJCURG3A/BJmxvvp/KSUfC2k/q+nTvoikLSWoymA/z/z0vhTlMCX/UFc/KnkKv2w3MyVms0w/c7sZv7l/NCUfN0I/U8gmv3ICNSVq5DY/eSAzv6m+NCVKxyo/CbY+v5TNMyWW2h4/ksBIvxswMiXgSxI/VhRSvxswMiXgSxI/VhRSv/p/KSUfC2k/q+nTvoikLSWoymA/z/z0vhTlMCX/UFc/KnkKv2w3MyVms0w/c7sZv7l/NCUfN0I/U8gmv3ICNSVq5DY/eSAzv6m+NCVKxyo/CbY+v5TNMyWW2h4/ksBIv/0vMiUfSxI/3BRSv/0vMiUfSxI/3BRSv8xoLyVpsQI/MCBcv9y5KyX78OQ+O/tkvx8fJyVQIMM+F65svzKiISVTQ6A+uiJzvwT2GyVDI4A+aNp3vxKeFSWu4z4+OIN7v/6gDiV5Svk9rBh+v0SUByU6Lno9pIV/vwAAACWn5d8pAACAvwAAACWn5d8pAACAv8xoLyVpsQI/MCBcv9y5KyX78OQ+O/tkvx8fJyVQIMM+F65svzKiISVTQ6A+uiJzvwT2GyVDI4A+aNp3vxKeFSWu4z4+OIN7v/6gDiV5Svk9rBh+v0SUByU6Lno9pIV/vwAAACUQ59+pAACAvwAAACUQ59+pAACAv+3I7CRzV5S93FN/v4No2CQKqhO+BlN9vx7KwiQRw1y+4vp5v7QhrCR6XpK+8VB1v0zyliSpH7K+IQJwvzUagSSVItG+f6tpvxJiVSTyRO++glNiv9TdKiS/MAW/qZ9av1oi/yPNSxK/YxRSv1oi/yPNSxK/YxRSv+3I7CRzV5S93FN/v4No2CQKqhO+BlN9vx7KwiQRw1y+4vp5v7QhrCR6XpK+8VB1v0zyliSpH7K+IQJwvzUagSSVItG+f6tpvxJiVSTyRO++glNiv9TdKiS/MAW/qZ9av+Mj/yOTSxK/ixRSv+Mj/yOTSxK/ixRSvwI4lyOcICG/nO5Gv7+muyJrDy+/18k6v2O36KJFJTy/z5ktv10Go6MsP0i/lH0fv+FcAKQrPlK/uw8SvyCxLqRUWFu/xP8Dv+5MXKRDg2O/mLnqvn/wgqQoPGq/U5fOvrlPl6RiG3C/UZexvrlPl6RiG3C/UZexvgI4lyOcICG/nO5Gv7+muyJrDy+/18k6v2O36KJFJTy/z5ktv10Go6MsP0i/lH0fv+FcAKQrPlK/uw8SvyCxLqRUWFu/xP8Dv+5MXKRDg2O/mLnqvn/wgqQoPGq/U5fOvjueYCNFg0I/fm8mPzueYCNFg0I/fm8mP7xFpqE2tzM/TVA2P1LPeKOvzCQ/meZDP01z6qMzUxU/BvBPP0f3KKTAxwU/Y0NaP+eHWaSNjOw+OgpjP66Lg6THv80+kWtqP5nsmKRFO68+PIpwPxIBraT/BZE+EYR1P8Thv6QYQGY+yXF5P8Xpz6Se8TA+LSZ8P5YW36TlMvg98xx+P6Zy7aQpZI89K19/P3Di9qS3Vg893Nd/PwAAAKWDd34KAACAPwAAAKWDd34KAACAP7xFpqE2tzM/TVA2P1LPeKOvzCQ/meZDP01z6qMzUxU/BvBPP0f3KKTAxwU/Y0NaP+eHWaSNjOw+OgpjP66Lg6THv80+kWtqP5nsmKRFO68+PIpwPxIBraT/BZE+EYR1P8Thv6QYQGY+yXF5P8Xpz6Se8TA+LSZ8P5YW36TlMvg98xx+P6Zy7aQpZI89K19/P3Di9qS3Vg893Nd/PwAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAACXxmH+KAACAvwAAACXxmH+KAACAv5b3BiVEYGU9KZl/vzGGDSVqQuU9FWR+vzrKEyUZDC0+blF8vzWuGSXWF2g+dVZ5v/8rHyUB7JE+/WF1v1a+IyXJIq0+R+twv2LtJyWarMg+d4Rrv8asKyVoiOQ+VxVlvzLsLiWwVgA/tIFdv76WMSW7gw4/walUv2OSMyW2uRw/EWtKv8+/NCVP3So/T6I+vxIDNSWKpDY/mWEzvxB9NCVSV0I/zaImvxB9NCVSV0I/zaImv5b3BiVEYGU9KZl/vzGGDSVqQuU9FWR+vzrKEyUZDC0+blF8vzWuGSXWF2g+dVZ5v/8rHyUB7JE+/WF1v1a+IyXJIq0+R+twv2LtJyWarMg+d4Rrv8asKyVoiOQ+VxVlvzLsLiWwVgA/tIFdv76WMSW7gw4/walUv2OSMyW2uRw/EWtKv8+/NCVP3So/T6I+vxIDNSWKpDY/mWEzv3hzJKVxG3C/AZexPnhzJKVxG3C/AZexPr5/KaWDC2m/8+fTPl2kLaUOy2C/Wfv0PvnkMKVjUVe/jngKP1w3M6XGs0y/8roZP7J/NKV9N0K/58cmP3ECNaXF5Da/HCAzP66+NKWkxyq/uLU+P5XNM6We2h6/i8BIPw8wMqWTSxK/ixRSPw8wMqWTSxK/ixRSP75/KaWDC2m/8+fTPl2kLaUOy2C/Wfv0PvnkMKVjUVe/jngKP1w3M6XGs0y/8roZP7J/NKV9N0K/58cmP3ECNaXF5Da/HCAzP66+NKWkxyq/uLU+P5XNM6We2h6/i8BIPyAwMqUETBK/PBRSPyAwMqUETBK/PBRSP/BoL6UYsgK/yB9cPwS6K6U28uS+7PpkP0gfJ6VkIcO+3q1sP1+iIaVfRKC+jiJzPzn2G6VcJIC+Q9p3P1CeFaUP5j6+HIN7P0ahDqWlT/m9mBh+P2yUB6WUM3q9noV/PwAAAKU+ZnsKAACAPwAAAKU+ZnsKAACAP/BoL6UYsgK/yB9cPwS6K6U28uS+7PpkP0gfJ6VkIcO+3q1sP1+iIaVfRKC+jiJzPzn2G6VcJIC+Q9p3P1CeFaUP5j6+HIN7P0ahDqWlT/m9mBh+P2yUB6WUM3q9noV/PwAAAKWqZHsKAACAPwAAAKWqZHsKAACAPxPJ7KRbVpQ93lN/P65o2KR2qRM+C1N9P0vKwqR+wlw+6/p5P9khrKRAXpI++VB1P2rylqR9H7I+KQJwP1IagaRtItE+iKtpP2RiVaS8RO8+kFNiP6PeKqR/MAU/0Z9aP30l/6NWSxI/thRSP30l/6NWSxI/thRSPxPJ7KRbVpQ93lN/P65o2KR2qRM+C1N9P0vKwqR+wlw+6/p5P9khrKRAXpI++VB1P2rylqR9H7I+KQJwP1IagaRtItE+iKtpP2RiVaS8RO8+kFNiP6PeKqR/MAU/0Z9aP9ch/6PgSxI/VhRSP9ch/6PgSxI/VhRSP/Q1l6PkICE/Ye5GP/ieu6KrDy8/m8k6P1u+6CJ6JTw/lZktP8kHoyNUP0g/Yn0fP2RdACRGPlI/lA8SP2SxLiRhWFs/r/8DP+lMXCRCg2M/m7nqPgXwgiQDPGo//JfOPsZOlyQgG3A/tJixPsZOlyQgG3A/tJixPvQ1l6PkICE/Ye5GP/ieu6KrDy8/m8k6P1u+6CJ6JTw/lZktP8kHoyNUP0g/Yn0fP2RdACRGPlI/lA8SP2SxLiRhWFs/r/8DP+lMXCRCg2M/m7nqPgXwgiQDPGo//JfOPu8iYaPrikK/jWYmv+8iYaPrikK/jWYmv9/XpSEUuDO/c082v1vreCPHyiS/M+hDv4WK6iPSTxW/c/JPv9L/KCQaxQW/A0Vav/aIWSTbi+y+aQpjv6SHgyRkxc2+Vmpqv0TkmCR8R6++Aohwv4T1rCTWF5G+b4F1v5fUvyTnama+UW95v7HczyQgHjG+OSR8vzQL3yQRhPi9tht+v4Jq7SQCoY+9o15/v8/d9iRRng+9tNd/vwAAACWzdn6KAACAvwAAACWzdn6KAACAv9/XpSEUuDO/c082v1vreCPHyiS/M+hDv4WK6iPSTxW/c/JPv9L/KCQaxQW/A0Vav/aIWSTbi+y+aQpjv6SHgyRkxc2+Vmpqv0TkmCR8R6++Aohwv4T1rCTWF5G+b4F1v5fUvyTnama+UW95v7HczyQgHjG+OSR8vzQL3yQRhPi9tht+v4Jq7SQCoY+9o15/v8/d9iRRng+9tNd/vwAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgL8AAAAlAAAApQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJQAAgD8AAAClAAAAJZR0lGKMBWVkZ2VzlGgdaCBLAIWUaCKHlFKUKEsBTTABSwOGlGgnjAJmNJSJiIeUUpQoSwNoK05OTkr/////Sv////9LAHSUYolCQA4AAAAAgL+LrCy6sO5cwQAAgD+LrCy6sO5cwQAAgL+skJVBFfPVwAAAgD+skJVBFfPVwAAAgL+LrCy6sO5cwQAAgL8X1+0/AxpcwQAAgL/tKWtAvKdZwQAAgL8BH69AoJNVwQAAgL+mFOdACe9PwQAAgL/QhA5Bc8xIwQAAgL83xCVB5i1BwQAAgL9J4jtBx4I4wQAAgL/gvFBBReMuwQAAgL86NmRB22kkwQAAgL//NXZBeTIZwQAAgL/4VINBfVkNwQAAgL8Sw4pBsfoAwQAAgL/6aJBBwmTswAAAgL+skJVBFfPVwAAAgD+LrCy6sO5cwQAAgD8X1+0/AxpcwQAAgD/tKWtAvKdZwQAAgD8BH69AoJNVwQAAgD+mFOdACe9PwQAAgD/QhA5Bc8xIwQAAgD83xCVB5i1BwQAAgD9J4jtBx4I4wQAAgD/gvFBBReMuwQAAgD86NmRB22kkwQAAgD//NXZBeTIZwQAAgD/4VINBfVkNwQAAgD8Sw4pBsfoAwQAAgD/6aJBBwmTswAAAgD+skJVBFfPVwAAAgL/jQDZBGgqBwQAAgD/jQDZBGgqBwQAAgL+skJVBFfPVwAAAgL8/KpFB0VoAwQAAgL97BoxBpvQUwQAAgL9/H4ZBCN0owQAAgL/PBH9BV+A7wQAAgL8N9HFBRCNMwQAAgL+A2GNBjoRbwQAAgL9ewVRB0PJpwQAAgL+u5kVB33R2wQAAgL/jQDZBGgqBwQAAgD+skJVBFfPVwAAAgD8/KpFB0VoAwQAAgD97BoxBpvQUwQAAgD9/H4ZBCN0owQAAgD/PBH9BV+A7wQAAgD8N9HFBRCNMwQAAgD+A2GNBjoRbwQAAgD9ewVRB0PJpwQAAgD+u5kVB33R2wQAAgD/jQDZBGgqBwQAAgL+LrCy66aSdwQAAgD+LrCy66aSdwQAAgL/jQDZBGgqBwQAAgL9k0CJBKUyHwQAAgL8imw5BLtCMwQAAgL/QFfNA0puRwQAAgL9spcdAZqGVwQAAgL8Qnp9AzJGYwQAAgL9gxW1AYtmawQAAgL9HQBtAX3WcwQAAgL8Ayps/r1idwQAAgL+LrCy66aSdwQAAgD/jQDZBGgqBwQAAgD9k0CJBKUyHwQAAgD8imw5BLtCMwQAAgD/QFfNA0puRwQAAgD9spcdAZqGVwQAAgD8Qnp9AzJGYwQAAgD9gxW1AYtmawQAAgD9HQBtAX3WcwQAAgD8Ayps/r1idwQAAgD+LrCy66aSdwQAAgL/qRTbBGgqBwQAAgD/qRTbBGgqBwQAAgL+LrCy66aSdwQAAgL+u6ri/rjmdwQAAgL83ATjARvqbwQAAgL+5iInA/uSZwQAAgL/gX7bALf2WwQAAgL8K8d3Anq6TwQAAgL8ESgLB0buPwQAAgL/UDhXB4iiLwQAAgL9+8SXBy1yGwQAAgL/qRTbBGgqBwQAAgD+LrCy66aSdwQAAgD+u6ri/rjmdwQAAgD83ATjARvqbwQAAgD+5iInA/uSZwQAAgD/gX7bALf2WwQAAgD8K8d3Anq6TwQAAgD8ESgLB0buPwQAAgD/UDhXB4iiLwQAAgD9+8SXBy1yGwQAAgD/qRTbBGgqBwQAAgL8rk5XBFfPVwAAAgD8rk5XBFfPVwAAAgL/qRTbBGgqBwQAAgL8iwUjBJTB0wQAAgL8jHFrBsw9lwQAAgL9KaWrB7aFUwQAAgL8wfXnBMA1DwQAAgL/g+ILBj1EywQAAgL9wpIjBZswgwQAAgL/Huo3BzpAOwQAAgL+b6pHB+BX6wAAAgL8rk5XBFfPVwAAAgD/qRTbBGgqBwQAAgD8iwUjBJTB0wQAAgD8jHFrBsw9lwQAAgD9KaWrB7aFUwQAAgD8wfXnBMA1DwQAAgD/g+ILBj1EywQAAgD9wpIjBZswgwQAAgD/Huo3BzpAOwQAAgD+b6pHB+BX6wAAAgD8rk5XBFfPVwAAAgL8rk5XBFfPVwAAAgL/X8o7BcVnywAAAgL8bi4fBsaUGwQAAgL+3Dn7BHuATwQAAgL8OI2vBW20gwQAAgL+yYFbBsykswQAAgL/D3T/BN/A2wQAAgL/luCfBSJxAwQAAgL9vGA7BIQtJwQAAgL8DUubALR1QwQAAgL8N67PARDlVwQAAgL+0AYDACRRZwQAAgL9nwxXAg6BbwQAAgL8/4Ja/bZpcwQAAgL+LrCy6sO5cwQAAgD8rk5XBFfPVwAAAgD/X8o7BcVnywAAAgD8bi4fBsaUGwQAAgD+3Dn7BHuATwQAAgD8OI2vBW20gwQAAgD+yYFbBsykswQAAgD/D3T/BN/A2wQAAgD/luCfBSJxAwQAAgD9vGA7BIQtJwQAAgD8DUubALR1QwQAAgD8N67PARDlVwQAAgD+0AYDACRRZwQAAgD9nwxXAg6BbwQAAgD8/4Ja/bZpcwQAAgD+LrCy6sO5cwQAAgL+LrCy64+hcQQAAgD+LrCy64+hcQQAAgL8rk5XBPOfVQAAAgD8rk5XBPOfVQAAAgL+LrCy64+hcQQAAgL+LAe6/NhRcQQAAgL/YPmvA76FZQQAAgL9XKa/A0o1VQQAAgL/iHufAO+lPQQAAgL/kiQ7Bo8ZIQQAAgL9EySXBFShBQQAAgL9Q5zvB9Hw4QQAAgL/jwVDBbt0uQQAAgL86O2TBAWQkQQAAgL/+OnbBmywZQQAAgL92V4PBnFMNQQAAgL+QxYrBy/QAQQAAgL94a5DB8VjsQAAAgL8rk5XBPOfVQAAAgD+LrCy64+hcQQAAgD+LAe6/NhRcQQAAgD/YPmvA76FZQQAAgD9XKa/A0o1VQQAAgD/iHufAO+lPQQAAgD/kiQ7Bo8ZIQQAAgD9EySXBFShBQQAAgD9Q5zvB9Hw4QQAAgD/jwVDBbt0uQQAAgD86O2TBAWQkQQAAgD/+OnbBmywZQQAAgD92V4PBnFMNQQAAgD+QxYrBy/QAQQAAgD94a5DB8VjsQAAAgD8rk5XBPOfVQAAAgL/qRTbBNAeBQQAAgD/qRTbBNAeBQQAAgL8rk5XBPOfVQAAAgL/QLJHBxVQAQQAAgL8fCYzBfO4UQQAAgL81IobBxtYoQQAAgL9bCn/BAto7QQAAgL+y+XHB4hxMQQAAgL873mPBJX5bQQAAgL8sx1TBZexpQQAAgL8f7EXByG52QQAAgL/qRTbBNAeBQQAAgD8rk5XBPOfVQAAAgD/QLJHBxVQAQQAAgD8fCYzBfO4UQQAAgD81IobBxtYoQQAAgD9bCn/BAto7QQAAgD+y+XHB4hxMQQAAgD873mPBJX5bQQAAgD8sx1TBZexpQQAAgD8f7EXByG52QQAAgD/qRTbBNAeBQQAAgL+LrCy686GdQQAAgD+LrCy686GdQQAAgL/qRTbBNAeBQQAAgL/a1SLBLEmHQQAAgL8CoQ7BHc2MQQAAgL8BIvPAvZiRQQAAgL/escfAUZ6VQQAAgL+Zqp/Au46YQQAAgL953m3AWNaaQQAAgL9OWRvAW3KcQQAAgL99+Ju/tVWdQQAAgL+LrCy686GdQQAAgD/qRTbBNAeBQQAAgD/a1SLBLEmHQQAAgD8CoQ7BHc2MQQAAgD8BIvPAvZiRQQAAgD/escfAUZ6VQQAAgD+Zqp/Au46YQQAAgD953m3AWNaaQQAAgD9OWRvAW3KcQQAAgD99+Ju/tVWdQQAAgD+LrCy686GdQQAAgL/jQDZBNAeBQQAAgD/jQDZBNAeBQQAAgL+LrCy686GdQQAAgL9ewbg/tzadQQAAgL9E7TdAT/ebQQAAgL/RfolACOKZQQAAgL/wVbZAOfqWQQAAgL8K591ArauTQQAAgL8ARQJB4biPQQAAgL/TCRVB8yWLQQAAgL917CVB4FmGQQAAgL/jQDZBNAeBQQAAgD+LrCy686GdQQAAgD9ewbg/tzadQQAAgD9E7TdAT/ebQQAAgD/RfolACOKZQQAAgD/wVbZAOfqWQQAAgD8K591ArauTQQAAgD8ARQJB4biPQQAAgD/TCRVB8yWLQQAAgD917CVB4FmGQQAAgD/jQDZBNAeBQQAAgL+skJVBPOfVQAAAgD+skJVBPOfVQAAAgL/jQDZBNAeBQQAAgL8VvEhBUip0QQAAgL8TF1pB2AllQQAAgL86ZGpBBpxUQQAAgL8leHlBOQdDQQAAgL9e9oJBhksyQQAAgL/0oYhBR8YgQQAAgL9SuI1Bk4oOQQAAgL8g6JFBzwn6QAAAgL+skJVBPOfVQAAAgD/jQDZBNAeBQQAAgD8VvEhBUip0QQAAgD8TF1pB2AllQQAAgD86ZGpBBpxUQQAAgD8leHlBOQdDQQAAgD9e9oJBhksyQQAAgD/0oYhBR8YgQQAAgD9SuI1Bk4oOQQAAgD8g6JFBzwn6QAAAgD+skJVBPOfVQAAAgL+skJVBPOfVQAAAgL9H9I5B9z3yQAAAgL+cj4dBPJIGQQAAgL/WGX5BmsoTQQAAgL94LWtB4VcgQQAAgL8EaFZBwxUsQQAAgL8/4D9But42QQAAgL+otSdBnY1AQQAAgL+RDw5BNP9IQQAAgL8/N+ZAmhNQQQAAgL/py7NATDFVQQAAgL/dxX9ALg1ZQQAAgL9CkhVAUZpbQQAAgL9Cl5Y/hJRcQQAAgL+LrCy64+hcQQAAgD+skJVBPOfVQAAAgD9H9I5B9z3yQAAAgD+cj4dBPJIGQQAAgD/WGX5BmsoTQQAAgD94LWtB4VcgQQAAgD8EaFZBwxUsQQAAgD8/4D9But42QQAAgD+otSdBnY1AQQAAgD+RDw5BNP9IQQAAgD8/N+ZAmhNQQQAAgD/py7NATDFVQQAAgD/dxX9ALg1ZQQAAgD9CkhVAUZpbQQAAgD9Cl5Y/hJRcQQAAgD+LrCy64+hcQZR0lGJoHWggSwCFlGgih5RSlChLAUslhZRoJ4wCdTSUiYiHlFKUKEsDaCtOTk5K/////0r/////SwB0lGKJQ5QAAAAAAgAAAAQAAAATAAAAIgAAACQAAAAuAAAAOAAAADoAAABEAAAATgAAAFAAAABaAAAAZAAAAGYAAABwAAAAegAAAIkAAACYAAAAmgAAAJwAAACrAAAAugAAALwAAADGAAAA0AAAANIAAADcAAAA5gAAAOgAAADyAAAA/AAAAP4AAAAIAQAAEgEAACEBAAAwAQAAlHSUYoaUjAxub3JtYWxfZWRnZXOUXZR1jAVjb2xvcpSMByMyOTgwYjmUjAJiYpR9lCiMBHhtaW6UR7/wa5dvckH8jAR4bWF4lEc/8GuXb3JB/4wEeW1pbpRHwDK5HsvhVGCMBHltYXiUR0AyuM8DVKHzjAR6bWlulEfAM7tWnuBhA4wEem1heJRHQDO699q6WCR1jANpbmSUaAh1fZQoaBRLAmgVaA9oFowIY2FkcXVlcnmUaBh9lChoGmgdaCBLAIWUaCKHlFKUKEsBTeIESwOGlGgqiUKYOgAAAACAv6v84sC7JFrAAACAP6v84sC7JFrAAACAPzbk2cC1VlnAAACAP7Qs0sD7PFfAAACAPwicy8CpO1TAAACAP4VnxcD/K1DAAACAPy2Pv8D8DUvAAACAP0ObusDUi0XAAACAP/lltsB12z/AAACAPwBJtMCBmDzAAACAP6s8ssC7JDnAAACAv6s8ssC7JDnAAACAvzbk2cC1VlnAAACAv7Qs0sD7PFfAAACAvwicy8CpO1TAAACAv4VnxcD/K1DAAACAvy2Pv8D8DUvAAACAv0ObusDUi0XAAACAv/lltsB12z/AAACAvwBJtMCBmDzAAACAv6s8ssC7JDnAAACAP6s8ssC7JDnAAACAPxJmrsD6wzHAAACAP936qsB24SnAAACAPwz7p8AvfSHAAACAP59mpcAklxjAAACAP5Y9o8BVLw/AAACAP/B/ocDERQXAAACAP68toMDetPW/AACAP9FGn8Cu2t+/AACAP03snsDjhdG/AACAP6u8nsB3ycK/AACAv6u8nsB3ycK/AACAvxJmrsD6wzHAAACAv936qsB24SnAAACAvwz7p8AvfSHAAACAv59mpcAklxjAAACAv5Y9o8BVLw/AAACAv/B/ocDERQXAAACAv68toMDetPW/AACAv9FGn8Cu2t+/AACAv03snsDjhdG/AACAv6u8nsB3ycK/AACAP6u8nsB3ycK/AACAP6ty5L93ycK/AACAv6ty5L93ycK/AACAv6ty5L93ycK/AACAP6ty5L93ycK/AACAP7Fl57+jV/m/AACAPzE9778oKxfAAACAPy35+7++4jDAAACAP9LMBsCV0knAAACAP0DVEcDui2HAAACAP1Y5H8C7hHjAAACAv1Y5H8C7hHjAAACAv7Fl57+jV/m/AACAvzE9778oKxfAAACAvy35+7++4jDAAACAv9LMBsCV0knAAACAv0DVEcDui2HAAACAv1Y5H8C7hHjAAACAP1Y5H8C7hHjAAACAP/XkLsBZR4fAAACAP19hQMBJcZHAAACAP5SuU8AwwJrAAACAP5TMaMAMNKPAAACAP7+rf8AryKrAAACAP6ssjMBegrHAAACAv6ssjMBegrHAAACAv/XkLsBZR4fAAACAv19hQMBJcZHAAACAv5SuU8AwwJrAAACAv5TMaMAMNKPAAACAv7+rf8AryKrAAACAv6ssjMBegrHAAACAP6ssjMBegrHAAACAPz06m8DfFLjAAACAP+ffqsAjQr3AAACAP6gdu8AqCsHAAACAP4Dzy8D0bMPAAACAP0Ns1sADMcTAAACAP6sc4cBecsTAAACAv6sc4cBecsTAAACAvz06m8DfFLjAAACAv+ffqsAjQr3AAACAv6gdu8AqCsHAAACAv4Dzy8D0bMPAAACAv0Ns1sADMcTAAACAv6sc4cBecsTAAACAP6sc4cBecsTAAACAP4j39MCIsMPAAACAP2roA8EFa8HAAACAP9BxDMH81L3AAACAPxq8E8EDbLnAAACAPx2nGsE85LPAAACAP9gyIcGmPa3AAACAP01fJ8FCeKXAAACAP3osLcEPlJzAAACAPzlIMcHwK5XAAACAP1UuNcFeIo3AAACAv1UuNcFeIo3AAACAv4j39MCIsMPAAACAv2roA8EFa8HAAACAv9BxDMH81L3AAACAvxq8E8EDbLnAAACAvx2nGsE85LPAAACAv9gyIcGmPa3AAACAv01fJ8FCeKXAAACAv3osLcEPlJzAAACAvzlIMcHwK5XAAACAv1UuNcFeIo3AAACAP1UuNcFeIo3AAACAP4FKOsEtwoDAAACAPxrSPsEO0WbAAACAPyPFQsHVKkrAAACAP5ojRsGwkSvAAACAP4DtSMGgBQvAAACAP9UiS8FGDdG/AACAP5jDTMF2KYi/AACAP8rPTcE1f+2+AACAP7IuTsHDI2W9AACAP1VOTsEk2ro+AACAv1VOTsEk2ro+AACAv4FKOsEtwoDAAACAvxrSPsEO0WbAAACAvyPFQsHVKkrAAACAv5ojRsGwkSvAAACAv4DtSMGgBQvAAACAv9UiS8FGDdG/AACAv5jDTMF2KYi/AACAv8rPTcE1f+2+AACAv7IuTsHDI2W9AACAv1VOTsEk2ro+AACAP1VOTsEk2ro+AACAP1VOTsESbRY/AACAv1VOTsESbRY/AACAv1VOTsESbRY/AACAP1VOTsESbRY/AACAP2rtTcGgUqU/AACAP6nKTMEf1fo/AACAP6sAS8GXDiRAAACAP2iUSMHX6EdAAACAPzbVRcHydGZAAACAP7GMQsHzr4FAAACAP9e6PsHaVI9AAACAP6lfOsEuKZxAAACAP+vwN8GhZqJAAACAP1VeNcGibahAAACAv1VeNcGibahAAACAv2rtTcGgUqU/AACAv6nKTMEf1fo/AACAv6sAS8GXDiRAAACAv2iUSMHX6EdAAACAvzbVRcHydGZAAACAv7GMQsHzr4FAAACAv9e6PsHaVI9AAACAv6lfOsEuKZxAAACAv+vwN8GhZqJAAACAv1VeNcGibahAAACAP1VeNcGibahAAACAP9bDL8Gx2LNAAACAP3a6KcED9r1AAACAPzdCI8GWxcZAAACAPxhbHMFsR85AAACAPxoFFcGFe9RAAACAPzxADcHfYdlAAACAP34MBcF8+txAAACAP8HT+MBbRd9AAACAPxyE7cCQC+BAAACAP6vc4cCiTeBAAACAv6vc4cCiTeBAAACAv9bDL8Gx2LNAAACAv3a6KcED9r1AAACAvzdCI8GWxcZAAACAvxhbHMFsR85AAACAvxoFFcGFe9RAAACAvzxADcHfYdlAAACAv34MBcF8+txAAACAv8HT+MBbRd9AAACAvxyE7cCQC+BAAACAv6vc4cCiTeBAAACAP6vc4cCiTeBAAACAP25CzsDMi99AAACAP2O2u8BKRt1AAACAP4s4qsAbfdlAAACAP4Bhm8BhydRAAACAP33BjsCMgc9AAACAP8DSgsBcO8lAAACAP5Mqb8DS9sFAAACAPzj7XsDuw7tAAACAP1aZT8Ci/bRAAACAv1aZT8Ci/bRAAACAv25CzsDMi99AAACAv2O2u8BKRt1AAACAv4s4qsAbfdlAAACAv4Bhm8BhydRAAACAv33BjsCMgc9AAACAv8DSgsBcO8lAAACAv5Mqb8DS9sFAAACAvzj7XsDuw7tAAACAv1aZT8Ci/bRAAACAP1aZT8Ci/bRAAACAP++vPMB4O6tAAACAP6LpK8Cjy6BAAACAP29GHcAlrpVAAACAP1XGEMD84olAAACAP1RpBsBS1HpAAACAP9te/L9Yh2BAAACAP0Ax8L8K30RAAACAP9hJ6L9n2ydAAACAP22a5b9/2RVAAACAP6ty5L9FWwNAAACAv6ty5L9FWwNAAACAv++vPMB4O6tAAACAv6LpK8Cjy6BAAACAv29GHcAlrpVAAACAv1XGEMD84olAAACAv1RpBsBS1HpAAACAv9te/L9Yh2BAAACAv0Ax8L8K30RAAACAv9hJ6L9n2ydAAACAv22a5b9/2RVAAACAv6ty5L9FWwNAAACAP6ty5L9FWwNAAACAP6u8nsBFWwNAAACAv6u8nsBFWwNAAACAv6u8nsBFWwNAAACAP6u8nsBFWwNAAACAPxpbn8BYiBVAAACAP3TEoMAZqyZAAACAPyi3osB5MzVAAACAP4UEpcBdj0FAAACAPwPXp8CGPE1AAACAP6Muq8DyOlhAAACAP0aDrsA6PWFAAACAP6s8ssBFu2lAAACAv6s8ssBFu2lAAACAvxpbn8BYiBVAAACAv3TEoMAZqyZAAACAvyi3osB5MzVAAACAv4UEpcBdj0FAAACAvwPXp8CGPE1AAACAv6Muq8DyOlhAAACAv0aDrsA6PWFAAACAv6s8ssBFu2lAAACAP6s8ssBFu2lAAACAP2I0tsDGYnFAAACAP5VsusC0NnhAAACAP0LlvsANN35AAACAP2uew8DpsYFAAACAPxCYyMCB3oNAAACAPy/SzcBOoYVAAACAP8pM08BS+oZAAACAP+AH2cCL6YdAAACAP0RJ3sCcZIhAAACAP6u848CijYhAAACAv6u848CijYhAAACAv2I0tsDGYnFAAACAv5VsusC0NnhAAACAv0LlvsANN35AAACAv2uew8DpsYFAAACAvxCYyMCB3oNAAACAvy/SzcBOoYVAAACAv8pM08BS+oZAAACAv+AH2cCL6YdAAACAv0RJ3sCcZIhAAACAv6u848CijYhAAACAP6u848CijYhAAACAP2Ge7MCfJohAAACAPxYm9MDCGYdAAACAP++M+sAZmYVAAACAP19MAMFEkYNAAACAP/jdAsHYSYFAAACAP0gOBcFMvn1AAACAP7wgB8GJN3hAAACAP1IVCcFl/3FAAACAPwrsCsHiFWtAAACAP+akDMH/emNAAACAP3SSDcHb115AAACAP1V2DsFF+1lAAACAv1V2DsFF+1lAAACAv2Ge7MCfJohAAACAvxYm9MDCGYdAAACAv++M+sAZmYVAAACAv19MAMFEkYNAAACAv/jdAsHYSYFAAACAv0gOBcFMvn1AAACAv7wgB8GJN3hAAACAv1IVCcFl/3FAAACAvwrsCsHiFWtAAACAv+akDMH/emNAAACAv3SSDcHb115AAACAv1V2DsFF+1lAAACAP1V2DsFF+1lAAACAPyr3D8HelVBAAACAP3RXEcE0SUZAAACAPzOXEsFIFTtAAACAP2i2E8Ea+i5AAACAPxO1FMGp9yFAAACAPwPWFcFWNw9AAACAP+rVFsEXZ/A/AACAPzu5F8HVtKw/AACAPw8FGMHjuX0/AACAP1UeGMESbRw/AACAv1UeGMESbRw/AACAvyr3D8HelVBAAACAv3RXEcE0SUZAAACAvzOXEsFIFTtAAACAv2i2E8Ea+i5AAACAvxO1FMGp9yFAAACAvwPWFcFWNw9AAACAv+rVFsEXZ/A/AACAvzu5F8HVtKw/AACAvw8FGMHjuX0/AACAv1UeGMESbRw/AACAP1UeGMESbRw/AACAP1UeGMEk2oQ+AACAv1UeGMEk2oQ+AACAv1UeGMEk2oQ+AACAP1UeGMEk2oQ+AACAP2q9F8EykPO+AACAP6maFsF/1I+/AACAP/T2FMEHAdC/AACAP2IzE8F5jv2/AACAP2N8EcFCHg/AAACAP3cWEMGWvxnAAACAP1WODsG7ZCPAAACAv1WODsG7ZCPAAACAv2q9F8EykPO+AACAv6maFsF/1I+/AACAv/T2FMEHAdC/AACAv2IzE8F5jv2/AACAv2N8EcFCHg/AAACAv3cWEMGWvxnAAACAv1WODsG7ZCPAAACAP1WODsG7ZCPAAACAPyXZDMHtWizAAACAP8T+CsE3hDTAAACAPzL/CMGZ4DvAAACAP27aBsETcELAAACAP3qQBMGlMkjAAACAP1QhAsFPKE3AAACAP/oZ/8ASUVHAAACAP+um+cDsrFTAAACAP3np88DfO1fAAACAP6Xh7cDq/VjAAACAP+mJ6MAH21nAAACAP6v84sC7JFrAAACAv6v84sC7JFrAAACAvyXZDMHtWizAAACAv8T+CsE3hDTAAACAvzL/CMGZ4DvAAACAv27aBsETcELAAACAv3qQBMGlMkjAAACAv1QhAsFPKE3AAACAv/oZ/8ASUVHAAACAv+um+cDsrFTAAACAv3np88DfO1fAAACAv6Xh7cDq/VjAAACAv+mJ6MAH21nAAACAv1WODsG7ZCPAAACAvyXZDMHtWizAAACAv8T+CsE3hDTAAACAvzL/CMGZ4DvAAACAv27aBsETcELAAACAv3qQBMGlMkjAAACAv1QhAsFPKE3AAACAv/oZ/8ASUVHAAACAv+um+cDsrFTAAACAv3np88DfO1fAAACAv6Xh7cDq/VjAAACAv+mJ6MAH21nAAACAv6v84sC7JFrAAACAv1UeGMEk2oQ+AACAv2q9F8EykPO+AACAv6maFsF/1I+/AACAv/T2FMEHAdC/AACAv2IzE8F5jv2/AACAv2N8EcFCHg/AAACAv3cWEMGWvxnAAACAv1UeGMESbRw/AACAv1V2DsFF+1lAAACAvyr3D8HelVBAAACAv3RXEcE0SUZAAACAvzOXEsFIFTtAAACAv2i2E8Ea+i5AAACAvxO1FMGp9yFAAACAvwPWFcFWNw9AAACAv+rVFsEXZ/A/AACAvzu5F8HVtKw/AACAvw8FGMHjuX0/AACAv6u848CijYhAAACAv2Ge7MCfJohAAACAvxYm9MDCGYdAAACAv++M+sAZmYVAAACAv19MAMFEkYNAAACAv/jdAsHYSYFAAACAv0gOBcFMvn1AAACAv7wgB8GJN3hAAACAv1IVCcFl/3FAAACAvwrsCsHiFWtAAACAv+akDMH/emNAAACAv3SSDcHb115AAACAv6s8ssBFu2lAAACAv2I0tsDGYnFAAACAv5VsusC0NnhAAACAv0LlvsANN35AAACAv2uew8DpsYFAAACAvxCYyMCB3oNAAACAvy/SzcBOoYVAAACAv8pM08BS+oZAAACAv+AH2cCL6YdAAACAv0RJ3sCcZIhAAACAv6u8nsBFWwNAAACAvxpbn8BYiBVAAACAv3TEoMAZqyZAAACAvyi3osB5MzVAAACAv4UEpcBdj0FAAACAvwPXp8CGPE1AAACAv6Muq8DyOlhAAACAv0aDrsA6PWFAAACAv6ty5L9FWwNAAACAv1aZT8Ci/bRAAACAv++vPMB4O6tAAACAv6LpK8Cjy6BAAACAv29GHcAlrpVAAACAv1XGEMD84olAAACAv1RpBsBS1HpAAACAv9te/L9Yh2BAAACAv0Ax8L8K30RAAACAv9hJ6L9n2ydAAACAv22a5b9/2RVAAACAv6vc4cCiTeBAAACAv25CzsDMi99AAACAv2O2u8BKRt1AAACAv4s4qsAbfdlAAACAv4Bhm8BhydRAAACAv33BjsCMgc9AAACAv8DSgsBcO8lAAACAv5Mqb8DS9sFAAACAvzj7XsDuw7tAAACAv1VeNcGibahAAACAv9bDL8Gx2LNAAACAv3a6KcED9r1AAACAvzdCI8GWxcZAAACAvxhbHMFsR85AAACAvxoFFcGFe9RAAACAvzxADcHfYdlAAACAv34MBcF8+txAAACAv8HT+MBbRd9AAACAvxyE7cCQC+BAAACAv1VOTsESbRY/AACAv2rtTcGgUqU/AACAv6nKTMEf1fo/AACAv6sAS8GXDiRAAACAv2iUSMHX6EdAAACAvzbVRcHydGZAAACAv7GMQsHzr4FAAACAv9e6PsHaVI9AAACAv6lfOsEuKZxAAACAv+vwN8GhZqJAAACAv1VOTsEk2ro+AACAv1UuNcFeIo3AAACAv4FKOsEtwoDAAACAvxrSPsEO0WbAAACAvyPFQsHVKkrAAACAv5ojRsGwkSvAAACAv4DtSMGgBQvAAACAv9UiS8FGDdG/AACAv5jDTMF2KYi/AACAv8rPTcE1f+2+AACAv7IuTsHDI2W9AACAv6sc4cBecsTAAACAv4j39MCIsMPAAACAv2roA8EFa8HAAACAv9BxDMH81L3AAACAvxq8E8EDbLnAAACAvx2nGsE85LPAAACAv9gyIcGmPa3AAACAv01fJ8FCeKXAAACAv3osLcEPlJzAAACAvzlIMcHwK5XAAACAv6ssjMBegrHAAACAvz06m8DfFLjAAACAv+ffqsAjQr3AAACAv6gdu8AqCsHAAACAv4Dzy8D0bMPAAACAv0Ns1sADMcTAAACAv1Y5H8C7hHjAAACAv/XkLsBZR4fAAACAv19hQMBJcZHAAACAv5SuU8AwwJrAAACAv5TMaMAMNKPAAACAv7+rf8AryKrAAACAv6ty5L93ycK/AACAv7Fl57+jV/m/AACAvzE9778oKxfAAACAvy35+7++4jDAAACAv9LMBsCV0knAAACAv0DVEcDui2HAAACAv6u8nsB3ycK/AACAv6s8ssC7JDnAAACAvxJmrsD6wzHAAACAv936qsB24SnAAACAvwz7p8AvfSHAAACAv59mpcAklxjAAACAv5Y9o8BVLw/AAACAv/B/ocDERQXAAACAv68toMDetPW/AACAv9FGn8Cu2t+/AACAv03snsDjhdG/AACAvzbk2cC1VlnAAACAv7Qs0sD7PFfAAACAvwicy8CpO1TAAACAv4VnxcD/K1DAAACAvy2Pv8D8DUvAAACAv0ObusDUi0XAAACAv/lltsB12z/AAACAvwBJtMCBmDzAAACAP1WODsG7ZCPAAACAPyXZDMHtWizAAACAP8T+CsE3hDTAAACAPzL/CMGZ4DvAAACAP27aBsETcELAAACAP3qQBMGlMkjAAACAP1QhAsFPKE3AAACAP/oZ/8ASUVHAAACAP+um+cDsrFTAAACAP3np88DfO1fAAACAP6Xh7cDq/VjAAACAP+mJ6MAH21nAAACAP6v84sC7JFrAAACAP1UeGMEk2oQ+AACAP2q9F8EykPO+AACAP6maFsF/1I+/AACAP/T2FMEHAdC/AACAP2IzE8F5jv2/AACAP2N8EcFCHg/AAACAP3cWEMGWvxnAAACAP1UeGMESbRw/AACAP1V2DsFF+1lAAACAPyr3D8HelVBAAACAP3RXEcE0SUZAAACAPzOXEsFIFTtAAACAP2i2E8Ea+i5AAACAPxO1FMGp9yFAAACAPwPWFcFWNw9AAACAP+rVFsEXZ/A/AACAPzu5F8HVtKw/AACAPw8FGMHjuX0/AACAP6u848CijYhAAACAP2Ge7MCfJohAAACAPxYm9MDCGYdAAACAP++M+sAZmYVAAACAP19MAMFEkYNAAACAP/jdAsHYSYFAAACAP0gOBcFMvn1AAACAP7wgB8GJN3hAAACAP1IVCcFl/3FAAACAPwrsCsHiFWtAAACAP+akDMH/emNAAACAP3SSDcHb115AAACAP6s8ssBFu2lAAACAP2I0tsDGYnFAAACAP5VsusC0NnhAAACAP0LlvsANN35AAACAP2uew8DpsYFAAACAPxCYyMCB3oNAAACAPy/SzcBOoYVAAACAP8pM08BS+oZAAACAP+AH2cCL6YdAAACAP0RJ3sCcZIhAAACAP6u8nsBFWwNAAACAPxpbn8BYiBVAAACAP3TEoMAZqyZAAACAPyi3osB5MzVAAACAP4UEpcBdj0FAAACAPwPXp8CGPE1AAACAP6Muq8DyOlhAAACAP0aDrsA6PWFAAACAP6ty5L9FWwNAAACAP1aZT8Ci/bRAAACAP++vPMB4O6tAAACAP6LpK8Cjy6BAAACAP29GHcAlrpVAAACAP1XGEMD84olAAACAP1RpBsBS1HpAAACAP9te/L9Yh2BAAACAP0Ax8L8K30RAAACAP9hJ6L9n2ydAAACAP22a5b9/2RVAAACAP6vc4cCiTeBAAACAP25CzsDMi99AAACAP2O2u8BKRt1AAACAP4s4qsAbfdlAAACAP4Bhm8BhydRAAACAP33BjsCMgc9AAACAP8DSgsBcO8lAAACAP5Mqb8DS9sFAAACAPzj7XsDuw7tAAACAP1VeNcGibahAAACAP9bDL8Gx2LNAAACAP3a6KcED9r1AAACAPzdCI8GWxcZAAACAPxhbHMFsR85AAACAPxoFFcGFe9RAAACAPzxADcHfYdlAAACAP34MBcF8+txAAACAP8HT+MBbRd9AAACAPxyE7cCQC+BAAACAP1VOTsESbRY/AACAP2rtTcGgUqU/AACAP6nKTMEf1fo/AACAP6sAS8GXDiRAAACAP2iUSMHX6EdAAACAPzbVRcHydGZAAACAP7GMQsHzr4FAAACAP9e6PsHaVI9AAACAP6lfOsEuKZxAAACAP+vwN8GhZqJAAACAP1VOTsEk2ro+AACAP1UuNcFeIo3AAACAP4FKOsEtwoDAAACAPxrSPsEO0WbAAACAPyPFQsHVKkrAAACAP5ojRsGwkSvAAACAP4DtSMGgBQvAAACAP9UiS8FGDdG/AACAP5jDTMF2KYi/AACAP8rPTcE1f+2+AACAP7IuTsHDI2W9AACAP6sc4cBecsTAAACAP4j39MCIsMPAAACAP2roA8EFa8HAAACAP9BxDMH81L3AAACAPxq8E8EDbLnAAACAPx2nGsE85LPAAACAP9gyIcGmPa3AAACAP01fJ8FCeKXAAACAP3osLcEPlJzAAACAPzlIMcHwK5XAAACAP6ssjMBegrHAAACAPz06m8DfFLjAAACAP+ffqsAjQr3AAACAP6gdu8AqCsHAAACAP4Dzy8D0bMPAAACAP0Ns1sADMcTAAACAP1Y5H8C7hHjAAACAP/XkLsBZR4fAAACAP19hQMBJcZHAAACAP5SuU8AwwJrAAACAP5TMaMAMNKPAAACAP7+rf8AryKrAAACAP6ty5L93ycK/AACAP7Fl57+jV/m/AACAPzE9778oKxfAAACAPy35+7++4jDAAACAP9LMBsCV0knAAACAP0DVEcDui2HAAACAP6u8nsB3ycK/AACAP6s8ssC7JDnAAACAPxJmrsD6wzHAAACAP936qsB24SnAAACAPwz7p8AvfSHAAACAP59mpcAklxjAAACAP5Y9o8BVLw/AAACAP/B/ocDERQXAAACAP68toMDetPW/AACAP9FGn8Cu2t+/AACAP03snsDjhdG/AACAPzbk2cC1VlnAAACAP7Qs0sD7PFfAAACAPwicy8CpO1TAAACAP4VnxcD/K1DAAACAPy2Pv8D8DUvAAACAP0ObusDUi0XAAACAP/lltsB12z/AAACAPwBJtMCBmDzAAACAv63Kwb4SbQ0/AACAP63Kwb4SbQ0/AACAP0uttb5Y5Kk/AACAPyRVkb4irgNAAACAP7Y3Mb5OSS1AAACAP6g3xbzha1NAAACAP3uWJD4VXnZAAACAP1NduD666YlAAACAP5Y6Fz+8spdAAACAP9WXQz8xd6BAAACAP6macz+izahAAACAv6macz+izahAAACAv0uttb5Y5Kk/AACAvyRVkb4irgNAAACAv7Y3Mb5OSS1AAACAv6g3xbzha1NAAACAv3uWJD4VXnZAAACAv1NduD666YlAAACAv5Y6Fz+8spdAAACAv9WXQz8xd6BAAACAv6macz+izahAAACAP6macz+izahAAACAP+8Hoj9drLRAAACAP7wFyT/+Ir5AAACAP+9e7j90qsVAAACAP6jtCkBTQsxAAACAP2+9H0Ca6tFAAACAP82eNUBJo9ZAAACAP8KRTEBgbNpAAACAP06WZEDfRd1AAACAP3GsfUDGL99AAACAP/njiEArBuBAAACAP1VDk0CiTeBAAACAv1VDk0CiTeBAAACAv+8Hoj9drLRAAACAv7wFyT/+Ir5AAACAv+9e7j90qsVAAACAv6jtCkBTQsxAAACAv2+9H0Ca6tFAAACAv82eNUBJo9ZAAACAv8KRTEBgbNpAAACAv06WZEDfRd1AAACAv3GsfUDGL99AAACAv/njiEArBuBAAACAv1VDk0CiTeBAAACAP1VDk0CiTeBAAACAPyfwokDMi99AAACAP8BasEDikd1AAACAP4/eu0AUvtpAAACAP5baxkDs69ZAAACAP9VO0UBqG9JAAACAP0s720CNTMxAAACAP/qf5EBWf8VAAACAP+B87UDFs71AAACAP6x/9EDPabZAAACAP1Uj+0Ciba5AAACAv1Uj+0Ciba5AAACAvyfwokDMi99AAACAv8BasEDikd1AAACAv4/eu0AUvtpAAACAv5baxkDs69ZAAACAv9VO0UBqG9JAAACAv0s720CNTMxAAACAv/qf5EBWf8VAAACAv+B87UDFs71AAACAv6x/9EDPabZAAACAv1Uj+0Ciba5AAACAP1Uj+0Ciba5AAACAP6shAUGizdhAAACAv6shAUGizdhAAACAv6shAUGizdhAAACAP6shAUGizdhAAACAP6vBMEGizdhAAACAv6vBMEGizdhAAACAv6vBMEGizdhAAACAP6vBMEGizdhAAACAP6vBMEEveSzBAACAv6vBMEEveSzBAACAv6vBMEEveSzBAACAP6vBMEEveSzBAACAP1XD9EAveSzBAACAv1XD9EAveSzBAACAv1XD9EAveSzBAACAP1XD9EAveSzBAACAP1XD9EBeEprAAACAv1XD9EBeEprAAACAv1XD9EBeEprAAACAP1XD9EBeEprAAACAP8+960A2V6PAAACAPwcW40CytKrAAACAP7Dc2kASi7DAAACAPw060kCLobXAAACAPyAuyUAd+LnAAACAP+m4v0DIjr3AAACAP2jatUCNZcDAAACAP5uSq0BrfMLAAACAP4XhoEBj08PAAACAPzzImUCfSsTAAACAP1WDkkBecsTAAACAv1WDkkBecsTAAACAv8+960A2V6PAAACAvwcW40CytKrAAACAv7Dc2kASi7DAAACAvw060kCLobXAAACAvyAuyUAd+LnAAACAv+m4v0DIjr3AAACAv2jatUCNZcDAAACAv5uSq0BrfMLAAACAv4XhoEBj08PAAACAvzzImUCfSsTAAACAv1WDkkBecsTAAACAP1WDkkBecsTAAACAP9scgkCIsMPAAACAPyoNaECetsHAAACAPxrJT0DQ4r7AAACAP4+NOECoELvAAACAP4xaIkAlQLbAAACAPw8wDUBJcbDAAACAPzMc8j8SpKnAAACAP1Xpyz+B2KHAAACAP4THpz+WDpnAAACAP3t7kT/Q1ZLAAACAP6kaeD9eMozAAACAv6kaeD9eMozAAACAv9scgkCIsMPAAACAvyoNaECetsHAAACAvxrJT0DQ4r7AAACAv4+NOECoELvAAACAv4xaIkAlQLbAAACAvw8wDUBJcbDAAACAvzMc8j8SpKnAAACAv1Xpyz+B2KHAAACAv4THpz+WDpnAAACAv3t7kT/Q1ZLAAACAv6kaeD9eMozAAACAP6kaeD9eMozAAACAPy35Lz82Yn7AAACAP4iV4D60JmLAAACAP749ZD43skPAAACAP/ZyJD29BCPAAACAP+Vv4L1IHgDAAACAP1HAZ76u/bW/AACAP09epr7mTSi/AACAP5bvur70XYi9AACAP63Kwb4SbQ0/AACAv63Kwb4SbQ0/AACAvy35Lz82Yn7AAACAv4iV4D60JmLAAACAv749ZD43skPAAACAv/ZyJD29BCPAAACAv+Vv4L1IHgDAAACAv1HAZ76u/bW/AACAv09epr7mTSi/AACAv5bvur70XYi9AACAv6qGQEAk2pw+AACAP6qGQEAk2pw+AACAP1cKQkC5tbi+AACAP1yVRkC+r3a/AACAP5pYTUDIY7q/AACAPyipVEAdeOi/AACAP0+mXEDMDwfAAACAP2y6YkCMoRLAAACAP6pmaUC7ZB3AAACAv6pmaUC7ZB3AAACAv1cKQkC5tbi+AACAv1yVRkC+r3a/AACAv5pYTUDIY7q/AACAvyipVEAdeOi/AACAv0+mXEDMDwfAAACAv2y6YkCMoRLAAACAv6pmaUC7ZB3AAACAP6pmaUC7ZB3AAACAP2bGcEAEhCfAAACAP8eneEBPtzDAAACAP2eFgECd/jjAAACAP733hEDuWUDAAACAP+eqiUBDyUbAAACAP+OejkCaTEzAAACAP7LTk0D041DAAACAP1RJmUBSj1TAAACAP8r/nkCyTlfAAACAPxL3pEAVIlnAAACAP3CLqUAS5FnAAACAP1VDrkC7JFrAAACAv1VDrkC7JFrAAACAv2bGcEAEhCfAAACAv8eneEBPtzDAAACAv2eFgECd/jjAAACAv733hEDuWUDAAACAv+eqiUBDyUbAAACAv+OejkCaTEzAAACAv7LTk0D041DAAACAv1RJmUBSj1TAAACAv8r/nkCyTlfAAACAvxL3pEAVIlnAAACAv3CLqUAS5FnAAACAv1VDrkC7JFrAAACAP1VDrkC7JFrAAACAP34MuUBhJlnAAACAP4MhwkCFjlbAAACAP2nMyUC+2FLAAACAPwZK0ECUZE7AAACAP27M1UBJe0nAAACAP0X+2kACt0PAAACAP4vf30DBFz3AAACAPz9w5ECEnTXAAACAP2Gw6EBNSC3AAACAP/Kf7EAaGCTAAACAP/E+8EDtDBrAAACAP6iU8kDijRLAAACAP1XD9EC7pArAAACAv1XD9EC7pArAAACAv34MuUBhJlnAAACAv4MhwkCFjlbAAACAv2nMyUC+2FLAAACAvwZK0ECUZE7AAACAv27M1UBJe0nAAACAv0X+2kACt0PAAACAv4vf30DBFz3AAACAvz9w5ECEnTXAAACAv2Gw6EBNSC3AAACAv/Kf7EAaGCTAAACAv/E+8EDtDBrAAACAv6iU8kDijRLAAACAv1XD9EC7pArAAACAP1XD9EC7pArAAACAP1XD9EBFm0RAAACAv1XD9EBFm0RAAACAv1XD9EBFm0RAAACAP1XD9EBFm0RAAACAP42l8UBhYU9AAACAP8U37kBCVllAAACAP/156kDoeWJAAACAPzRs5kBSzGpAAACAP2wO4kCBTXJAAACAP6Ng3UB0/XhAAACAP9pi2EAs3H5AAACAPxEV00DU9IFAAACAP0h3zUD1EoRAAACAP3+Jx0B3yIVAAACAP7VLwUBcFYdAAACAP+u9ukCj+YdAAACAP+v8tECjaIhAAACAP1UDr0CijYhAAACAv1UDr0CijYhAAACAv42l8UBhYU9AAACAv8U37kBCVllAAACAv/156kDoeWJAAACAvzRs5kBSzGpAAACAv2wO4kCBTXJAAACAv6Ng3UB0/XhAAACAv9pi2EAs3H5AAACAvxEV00DU9IFAAACAv0h3zUD1EoRAAACAv3+Jx0B3yIVAAACAv7VLwUBcFYdAAACAv+u9ukCj+YdAAACAv+v8tECjaIhAAACAv1UDr0CijYhAAACAP1UDr0CijYhAAACAP3iQqEDPUYhAAACAPxNgokBUnodAAACAPyhynEAzc4ZAAACAP7bGlkBr0IRAAACAP75dkUD7tYJAAACAPz43jEDlI4BAAACAPzhTh0BQNHpAAACAP6uxgkCIMXNAAACAPy2lfEBxP2tAAACAP/hrdEANXmJAAACAP7b4bkBal1tAAACAP6rGaUBFW1RAAACAv6rGaUBFW1RAAACAv3iQqEDPUYhAAACAvxNgokBUnodAAACAvyhynEAzc4ZAAACAv7bGlkBr0IRAAACAv75dkUD7tYJAAACAvz43jEDlI4BAAACAvzhTh0BQNHpAAACAv6uxgkCIMXNAAACAvy2lfEBxP2tAAACAv/hrdEANXmJAAACAv7b4bkBal1tAAACAv6rGaUBFW1RAAACAP6rGaUBFW1RAAACAPwOhYUDp7EZAAACAP5RgWkCg8jdAAACAP14FVEBpbCdAAACAP2GPTkBEWhVAAACAP5z+SUAxvAFAAACAP9NMRUBnWMo/AACAP+nrQUC7gYM/AACAP/rfQEBSIS0/AACAP6qGQEAk2pw+AACAv6qGQEAk2pw+AACAvwOhYUDp7EZAAACAv5RgWkCg8jdAAACAv14FVEBpbCdAAACAv2GPTkBEWhVAAACAv5z+SUAxvAFAAACAv9NMRUBnWMo/AACAv+nrQUC7gYM/AACAv/rfQEBSIS0/AACAv6kaeD9eMozAAACAvy35Lz82Yn7AAACAv4iV4D60JmLAAACAv749ZD43skPAAACAv/ZyJD29BCPAAACAv+Vv4L1IHgDAAACAv1HAZ76u/bW/AACAv09epr7mTSi/AACAv5bvur70XYi9AACAv63Kwb4SbQ0/AACAv1WDkkBecsTAAACAv9scgkCIsMPAAACAvyoNaECetsHAAACAvxrJT0DQ4r7AAACAv4+NOECoELvAAACAv4xaIkAlQLbAAACAvw8wDUBJcbDAAACAvzMc8j8SpKnAAACAv1Xpyz+B2KHAAACAv4THpz+WDpnAAACAv3t7kT/Q1ZLAAACAv1XD9EBeEprAAACAv8+960A2V6PAAACAvwcW40CytKrAAACAv7Dc2kASi7DAAACAvw060kCLobXAAACAvyAuyUAd+LnAAACAv+m4v0DIjr3AAACAv2jatUCNZcDAAACAv5uSq0BrfMLAAACAv4XhoEBj08PAAACAvzzImUCfSsTAAACAv1XD9EAveSzBAACAv6vBMEEveSzBAACAv6vBMEGizdhAAACAv6shAUGizdhAAACAv1Uj+0Ciba5AAACAv1VDk0CiTeBAAACAvyfwokDMi99AAACAv8BasEDikd1AAACAv4/eu0AUvtpAAACAv5baxkDs69ZAAACAv9VO0UBqG9JAAACAv0s720CNTMxAAACAv/qf5EBWf8VAAACAv+B87UDFs71AAACAv6x/9EDPabZAAACAv6macz+izahAAACAv+8Hoj9drLRAAACAv7wFyT/+Ir5AAACAv+9e7j90qsVAAACAv6jtCkBTQsxAAACAv2+9H0Ca6tFAAACAv82eNUBJo9ZAAACAv8KRTEBgbNpAAACAv06WZEDfRd1AAACAv3GsfUDGL99AAACAv/njiEArBuBAAACAv0uttb5Y5Kk/AACAvyRVkb4irgNAAACAv7Y3Mb5OSS1AAACAv6g3xbzha1NAAACAv3uWJD4VXnZAAACAv1NduD666YlAAACAv5Y6Fz+8spdAAACAv9WXQz8xd6BAAACAv6rGaUBFW1RAAACAvwOhYUDp7EZAAACAv5RgWkCg8jdAAACAv14FVEBpbCdAAACAv2GPTkBEWhVAAACAv5z+SUAxvAFAAACAv9NMRUBnWMo/AACAv+nrQUC7gYM/AACAv/rfQEBSIS0/AACAv6qGQEAk2pw+AACAv1UDr0CijYhAAACAv3iQqEDPUYhAAACAvxNgokBUnodAAACAvyhynEAzc4ZAAACAv7bGlkBr0IRAAACAv75dkUD7tYJAAACAvz43jEDlI4BAAACAvzhTh0BQNHpAAACAv6uxgkCIMXNAAACAvy2lfEBxP2tAAACAv/hrdEANXmJAAACAv7b4bkBal1tAAACAv1XD9EBFm0RAAACAv42l8UBhYU9AAACAv8U37kBCVllAAACAv/156kDoeWJAAACAvzRs5kBSzGpAAACAv2wO4kCBTXJAAACAv6Ng3UB0/XhAAACAv9pi2EAs3H5AAACAvxEV00DU9IFAAACAv0h3zUD1EoRAAACAv3+Jx0B3yIVAAACAv7VLwUBcFYdAAACAv+u9ukCj+YdAAACAv+v8tECjaIhAAACAv1XD9EC7pArAAACAv1VDrkC7JFrAAACAv34MuUBhJlnAAACAv4MhwkCFjlbAAACAv2nMyUC+2FLAAACAvwZK0ECUZE7AAACAv27M1UBJe0nAAACAv0X+2kACt0PAAACAv4vf30DBFz3AAACAvz9w5ECEnTXAAACAv2Gw6EBNSC3AAACAv/Kf7EAaGCTAAACAv/E+8EDtDBrAAACAv6iU8kDijRLAAACAv6pmaUC7ZB3AAACAv2bGcEAEhCfAAACAv8eneEBPtzDAAACAv2eFgECd/jjAAACAv733hEDuWUDAAACAv+eqiUBDyUbAAACAv+OejkCaTEzAAACAv7LTk0D041DAAACAv1RJmUBSj1TAAACAv8r/nkCyTlfAAACAvxL3pEAVIlnAAACAv3CLqUAS5FnAAACAv1cKQkC5tbi+AACAv1yVRkC+r3a/AACAv5pYTUDIY7q/AACAvyipVEAdeOi/AACAv0+mXEDMDwfAAACAv2y6YkCMoRLAAACAP6kaeD9eMozAAACAPy35Lz82Yn7AAACAP4iV4D60JmLAAACAP749ZD43skPAAACAP/ZyJD29BCPAAACAP+Vv4L1IHgDAAACAP1HAZ76u/bW/AACAP09epr7mTSi/AACAP5bvur70XYi9AACAP63Kwb4SbQ0/AACAP1WDkkBecsTAAACAP9scgkCIsMPAAACAPyoNaECetsHAAACAPxrJT0DQ4r7AAACAP4+NOECoELvAAACAP4xaIkAlQLbAAACAPw8wDUBJcbDAAACAPzMc8j8SpKnAAACAP1Xpyz+B2KHAAACAP4THpz+WDpnAAACAP3t7kT/Q1ZLAAACAP1XD9EBeEprAAACAP8+960A2V6PAAACAPwcW40CytKrAAACAP7Dc2kASi7DAAACAPw060kCLobXAAACAPyAuyUAd+LnAAACAP+m4v0DIjr3AAACAP2jatUCNZcDAAACAP5uSq0BrfMLAAACAP4XhoEBj08PAAACAPzzImUCfSsTAAACAP1XD9EAveSzBAACAP6vBMEEveSzBAACAP6vBMEGizdhAAACAP6shAUGizdhAAACAP1Uj+0Ciba5AAACAP1VDk0CiTeBAAACAPyfwokDMi99AAACAP8BasEDikd1AAACAP4/eu0AUvtpAAACAP5baxkDs69ZAAACAP9VO0UBqG9JAAACAP0s720CNTMxAAACAP/qf5EBWf8VAAACAP+B87UDFs71AAACAP6x/9EDPabZAAACAP6macz+izahAAACAP+8Hoj9drLRAAACAP7wFyT/+Ir5AAACAP+9e7j90qsVAAACAP6jtCkBTQsxAAACAP2+9H0Ca6tFAAACAP82eNUBJo9ZAAACAP8KRTEBgbNpAAACAP06WZEDfRd1AAACAP3GsfUDGL99AAACAP/njiEArBuBAAACAP0uttb5Y5Kk/AACAPyRVkb4irgNAAACAP7Y3Mb5OSS1AAACAP6g3xbzha1NAAACAP3uWJD4VXnZAAACAP1NduD666YlAAACAP5Y6Fz+8spdAAACAP9WXQz8xd6BAAACAP6rGaUBFW1RAAACAPwOhYUDp7EZAAACAP5RgWkCg8jdAAACAP14FVEBpbCdAAACAP2GPTkBEWhVAAACAP5z+SUAxvAFAAACAP9NMRUBnWMo/AACAP+nrQUC7gYM/AACAP/rfQEBSIS0/AACAP6qGQEAk2pw+AACAP1UDr0CijYhAAACAP3iQqEDPUYhAAACAPxNgokBUnodAAACAPyhynEAzc4ZAAACAP7bGlkBr0IRAAACAP75dkUD7tYJAAACAPz43jEDlI4BAAACAPzhTh0BQNHpAAACAP6uxgkCIMXNAAACAPy2lfEBxP2tAAACAP/hrdEANXmJAAACAP7b4bkBal1tAAACAP1XD9EBFm0RAAACAP42l8UBhYU9AAACAP8U37kBCVllAAACAP/156kDoeWJAAACAPzRs5kBSzGpAAACAP2wO4kCBTXJAAACAP6Ng3UB0/XhAAACAP9pi2EAs3H5AAACAPxEV00DU9IFAAACAP0h3zUD1EoRAAACAP3+Jx0B3yIVAAACAP7VLwUBcFYdAAACAP+u9ukCj+YdAAACAP+v8tECjaIhAAACAP1XD9EC7pArAAACAP1VDrkC7JFrAAACAP34MuUBhJlnAAACAP4MhwkCFjlbAAACAP2nMyUC+2FLAAACAPwZK0ECUZE7AAACAP27M1UBJe0nAAACAP0X+2kACt0PAAACAP4vf30DBFz3AAACAPz9w5ECEnTXAAACAP2Gw6EBNSC3AAACAP/Kf7EAaGCTAAACAP/E+8EDtDBrAAACAP6iU8kDijRLAAACAP6pmaUC7ZB3AAACAP2bGcEAEhCfAAACAP8eneEBPtzDAAACAP2eFgECd/jjAAACAP733hEDuWUDAAACAP+eqiUBDyUbAAACAP+OejkCaTEzAAACAP7LTk0D041DAAACAP1RJmUBSj1TAAACAP8r/nkCyTlfAAACAPxL3pEAVIlnAAACAP3CLqUAS5FnAAACAP1cKQkC5tbi+AACAP1yVRkC+r3a/AACAP5pYTUDIY7q/AACAPyipVEAdeOi/AACAP0+mXEDMDwfAAACAP2y6YkCMoRLAlHSUYmgvaB1oIEsAhZRoIoeUUpQoSwFNsA2FlGg2iUJgGwAADAAAAAEADAABAAIADQACAAMADQAMAAIADgADAAQADgANAAMADwAEAAUADwAOAAQAEAAFAAYAEAAPAAUAEQAGAAcAEQAQAAYAEgAHAAgAEgARAAcAEwAIAAkAEwASAAgACwAJAAoACwATAAkAIQAUABUAIQAVABYAIgAWABcAIgAhABYAIwAXABgAIwAiABcAJAAYABkAJAAjABgAJQAZABoAJQAkABkAJgAaABsAJgAlABoAJwAbABwAJwAmABsAKAAcAB0AKAAnABwAKQAdAB4AKQAoAB0AIAAeAB8AIAApAB4ALQAqACsALQArACwANwAuAC8ANwAvADAAOAAwADEAOAA3ADAAOQAxADIAOQA4ADEAOgAyADMAOgA5ADIAOwAzADQAOwA6ADMANgA0ADUANgA7ADQARQA8AD0ARQA9AD4ARgA+AD8ARgBFAD4ARwA/AEAARwBGAD8ASABAAEEASABHAEAASQBBAEIASQBIAEEARABCAEMARABJAEIAUwBKAEsAUwBLAEwAVABMAE0AVABTAEwAVQBNAE4AVQBUAE0AVgBOAE8AVgBVAE4AVwBPAFAAVwBWAE8AUgBQAFEAUgBXAFAAZQBYAFkAZQBZAFoAZgBaAFsAZgBlAFoAZwBbAFwAZwBmAFsAaABcAF0AaABnAFwAaQBdAF4AaQBeAF8AaQBoAF0AagBpAF8AawBfAGAAawBqAF8AbABgAGEAbABrAGAAbQBhAGIAbQBsAGEAZABiAGMAZABtAGIAewBuAG8AewBvAHAAfABwAHEAfAB7AHAAfQBxAHIAfQB8AHEAfgByAHMAfgB9AHIAfwBzAHQAfwB0AHUAfwB+AHMAgAB/AHUAgQB1AHYAgQCAAHUAggB2AHcAggCBAHYAgwB3AHgAgwCCAHcAegB4AHkAegCDAHgAhwCEAIUAhwCFAIYAlQCIAIkAlQCJAIoAlgCKAIsAlgCVAIoAlwCLAIwAlwCWAIsAmACMAI0AmACXAIwAmQCNAI4AmQCOAI8AmQCYAI0AmgCZAI8AmwCPAJAAmwCaAI8AnACQAJEAnACbAJAAnQCRAJIAnQCcAJEAlACSAJMAlACdAJIAqwCeAJ8AqwCfAKAArACgAKEArACrAKAArQChAKIArQCsAKEArgCiAKMArgCtAKIArwCjAKQArwCkAKUArwCuAKMAsACvAKUAsQClAKYAsQCwAKUAsgCmAKcAsgCxAKYAswCnAKgAswCyAKcAqgCoAKkAqgCzAKgAwAC0ALUAwAC1ALYAwQC2ALcAwQDAALYAwgC3ALgAwgDBALcAwwC4ALkAwwDCALgAxAC5ALoAxAC6ALsAxADDALkAxQDEALsAxgC7ALwAxgDFALsAxwC8AL0AxwDGALwAvwC9AL4AvwDHAL0A1QDIAMkA1QDJAMoA1gDKAMsA1gDVAMoA1wDLAMwA1wDWAMsA2ADMAM0A2ADXAMwA2QDNAM4A2QDYAM0A2gDOAM8A2gDPANAA2gDZAM4A2wDaANAA3ADQANEA3ADbANAA3QDRANIA3QDcANEA1ADSANMA1ADdANIA4QDeAN8A4QDfAOAA7QDiAOMA7QDjAOQA7gDkAOUA7gDtAOQA7wDlAOYA7wDuAOUA8ADmAOcA8ADvAOYA8QDnAOgA8QDwAOcA8gDoAOkA8gDxAOgA8wDpAOoA8wDyAOkA7ADqAOsA7ADzAOoAAQH0APUAAQH1APYAAgH2APcAAgEBAfYAAwH3APgAAwECAfcABAH4APkABAEDAfgABQH5APoABQEEAfkABgH6APsABgEFAfoABwH7APwABwEGAfsACAH8AP0ACAEHAfwACQH9AP4ACQEIAf0AAAH+AP8AAAEJAf4AGQEKAQsBGQELAQwBGgEMAQ0BGgEZAQwBGwENAQ4BGwEaAQ0BHAEOAQ8BHAEbAQ4BHQEPARABHQEcAQ8BHgEQAREBHgEdARABHwERARIBHwEeAREBIAESARMBIAEfARIBIQETARQBIQEgARMBIgEUARUBIgEhARQBIwEVARYBIwEiARUBGAEWARcBGAEjARYBMQEkASUBMQElASYBMgEmAScBMgExASYBMwEnASgBMwEyAScBNAEoASkBNAEzASgBNQEpASoBNQE0ASkBNgEqASsBNgE1ASoBNwErASwBNwE2ASsBOAEsAS0BOAE3ASwBOQEtAS4BOQE4AS0BMAEuAS8BMAE5AS4BPQE6ATsBPQE7ATwBSAE+AT8BSAE/AUABSQFAAUEBSQFIAUABSgFBAUIBSgFJAUEBSwFCAUMBSwFKAUIBTAFDAUQBTAFLAUMBTQFEAUUBTQFMAUQBRwFFAUYBRwFNAUUBXQFOAU8BXQFPAVABXgFQAVEBXgFdAVABXwFRAVIBXwFeAVEBYAFSAVMBYAFfAVIBYQFTAVQBYQFgAVMBYgFUAVUBYgFhAVQBYwFVAVYBYwFiAVUBZAFWAVcBZAFjAVYBZQFXAVgBZQFkAVcBZgFYAVkBZgFlAVgBZwFZAVoBZwFmAVkBXAFaAVsBXAFnAVoBagHfAeABawHeAd8BawHfAWoBaQHgAeEBaQFqAeABbAHdAd4BbAHeAWsBaAFpAeEBaAHhAc4BbQHcAd0BbQHdAWwBewHOAc8BewFoAc4BbgHbAdwBbgHcAW0BegHPAdABegF7Ac8BbwHbAW4BeQHQAdEBeQF6AdABcAHaAdsBcAHbAW8BcQHZAdoBcQHaAXABeAHRAdIBeAHSAdMBeAF5AdEBcgHZAXEBcwHYAdkBcwHZAXIBdwHTAdQBdwHUAdUBdwF4AdMBdAHnAdgBdAHYAXMB/wHmAecB/wHnAXQBdgHVAdYBdgHWAdcBdgF3AdUBAALlAeYBAALmAf8BAQLkAeUBAQLlAQACAgLjAeQBAgLkAQECdQHXAc0BdQF2AdcBAwLjAQICBALiAeMBBALjAQMCfAHNAcMBfAF1Ac0BBQLtAeIBBQLiAQQCBgLtAQUChgF8AcMBhgHDAcQB9QHsAe0B9QHtAQYC9gHsAfUB6wHsAfYBhQGGAcQBhQHEAcUB9wHrAfYB6gHrAfcB6gH3AfgBhAGFAcUBhAHFAcYBgwHGAccBgwGEAcYB6QHqAfgB6QH4AfkBggGDAccBggHHAcgBgQGCAcgBgQHIAckB6AHpAfkB6AH5AfoBgAGBAckBgAHJAcoBfwGAAcoBfwHKAcsB8wHoAfoBfgF/AcsBfgHLAcwBfQF+AcwBfQHMAbkBkgF9AbkBugGSAbkB8gH6AfsB8gHzAfoBkQGSAboBkAGRAboB8QHyAfsB8QH7AfwBuwGPAZABuwGQAboB8AHxAfwB8AH8Af0BvAGOAY8BvAGPAbsB7wHwAf0B7wH9Af4B7wH+AfQBvQGNAY4BvQGOAbwB7gHvAfQBvgGLAYwBvgGMAY0BvgGNAb0BvwGKAYsBvwGLAb4BwAGJAYoBwAGKAb8BwQGIAYkBwQGJAcABwgGIAcEBwgGHAYgBsAGHAcIBsAGcAYcBsQGcAbABsQGaAZsBsQGbAZwBrwGdAZ4BrwGlAZ0BrgGvAZ4BsgGaAbEBsgGYAZkBsgGZAZoBrQGuAZ4BrQGeAZ8BswGYAbIBswGXAZgBrAGtAZ8BrAGfAaABtAGWAZcBtAGXAbMBqwGsAaABqwGgAaEBtQGVAZYBtQGWAbQBqgGrAaEBtgGVAbUBtgGUAZUBqQGqAaEBqQGhAaIBtwGTAZQBtwGUAbYBqAGpAaIBqAGiAaMBuAGTAbcBpwGjAaQBpwGoAaMBpgGkAZMBpgGnAaQBpgGTAbgBCQJ/An4CCgJ+An0CCgIJAn4CCAKAAn8CCAJ/AgkCCwJ9AnwCCwIKAn0CBwKAAggCBwJtAoACDAJ8AnsCDAILAnwCGgJuAm0CGgJtAgcCDQJ7AnoCDQIMAnsCGQJvAm4CGQJuAhoCDgINAnoCGAJwAm8CGAJvAhkCDwJ6AnkCDwIOAnoCEAJ5AngCEAIPAnkCFwJxAnACFwJyAnECFwJwAhgCEQIQAngCEgJ4AncCEgIRAngCFgJzAnICFgJ0AnMCFgJyAhcCEwJ3AoYCEwISAncCngKGAoUCngITAoYCFQJ1AnQCFQJ2AnUCFQJ0AhYCnwKFAoQCnwKeAoUCoAKEAoMCoAKfAoQCoQKDAoICoQKgAoMCFAJsAnYCFAJ2AhUCogKhAoICowKCAoECowKiAoICGwJiAmwCGwJsAhQCpAKBAowCpAKjAoECpQKkAowCJQJiAhsCJQJjAmIClAKMAosClAKlAowClQKUAosCigKVAosCJAJjAiUCJAJkAmMClgKVAooCiQKWAooCiQKXApYCIwJkAiQCIwJlAmQCIgJmAmUCIgJlAiMCiAKXAokCiAKYApcCIQJmAiICIQJnAmYCIAJnAiECIAJoAmcChwKYAogChwKZApgCHwJoAiACHwJpAmgCHgJpAh8CHgJqAmkCkgKZAocCHQJqAh4CHQJrAmoCHAJrAh0CHAJYAmsCMQJYAhwCWQJYAjECkQKaApkCkQKZApICMAJZAjECLwJZAjACkAKaApECkAKbApoCWgIvAi4CWgJZAi8CjwKbApACjwKcApsCWwIuAi0CWwJaAi4CjgKcAo8CjgKdApwCjgKTAp0CXAItAiwCXAJbAi0CjQKTAo4CXQIrAioCXQIsAisCXQJcAiwCXgIqAikCXgJdAioCXwIpAigCXwJeAikCYAIoAicCYAJfAigCYQJgAicCYQInAiYCTwJhAiYCTwImAjsCUAJPAjsCUAI6AjkCUAI7AjoCTgI9AjwCTgI8AkQCTQI9Ak4CUQJQAjkCUQI4AjcCUQI5AjgCTAI9Ak0CTAI+Aj0CUgJRAjcCUgI3AjYCSwI+AkwCSwI/Aj4CUwI2AjUCUwJSAjYCSgI/AksCSgJAAj8CVAI1AjQCVAJTAjUCSQJAAkoCVQJUAjQCVQI0AjMCSAJAAkkCSAJBAkACVgIzAjICVgJVAjMCRwJBAkgCRwJCAkECVwJWAjICRgJDAkICRgJCAkcCRQIyAkMCRQJDAkYCRQJXAjICsgKmAqcCsgKnAqgCswKoAqkCswKyAqgCtAKpAqoCtAKzAqkCtQKqAqsCtQK0AqoCtgKrAqwCtgK1AqsCtwKsAq0CtwK2AqwCuAKtAq4CuAK3Aq0CuQKuAq8CuQK4Aq4CsQKvArACsQK5Aq8CyAK6ArsCyAK7ArwCyQK8Ar0CyQLIArwCygK9Ar4CygLJAr0CywK+Ar8CywLKAr4CzAK/AsACzALLAr8CzQLAAsECzQLMAsACzgLBAsICzgLCAsMCzgLNAsECzwLOAsMC0ALDAsQC0ALPAsMC0QLEAsUC0QLQAsQCxwLFAsYCxwLRAsUC3wLSAtMC3wLTAtQC4ALUAtUC4ALfAtQC4QLVAtYC4QLgAtUC4gLWAtcC4gLhAtYC4wLXAtgC4wLiAtcC5ALYAtkC5ALjAtgC5QLZAtoC5QLaAtsC5QLkAtkC5gLlAtsC5wLbAtwC5wLmAtsC3gLcAt0C3gLnAtwC6wLoAukC6wLpAuoC7wLsAu0C7wLtAu4C8wLwAvEC8wLxAvIC9wL0AvUC9wL1AvYC+wL4AvkC+wL5AvoCCgP8Av0CCgP9Av4CCwP+Av8CCwMKA/4CDAP/AgADDAMLA/8CDQMAAwEDDQMMAwADDgMBAwIDDgMNAwEDDwMCAwMDDwMOAwIDEAMDAwQDEAMPAwMDEQMEAwUDEQMFAwYDEQMQAwQDEgMRAwYDEwMGAwcDEwMSAwYDCQMHAwgDCQMTAwcDIgMUAxUDIgMVAxYDIwMWAxcDIwMiAxYDJAMXAxgDJAMYAxkDJAMjAxcDJQMkAxkDJgMZAxoDJgMlAxkDJwMaAxsDJwMmAxoDKAMbAxwDKAMcAx0DKAMnAxsDKQMoAx0DKgMdAx4DKgMpAx0DKwMeAx8DKwMqAx4DIQMfAyADIQMrAx8DOAMsAy0DOAMtAy4DOQMuAy8DOQM4Ay4DOgMvAzADOgM5Ay8DOwMwAzEDOwM6AzADPAMxAzIDPAMyAzMDPAM7AzEDPQM8AzMDPgMzAzQDPgM9AzMDPwM0AzUDPwM+AzQDNwM1AzYDNwM/AzUDSgNAA0EDSgNBA0IDSwNCA0MDSwNKA0IDTANDA0QDTANLA0MDTQNEA0UDTQNMA0QDTgNFA0YDTgNNA0UDTwNGA0cDTwNOA0YDSQNHA0gDSQNPA0cDXwNQA1EDXwNRA1IDYANSA1MDYANfA1IDYQNTA1QDYQNgA1MDYgNUA1UDYgNhA1QDYwNVA1YDYwNiA1UDZANWA1cDZANjA1YDZQNXA1gDZQNkA1cDZgNYA1kDZgNlA1gDZwNZA1oDZwNmA1kDaANaA1sDaANnA1oDaQNbA1wDaQNoA1sDXgNcA10DXgNpA1wDegNqA2sDegNrA2wDewNsA20DewN6A2wDfANtA24DfAN7A20DfQNuA28DfQN8A24DfgNvA3ADfgN9A28DfwNwA3EDfwN+A3ADgANxA3IDgAN/A3EDgQNyA3MDgQOAA3IDggNzA3QDggOBA3MDgwN0A3UDgwOCA3QDhAN1A3YDhAODA3UDhQN2A3cDhQOEA3YDeQN3A3gDeQOFA3cDiQOGA4cDiQOHA4gDmwOKA4sDmwOLA4wDnAOMA40DnAObA4wDnQONA44DnQOcA40DngOOA48DngOdA44DnwOPA5ADnwOeA48DoAOQA5EDoAOfA5ADoQORA5IDoQOgA5EDogOSA5MDogOhA5IDowOTA5QDowOiA5MDpAOUA5UDpAOjA5QDpQOVA5YDpQOkA5UDpgOWA5cDpgOlA5YDpwOXA5gDpwOmA5cDmgOYA5kDmgOnA5gDtwOoA6kDtwOpA6oDuAOqA6sDuAO3A6oDuQOrA6wDuQO4A6sDugOsA60DugO5A6wDuwOtA64DuwO6A60DvAOuA68DvAO7A64DvQOvA7ADvQO8A68DvgOwA7EDvgO9A7ADvwOxA7IDvwO+A7EDwAOyA7MDwAO/A7IDwQOzA7QDwQPAA7MDtgO0A7UDtgPBA7QDzgPCA8MDzgPDA8QDzwPEA8UDzwPOA8QD0APFA8YD0APPA8UD0QPGA8cD0QPQA8YD0gPHA8gD0gPRA8cD0wPIA8kD0wPSA8gD1APJA8oD1APTA8kD1QPKA8sD1QPLA8wD1QPUA8oDzQPVA8wDTATnA+gDTAToA+kDTQTmA+cDTQTnA0wESwTpA+oDSwRMBOkDTgTkA+UDTgTlA+YDTgTmA00ESgTqA9YDSgRLBOoDTwTjA+QDTwTkA04EWwTWA9cDWwRKBNYDUATiA+MDUATjA08EWgRbBNcDWgTXA9gDUQThA+IDUQTiA1AEUgTgA+EDUgThA1EEWQTYA9kDWQTZA9oDWQRaBNgDUwTgA1IEUwT0A/UDUwT1A+ADWATaA9sDWARZBNoDVATzA/QDVAT0A1MEVQTyA/MDVQTzA1QEPQTxA/IDPQTyA1UEVwTbA9wDVwRYBNsDPgTxAz0EPgTvA/ADPgTwA/EDVgTcA90DVgTdA94DVgRXBNwDPwTtA+4DPwTuA+8DPwTvAz4EQATsA+0DQATtAz8EQQTsA0AEQQTrA+wDIQTeA98DIQRWBN4DQgTrA0EEIAQhBN8DIATfAxAEQwTrA0IERATrA0MEHwQgBBAERQTrA0QERgTrA0UEHgQfBBAEHgQQBBEERwTrA0YESATrA0cEHQQRBBIEHQQeBBEESQTrA0gEPAT3A+sDPATrA0kEHAQSBBMEHAQdBBIEGwQTBBQEGwQcBBMEGgQUBBUEGgQbBBQEGQQVBBYEGQQWBBcEGQQaBBUEGAQZBBcEGAQXBAUELQQYBAUELQQFBAYELAQtBAYEBwQsBAYEKwQsBAcECAQrBAcECQQrBAgECQQqBCsECgQqBAkECgQpBCoECwQpBAoECwQoBCkEDAQoBAsEDQQoBAwEDQQnBCgEDgQnBA0EDgQmBCcEDwQmBA4EDwQlBCYE+wMlBA8E+wMkBCUE/AMjBCQE/AMkBPsD/QMjBPwD/QMiBCME/gM7BCIE/gMiBP0D/wM7BP4D/wM6BDsEAAQ6BP8DAQQ6BAAEAQQ5BDoE+gMuBC8E+gMvBDAE+gMwBDEE+gMxBDIE+gMyBDME+gMzBDQE+gM0BDUE+gM1BDYEAgQ5BAEEAgQ4BDkEBAT6AzYEBAQ2BDcEAwQ3BDgEAwQ4BAIEAwQEBDcE+AM8BC4E+AP6A/kD+AMuBPoD+AP3AzwE6wP3A/YD0gRuBG0E0gRvBG4E0wRtBGwE0wTSBG0E0QRwBG8E0QRvBNIE1ARrBGoE1ARsBGsE1ATTBGwE0ARcBHAE0ARwBNEE1QRqBGkE1QTUBGoE4QRdBFwE4QRcBNAE1gRpBGgE1gTVBGkE4ARdBOEE4AReBF0E1wRoBGcE1wTWBGgE2ARnBGYE2ATXBGcE3wRfBF4E3wRgBF8E3wReBOAE2QTYBGYE2QR7BHoE2QRmBHsE3gRhBGAE3gRgBN8E2gR6BHkE2gTZBHoE2wR5BHgE2wTaBHkEwwR4BHcEwwTbBHgE3QRiBGEE3QRhBN4ExATDBHcExAR2BHUExAR3BHYE3ARjBGIE3ARkBGME3ARiBN0ExQR0BHMExQR1BHQExQTEBHUExgRzBHIExgTFBHMExwTGBHIExwRyBHEEpwRlBGQEpwRkBNwEyATHBHEEpgRlBKcEpgSWBGUEyQTIBHEEygTJBHEEpQSWBKYEywTKBHEEzATLBHEEpASWBKUEpASXBJYEzQTMBHEEzgTNBHEEowSYBJcEowSXBKQEzwTOBHEEwgRxBH0EwgTPBHEEogSZBJgEogSYBKMEoQSaBJkEoQSZBKIEoASbBJoEoASaBKEEnwScBJsEnwSdBJwEnwSbBKAEngSdBJ8EngSLBJ0EswSLBJ4EswSMBIsEsgSMBLMEjQSMBLIEsQSNBLIEjgSNBLEEjwSOBLEEjwSxBLAEkASPBLAEkASwBK8EkQSQBK8EkQSvBK4EkgSRBK4EkwSSBK4EkwSuBK0ElASTBK0ElAStBKwElQSUBKwElQSsBKsEgQSVBKsEgQSrBKoEggSqBKkEggSBBKoEgwSCBKkEgwSpBKgEhASoBMEEhASDBKgEhQSEBMEEhQTBBMAEhgSFBMAEhwSGBMAEhwTABL8EgAS1BLQEgAS2BLUEgAS3BLYEgAS4BLcEgAS5BLgEgAS6BLkEgAS7BLoEgAS8BLsEiASHBL8EiAS/BL4EigS8BIAEigS9BLwEiQS+BL0EiQSIBL4EiQS9BIoEfgS0BMIEfgR/BIAEfgSABLQEfgTCBH0EcQR8BH0ElHSUYmg6aB1oIEsAhZRoIoeUUpQoSwFN4gRLA4aUaCqJQpg6AAAAAAAAAAAAAAAAgD8AAAAAAAAAAAAAgD8AAAAAyRK6vfLwfj8AAAAASPA4vlHKez8AAAAA9YaIvhW7dj8AAAAAFjm2vtw8bz8AAAAAyVTkvjUiZT8AAAAAtX4Gv9XSWT8AAAAA6vwXv8r/TT8AAAAAibsgv09ARz8AAAAA6R4pv8MuQD8AAAAA6R4pv8MuQD8AAAAAyRK6vfLwfj8AAAAASPA4vlHKez8AAAAA9YaIvhW7dj8AAAAAFjm2vtw8bz8AAAAAyVTkvjUiZT8AAAAAtX4Gv9XSWT8AAAAA6vwXv8r/TT8AAAAAibsgv09ARz8AAAAA6R4pv8MuQD8AAAAA6R4pv8MuQD8AAAAAHYM5v4FpMD8AAAAARwNJvySGHj8AAAAALxlXv8zPCj8AAAAA81Fjv2Z46z4AAAAA415tv8K9vz4AAAAACh91v2irkz4AAAAA3556v3vRUD4AAAAAZg9+v5qk+z0AAAAACUx/v2arlz0AAAAAa+d/v6ta4DwAAAAAa+d/v6ta4DwAAAAAHYM5v4FpMD8AAAAARwNJvySGHj8AAAAALxlXv8zPCj8AAAAA81Fjv2Z46z4AAAAA415tv8K9vz4AAAAACh91v2irkz4AAAAA3556v3vRUD4AAAAAZg9+v5qk+z0AAAAACUx/v2arlz0AAAAAAAAAgAAAgD8AAAAAAAAAgAAAgD8AAAAAAAAAgAAAgD8AAAAAAAAAgAAAgD8AAAAAS/1/P3bwFLwAAAAAS/1/P3bwFLwAAAAAlrh+P+x1zL0AAAAAvyt7PwT1Rb4AAAAAcDl1P6/7kr4AAAAAP/VsP6jFwb4AAAAALthiP05M7b4AAAAAhiZXPx27Cr8AAAAAhiZXPx27Cr8AAAAAlrh+P+x1zL0AAAAAvyt7PwT1Rb4AAAAAcDl1P6/7kr4AAAAAP/VsP6jFwb4AAAAALthiP05M7b4AAAAAhiZXPx27Cr8AAAAAhiZXPx27Cr8AAAAA9plJP1bGHb8AAAAANhk6PyPLL78AAAAAqv4oPx9LQL8AAAAAuMMWP3DlTr8AAAAAJv0DP+dZW78AAAAA60fiPjykZb8AAAAA60fiPjykZb8AAAAA9plJP1bGHb8AAAAANhk6PyPLL78AAAAAqv4oPx9LQL8AAAAAuMMWP3DlTr8AAAAAJv0DP+dZW78AAAAA60fiPjykZb8AAAAA60fiPjykZb8AAAAAVgC3PtQWb78AAAAA9niKPql1dr8AAAAAvLE7Pq+pe78AAAAArNTIPSPEfr8AAAAAem1FPdSzf78AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAVgC3PtQWb78AAAAA9niKPql1dr8AAAAAvLE7Pq+pe78AAAAArNTIPSPEfr8AAAAAem1FPdSzf78AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAOcafvUI4f78AAAAAX8smvsWUfL8AAAAAMFN/vhnqd78AAAAAHA+pvk2kcb8AAAAA+gXTvsA+ab8AAAAAx4H8vqWzXr8AAAAAcjMSv1clUr8AAAAAo9YkvzjeQ78AAAAANrUxv3VFOL8AAAAAl3s9v+ojLL8AAAAAl3s9v+ojLL8AAAAAOcafvUI4f78AAAAAX8smvsWUfL8AAAAAMFN/vhnqd78AAAAAHA+pvk2kcb8AAAAA+gXTvsA+ab8AAAAAx4H8vqWzXr8AAAAAcjMSv1clUr8AAAAAo9YkvzjeQ78AAAAANrUxv3VFOL8AAAAAl3s9v+ojLL8AAAAAl3s9v+ojLL8AAAAAettMvweGGb8AAAAAm0dav97ABb8AAAAAfoNlv6LM4r4AAAAAm39uvxkPur4AAAAAPlR1v1RIkr4AAAAAlTZ6v2h+WL4AAAAA+Gt9v832EL4AAAAAxT5/vy0nnb0AAAAAhNJ/vzyUGL0AAAAAAACAvwAAAAAAAAAAAACAvwAAAAAAAAAAettMvweGGb8AAAAAm0dav97ABb8AAAAAfoNlv6LM4r4AAAAAm39uvxkPur4AAAAAPlR1v1RIkr4AAAAAlTZ6v2h+WL4AAAAA+Gt9v832EL4AAAAAxT5/vy0nnb0AAAAAhNJ/vzyUGL0AAAAAAACAvwAAAAAAAAAAAACAvwAAAAAAAAAAAACAvwAAAAAAAAAAAACAvwAAAAAAAAAAAACAvwAAAAAAAAAAAACAvwAAAAAAAAAAn2R/v0jxjD0AAAAAQVR9vzWIEz4AAAAAAKZ5v56vYj4AAAAA2xd0v79Umj4AAAAAITptv2NzwD4AAAAA/ndkvx775j4AAAAAdM1Zv2uHBj8AAAAAG1ZNv9vhGD8AAAAA9FdGv+zZIT8AAAAAmPs+v315Kj8AAAAAmPs+v315Kj8AAAAAn2R/v0jxjD0AAAAAQVR9vzWIEz4AAAAAAKZ5v56vYj4AAAAA2xd0v79Umj4AAAAAITptv2NzwD4AAAAA/ndkvx775j4AAAAAdM1Zv2uHBj8AAAAAG1ZNv9vhGD8AAAAA9FdGv+zZIT8AAAAAmPs+v315Kj8AAAAAmPs+v315Kj8AAAAAA9Qtv4DvOz8AAAAAEXcav/clTD8AAAAA3VUFvwiJWj8AAAAAuBrevp2oZj8AAAAAyKCwvtRIcD8AAAAAAJuDvgJmdz8AAAAAU2MwvmgsfD8AAAAAv/u8vWLofj8AAAAAUfA3veO9fz8AAAAAAAAAAAAAgD8AAAAAAAAAAAAAgD8AAAAAA9Qtv4DvOz8AAAAAEXcav/clTD8AAAAA3VUFvwiJWj8AAAAAuBrevp2oZj8AAAAAyKCwvtRIcD8AAAAAAJuDvgJmdz8AAAAAU2MwvmgsfD8AAAAAv/u8vWLofj8AAAAAUfA3veO9fz8AAAAAAAAAAAAAgD8AAAAAAAAAAAAAgD8AAACAuxSiPXEyfz8AAACAzbspPm91fD8AAACAKXOEPilJdz8AAACAaSmxPq0vcD8AAACAI/vZPtSjZz8AAACAWioBP4oGXT8AAACAgJUUP753UD8AAACABo4iP3TERT8AAACAip4vP01DOj8AAACAip4vP01DOj8AAACAuxSiPXEyfz8AAACAzbspPm91fD8AAACAKXOEPilJdz8AAACAaSmxPq0vcD8AAACAI/vZPtSjZz8AAACAWioBP4oGXT8AAACAgJUUP753UD8AAACABo4iP3TERT8AAACAip4vP01DOj8AAACAip4vP01DOj8AAACAqtg/P42AKT8AAACAFuROP5TFFj8AAACAO0NcP1F2Aj8AAACAMJZnPxg12j4AAACAo6dwP36Zrj4AAACAoXB3PwhLgz4AAACA7xJ8PyamMj4AAACAKs1+P5TyxT0AAACAf6V/P6AwVz0AAACAcvx/P0yoKjwAAACAcvx/P0yoKjwAAACAqtg/P42AKT8AAACAFuROP5TFFj8AAACAO0NcP1F2Aj8AAACAMJZnPxg12j4AAACAo6dwP36Zrj4AAACAoXB3PwhLgz4AAACA7xJ8PyamMj4AAACAKs1+P5TyxT0AAACAf6V/P6AwVz0AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAb+1/vwv+wrwAAAAAb+1/vwv+wrwAAAAA51J+v6756b0AAAAAXSV6v+G7Wb4AAAAAGbVzvyzAnL4AAAAANXxrv1fTyL4AAAAAuuRgvwed9L4AAAAAAQ5UvxRrD78AAAAANExHv8msIL8AAAAAGmE5vz6NML8AAAAAGmE5vz6NML8AAAAA51J+v6756b0AAAAAXSV6v+G7Wb4AAAAAGbVzvyzAnL4AAAAANXxrv1fTyL4AAAAAuuRgvwed9L4AAAAAAQ5UvxRrD78AAAAANExHv8msIL8AAAAAGmE5vz6NML8AAAAAGmE5vz6NML8AAAAAuJkpv2vCP78AAAAAMgYYv/H4Tb8AAAAAy/QEvyXEWr8AAAAAiaXhvirMZb8AAAAAPEG4vi7Zbr8AAAAAX8WOvoDYdb8AAAAAykhMvqLaer8AAAAAZJL8vbYLfr8AAAAA5cl0vdyKf78AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAuJkpv2vCP78AAAAAMgYYv/H4Tb8AAAAAy/QEvyXEWr8AAAAAiaXhvirMZb8AAAAAPEG4vi7Zbr8AAAAAX8WOvoDYdb8AAAAAykhMvqLaer8AAAAAZJL8vbYLfr8AAAAA5cl0vdyKf78AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAPJW+PZ7jfr8AAAAAjm89Ps6Ue78AAAAAa82LPphFdr8AAAAA9XO6Pulrbr8AAAAALbDkPmsLZb8AAAAAU/kEP2TBWr8AAAAAk9EWP1fbTr8AAAAAE4EnP9+XQb8AAAAA6Ls2P8xJM78AAAAARlBEP75OJL8AAAAAf0RLP0+fG78AAAAABqhRP+7mEr8AAAAABqhRP+7mEr8AAAAAPJW+PZ7jfr8AAAAAjm89Ps6Ue78AAAAAa82LPphFdr8AAAAA9XO6Pulrbr8AAAAALbDkPmsLZb8AAAAAU/kEP2TBWr8AAAAAk9EWP1fbTr8AAAAAE4EnP9+XQb8AAAAA6Ls2P8xJM78AAAAARlBEP75OJL8AAAAAf0RLP0+fG78AAAAABqhRP+7mEr8AAAAABqhRP+7mEr8AAAAAF/1cP4Q6Ab8AAAAAGwlmP6Ks4L4AAAAA1B9tP930wL4AAAAAK5ZyP6iOo74AAAAAXLp2Py6MiL4AAAAAvKV6P4lNUL4AAAAAyW99P/+LEL4AAAAA/1p/P548kb0AAAAAZtt/P5HgCL0AAACAAACAPwAAAAAAAACAAACAPwAAAAAAAAAAF/1cP4Q6Ab8AAAAAGwlmP6Ks4L4AAAAA1B9tP930wL4AAAAAK5ZyP6iOo74AAAAAXLp2Py6MiL4AAAAAvKV6P4lNUL4AAAAAyW99P/+LEL4AAAAA/1p/P548kb0AAAAAZtt/P5HgCL0AAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAACAAACAPwAAAAAAAACAAACAPwAAAAAAAACAGmd/P4LQiz0AAACAz+p8P7FvHj4AAACAPNB3P9hxgD4AAACAuE5wP7WAsD4AAACAW+ZmP4UZ3T4AAACAUaNdP5scAD8AAACAvNtRPwWdEj8AAACAvNtRPwWdEj8AAACAGmd/P4LQiz0AAACAz+p8P7FvHj4AAACAPNB3P9hxgD4AAACAuE5wP7WAsD4AAACAW+ZmP4UZ3T4AAACAUaNdP5scAD8AAACAvNtRPwWdEj8AAACAvNtRPwWdEj8AAACAmc9EPyW2Iz8AAACAabM1P9VVND8AAACAF7AkP6P+Qz8AAACA3hUSP+g5Uj8AAACAc6z8PounXj8AAACAre3TPjYKaT8AAACAiQGrPo9McT8AAACANuGCPqR+dz8AAACADq04PmfNez8AAACAzMffPZh3fj8AAACAETBYPaekfz8AAAAAAAAAAAAAgD8AAAAAAAAAAAAAgD8AAACAmc9EPyW2Iz8AAACAabM1P9VVND8AAACAF7AkP6P+Qz8AAACA3hUSP+g5Uj8AAACAc6z8PounXj8AAACAre3TPjYKaT8AAACAiQGrPo9McT8AAACANuGCPqR+dz8AAACADq04PmfNez8AAACAzMffPZh3fj8AAACAETBYPaekfz8AAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAAAAAACAvwAAAAAAAAAAAACAvwAAAAAAAAAAzH5/v0OJgD0AAAAAAr59v/ayBz4AAAAA4I96v7XwUT4AAAAACqd1v1sYkD4AAAAAbsRuv7KsuD4AAAAA4o5mv3qF3j4AAAAAdkpcvxtqAj8AAAAA+y1Uv8I7Dz8AAAAAISRLv4zJGz8AAAAAISRLv4zJGz8AAAAAzH5/v0OJgD0AAAAAAr59v/ayBz4AAAAA4I96v7XwUT4AAAAACqd1v1sYkD4AAAAAbsRuv7KsuD4AAAAA4o5mv3qF3j4AAAAAdkpcvxtqAj8AAAAA+y1Uv8I7Dz8AAAAAISRLv4zJGz8AAAAAISRLv4zJGz8AAAAAXbg6vw8iLz8AAAAAb04pv+YEQD8AAAAAHqQXvzFBTj8AAAAAHGEEv6IdWz8AAAAAq+Hfvo46Zj8AAAAAMKy1vqVXbz8AAAAAdDaLvvhadj8AAAAA6AZDvmlQez8AAAAA2qvlvZhifj8AAAAA3JRfvUuefz8AAAAAAAAAAAAAgD8AAAAAAAAAAAAAgD8AAAAAXbg6vw8iLz8AAAAAb04pv+YEQD8AAAAAHqQXvzFBTj8AAAAAHGEEv6IdWz8AAAAAq+Hfvo46Zj8AAAAAMKy1vqVXbz8AAAAAdDaLvvhadj8AAAAA6AZDvmlQez8AAAAA2qvlvZhifj8AAAAA3JRfvUuefz8AAAAAAAAAAAAAgD8AAAAAAAAAAAAAgD8AAACAoRnKPR/Afj8AAACAq7xGPuQhez8AAACAmhaRPp2BdT8AAACAD0y/PtF1bT8AAACAmKvsPiQCYz8AAACAau8LP4FeVj8AAACAGN4fPyfyRz8AAACAqbYxPw9EOD8AAACAf+E+P7SWKj8AAACAyWZKPz2/HD8AAACAyWZKPz2/HD8AAACAoRnKPR/Afj8AAACAq7xGPuQhez8AAACAmhaRPp2BdT8AAACAD0y/PtF1bT8AAACAmKvsPiQCYz8AAACAau8LP4FeVj8AAACAGN4fPyfyRz8AAACAqbYxPw9EOD8AAACAf+E+P7SWKj8AAAAAynR8vybLKT4AAAAAynR8vybLKT4AAAAAynR8vybLKT4AAAAAynR8vybLKT4AAAAAAAAAgAAAgD8AAAAAAAAAgAAAgD8AAAAAAAAAgAAAgD8AAAAAAAAAgAAAgD8AAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAACAPwAAAAAAAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAAACAvwAAAAAAAAAAAACAvwAAAAAAAAAAAACAvwAAAAAAAAAAAACAvwAAAAAAAAAA87U/P9CnKb8AAAAA87U/P9CnKb8AAAAALoMuP+NMO78AAAAAWckcP/ReSr8AAAAA0zcLP+nVVr8AAAAAotrwPtTnYb8AAAAAHpvJPoRRa78AAAAAlJKhPjvrcr8AAAAAVkhzPpCreL8AAAAA5zslPi2lfL8AAAAA+aG0PZgAf78AAAAAs98wPd/Cf78AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAALoMuP+NMO78AAAAAWckcP/ReSr8AAAAA0zcLP+nVVr8AAAAAotrwPtTnYb8AAAAAHpvJPoRRa78AAAAAlJKhPjvrcr8AAAAAVkhzPpCreL8AAAAA5zslPi2lfL8AAAAA+aG0PZgAf78AAAAAs98wPd/Cf78AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAQeXAvancfr8AAAAAG0c9vrWWe78AAAAAkQWKvteFdr8AAAAA9u61vvZKb78AAAAAMEHhvsbkZb8AAAAATWsFv/N7Wr8AAAAAstMYv6VgTb8AAAAAoXQqv+7/Pr8AAAAApBA6vzXUL78AAAAAQg1Dv7LNJb8AAAAAySlLvyvCG78AAAAAySlLvyvCG78AAAAAQeXAvancfr8AAAAAG0c9vrWWe78AAAAAkQWKvteFdr8AAAAA9u61vvZKb78AAAAAMEHhvsbkZb8AAAAATWsFv/N7Wr8AAAAAstMYv6VgTb8AAAAAoXQqv+7/Pr8AAAAApBA6vzXUL78AAAAAQg1Dv7LNJb8AAAAAySlLvyvCG78AAAAAySlLvyvCG78AAAAAqf5Yv/7TB78AAAAAKV9kv0Fd574AAAAALV1tvzfGv74AAAAAWS50vy3Gmb4AAAAAnBx5v5Dxa74AAAAAsXh8vyZuKb4AAAAAOud+v1xfvb0AAAAA4L9/v60mNb0AAAAAAACAv104oaQAAAAAAACAv104oaQAAAAAqf5Yv/7TB78AAAAAKV9kv0Fd574AAAAALV1tvzfGv74AAAAAWS50vy3Gmb4AAAAAnBx5v5Dxa74AAAAAsXh8vyZuKb4AAAAAOud+v1xfvb0AAAAA4L9/v60mNb0AAACAAACAPwAAAAAAAACAAACAPwAAAAAAAACAwUp/P2Q1mD0AAACABI18P9CGJz4AAACAvjl3PxfmhD4AAACA5gBwP0kmsj4AAACArYdmP1ej3j4AAACAvU9eP/fg/T4AAACA12VUP97oDj8AAACA12VUP97oDj8AAACAwUp/P2Q1mD0AAACABI18P9CGJz4AAACAvjl3PxfmhD4AAACA5gBwP0kmsj4AAACArYdmP1ej3j4AAACAvU9eP/fg/T4AAACA12VUP97oDj8AAACA12VUP97oDj8AAACAe+5IP3+gHj8AAACA9GU7P0NoLj8AAACAVsIrPw/UPT8AAACADR0aP/RpTD8AAACASbgGPz6vWT8AAACAhPrjPq04ZT8AAACATeS4Pqu5bj8AAACAU1ONPu4Ndj8AAACAncJEPss6ez8AAACAKffjPbxofj8AAACAVTdePXyffz8AAAAAAAAAAAAAgD8AAAAAAAAAAAAAgD8AAACAe+5IP3+gHj8AAACA9GU7P0NoLj8AAACAVsIrPw/UPT8AAACADR0aP/RpTD8AAACASbgGPz6vWT8AAACAhPrjPq04ZT8AAACATeS4Pqu5bj8AAACAU1ONPu4Ndj8AAACAncJEPss6ez8AAACAKffjPbxofj8AAACAVTdePXyffz8AAAAAAAAAAAAAgD8AAAAAAAAAAAAAgD8AAAAA4mTCvRvYfj8AAAAAFWpCvgFYez8AAAAALT+QvlihdT8AAAAA3Vi8vo0Mbj8AAAAA0obkvrwVZT8AAAAAlhUGv5sTWj8AAAAAEyAZv7knTT8AAAAAfegqv0mYPj8AAAAAugs7vwPJLj8AAAAASkhJv3suHj8AAAAAsYFVv24/DT8AAAAAmtVcv/N9AT8AAAAAkztjv7rO6z4AAAAAkztjv7rO6z4AAAAA4mTCvRvYfj8AAAAAFWpCvgFYez8AAAAALT+QvlihdT8AAAAA3Vi8vo0Mbj8AAAAA0obkvrwVZT8AAAAAlhUGv5sTWj8AAAAAEyAZv7knTT8AAAAAfegqv0mYPj8AAAAAugs7vwPJLj8AAAAASkhJv3suHj8AAAAAsYFVv24/DT8AAAAAmtVcv/N9AT8AAAAAAACAvwAAAAAAAAAAAACAvwAAAAAAAAAAAACAvwAAAAAAAAAAAACAvwAAAAAAAAAA7T9iv/uO774AAAAA7T9iv/uO774AAAAAEHVYv9uuCL8AAAAAb7RMvxG6Gb8AAAAAwPU+vwmAKr8AAAAAKVEvvySMOr8AAAAA4QIev4ZqSb8AAAAAe2gLv1q2Vr8AAAAACu/vvnkmYr8AAAAADl/IvviUa78AAAAAJRahvuP/cr8AAAAAfs51vtaDeL8AAAAAr+ksvudSfL8AAAAAcLTQvdGqfr8AAAAABKVJvYmwf78AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAEHVYv9uuCL8AAAAAb7RMvxG6Gb8AAAAAwPU+vwmAKr8AAAAAKVEvvySMOr8AAAAA4QIev4ZqSb8AAAAAe2gLv1q2Vr8AAAAACu/vvnkmYr8AAAAADl/IvviUa78AAAAAJRahvuP/cr8AAAAAfs51vtaDeL8AAAAAr+ksvudSfL8AAAAAcLTQvdGqfr8AAAAABKVJvYmwf78AAAAAAAAAAAAAgL8AAAAAAAAAAAAAgL8AAAAAsRKXPXRNf78AAAAAZCEcPsABfb8AAAAAe6RwPqbUeL8AAAAAJbejPlePcr8AAAAAczfPPskYar8AAAAA6635PlF/X78AAAAAdP0QP6/7Ur8AAAAAdpQjP5rrRL8AAAAAUEQ0P8rENb8AAAAAmt5CP4UEJr8AAAAA3NVLP7jgGr8AAAAAWMpTP+3OD78AAAAAWMpTP+3OD78AAAAAsRKXPXRNf78AAAAAZCEcPsABfb8AAAAAe6RwPqbUeL8AAAAAJbejPlePcr8AAAAAczfPPskYar8AAAAA6635PlF/X78AAAAAdP0QP6/7Ur8AAAAAdpQjP5rrRL8AAAAAUEQ0P8rENb8AAAAAmt5CP4UEJr8AAAAA3NVLP7jgGr8AAAAAWMpTP+3OD78AAAAAWMpTP+3OD78AAAAALxBhP/P8874AAAAAwAJrP1QJy74AAAAArkFyP56Apb4AAAAAI2V3P42hg74AAAAANe96P+WySr4AAAAARtt9P947BL4AAAAA+Xp/P49sgr0AAAAADuJ/P+qc97wAAAAAAACAPxA+eKQAAAAAAACAPxA+eKQAAAAALxBhP/P8874AAAAAwAJrP1QJy74AAAAArkFyP56Apb4AAAAAI2V3P42hg74AAAAANe96P+WySr4AAAAARtt9P947BL4AAAAA+Xp/P49sgr0AAAAADuJ/P+qc97wAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIC/AAAAgAAAAIAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAAAAAIA/AAAAAAAAAACUdJRiaEFoHWggSwCFlGgih5RSlChLAU3mAksDhpRoSIlCyCIAAAAAgL+r/OLAuyRawAAAgD+r/OLAuyRawAAAgL+rPLLAuyQ5wAAAgD+rPLLAuyQ5wAAAgL+r/OLAuyRawAAAgL825NnAtVZZwAAAgL+0LNLA+zxXwAAAgL8InMvAqTtUwAAAgL+FZ8XA/ytQwAAAgL8tj7/A/A1LwAAAgL9Dm7rA1ItFwAAAgL/5ZbbAdds/wAAAgL8ASbTAgZg8wAAAgL+rPLLAuyQ5wAAAgD+r/OLAuyRawAAAgD825NnAtVZZwAAAgD+0LNLA+zxXwAAAgD8InMvAqTtUwAAAgD+FZ8XA/ytQwAAAgD8tj7/A/A1LwAAAgD9Dm7rA1ItFwAAAgD/5ZbbAdds/wAAAgD8ASbTAgZg8wAAAgD+rPLLAuyQ5wAAAgL+rvJ7Ad8nCvwAAgD+rvJ7Ad8nCvwAAgL+rPLLAuyQ5wAAAgL8SZq7A+sMxwAAAgL/d+qrAduEpwAAAgL8M+6fAL30hwAAAgL+fZqXAJJcYwAAAgL+WPaPAVS8PwAAAgL/wf6HAxEUFwAAAgL+vLaDA3rT1vwAAgL/RRp/ArtrfvwAAgL9N7J7A44XRvwAAgL+rvJ7Ad8nCvwAAgD+rPLLAuyQ5wAAAgD8SZq7A+sMxwAAAgD/d+qrAduEpwAAAgD8M+6fAL30hwAAAgD+fZqXAJJcYwAAAgD+WPaPAVS8PwAAAgD/wf6HAxEUFwAAAgD+vLaDA3rT1vwAAgD/RRp/ArtrfvwAAgD9N7J7A44XRvwAAgD+rvJ7Ad8nCvwAAgL+rcuS/d8nCvwAAgD+rcuS/d8nCvwAAgL+rvJ7Ad8nCvwAAgL+rcuS/d8nCvwAAgD+rvJ7Ad8nCvwAAgD+rcuS/d8nCvwAAgL9WOR/Au4R4wAAAgD9WOR/Au4R4wAAAgL+rcuS/d8nCvwAAgL+xZee/o1f5vwAAgL8xPe+/KCsXwAAAgL8t+fu/vuIwwAAAgL/SzAbAldJJwAAAgL9A1RHA7othwAAAgL9WOR/Au4R4wAAAgD+rcuS/d8nCvwAAgD+xZee/o1f5vwAAgD8xPe+/KCsXwAAAgD8t+fu/vuIwwAAAgD/SzAbAldJJwAAAgD9A1RHA7othwAAAgD9WOR/Au4R4wAAAgL+rLIzAXoKxwAAAgD+rLIzAXoKxwAAAgL9WOR/Au4R4wAAAgL/15C7AWUeHwAAAgL9fYUDASXGRwAAAgL+UrlPAMMCawAAAgL+UzGjADDSjwAAAgL+/q3/AK8iqwAAAgL+rLIzAXoKxwAAAgD9WOR/Au4R4wAAAgD/15C7AWUeHwAAAgD9fYUDASXGRwAAAgD+UrlPAMMCawAAAgD+UzGjADDSjwAAAgD+/q3/AK8iqwAAAgD+rLIzAXoKxwAAAgL+rHOHAXnLEwAAAgD+rHOHAXnLEwAAAgL+rLIzAXoKxwAAAgL89OpvA3xS4wAAAgL/n36rAI0K9wAAAgL+oHbvAKgrBwAAAgL+A88vA9GzDwAAAgL9DbNbAAzHEwAAAgL+rHOHAXnLEwAAAgD+rLIzAXoKxwAAAgD89OpvA3xS4wAAAgD/n36rAI0K9wAAAgD+oHbvAKgrBwAAAgD+A88vA9GzDwAAAgD9DbNbAAzHEwAAAgD+rHOHAXnLEwAAAgL9VLjXBXiKNwAAAgD9VLjXBXiKNwAAAgL+rHOHAXnLEwAAAgL+I9/TAiLDDwAAAgL9q6APBBWvBwAAAgL/QcQzB/NS9wAAAgL8avBPBA2y5wAAAgL8dpxrBPOSzwAAAgL/YMiHBpj2twAAAgL9NXyfBQnilwAAAgL96LC3BD5ScwAAAgL85SDHB8CuVwAAAgL9VLjXBXiKNwAAAgD+rHOHAXnLEwAAAgD+I9/TAiLDDwAAAgD9q6APBBWvBwAAAgD/QcQzB/NS9wAAAgD8avBPBA2y5wAAAgD8dpxrBPOSzwAAAgD/YMiHBpj2twAAAgD9NXyfBQnilwAAAgD96LC3BD5ScwAAAgD85SDHB8CuVwAAAgD9VLjXBXiKNwAAAgL9VTk7BJNq6PgAAgD9VTk7BJNq6PgAAgL9VLjXBXiKNwAAAgL+BSjrBLcKAwAAAgL8a0j7BDtFmwAAAgL8jxULB1SpKwAAAgL+aI0bBsJErwAAAgL+A7UjBoAULwAAAgL/VIkvBRg3RvwAAgL+Yw0zBdimIvwAAgL/Kz03BNX/tvgAAgL+yLk7BwyNlvQAAgL9VTk7BJNq6PgAAgD9VLjXBXiKNwAAAgD+BSjrBLcKAwAAAgD8a0j7BDtFmwAAAgD8jxULB1SpKwAAAgD+aI0bBsJErwAAAgD+A7UjBoAULwAAAgD/VIkvBRg3RvwAAgD+Yw0zBdimIvwAAgD/Kz03BNX/tvgAAgD+yLk7BwyNlvQAAgD9VTk7BJNq6PgAAgL9VTk7BEm0WPwAAgD9VTk7BEm0WPwAAgL9VTk7BJNq6PgAAgL9VTk7BEm0WPwAAgD9VTk7BJNq6PgAAgD9VTk7BEm0WPwAAgL9VXjXBom2oQAAAgD9VXjXBom2oQAAAgL9VTk7BEm0WPwAAgL9q7U3BoFKlPwAAgL+pykzBH9X6PwAAgL+rAEvBlw4kQAAAgL9olEjB1+hHQAAAgL821UXB8nRmQAAAgL+xjELB86+BQAAAgL/Xuj7B2lSPQAAAgL+pXzrBLimcQAAAgL/r8DfBoWaiQAAAgL9VXjXBom2oQAAAgD9VTk7BEm0WPwAAgD9q7U3BoFKlPwAAgD+pykzBH9X6PwAAgD+rAEvBlw4kQAAAgD9olEjB1+hHQAAAgD821UXB8nRmQAAAgD+xjELB86+BQAAAgD/Xuj7B2lSPQAAAgD+pXzrBLimcQAAAgD/r8DfBoWaiQAAAgD9VXjXBom2oQAAAgL+r3OHAok3gQAAAgD+r3OHAok3gQAAAgL9VXjXBom2oQAAAgL/Wwy/BsdizQAAAgL92uinBA/a9QAAAgL83QiPBlsXGQAAAgL8YWxzBbEfOQAAAgL8aBRXBhXvUQAAAgL88QA3B32HZQAAAgL9+DAXBfPrcQAAAgL/B0/jAW0XfQAAAgL8chO3AkAvgQAAAgL+r3OHAok3gQAAAgD9VXjXBom2oQAAAgD/Wwy/BsdizQAAAgD92uinBA/a9QAAAgD83QiPBlsXGQAAAgD8YWxzBbEfOQAAAgD8aBRXBhXvUQAAAgD88QA3B32HZQAAAgD9+DAXBfPrcQAAAgD/B0/jAW0XfQAAAgD8chO3AkAvgQAAAgD+r3OHAok3gQAAAgL9WmU/Aov20QAAAgD9WmU/Aov20QAAAgL+r3OHAok3gQAAAgL9uQs7AzIvfQAAAgL9jtrvASkbdQAAAgL+LOKrAG33ZQAAAgL+AYZvAYcnUQAAAgL99wY7AjIHPQAAAgL/A0oLAXDvJQAAAgL+TKm/A0vbBQAAAgL84+17A7sO7QAAAgL9WmU/Aov20QAAAgD+r3OHAok3gQAAAgD9uQs7AzIvfQAAAgD9jtrvASkbdQAAAgD+LOKrAG33ZQAAAgD+AYZvAYcnUQAAAgD99wY7AjIHPQAAAgD/A0oLAXDvJQAAAgD+TKm/A0vbBQAAAgD84+17A7sO7QAAAgD9WmU/Aov20QAAAgL+rcuS/RVsDQAAAgD+rcuS/RVsDQAAAgL9WmU/Aov20QAAAgL/vrzzAeDurQAAAgL+i6SvAo8ugQAAAgL9vRh3AJa6VQAAAgL9VxhDA/OKJQAAAgL9UaQbAUtR6QAAAgL/bXvy/WIdgQAAAgL9AMfC/Ct9EQAAAgL/YSei/Z9snQAAAgL9tmuW/f9kVQAAAgL+rcuS/RVsDQAAAgD9WmU/Aov20QAAAgD/vrzzAeDurQAAAgD+i6SvAo8ugQAAAgD9vRh3AJa6VQAAAgD9VxhDA/OKJQAAAgD9UaQbAUtR6QAAAgD/bXvy/WIdgQAAAgD9AMfC/Ct9EQAAAgD/YSei/Z9snQAAAgD9tmuW/f9kVQAAAgD+rcuS/RVsDQAAAgL+rvJ7ARVsDQAAAgD+rvJ7ARVsDQAAAgL+rcuS/RVsDQAAAgL+rvJ7ARVsDQAAAgD+rcuS/RVsDQAAAgD+rvJ7ARVsDQAAAgL+rPLLARbtpQAAAgD+rPLLARbtpQAAAgL+rvJ7ARVsDQAAAgL8aW5/AWIgVQAAAgL90xKDAGasmQAAAgL8ot6LAeTM1QAAAgL+FBKXAXY9BQAAAgL8D16fAhjxNQAAAgL+jLqvA8jpYQAAAgL9Gg67AOj1hQAAAgL+rPLLARbtpQAAAgD+rvJ7ARVsDQAAAgD8aW5/AWIgVQAAAgD90xKDAGasmQAAAgD8ot6LAeTM1QAAAgD+FBKXAXY9BQAAAgD8D16fAhjxNQAAAgD+jLqvA8jpYQAAAgD9Gg67AOj1hQAAAgD+rPLLARbtpQAAAgL+rvOPAoo2IQAAAgD+rvOPAoo2IQAAAgL+rPLLARbtpQAAAgL9iNLbAxmJxQAAAgL+VbLrAtDZ4QAAAgL9C5b7ADTd+QAAAgL9rnsPA6bGBQAAAgL8QmMjAgd6DQAAAgL8v0s3ATqGFQAAAgL/KTNPAUvqGQAAAgL/gB9nAi+mHQAAAgL9ESd7AnGSIQAAAgL+rvOPAoo2IQAAAgD+rPLLARbtpQAAAgD9iNLbAxmJxQAAAgD+VbLrAtDZ4QAAAgD9C5b7ADTd+QAAAgD9rnsPA6bGBQAAAgD8QmMjAgd6DQAAAgD8v0s3ATqGFQAAAgD/KTNPAUvqGQAAAgD/gB9nAi+mHQAAAgD9ESd7AnGSIQAAAgD+rvOPAoo2IQAAAgL9Vdg7BRftZQAAAgD9Vdg7BRftZQAAAgL+rvOPAoo2IQAAAgL9hnuzAnyaIQAAAgL8WJvTAwhmHQAAAgL/vjPrAGZmFQAAAgL9fTADBRJGDQAAAgL/43QLB2EmBQAAAgL9IDgXBTL59QAAAgL+8IAfBiTd4QAAAgL9SFQnBZf9xQAAAgL8K7ArB4hVrQAAAgL/mpAzB/3pjQAAAgL90kg3B29deQAAAgL9Vdg7BRftZQAAAgD+rvOPAoo2IQAAAgD9hnuzAnyaIQAAAgD8WJvTAwhmHQAAAgD/vjPrAGZmFQAAAgD9fTADBRJGDQAAAgD/43QLB2EmBQAAAgD9IDgXBTL59QAAAgD+8IAfBiTd4QAAAgD9SFQnBZf9xQAAAgD8K7ArB4hVrQAAAgD/mpAzB/3pjQAAAgD90kg3B29deQAAAgD9Vdg7BRftZQAAAgL9VHhjBEm0cPwAAgD9VHhjBEm0cPwAAgL9Vdg7BRftZQAAAgL8q9w/B3pVQQAAAgL90VxHBNElGQAAAgL8zlxLBSBU7QAAAgL9othPBGvouQAAAgL8TtRTBqfchQAAAgL8D1hXBVjcPQAAAgL/q1RbBF2fwPwAAgL87uRfB1bSsPwAAgL8PBRjB47l9PwAAgL9VHhjBEm0cPwAAgD9Vdg7BRftZQAAAgD8q9w/B3pVQQAAAgD90VxHBNElGQAAAgD8zlxLBSBU7QAAAgD9othPBGvouQAAAgD8TtRTBqfchQAAAgD8D1hXBVjcPQAAAgD/q1RbBF2fwPwAAgD87uRfB1bSsPwAAgD8PBRjB47l9PwAAgD9VHhjBEm0cPwAAgL9VHhjBJNqEPgAAgD9VHhjBJNqEPgAAgL9VHhjBEm0cPwAAgL9VHhjBJNqEPgAAgD9VHhjBEm0cPwAAgD9VHhjBJNqEPgAAgL9Vjg7Bu2QjwAAAgD9Vjg7Bu2QjwAAAgL9VHhjBJNqEPgAAgL9qvRfBMpDzvgAAgL+pmhbBf9SPvwAAgL/09hTBBwHQvwAAgL9iMxPBeY79vwAAgL9jfBHBQh4PwAAAgL93FhDBlr8ZwAAAgL9Vjg7Bu2QjwAAAgD9VHhjBJNqEPgAAgD9qvRfBMpDzvgAAgD+pmhbBf9SPvwAAgD/09hTBBwHQvwAAgD9iMxPBeY79vwAAgD9jfBHBQh4PwAAAgD93FhDBlr8ZwAAAgD9Vjg7Bu2QjwAAAgL9Vjg7Bu2QjwAAAgL8l2QzB7VoswAAAgL/E/grBN4Q0wAAAgL8y/wjBmeA7wAAAgL9u2gbBE3BCwAAAgL96kATBpTJIwAAAgL9UIQLBTyhNwAAAgL/6Gf/AElFRwAAAgL/rpvnA7KxUwAAAgL956fPA3ztXwAAAgL+l4e3A6v1YwAAAgL/piejAB9tZwAAAgL+r/OLAuyRawAAAgD9Vjg7Bu2QjwAAAgD8l2QzB7VoswAAAgD/E/grBN4Q0wAAAgD8y/wjBmeA7wAAAgD9u2gbBE3BCwAAAgD96kATBpTJIwAAAgD9UIQLBTyhNwAAAgD/6Gf/AElFRwAAAgD/rpvnA7KxUwAAAgD956fPA3ztXwAAAgD+l4e3A6v1YwAAAgD/piejAB9tZwAAAgD+r/OLAuyRawAAAgL+tysG+Em0NPwAAgD+tysG+Em0NPwAAgL+pmnM/os2oQAAAgD+pmnM/os2oQAAAgL+tysG+Em0NPwAAgL9LrbW+WOSpPwAAgL8kVZG+Iq4DQAAAgL+2NzG+TkktQAAAgL+oN8W84WtTQAAAgL97liQ+FV52QAAAgL9TXbg+uumJQAAAgL+WOhc/vLKXQAAAgL/Vl0M/MXegQAAAgL+pmnM/os2oQAAAgD+tysG+Em0NPwAAgD9LrbW+WOSpPwAAgD8kVZG+Iq4DQAAAgD+2NzG+TkktQAAAgD+oN8W84WtTQAAAgD97liQ+FV52QAAAgD9TXbg+uumJQAAAgD+WOhc/vLKXQAAAgD/Vl0M/MXegQAAAgD+pmnM/os2oQAAAgL9VQ5NAok3gQAAAgD9VQ5NAok3gQAAAgL+pmnM/os2oQAAAgL/vB6I/Xay0QAAAgL+8Bck//iK+QAAAgL/vXu4/dKrFQAAAgL+o7QpAU0LMQAAAgL9vvR9AmurRQAAAgL/NnjVASaPWQAAAgL/CkUxAYGzaQAAAgL9OlmRA30XdQAAAgL9xrH1Axi/fQAAAgL/544hAKwbgQAAAgL9VQ5NAok3gQAAAgD+pmnM/os2oQAAAgD/vB6I/Xay0QAAAgD+8Bck//iK+QAAAgD/vXu4/dKrFQAAAgD+o7QpAU0LMQAAAgD9vvR9AmurRQAAAgD/NnjVASaPWQAAAgD/CkUxAYGzaQAAAgD9OlmRA30XdQAAAgD9xrH1Axi/fQAAAgD/544hAKwbgQAAAgD9VQ5NAok3gQAAAgL9VI/tAom2uQAAAgD9VI/tAom2uQAAAgL9VQ5NAok3gQAAAgL8n8KJAzIvfQAAAgL/AWrBA4pHdQAAAgL+P3rtAFL7aQAAAgL+W2sZA7OvWQAAAgL/VTtFAahvSQAAAgL9LO9tAjUzMQAAAgL/6n+RAVn/FQAAAgL/gfO1AxbO9QAAAgL+sf/RAz2m2QAAAgL9VI/tAom2uQAAAgD9VQ5NAok3gQAAAgD8n8KJAzIvfQAAAgD/AWrBA4pHdQAAAgD+P3rtAFL7aQAAAgD+W2sZA7OvWQAAAgD/VTtFAahvSQAAAgD9LO9tAjUzMQAAAgD/6n+RAVn/FQAAAgD/gfO1AxbO9QAAAgD+sf/RAz2m2QAAAgD9VI/tAom2uQAAAgL+rIQFBos3YQAAAgD+rIQFBos3YQAAAgL9VI/tAom2uQAAAgL+rIQFBos3YQAAAgD9VI/tAom2uQAAAgD+rIQFBos3YQAAAgL+rwTBBos3YQAAAgD+rwTBBos3YQAAAgL+rIQFBos3YQAAAgL+rwTBBos3YQAAAgD+rIQFBos3YQAAAgD+rwTBBos3YQAAAgL+rwTBBL3kswQAAgD+rwTBBL3kswQAAgL+rwTBBos3YQAAAgL+rwTBBL3kswQAAgD+rwTBBos3YQAAAgD+rwTBBL3kswQAAgL9Vw/RAL3kswQAAgD9Vw/RAL3kswQAAgL+rwTBBL3kswQAAgL9Vw/RAL3kswQAAgD+rwTBBL3kswQAAgD9Vw/RAL3kswQAAgL9Vw/RAXhKawAAAgD9Vw/RAXhKawAAAgL9Vw/RAL3kswQAAgL9Vw/RAXhKawAAAgD9Vw/RAL3kswQAAgD9Vw/RAXhKawAAAgL9Vg5JAXnLEwAAAgD9Vg5JAXnLEwAAAgL9Vw/RAXhKawAAAgL/PvetANlejwAAAgL8HFuNAsrSqwAAAgL+w3NpAEouwwAAAgL8NOtJAi6G1wAAAgL8gLslAHfi5wAAAgL/puL9AyI69wAAAgL9o2rVAjWXAwAAAgL+bkqtAa3zCwAAAgL+F4aBAY9PDwAAAgL88yJlAn0rEwAAAgL9Vg5JAXnLEwAAAgD9Vw/RAXhKawAAAgD/PvetANlejwAAAgD8HFuNAsrSqwAAAgD+w3NpAEouwwAAAgD8NOtJAi6G1wAAAgD8gLslAHfi5wAAAgD/puL9AyI69wAAAgD9o2rVAjWXAwAAAgD+bkqtAa3zCwAAAgD+F4aBAY9PDwAAAgD88yJlAn0rEwAAAgD9Vg5JAXnLEwAAAgL+pGng/XjKMwAAAgD+pGng/XjKMwAAAgL9Vg5JAXnLEwAAAgL/bHIJAiLDDwAAAgL8qDWhAnrbBwAAAgL8ayU9A0OK+wAAAgL+PjThAqBC7wAAAgL+MWiJAJUC2wAAAgL8PMA1ASXGwwAAAgL8zHPI/EqSpwAAAgL9V6cs/gdihwAAAgL+Ex6c/lg6ZwAAAgL97e5E/0NWSwAAAgL+pGng/XjKMwAAAgD9Vg5JAXnLEwAAAgD/bHIJAiLDDwAAAgD8qDWhAnrbBwAAAgD8ayU9A0OK+wAAAgD+PjThAqBC7wAAAgD+MWiJAJUC2wAAAgD8PMA1ASXGwwAAAgD8zHPI/EqSpwAAAgD9V6cs/gdihwAAAgD+Ex6c/lg6ZwAAAgD97e5E/0NWSwAAAgD+pGng/XjKMwAAAgL+pGng/XjKMwAAAgL8t+S8/NmJ+wAAAgL+IleA+tCZiwAAAgL++PWQ+N7JDwAAAgL/2ciQ9vQQjwAAAgL/lb+C9SB4AwAAAgL9RwGe+rv21vwAAgL9PXqa+5k0ovwAAgL+W77q+9F2IvQAAgL+tysG+Em0NPwAAgD+pGng/XjKMwAAAgD8t+S8/NmJ+wAAAgD+IleA+tCZiwAAAgD++PWQ+N7JDwAAAgD/2ciQ9vQQjwAAAgD/lb+C9SB4AwAAAgD9RwGe+rv21vwAAgD9PXqa+5k0ovwAAgD+W77q+9F2IvQAAgD+tysG+Em0NPwAAgL+qhkBAJNqcPgAAgD+qhkBAJNqcPgAAgL+qZmlAu2QdwAAAgD+qZmlAu2QdwAAAgL+qhkBAJNqcPgAAgL9XCkJAubW4vgAAgL9clUZAvq92vwAAgL+aWE1AyGO6vwAAgL8oqVRAHXjovwAAgL9PplxAzA8HwAAAgL9sumJAjKESwAAAgL+qZmlAu2QdwAAAgD+qhkBAJNqcPgAAgD9XCkJAubW4vgAAgD9clUZAvq92vwAAgD+aWE1AyGO6vwAAgD8oqVRAHXjovwAAgD9PplxAzA8HwAAAgD9sumJAjKESwAAAgD+qZmlAu2QdwAAAgL9VQ65AuyRawAAAgD9VQ65AuyRawAAAgL+qZmlAu2QdwAAAgL9mxnBABIQnwAAAgL/Hp3hAT7cwwAAAgL9nhYBAnf44wAAAgL+994RA7llAwAAAgL/nqolAQ8lGwAAAgL/jno5AmkxMwAAAgL+y05NA9ONQwAAAgL9USZlAUo9UwAAAgL/K/55Ask5XwAAAgL8S96RAFSJZwAAAgL9wi6lAEuRZwAAAgL9VQ65AuyRawAAAgD+qZmlAu2QdwAAAgD9mxnBABIQnwAAAgD/Hp3hAT7cwwAAAgD9nhYBAnf44wAAAgD+994RA7llAwAAAgD/nqolAQ8lGwAAAgD/jno5AmkxMwAAAgD+y05NA9ONQwAAAgD9USZlAUo9UwAAAgD/K/55Ask5XwAAAgD8S96RAFSJZwAAAgD9wi6lAEuRZwAAAgD9VQ65AuyRawAAAgL9Vw/RAu6QKwAAAgD9Vw/RAu6QKwAAAgL9VQ65AuyRawAAAgL9+DLlAYSZZwAAAgL+DIcJAhY5WwAAAgL9pzMlAvthSwAAAgL8GStBAlGROwAAAgL9uzNVASXtJwAAAgL9F/tpAArdDwAAAgL+L399AwRc9wAAAgL8/cORAhJ01wAAAgL9hsOhATUgtwAAAgL/yn+xAGhgkwAAAgL/xPvBA7QwawAAAgL+olPJA4o0SwAAAgL9Vw/RAu6QKwAAAgD9VQ65AuyRawAAAgD9+DLlAYSZZwAAAgD+DIcJAhY5WwAAAgD9pzMlAvthSwAAAgD8GStBAlGROwAAAgD9uzNVASXtJwAAAgD9F/tpAArdDwAAAgD+L399AwRc9wAAAgD8/cORAhJ01wAAAgD9hsOhATUgtwAAAgD/yn+xAGhgkwAAAgD/xPvBA7QwawAAAgD+olPJA4o0SwAAAgD9Vw/RAu6QKwAAAgL9Vw/RARZtEQAAAgD9Vw/RARZtEQAAAgL9Vw/RAu6QKwAAAgL9Vw/RARZtEQAAAgD9Vw/RAu6QKwAAAgD9Vw/RARZtEQAAAgL9VA69Aoo2IQAAAgD9VA69Aoo2IQAAAgL9Vw/RARZtEQAAAgL+NpfFAYWFPQAAAgL/FN+5AQlZZQAAAgL/9eepA6HliQAAAgL80bOZAUsxqQAAAgL9sDuJAgU1yQAAAgL+jYN1AdP14QAAAgL/aYthALNx+QAAAgL8RFdNA1PSBQAAAgL9Id81A9RKEQAAAgL9/icdAd8iFQAAAgL+1S8FAXBWHQAAAgL/rvbpAo/mHQAAAgL/r/LRAo2iIQAAAgL9VA69Aoo2IQAAAgD9Vw/RARZtEQAAAgD+NpfFAYWFPQAAAgD/FN+5AQlZZQAAAgD/9eepA6HliQAAAgD80bOZAUsxqQAAAgD9sDuJAgU1yQAAAgD+jYN1AdP14QAAAgD/aYthALNx+QAAAgD8RFdNA1PSBQAAAgD9Id81A9RKEQAAAgD9/icdAd8iFQAAAgD+1S8FAXBWHQAAAgD/rvbpAo/mHQAAAgD/r/LRAo2iIQAAAgD9VA69Aoo2IQAAAgL+qxmlARVtUQAAAgD+qxmlARVtUQAAAgL9VA69Aoo2IQAAAgL94kKhAz1GIQAAAgL8TYKJAVJ6HQAAAgL8ocpxAM3OGQAAAgL+2xpZAa9CEQAAAgL++XZFA+7WCQAAAgL8+N4xA5SOAQAAAgL84U4dAUDR6QAAAgL+rsYJAiDFzQAAAgL8tpXxAcT9rQAAAgL/4a3RADV5iQAAAgL+2+G5AWpdbQAAAgL+qxmlARVtUQAAAgD9VA69Aoo2IQAAAgD94kKhAz1GIQAAAgD8TYKJAVJ6HQAAAgD8ocpxAM3OGQAAAgD+2xpZAa9CEQAAAgD++XZFA+7WCQAAAgD8+N4xA5SOAQAAAgD84U4dAUDR6QAAAgD+rsYJAiDFzQAAAgD8tpXxAcT9rQAAAgD/4a3RADV5iQAAAgD+2+G5AWpdbQAAAgD+qxmlARVtUQAAAgL+qxmlARVtUQAAAgL8DoWFA6exGQAAAgL+UYFpAoPI3QAAAgL9eBVRAaWwnQAAAgL9hj05ARFoVQAAAgL+c/klAMbwBQAAAgL/TTEVAZ1jKPwAAgL/p60FAu4GDPwAAgL/630BAUiEtPwAAgL+qhkBAJNqcPgAAgD+qxmlARVtUQAAAgD8DoWFA6exGQAAAgD+UYFpAoPI3QAAAgD9eBVRAaWwnQAAAgD9hj05ARFoVQAAAgD+c/klAMbwBQAAAgD/TTEVAZ1jKPwAAgD/p60FAu4GDPwAAgD/630BAUiEtPwAAgD+qhkBAJNqcPpR0lGKVKQYAAAAAAABoHWggSwCFlGgih5RSlChLAUt2hZRoUolC2AEAAAAAAAACAAAABAAAAA4AAAAYAAAAGgAAACUAAAAwAAAAMgAAADQAAAA2AAAAOAAAAD8AAABGAAAASAAAAE8AAABWAAAAWAAAAF8AAABmAAAAaAAAAHMAAAB+AAAAgAAAAIsAAACWAAAAmAAAAJoAAACcAAAAngAAAKkAAAC0AAAAtgAAAMEAAADMAAAAzgAAANgAAADiAAAA5AAAAO8AAAD6AAAA/AAAAP4AAAAAAQAAAgEAAAsBAAAUAQAAFgEAACEBAAAsAQAALgEAADsBAABIAQAASgEAAFUBAABgAQAAYgEAAGQBAABmAQAAaAEAAHABAAB4AQAAhQEAAJIBAACUAQAAlgEAAKABAACqAQAArAEAALgBAADEAQAAxgEAANEBAADcAQAA3gEAAOABAADiAQAA5AEAAOYBAADoAQAA6gEAAOwBAADuAQAA8AEAAPIBAAD0AQAA9gEAAPgBAAD6AQAA/AEAAAgCAAAUAgAAFgIAACICAAAuAgAAOAIAAEICAABEAgAARgIAAE4CAABWAgAAWAIAAGUCAAByAgAAdAIAAIICAACQAgAAkgIAAJQCAACWAgAAmAIAAKcCAAC2AgAAuAIAAMUCAADSAgAA3AIAAOYCAACUdJRihpRoV12UdWhZjAcjZmZmZmZmlGhbfZQoaF1Hv/A7tQMA/5hoXkc/8Du1AwD/gGhfR8Ap0UFNj37GaGBHQCYfq/MwwR5oYUfAJZacfAdO+mhiR0AcGKGJceHTdWhjaA11ZYwDbG9jlE5oFowQanVweXRlciBjYWRxdWVyeZR1jAR0cmVllH2UKGgVjARub2RllGgWaIpoFEsDjAhjaGlsZHJlbpRdlCh9lChoFYwEbGVhZpRoFmgXaBRLAWhZjAcjMjk4MGI5lHV9lChoFWiRaBZoZWgUSwJoWYwHI2ZmZmZmZpR1ZXVoW4waanVweXRlcl9jYWRxdWVyeS5vY3BfdXRpbHOUjAtCb3VuZGluZ0JveJSTlCmBlH2UKIwHb3B0aW1hbJSJjAN0b2yURz7k+LWI42jxjAR4bWlulEe/8GuXb3JB/IwEeG1heJRHP/Brl29yQf+MBHltaW6UR8AyuR7L4VRgjAR5bWF4lEdAMrjPA1Sh84wEem1pbpRHwDO7Vp7gYQOMBHptYXiUR0AzuvfaulgkjAV4c2l6ZZRHQABrl29yQf6MBXlzaXpllEdAQrj255r7KowFenNpemWUR0BDuyc8zVyUjAZjZW50ZXKURzzAAAAAAAAAR79D8iMsmwAAR79HsQmCN4AAh5SMA21heJRHQDO7Vp7gYQN1YnVoFWgBjAZjb25maWeUfZQojAZoZWlnaHSUTVgCjAp0cmVlX3dpZHRolEv6jAljYWRfd2lkdGiUTSADjAliYl9mYWN0b3KURz/wAAAAAAAAjA1kZWZhdWx0X2NvbG9ylEvoS7BLJIeUjBFkZWZhdWx0X2VkZ2Vjb2xvcpRLwEvAS8CHlIwMcmVuZGVyX2VkZ2VzlIiMDnJlbmRlcl9ub3JtYWxzlImMDHJlbmRlcl9tYXRlc5SJjAptYXRlX3NjYWxllEsBjAdxdWFsaXR5lE6MCWRldmlhdGlvbpRHP7mZmZmZmZqMEWFuZ3VsYXJfdG9sZXJhbmNllEc/yZmZmZmZmowNZWRnZV9hY2N1cmFjeZROjApvcHRpbWFsX2JilImMBGF4ZXOUiYwFYXhlczCUiYwEZ3JpZJSIjAV0aWNrc5RLA4wFb3J0aG+UiYwLdHJhbnNwYXJlbnSUiYwLYmxhY2tfZWRnZXOUiYwRYW1iaWVudF9pbnRlbnNpdHmURz/wAAAAAAAAjBBkaXJlY3RfaW50ZW5zaXR5lEc/vrhR64UeuIwMcmVzZXRfY2FtZXJhlIiMDW1hY19zY3JvbGxiYXKUiIwHZGlzcGxheZSMB3NpZGVjYXKUjAV0b29sc5SIjAZ0aW1laXSUiYwIcG9zaXRpb26UR0BgRMzMzMzNR0BVM9cKPXCkR0BI1cKPXCj2h5SMBHpvb22UR0ABmZmZmZmadYwFY291bnSUSwJ1Lg=='
\ No newline at end of file
@@ -15,3 +15,4 @@
 #
 
 from .cad_objects import Assembly, PartGroup, Part, show
+from ..tessellator import reset_cache, toggle_cache, cache_info
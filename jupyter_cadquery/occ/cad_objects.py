@@ -68,6 +68,16 @@ def show(cad_obj, **kwargs):
     - edge_accuracy:     Presicion of edge discretizaion (default=None)
                          If None, uses: quality / 100
     - optimal_bb:        Use optimal bounding box (default=False)
+    - parallel:          Tessellate parts in parallel processes, True or number of processes (default=False)
+    - triangle_budget:   Approximate maximum number of triangles, small parts are meshed coarser (default=None)
+    - weld:              Merge vertices shared by adjacent faces unless it is a crease (default=False)
+    - crease_angle:      Angle in degrees between normals marking a sharp edge for weld and decimate (default=30)
+    - decimate:          Reduce parts with more triangles to this number by edge collapses (default=None)
+    - decimate_error:    Maximum distance a decimated surface may move, stops decimate earlier (default=None)
+    - reorder:           Reorder triangles and vertices for the GPU vertex cache and less overdraw (default=False)
+    - quantize:          Send int16 vertices, oct encoded normals, error < 0.004*quality/deviation (default=False)
+    - block:             Wait for the objects being shown, else return a handle with result(), cancel() (default=True)
+    - progressive:       Show a coarse mesh first and refine it in the background, returns a handle (default=False)
     - axes:              Show axes (default=False)
     - axes0:             Show axes at (0,0,0) (default=False)
     - grid:              Show grid (default=False)
@@ -80,6 +90,7 @@ def show(cad_obj, **kwargs):
     - rotation:          z, y and y rotation angles to apply to position vector (default=(0, 0, 0))
     - zoom:              Zoom factor of view (default=2.5)
     - reset_camera:      Reset camera position, rotation and zoom to default (default=True)
+    - batched:           Merge all parts into one mesh per color, for large assemblies; no animation (default=False)
     - mac_scrollbar:     Prettify scrollbars (default=True)
     - display:           Select display: "sidecar", "cell", "html"
     - tools:             Show the viewer tools like the object tree
@@ -1,18 +1,22 @@
+from collections import OrderedDict
+import io
 import itertools
 import numpy as np
 
 from OCP.Bnd import Bnd_Box
-from OCP.BRep import BRep_Tool
+from OCP.BRep import BRep_Tool, BRep_Builder
 from OCP.BRepBndLib import BRepBndLib
 from OCP.BRepMesh import BRepMesh_IncrementalMesh
-from OCP.BRepTools import BRepTools
+from OCP.BRepTools import BRepTools, BRepTools_ShapeSet
+from OCP.gp import gp_TrsfForm
 
 
 from OCP.TopAbs import (
     TopAbs_EDGE,
     TopAbs_FACE,
 )
-from OCP.TopoDS import TopoDS_Compound
+from OCP.TopoDS import TopoDS_Compound, TopoDS_Shape
+from OCP.TopLoc import TopLoc_Location
 from OCP.TopAbs import TopAbs_FACE
 from OCP.TopExp import TopExp_Explorer
 
@@ -20,6 +24,7 @@ from OCP.StlAPI import StlAPI_Writer
 
 from cadquery import Compound, Location
 from cadquery.occ_impl.shapes import downcast
+from .defaults import get_default
 from .utils import distance
 
 
@@ -55,10 +60,11 @@ class BoundingBox(object):
     def _bounding_box(self, obj, tol=1e-5):
         bbox = Bnd_Box()
         if self.optimal:
-            BRepTools.Clean_s(obj)
-            BRepBndLib.AddOptimal_s(obj, bbox)
+            # use the exact geometry instead of removing the triangulation, which might still be needed
+            BRepBndLib.AddOptimal_s(obj, bbox, False)
         else:
-            BRepBndLib.Add_s(obj, bbox)
+            # ignore triangulations, a mesh left on the shape would enlarge the box by its deflection
+            BRepBndLib.Add_s(obj, bbox, False)
         values = bbox.Get()
         return (values[0], values[3], values[1], values[4], values[2], values[5])
 
@@ -148,26 +154,163 @@ def bounding_box(objs, loc=None, optimal=False):
     return BoundingBox(compound if loc is None else compound.Moved(loc.wrapped), optimal=optimal)
 
 
+def points_bounding_box(points, loc=None):
+    """Bounding box of a (n, 3) array of points, optionally moved by a cadquery Location"""
+    if loc is not None:
+        points = transform_points(points.astype(np.float64), loc.wrapped.Transformation())
+    mins = points.min(axis=0)
+    maxs = points.max(axis=0)
+    return BoundingBox(
+        {
+            "xmin": float(mins[0]),
+            "xmax": float(maxs[0]),
+            "ymin": float(mins[1]),
+            "ymax": float(maxs[1]),
+            "zmin": float(mins[2]),
+            "zmax": float(maxs[2]),
+        }
+    )
+
+
+def transform_points(coords, trsf):
+    """Apply a gp_Trsf to a (n, 3) array of points, following gp_Pnt.Transform operation by operation"""
+    form = trsf.Form()
+    if form == gp_TrsfForm.gp_Identity:
+        return coords
+
+    loc = trsf.TranslationPart().Coord()
+
+    if form == gp_TrsfForm.gp_Translation:
+        result = coords + loc
+
+    elif form == gp_TrsfForm.gp_Scale:
+        result = coords * trsf.ScaleFactor() + loc
+
+    elif form == gp_TrsfForm.gp_PntMirror:
+        result = -coords + loc
+
+    else:
+        m = trsf.HVectorialPart()
+        x, y, z = coords[:, 0], coords[:, 1], coords[:, 2]
+        result = np.column_stack(
+            [m.Value(row, 1) * x + m.Value(row, 2) * y + m.Value(row, 3) * z for row in (1, 2, 3)]
+        )
+        scale = trsf.ScaleFactor()
+        if scale != 1.0:
+            result *= scale
+        result += loc
+
+    return result
+
+
 # Export STL
 
 
+# Meshing parameters of the face triangulations created by mesh_shape, keyed by the face without location
+# (instances share their triangulation). Poly_Triangulation does not know its angular deflection.
+TRIANGULATIONS = OrderedDict()
+MAX_TRIANGULATIONS = 100000
+
+
+def _face_key(face):
+    return face.Located(TopLoc_Location()).HashCode(HASH_CODE_MAX)
+
+
+def _remember_triangulation(shape, angular_tolerance):
+    loc = TopLoc_Location()
+    for face in get_faces(shape):
+        poly = BRep_Tool.Triangulation_s(face, loc)
+        if poly is not None:
+            key = _face_key(face)
+            TRIANGULATIONS[key] = (poly.NbNodes(), poly.NbTriangles(), poly.Deflection(), angular_tolerance)
+            TRIANGULATIONS.move_to_end(key)
+
+    while len(TRIANGULATIONS) > MAX_TRIANGULATIONS:
+        TRIANGULATIONS.popitem(last=False)
+
+
+def _qualifies(face, poly, deflection, angular_tolerance, relative):
+    if relative:
+        # BRepMesh scales a relative deflection with the size of the face
+        bb = BoundingBox(face)
+        deflection *= max(bb.xsize, bb.ysize, bb.zsize)
+    if poly.Deflection() > deflection:
+        return False
+
+    params = TRIANGULATIONS.get(_face_key(face))
+    return (
+        params is not None
+        and params[:3] == (poly.NbNodes(), poly.NbTriangles(), poly.Deflection())
+        and (angular_tolerance is None or params[3] <= angular_tolerance)
+    )
+
+
+def clean_triangulation(shape, deflection=None, angular_tolerance=None, relative=False):
+    """Remove the triangulation of shape before meshing it with the linear deflection deflection.
+
+    With set_defaults(keep_triangulation=True) only the triangulations of faces that are at least as fine as
+    deflection (relative to the face size if relative) and angular_tolerance are kept. Since the angular
+    deflection of a triangulation is unknown to OCC, only triangulations created by mesh_shape can be kept.
+    Returns True if all faces kept a triangulation and shape does not need to be meshed again.
+    """
+    if deflection is None or not get_default("keep_triangulation"):
+        BRepTools.Clean_s(shape)
+        return False
+
+    complete = True
+    loc = TopLoc_Location()
+    for face in get_faces(shape):
+        poly = BRep_Tool.Triangulation_s(face, loc)
+        if poly is None:
+            complete = False
+        elif not _qualifies(face, poly, deflection, angular_tolerance, relative):
+            BRepTools.Clean_s(face)
+            complete = False
+    return complete
+
+
+def mesh_shape(shape, deflection, angular_tolerance, relative=False, parallel=False):
+    """Triangulate shape, kept triangulations are reused if they qualify (see clean_triangulation)"""
+    if not clean_triangulation(shape, deflection, angular_tolerance, relative):
+        BRepMesh_IncrementalMesh(shape, deflection, relative, angular_tolerance, parallel)
+        if get_default("keep_triangulation"):
+            _remember_triangulation(shape, angular_tolerance)
+
+
 def write_stl_file(compound, filename, tolerance=None, angular_tolerance=None):
 
     # Remove previous mesh data
-    BRepTools.Clean_s(compound)
-
-    mesh = BRepMesh_IncrementalMesh(compound, tolerance, True, angular_tolerance)
-    mesh.Perform()
+    mesh_shape(compound, tolerance, angular_tolerance, relative=True)
 
     writer = StlAPI_Writer()
 
     result = writer.Write(compound, filename)
 
     # Remove the mesh data again
-    BRepTools.Clean_s(compound)
+    if not get_default("keep_triangulation"):
+        BRepTools.Clean_s(compound)
     return result
 
 
+# Serialization
+
+
+def serialize_shape(shape):
+    """Serialize a shape into the BREP format, without triangulations"""
+    shape_set = BRepTools_ShapeSet(False)
+    shape_set.Add(shape)
+    stream = io.BytesIO()
+    shape_set.Write(stream)
+    shape_set.Write(shape, stream)
+    return stream.getvalue()
+
+
+def deserialize_shape(buffer):
+    shape = TopoDS_Shape()
+    BRepTools.Read_s(shape, io.BytesIO(buffer), BRep_Builder())
+    return shape
+
+
 # OCP types and accessors
 
 
@@ -207,6 +350,23 @@ def get_rgb(color):
     return (int(255 * rgb.Red()), int(255 * rgb.Green()), int(255 * rgb.Blue()))
 
 
+def split_location(shape):
+    """Split a shape into the unlocated shape and its location as cadquery Location.
+
+    Only rigid locations are split off, since scaling and mirroring cannot be expressed by position
+    and quaternion. For all other shapes the location is None.
+    """
+    location = shape.Location()
+    if location.IsIdentity():
+        return shape, None
+
+    trsf = location.Transformation()
+    if trsf.IsNegative() or abs(trsf.ScaleFactor() - 1.0) > 1e-9:
+        return shape, None
+
+    return shape.Located(TopLoc_Location()), Location(location)
+
+
 def loc_to_tq(loc):
     T = loc.wrapped.Transformation()
     t = T.Transforms()
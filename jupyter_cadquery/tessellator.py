@@ -1,4 +1,13 @@
-from array import array
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
 
 import numpy as np
 
@@ -6,80 +15,314 @@ from OCP.gp import gp_Vec, gp_Pnt
 from OCP.BRep import BRep_Tool
 from OCP.BRepTools import BRepTools
 from OCP.BRepGProp import BRepGProp_Face
-from OCP.BRepMesh import BRepMesh_IncrementalMesh
 from OCP.TopLoc import TopLoc_Location
 from OCP.TopAbs import TopAbs_Orientation
 from OCP.TopTools import TopTools_IndexedDataMapOfShapeListOfShape, TopTools_IndexedMapOfShape
 from OCP.TopExp import TopExp, TopExp_Explorer
 from OCP.TopAbs import TopAbs_EDGE, TopAbs_FACE, TopAbs_SOLID
-from OCP.TopoDS import TopoDS
+from OCP.TopoDS import TopoDS, TopoDS_Iterator
 from OCP.BRepAdaptor import BRepAdaptor_Curve
 from OCP.GCPnts import GCPnts_QuasiUniformDeflection
 
-from jupyter_cadquery.utils import Timer
-from jupyter_cadquery.ocp_utils import get_faces, bounding_box
+from jupyter_cadquery.utils import index_dtype, polyline_segments, Timer
+from jupyter_cadquery.ocp_utils import (
+    deserialize_shape,
+    get_faces,
+    mesh_shape,
+    serialize_shape,
+    transform_points,
+)
+from jupyter_cadquery.defaults import get_default
 from cadquery.occ_impl.shapes import Compound
 
-# class RenderCache:
-#     def __init__(self):
-#         self.objects = {}
-#         self.use_cache = True
-
-#     def reset_cache(self):
-#         self.objects = {}
-
-#     def toggle_cache(self):
-#         self.use_cache = not self.use_cache
-#         print(f"Render cache turned {'ON' if self.use_cache else 'OFF'}")
-
-#     def tessellate(
-#         self,
-#         compound,
-#         quality=None,
-#         angular_tolerance=None,
-#         render_edges=True,
-#         normals_len=0,
-#         debug=False,
-#     ):
-
-#         hash = id(compound)  # use python id instead of compound.HashCode(HASH_CODE_MAX)
-#         if self.objects.get(hash) is None:
-#             tess = Tessellator()
-#             tess.compute(
-#                 compound,
-#                 quality=quality,
-#                 angular_tolerance=angular_tolerance,
-#                 compute_edges=render_edges,
-#                 normals_len=normals_len,
-#                 debug=debug,
-#             )
-#             np_vertices = tess.get_vertices()
-#             np_triangles = tess.get_triangles()
-#             np_normals = tess.get_normals()
-#             np_edges = tess.get_edges()
-
-#             if np_normals.shape != np_vertices.shape:
-#                 raise AssertionError("Wrong number of normals/shapes")
-
-#             shape_geometry = BufferGeometry(
-#                 attributes={
-#                     "position": BufferAttribute(np_vertices),
-#                     "index": BufferAttribute(np_triangles),
-#                     "normal": BufferAttribute(np_normals),
-#                 }
-#             )
-#             if debug:
-#                 print(f"| | | (Caching {hash})")
-#             self.objects[hash] = (shape_geometry, np_edges)
-#         else:
-#             if debug:
-#                 print(f"| | | (Taking {hash} from cache)")
-#         return self.objects[hash]
-
-
-# RENDER_CACHE = RenderCache()
-# reset_cache = RENDER_CACHE.reset_cache
-# toggle_cache = RENDER_CACHE.toggle_cache
+
+class DiskCache:
+    """Persistent tier of the tessellation cache.
+
+    Every mesh is stored in a folder named by its mesh_key() under the default "mesh_cache_dir", one
+    .npy file per array and a small json index describing the mesh structure. Arrays are loaded memory
+    mapped, so data is only read when it is rendered. The folder modification time marks the last use.
+    Entries older than "mesh_cache_age" days are removed and the least recently used ones are removed
+    as long as the total size exceeds "mesh_cache_size" bytes. This is checked on the first put, when the
+    size limit is exceeded and at the latest every EVICT_INTERVAL seconds.
+
+    Only folders named like a mesh key and holding an index are treated as entries, so other content of
+    "mesh_cache_dir" is never removed.
+    """
+
+    INDEX = "mesh.json"
+    KEY = re.compile("[0-9a-f]{32}")
+    EVICT_INTERVAL = 3600
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_evict = 0.0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.size = None
+
+    @property
+    def path(self):
+        return get_default("mesh_cache_dir")
+
+    def _entry(self, key):
+        return os.path.join(self.path, key)
+
+    def get(self, key):
+        if self.path is None:
+            return None
+
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, DiskCache.INDEX), "r") as fd:
+                index = json.load(fd)
+
+            mesh = {}
+            for name, files in index.items():
+                if isinstance(files, list):
+                    mesh[name] = tuple(_load_array(os.path.join(entry, file)) for file in files)
+                else:
+                    mesh[name] = _load_array(os.path.join(entry, files))
+
+            # mark as recently used
+            os.utime(entry)
+
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return mesh
+
+    def put(self, key, mesh):
+        if self.path is None:
+            return
+
+        entry = self._entry(key)
+        if os.path.isdir(entry):
+            return
+
+        os.makedirs(self.path, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f".{key}-", dir=self.path)
+        try:
+            index = {}
+            for name, value in mesh.items():
+                if isinstance(value, (tuple, list)):
+                    index[name] = [f"{name}_{i}.npy" for i in range(len(value))]
+                    files = zip(index[name], value)
+                else:
+                    index[name] = f"{name}.npy"
+                    files = [(index[name], value)]
+
+                for file, array in files:
+                    np.save(os.path.join(tmp, file), np.asarray(array), allow_pickle=False)
+
+            with open(os.path.join(tmp, DiskCache.INDEX), "w") as fd:
+                json.dump(index, fd)
+
+            # atomic, so concurrent readers and writers never see partial entries
+            os.rename(tmp, entry)
+
+        except OSError:
+            # another process has won the race or the disk is full, the entry is optional anyway
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+
+        with self.lock:
+            if (
+                self.size is None
+                or self.size + _folder_size(entry) > get_default("mesh_cache_size")
+                or time.time() - self.last_evict > DiskCache.EVICT_INTERVAL
+            ):
+                self.evict()
+            else:
+                self.size += _folder_size(entry)
+
+    def entries(self):
+        if self.path is None or not os.path.isdir(self.path):
+            return []
+
+        result = []
+        for key in os.listdir(self.path):
+            entry = self._entry(key)
+            if not DiskCache.KEY.fullmatch(key) or not os.path.isfile(os.path.join(entry, DiskCache.INDEX)):
+                continue
+            try:
+                result.append((os.stat(entry).st_mtime, _folder_size(entry), entry))
+            except OSError:
+                pass
+        return sorted(result)
+
+    def evict(self):
+        max_size = get_default("mesh_cache_size")
+        min_mtime = time.time() - get_default("mesh_cache_age") * 86400
+
+        entries = self.entries()
+        size = sum(entry[1] for entry in entries)
+        for mtime, entry_size, entry in entries:
+            if size <= max_size and mtime >= min_mtime:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            size -= entry_size
+
+        self.size = size
+        self.last_evict = time.time()
+
+    def clear(self):
+        with self.lock:
+            for _, _, entry in self.entries():
+                shutil.rmtree(entry, ignore_errors=True)
+            self.size = 0
+
+    def info(self):
+        with self.lock:
+            entries = self.entries()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(entries),
+                "size": sum(entry[1] for entry in entries),
+                "max_size": get_default("mesh_cache_size"),
+                "path": self.path,
+            }
+
+
+def _load_array(filename):
+    try:
+        return np.load(filename, mmap_mode="r")
+    except ValueError:
+        # empty arrays cannot be memory mapped
+        return np.load(filename)
+
+
+def _folder_size(folder):
+    return sum(entry.stat().st_size for entry in os.scandir(folder))
+
+
+class TessellationCache:
+    """LRU cache for tessellation results, limited by the size of the cached numpy arrays.
+
+    Entries are keyed by mesh_key(), i.e. by the content of the shape and the tessellation parameters,
+    so re-created but unchanged shapes are taken from the cache. The size limit in bytes is read from
+    the default "cache_size" whenever a new mesh is added.
+    If the default "mesh_cache_dir" is set, meshes are also kept on disk (see DiskCache).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.use_cache = True
+        self.disk = DiskCache()
+        self.reset_cache()
+
+    def reset_cache(self, disk=False):
+        with self.lock:
+            self.objects = OrderedDict()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+        self.disk.reset_stats()
+        if disk:
+            self.disk.clear()
+
+    def toggle_cache(self):
+        self.use_cache = not self.use_cache
+        print(f"Tessellation cache turned {'ON' if self.use_cache else 'OFF'}")
+
+    def get(self, key):
+        with self.lock:
+            mesh = self.objects.get(key)
+            if mesh is not None:
+                self.hits += 1
+                self.objects.move_to_end(key)
+                return mesh
+
+            self.misses += 1
+
+        mesh = self.disk.get(key)
+        if mesh is not None:
+            self._put(key, mesh)
+        return mesh
+
+    def put(self, key, mesh):
+        self._put(key, mesh)
+        self.disk.put(key, mesh)
+
+    def _put(self, key, mesh):
+        size = mesh_size(mesh)
+        max_size = get_default("cache_size")
+        if size > max_size:
+            return
+
+        for array in _arrays(mesh):
+            array.flags.writeable = False
+
+        with self.lock:
+            if key in self.objects:
+                self.size -= mesh_size(self.objects.pop(key))
+
+            self.objects[key] = mesh
+            self.size += size
+
+            while self.size > max_size:
+                _, evicted = self.objects.popitem(last=False)
+                self.size -= mesh_size(evicted)
+
+    def info(self):
+        with self.lock:
+            result = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.objects),
+                "size": self.size,
+                "max_size": get_default("cache_size"),
+            }
+        result["disk"] = self.disk.info()
+        return result
+
+
+def _arrays(mesh):
+    for value in mesh.values():
+        for array in value if isinstance(value, (tuple, list)) else (value,):
+            if isinstance(array, np.ndarray):
+                yield array
+
+
+def mesh_size(mesh):
+    return sum(array.nbytes for array in _arrays(mesh))
+
+
+# grid size of weld_mesh relative to the size of the mesh
+WELD_TOLERANCE = 1e-6
+
+# post-transform vertex cache size reorder_mesh optimizes for, small enough for weak integrated GPUs
+VERTEX_CACHE_SIZE = 16
+
+# part of the mesh keys, so that meshes of an older layout are not taken from mesh_cache_dir
+MESH_FORMAT = 2
+
+
+def mesh_key(shape, quality, angular_tolerance, tessellate=True, compute_edges=True, normals_len=0, brep=None):
+    """Content based key of a shape and its tessellation parameters"""
+    digest = hashlib.blake2b(serialize_shape(shape) if brep is None else brep, digest_size=16)
+    # kept triangulations can be finer than requested
+    keep = get_default("keep_triangulation")
+    params = (MESH_FORMAT, quality, angular_tolerance, tessellate, compute_edges, normals_len, keep)
+    digest.update(repr(params).encode())
+    return digest.hexdigest()
+
+
+CACHE = TessellationCache()
+reset_cache = CACHE.reset_cache
+toggle_cache = CACHE.toggle_cache
+cache_info = CACHE.info
+
+
 class Tessellator:
     def __init__(self):
         self.vertices = np.empty((0, 3), dtype="float32")
@@ -105,16 +348,18 @@ class Tessellator:
         compute_edges=True,
         normals_len=0,
         debug=False,
+        parallel=True,
     ):
         self.shape = shape
         self.normals_len = normals_len
-        self.edges = []
+        self.edges = np.empty((0, 3), dtype=np.float32)
+        self.edge_offsets = np.zeros(1, dtype=np.uint32)
 
-        count = self.number_solids(shape)
+        # workers of a process pool mesh serially, the pool already uses all cores
+        count = self.number_solids(shape) if parallel else 1
         with Timer(debug, "", f"mesh incrementally {'(parallel)' if count > 1 else ''}", 3):
-            # Remove previous mesh data
-            BRepTools.Clean_s(shape)
-            BRepMesh_IncrementalMesh(shape, quality, False, angular_tolerance, count > 1)
+            # Remove previous mesh data, but keep fine enough triangulations if requested
+            mesh_shape(shape, quality, angular_tolerance, parallel=count > 1)
 
         if tessellate:
             with Timer(debug, "", "get nodes, triangles and normals", 3):
@@ -128,74 +373,80 @@ class Tessellator:
         # BRepTools.Clean_s(shape)
 
     def tessellate(self):
-        self.vertices = array("f")
-        self.triangles = array("f")
-        self.normals = array("f")
+        vertices = []
+        triangles = []
+        normals = []
 
         # global buffers
         p_buf = gp_Pnt()
         n_buf = gp_Vec()
         loc_buf = TopLoc_Location()
 
-        offset = -1
+        offset = 0
 
-        # every line below is selected for performance. Do not introduce functions to "beautify" the code
+        # Each face's triangulation is read into numpy arrays in one go, all further processing
+        # (location, index offset, orientation and normal reversal) is done on the whole arrays
 
         for face in get_faces(self.shape):
-            if face.Orientation() == TopAbs_Orientation.TopAbs_REVERSED:
-                i1, i2 = 2, 1
-            else:
-                i1, i2 = 1, 2
+            poly = BRep_Tool.Triangulation_s(face, loc_buf)
+            if poly is None:
+                continue
 
-            internal = face.Orientation() == TopAbs_Orientation.TopAbs_INTERNAL
+            orientation = face.Orientation()
 
-            poly = BRep_Tool.Triangulation_s(face, loc_buf)
-            if poly is not None:
-                Trsf = loc_buf.Transformation()
+            # add vertices
+            vertices.append(transform_points(_coords(poly.Nodes()), loc_buf.Transformation()))
 
-                # add vertices
-                # [node.Transformed(Trsf).Coord() for node in poly.Nodes()] is 5-8 times slower!
-                items = poly.Nodes()
-                coords = [items.Value(i).Transformed(Trsf).Coord() for i in range(items.Lower(), items.Upper() + 1)]
-                flat = []
-                for coord in coords:
-                    flat += coord
-                self.vertices.extend(flat)
-
-                # add triangles
-                items = poly.Triangles()
-                coords = [items.Value(i).Get() for i in range(items.Lower(), items.Upper() + 1)]
-                flat = []
-                for coord in coords:
-                    flat += (coord[0] + offset, coord[i1] + offset, coord[i2] + offset)
-                self.triangles.extend(flat)
-
-                # add normals
-                if poly.HasUVNodes():
-
-                    def extract(uv0, uv1):
-                        prop.Normal(uv0, uv1, p_buf, n_buf)
-                        if n_buf.SquareMagnitude() > 0:
-                            n_buf.Normalize()
-                        return n_buf.Reverse().Coord() if internal else n_buf.Coord()
-
-                    prop = BRepGProp_Face(face)
-                    items = poly.UVNodes()
-
-                    uvs = [items.Value(i).Coord() for i in range(items.Lower(), items.Upper() + 1)]
-                    flat = []
-                    for uv1, uv2 in uvs:
-                        flat += extract(uv1, uv2)
-                    self.normals.extend(flat)
-
-                offset += poly.NbNodes()
+            # add triangles
+            items = poly.Triangles()
+            indices = np.array(
+                [items.Value(i).Get() for i in range(items.Lower(), items.Upper() + 1)], dtype=np.int64
+            ).reshape(-1, 3)
+            if orientation == TopAbs_Orientation.TopAbs_REVERSED:
+                indices = indices[:, (0, 2, 1)]
+            # OCC node indices are 1 based
+            triangles.append(indices + (offset - 1))
+
+            # add normals
+            if poly.HasUVNodes():
+                normal = BRepGProp_Face(face).Normal
+                items = poly.UVNodes()
+                coords = []
+                for i in range(items.Lower(), items.Upper() + 1):
+                    u, v = items.Value(i).Coord()
+                    normal(u, v, p_buf, n_buf)
+                    coords.append(n_buf.Coord())
+                coords = np.array(coords, dtype=np.float64).reshape(-1, 3)
+
+                x, y, z = coords[:, 0], coords[:, 1], coords[:, 2]
+                magnitude = np.sqrt(x * x + y * y + z * z)
+                nonzero = magnitude > 0
+                coords[nonzero] /= magnitude[nonzero, None]
+
+                if orientation == TopAbs_Orientation.TopAbs_INTERNAL:
+                    coords = -coords
+                normals.append(coords)
+
+            offset += poly.NbNodes()
+
+        self.vertices = _concat(vertices, (0, 3), np.float32)
+        # uint16 halves the index buffer of all parts with up to 65536 vertices
+        self.triangles = _concat(triangles, (0, 3), index_dtype(len(self.vertices))).ravel()
+        self.normals = _concat(normals, (0, 3), np.float32)
 
     def compute_edges(self):
         edge_map = TopTools_IndexedMapOfShape()
         face_map = TopTools_IndexedDataMapOfShapeListOfShape()
+        faces = TopTools_IndexedMapOfShape()
 
         TopExp.MapShapes_s(self.shape, TopAbs_EDGE, edge_map)
         TopExp.MapShapesAndAncestors_s(self.shape, TopAbs_EDGE, TopAbs_FACE, face_map)
+        TopExp.MapShapes_s(self.shape, TopAbs_FACE, faces)
+
+        # The nodes of each edge are read into one array and transformed with numpy. Edges without a 3D polygon
+        # index into the nodes of their face's triangulation, which are read once per face
+        face_nodes = {}
+        polylines = []
 
         for i in range(1, edge_map.Extent() + 1):
             edge = TopoDS.Edge_s(edge_map.FindKey(i))
@@ -210,16 +461,7 @@ class Tessellator:
 
             if poly is not None:
                 # print("Polygon3D successful")
-                nodes = poly.Nodes()
-                transf = loc.Transformation()
-                v1 = None
-                for j in range(1, poly.NbNodes() + 1):
-                    v2 = nodes.Value(j)
-                    v2.Transform(transf)
-                    v2 = v2.Coord()
-                    if v1 is not None:
-                        self.edges.append((v1, v2))
-                    v1 = v2
+                coords = _coords(poly.Nodes())
             else:
                 face = TopoDS.Face_s(face_list.First())
                 triang = BRep_Tool.Triangulation_s(face, loc)
@@ -227,41 +469,530 @@ class Tessellator:
                 if poly is None:
                     continue
 
-                indices = poly.Nodes()
-                nodes = triang.Nodes()
-                transf = loc.Transformation()
-                v1 = None
-                for j in range(indices.Lower(), indices.Upper() + 1):
-                    v2 = nodes.Value(indices.Value(j))
-                    v2.Transform(transf)
-                    v2 = v2.Coord()
-                    if v1 is not None:
-                        self.edges.append((v1, v2))
-                    v1 = v2
+                index = faces.FindIndex(face)
+                if index not in face_nodes:
+                    items = triang.Nodes()
+                    face_nodes[index] = (_coords(items), items.Lower())
+                nodes, lower = face_nodes[index]
+
+                items = poly.Nodes()
+                indices = np.array([items.Value(j) for j in range(items.Lower(), items.Upper() + 1)], dtype=np.int64)
+                coords = nodes[indices - lower]
+
+            polylines.append(transform_points(coords, loc.Transformation()))
+
+        self.edges = _concat(polylines, (0, 3), np.float32)
+        self.edge_offsets = np.cumsum([0] + [len(polyline) for polyline in polylines]).astype(np.uint32)
 
     def get_vertices(self):
-        return np.asarray(self.vertices, dtype=np.float32).reshape(-1, 3)
+        return self.vertices
 
     def get_triangles(self):
-        return np.asarray(self.triangles, dtype=np.uint32)
+        return self.triangles
 
     def get_normals(self):
-        return np.asarray(self.normals, dtype=np.float32).reshape(-1, 3)
+        return self.normals
 
     def get_edges(self):
+        """Edges as polylines: all points (n, 3) and the offsets of the polylines, see polyline_segments"""
+        return (self.edges, self.edge_offsets)
+
+    def get_normal_edges(self):
         normal_edges = []
         if self.normals_len > 0:
             vertices = self.get_vertices()
             normals = self.get_normals()
             normal_edges = np.column_stack((vertices, vertices + (normals * self.normals_len))).reshape((-1, 2, 3))
 
-        return (np.asarray(self.edges, dtype=np.float32), normal_edges)
+        return normal_edges
+
+
+def _coords(items):
+    """Coordinates of an OCC array of points as (n, 3) array"""
+    coords = [items.Value(i).Coord() for i in range(items.Lower(), items.Upper() + 1)]
+    return np.array(coords, dtype=np.float64).reshape(-1, 3)
+
+
+def _concat(arrays, empty_shape, dtype):
+    if len(arrays) == 0:
+        return np.empty(empty_shape, dtype=dtype)
+    return np.concatenate(arrays).astype(dtype)
+
+
+def weld_mesh(mesh, crease_angle=30):
+    """Copy of mesh with coincident vertices of adjacent faces merged if their normals differ by at most
+    crease_angle degrees, so sharp edges keep split normals. Merged vertices get the average normal.
+
+    Positions are hashed on a grid of WELD_TOLERANCE times the mesh size. The triangles keep their order
+    (and merged away degenerated triangles stay), so face indices of picking refer to the same triangles.
+    """
+    vertices, normals = mesh["vertices"], mesh["normals"]
+    if len(vertices) == 0 or len(normals) != len(vertices):
+        return mesh
+
+    tolerance = max(float(np.ptp(vertices, axis=0).max()) * WELD_TOLERANCE, 1e-7)
+    _, cells = np.unique(np.rint(vertices / tolerance).astype(np.int64), axis=0, return_inverse=True)
+    cells = cells.ravel()
+
+    # Each round merges the remaining vertices of a cell into the first of them if their normals agree
+    cos_crease = np.cos(np.radians(crease_angle))
+    target = np.empty(len(vertices), dtype=np.int64)
+    remaining = np.arange(len(vertices))
+    leaders = np.empty(cells.max() + 1, dtype=np.int64)
+    while len(remaining) > 0:
+        leaders.fill(len(vertices))
+        np.minimum.at(leaders, cells[remaining], remaining)
+        leader = leaders[cells[remaining]]
+        same = (normals[remaining] * normals[leader]).sum(axis=1) >= cos_crease
+        same |= remaining == leader
+        target[remaining[same]] = leader[same]
+        remaining = remaining[~same]
+
+    kept, index = np.unique(target, return_inverse=True)
+    merged = np.zeros((len(kept), 3), dtype=np.float64)
+    np.add.at(merged, index, normals)
+    length = np.linalg.norm(merged, axis=1, keepdims=True)
+    length[length == 0] = 1.0
+
+    result = dict(mesh)
+    result["vertices"] = vertices[kept]
+    result["normals"] = (merged / length).astype(np.float32)
+    result["triangles"] = index.astype(index_dtype(len(kept)))[mesh["triangles"]]
+
+    # rendered normals show the averaged normals, with the length of the original ones
+    normal_edges = mesh.get("normal_edges", [])
+    if len(normal_edges) > 0:
+        normals_len = float(np.linalg.norm(normal_edges[:, 1] - normal_edges[:, 0], axis=1).max())
+        result["normal_edges"] = np.column_stack(
+            (result["vertices"], result["vertices"] + result["normals"] * normals_len)
+        ).reshape((-1, 2, 3))
+    return result
+
+
+def _monomials(vertices):
+    # v^T Q v = quadric . monomials(v) for a symmetric 4x4 quadric Q stored as its 10 upper entries
+    x, y, z = vertices.T
+    one = np.ones_like(x)
+    return np.column_stack((x * x, 2 * x * y, 2 * x * z, 2 * x, y * y, 2 * y * z, 2 * y, z * z, 2 * z, one))
+
+
+def _locked_vertices(triangles, planes, crease_angle, count):
+    """Vertices on boundary, non-manifold or crease edges (normals differ by more than crease_angle degrees)"""
+    # edges as keys low vertex * count + high vertex, in the order of the half edges
+    sources, targets = triangles.ravel(), triangles[:, [1, 2, 0]].ravel()
+    keys = np.minimum(sources, targets) * count + np.maximum(sources, targets)
+    order = np.argsort(keys, kind="stable")
+    unique, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+
+    # the two triangles of each inner edge
+    inner = counts == 2
+    first = order[starts[inner]] // 3
+    second = order[starts[inner] + 1] // 3
+    crease = (planes[first, :3] * planes[second, :3]).sum(axis=1) < np.cos(np.radians(crease_angle))
+
+    locked = np.zeros(count, dtype=bool)
+    for edges in (unique[~inner], unique[inner][crease]):
+        locked[edges // count] = True
+        locked[edges % count] = True
+    return locked
+
+
+# rounds of selecting independent collapses per pass of decimate_mesh
+SELECTION_ROUNDS = 4
+
+
+def _collapses(triangles, quadrics, monomials, locked, max_error):
+    """Sources, targets and errors of all collapses of a source onto a neighbour.
+
+    The half edges of the triangles are both directions of every inner edge, the vertices of all other edges are
+    locked.
+    """
+    sources, targets = triangles.ravel(), triangles[:, [1, 2, 0]].ravel()
+    keep = ~locked[sources]
+    sources, targets = sources[keep], targets[keep]
+
+    # (quadric of source + quadric of target) . monomials of target
+    errors = np.einsum("ij,ij->i", quadrics, monomials)[targets]
+    errors += np.einsum("ij,ij->i", quadrics[sources], monomials[targets])
+    np.maximum(errors, 0.0, out=errors)
+    if max_error is not None:
+        keep = errors <= max_error
+        sources, targets, errors = sources[keep], targets[keep], errors[keep]
+    return sources, targets, errors
+
+
+def _stars(triangles, centers, count):
+    """Index of the center, triangle and corner of the center for all triangles around the distinct centers"""
+    index = np.full(count, -1, dtype=np.int64)
+    index[centers] = np.arange(len(centers))
+    at = index[triangles]
+    faces, corners = np.nonzero(at >= 0)
+    return at[faces, corners], faces, corners
+
+
+def _ring_keys(triangles, centers, count):
+    # index of the center * count + vertex for all vertices in the 1-rings of the distinct centers
+    owner, faces, corners = _stars(triangles, centers, count)
+    others = np.concatenate((triangles[faces, (corners + 1) % 3], triangles[faces, (corners + 2) % 3]))
+    return np.unique(np.tile(owner, 2) * count + others)
+
+
+def _valid_collapses(triangles, points, sources, targets):
+    """Mask of the collapses (with distinct sources and distinct targets) that keep the mesh manifold and flip no
+    triangle"""
+    count = len(points)
+
+    # link condition: the inner edge source-target may only have the 2 opposite vertices of its triangles in common
+    common = np.intersect1d(
+        _ring_keys(triangles, sources, count), _ring_keys(triangles, targets, count), assume_unique=True
+    )
+    valid = np.bincount(common // count, minlength=len(sources)) == 2
+
+    # no triangle of the source may flip or degenerate when the source moves to the target
+    owner, faces, corners = _stars(triangles, sources, count)
+    moved = (triangles[faces] != targets[owner, None]).all(axis=1)
+    owner, faces, corners = owner[moved], faces[moved], corners[moved]
+    before = points[triangles[faces]]
+    after = before.copy()
+    after[np.arange(len(faces)), corners] = points[targets[owner]]
+    normal = lambda p: np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+    flips = (normal(before) * normal(after)).sum(axis=1) <= 0
+    return valid & (np.bincount(owner, weights=flips, minlength=len(sources)) == 0)
+
+
+def _ring_minimum(triangles, values, count):
+    """Minimum of values (per vertex) over the closed 1-ring of every vertex"""
+    result = np.full(count, np.iinfo(values.dtype).max)
+    minimum = np.minimum(np.minimum(values[triangles[:, 0]], values[triangles[:, 1]]), values[triangles[:, 2]])
+    np.minimum.at(result, triangles.ravel(), np.repeat(minimum, 3))
+    return result
+
+
+def _near(triangles, vertices, count):
+    """Mask of the vertices in the closed 1-rings of vertices"""
+    mask = np.zeros(count, dtype=bool)
+    mask[vertices] = True
+    result = np.zeros(count, dtype=bool)
+    result[triangles[mask[triangles[:, 0]] | mask[triangles[:, 1]] | mask[triangles[:, 2]]]] = True
+    return result
+
+
+def _independent(triangles, points, sources, targets, limit):
+    """Indices of at most limit valid collapses (ordered by priority) that can be applied at once.
+
+    A collapse only changes the triangles around its source. It stays valid if no vertex of another collapse lies
+    in the 1-ring of its source and no other source in the 1-ring of its target. A collapse is selected if it comes
+    first among all collapses that could violate this and is valid, which is repeated for the remaining collapses
+    away from the selected ones.
+    """
+    count = len(points)
+    rank = np.arange(len(sources))
+    free = np.ones(len(sources), dtype=bool)
+    selected = []
+    rounds = 0
+    while free.any() and (rounds < SELECTION_ROUNDS or not selected):
+        candidates = rank[free]
+        first_source = np.full(count, len(sources))
+        np.minimum.at(first_source, sources[candidates], candidates)
+        first_vertex = first_source.copy()
+        np.minimum.at(first_vertex, targets[candidates], candidates)
+
+        # first collapse with a vertex in the 1-ring of v and first collapse with its source in the 1-ring of v
+        vertex_near = _ring_minimum(triangles, first_vertex, count)
+        source_near = _ring_minimum(triangles, first_source, count)
+
+        s, t = sources[candidates], targets[candidates]
+        first = (vertex_near[s] == candidates) & (source_near[s] == candidates) & (source_near[t] == candidates)
+        chosen = candidates[first]
+        free[chosen] = False
+        chosen = chosen[_valid_collapses(triangles, points, sources[chosen], targets[chosen])]
+        rounds += 1
+        if len(chosen) == 0:
+            continue
+
+        selected.append(chosen)
+        near_source = _near(triangles, sources[chosen], count)
+        near_target = _near(triangles, targets[chosen], count)
+        free &= ~(near_source[sources] | near_source[targets] | near_target[sources])
+
+    return np.sort(np.concatenate(selected))[:limit] if selected else rank[:0]
+
+
+def decimate_mesh(mesh, max_triangles, max_error=None, crease_angle=30):
+    """Copy of mesh reduced to at most max_triangles triangles by quadric error edge collapses (Garland-Heckbert).
+
+    Every pass collapses a batch of independent edges whose errors are at most the one of the cheapest collapses
+    still needed, so cheaper collapses still come first. With max_error (a distance) no collapse moves the surface
+    further. A vertex is always collapsed onto a neighbour, so the kept vertices and normals are the exact ones of
+    the tessellation. Vertices on boundary edges (incl. face borders of meshes that are not welded) and on crease
+    edges are never removed, so the "edges" polylines still lie on the mesh. Collapses that would flip a triangle
+    or make the mesh non-manifold are skipped.
+    """
+    vertices, normals = mesh["vertices"], mesh["normals"]
+    triangles = np.asarray(mesh["triangles"], dtype=np.int64).reshape(-1, 3)
+    if len(triangles) <= max_triangles or len(normals) != len(vertices):
+        return mesh
+
+    points = np.asarray(vertices, dtype=np.float64)
+    p0, p1, p2 = points[triangles[:, 0]], points[triangles[:, 1]], points[triangles[:, 2]]
+    cross = np.cross(p1 - p0, p2 - p0)
+    length = np.linalg.norm(cross, axis=1, keepdims=True)
+    unit = np.divide(cross, length, out=np.zeros_like(cross), where=length > 0)
+    planes = np.column_stack((unit, -(unit * p0).sum(axis=1)))
+
+    # vertex quadrics: sum of the squared distance quadrics of the planes of all adjacent triangles
+    upper = np.triu_indices(4)
+    plane_quadrics = (planes[:, :, None] * planes[:, None, :])[:, upper[0], upper[1]]
+    quadrics = np.zeros((len(points), 10), dtype=np.float64)
+    for k in range(3):
+        np.add.at(quadrics, triangles[:, k], plane_quadrics)
+    monomials = _monomials(points)
+
+    locked = _locked_vertices(triangles, planes, crease_angle, len(points))
+
+    max_error = None if max_error is None else max_error * max_error
+    rng = np.random.default_rng(len(triangles))
+    while len(triangles) > max_triangles:
+        sources, targets, errors = _collapses(triangles, quadrics, monomials, locked, max_error)
+        if len(sources) == 0:
+            break
+
+        # every collapse removes the 2 triangles of its edge
+        limit = (len(triangles) - max_triangles + 1) // 2
+
+        # Only the collapses up to the error of the limit-th cheapest one are done in this pass. They are taken in
+        # random order, else smoothly varying errors (or equal ones of flat regions) would leave few collapses first
+        # in their neighbourhood
+        k = min(limit, len(errors)) - 1
+        cheap = errors <= np.partition(errors, k)[k]
+        order = rng.permutation(np.flatnonzero(cheap))
+        selected = order[_independent(triangles, points, sources[order], targets[order], limit)]
+        if len(selected) == 0:
+            # no cheap collapse is valid, the others are tried in the order of their error
+            order = np.flatnonzero(~cheap)
+            order = order[np.argsort(errors[order], kind="stable")]
+            selected = order[_independent(triangles, points, sources[order], targets[order], limit)]
+            if len(selected) == 0:
+                break
+        sources, targets = sources[selected], targets[selected]
+
+        np.add.at(quadrics, targets, quadrics[sources])
+        collapsed = np.arange(len(points))
+        collapsed[sources] = targets
+        triangles = collapsed[triangles]
+        alive = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2])
+        triangles = triangles[alive & (triangles[:, 2] != triangles[:, 0])]
+
+    kept, index = np.unique(triangles, return_inverse=True)
+
+    result = dict(mesh)
+    result["vertices"] = vertices[kept]
+    result["normals"] = normals[kept]
+    result["triangles"] = index.ravel().astype(index_dtype(len(kept)))
+    if len(mesh.get("normal_edges", [])) == len(vertices):
+        result["normal_edges"] = mesh["normal_edges"][kept]
+    return result
+
+
+def _tipsify(triangles, vertex_count, cache_size):
+    """Triangle order of Tipsify (Sander, Nehab, Barczak 2007) and the indices where its clusters start.
+
+    Triangles are emitted as fans around a vertex, the next fan vertex is a vertex of the last fan that is
+    still in the (simulated FIFO) cache. A new cluster starts whenever no such vertex is left.
+    """
+    flat = triangles.ravel()
+    order = np.argsort(flat, kind="stable")
+    offsets = np.searchsorted(flat[order], np.arange(vertex_count + 1)).tolist()
+    adjacency = (order // 3).tolist()
+    live = np.bincount(flat, minlength=vertex_count).tolist()
+    corners = triangles.tolist()
+
+    emitted = [False] * len(corners)
+    cache_clock = [0] * vertex_count
+    clock = cache_size + 1
+    dead_end = []
+    cursor = 0
+    result = []
+    clusters = []
+
+    fan = -1
+    while True:
+        if fan < 0:
+            # dead end: take the most recent vertex with triangles left, else the next one in input order
+            while dead_end and fan < 0:
+                v = dead_end.pop()
+                fan = v if live[v] > 0 else -1
+            while cursor < vertex_count and fan < 0:
+                fan = cursor if live[cursor] > 0 else -1
+                cursor += 1
+            if fan < 0:
+                break
+            clusters.append(len(result))
+
+        candidates = []
+        for t in adjacency[offsets[fan] : offsets[fan + 1]]:
+            if emitted[t]:
+                continue
+            emitted[t] = True
+            result.append(t)
+            for v in corners[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if clock - cache_clock[v] > cache_size:
+                    cache_clock[v] = clock
+                    clock += 1
+
+        # prefer the oldest candidate that stays in the cache while its remaining triangles are emitted
+        fan, best = -1, -1
+        for v in candidates:
+            if live[v] > 0:
+                priority = clock - cache_clock[v] if clock - cache_clock[v] + 2 * live[v] <= cache_size else 0
+                if priority > best:
+                    fan, best = v, priority
+
+    return np.array(result, dtype=np.int64), np.array(clusters, dtype=np.int64)
+
+
+def reorder_mesh(mesh, cache_size=VERTEX_CACHE_SIZE):
+    """Copy of mesh with triangles and vertices reordered for the GPU, the mesh itself stays the same.
+
+    Triangles are ordered by Tipsify for the post-transform vertex cache, then its clusters are sorted
+    outside in (by the distance of their plane from the mesh center) to reduce overdraw. Vertices are
+    renumbered in order of first use, so vertex fetches are sequential and the deltas of the index buffer
+    are small, which also makes the mesh compress better.
+    """
+    vertices, normals = mesh["vertices"], mesh["normals"]
+    triangles = np.asarray(mesh["triangles"], dtype=np.int64).reshape(-1, 3)
+    if len(triangles) == 0 or len(normals) != len(vertices):
+        return mesh
+
+    order, clusters = _tipsify(triangles, len(vertices), cache_size)
+    triangles = triangles[order]
+
+    # overdraw: clusters facing away from the center are drawn first, they likely hide the others
+    points = np.asarray(vertices, dtype=np.float64)[triangles]
+    cross = np.cross(points[:, 1] - points[:, 0], points[:, 2] - points[:, 0])
+    weights = np.linalg.norm(cross, axis=1)
+    centers = points.mean(axis=1) * weights[:, None]
+    cluster = np.zeros(len(triangles), dtype=np.int64)
+    cluster[clusters[1:]] = 1
+    cluster = np.cumsum(cluster)
+
+    cluster_normals = np.zeros((len(clusters), 3))
+    cluster_centers = np.zeros((len(clusters), 3))
+    cluster_weights = np.zeros(len(clusters))
+    np.add.at(cluster_normals, cluster, cross)
+    np.add.at(cluster_centers, cluster, centers)
+    np.add.at(cluster_weights, cluster, weights)
+    center = centers.sum(axis=0) / max(weights.sum(), 1e-30)
+    cluster_centers /= np.maximum(cluster_weights, 1e-30)[:, None]
+    length = np.maximum(np.linalg.norm(cluster_normals, axis=1), 1e-30)
+    distance = ((cluster_centers - center) * cluster_normals).sum(axis=1) / length
+    rank = np.empty(len(clusters), dtype=np.int64)
+    rank[np.argsort(-distance, kind="stable")] = np.arange(len(clusters))
+    triangles = triangles[np.argsort(rank[cluster], kind="stable")]
+
+    # vertex fetch: renumber the vertices in order of first use, unused vertices go last
+    flat = triangles.ravel()
+    first_use = np.full(len(vertices), len(flat), dtype=np.int64)
+    np.minimum.at(first_use, flat, np.arange(len(flat)))
+    kept = np.argsort(first_use, kind="stable")
+    index = np.empty(len(vertices), dtype=np.int64)
+    index[kept] = np.arange(len(vertices))
+
+    result = dict(mesh)
+    result["vertices"] = vertices[kept]
+    result["normals"] = normals[kept]
+    result["triangles"] = index[flat].astype(index_dtype(len(vertices)))
+    if len(mesh.get("normal_edges", [])) == len(vertices):
+        result["normal_edges"] = mesh["normal_edges"][kept]
+    return result
 
 
 def compute_quality(bb, deviation=0.1):
     return (bb.xsize + bb.ysize + bb.zsize) / 300 * deviation
 
 
+def count_triangles(shape, quality, angular_tolerance, parallel=True):
+    """Number of triangles of a mesh of shape with linear deflection quality, the mesh is removed again.
+
+    Kept finer triangulations (see clean_triangulation) are counted as if meshed with quality.
+    """
+    keep = get_default("keep_triangulation")
+    mesh_shape(shape, quality, angular_tolerance, parallel=parallel)
+
+    count = 0
+    loc = TopLoc_Location()
+    for face in get_faces(shape):
+        poly = BRep_Tool.Triangulation_s(face, loc)
+        if poly is not None:
+            # a kept finer triangulation has more triangles than a new mesh would have
+            count += poly.NbTriangles() * (min(poly.Deflection() / quality, 1.0) if keep else 1.0)
+
+    if not keep:
+        BRepTools.Clean_s(shape)
+    return round(count)
+
+
+def _count_triangles_brep(brep, quality, angular_tolerance):
+    # Runs in a worker process, see _tessellate_brep
+    return count_triangles(deserialize_shape(brep), quality, angular_tolerance, parallel=False)
+
+
+def count_triangles_async(executor, shape, quality, angular_tolerance):
+    """Like count_triangles(), but the shape is meshed in the process pool executor. Returns a Future of the count"""
+    return executor.submit(_count_triangles_brep, serialize_shape(shape), quality, angular_tolerance)
+
+
+def budget_quality(estimates, budget):
+    """Smallest linear deflection that keeps the estimated triangle count of all parts within budget.
+
+    estimates is a list of (quality, triangles) with the default deflection of a part and the triangle count
+    at this deflection. The triangle count is assumed to be inversely proportional to the deflection. Parts with a
+    default deflection below the result are meshed with the result instead, larger parts keep their default, so
+    the deviation on screen is the same for all small parts. Returns None if no part needs to be coarser.
+    """
+    estimates = sorted((quality, triangles * quality) for quality, triangles in estimates if quality > 0)
+
+    # triangles of the parts with default deflection and numerator of the triangles of the coarsened parts
+    fixed = sum(weight / quality for quality, weight in estimates)
+    scaled = 0.0
+    if fixed <= budget:
+        return None
+
+    for i, (quality, weight) in enumerate(estimates):
+        fixed -= weight / quality
+        scaled += weight
+        if fixed < budget:
+            result = scaled / (budget - fixed)
+            if i == len(estimates) - 1 or result <= estimates[i + 1][0]:
+                return max(result, quality)
+
+    return None
+
+
+def _tessellate(
+    compound, quality, angular_tolerance, tessellate, compute_edges, normals_len, debug=False, parallel=True
+):
+    tess = Tessellator()
+    tess.compute(compound, quality, angular_tolerance, tessellate, compute_edges, normals_len, debug, parallel)
+    return {
+        "vertices": tess.get_vertices(),
+        "triangles": tess.get_triangles(),
+        "normals": tess.get_normals(),
+        "edges": tess.get_edges(),
+        "normal_edges": tess.get_normal_edges(),
+    }
+
+
+def _tessellate_brep(brep, quality, angular_tolerance, tessellate, compute_edges, normals_len):
+    # Runs in a worker process: OCP shapes cannot be pickled, so the shape is handed over as BREP
+    return _tessellate(
+        deserialize_shape(brep), quality, angular_tolerance, tessellate, compute_edges, normals_len, parallel=False
+    )
+
+
 def tessellate(
     shapes,
     quality: float,
@@ -270,16 +1001,89 @@ def tessellate(
     compute_edges=True,
     normals_len=0,
     debug=False,
+    instances=None,
 ):
+    """Tessellate shapes, taking the mesh from the cache or from instances (mesh_key -> mesh) if possible"""
     compound = Compound._makeCompound(shapes) if len(shapes) > 1 else shapes[0]
-    tess = Tessellator()
-    tess.compute(compound, quality, angular_tolerance, tessellate, compute_edges, normals_len, debug)
-    return {
-        "vertices": tess.get_vertices(),
-        "triangles": tess.get_triangles(),
-        "normals": tess.get_normals(),
-        "edges": tess.get_edges(),
-    }
+
+    key = None
+    if CACHE.use_cache or instances is not None:
+        with Timer(debug, "", "fingerprint", 3):
+            key = mesh_key(compound, quality, angular_tolerance, tessellate, compute_edges, normals_len)
+
+        if instances is not None and key in instances:
+            return instances[key]
+
+    if CACHE.use_cache:
+        mesh = CACHE.get(key)
+        if mesh is not None:
+            with Timer(debug, "", f"taken from cache ({key})", 3):
+                return mesh
+
+    mesh = _tessellate(compound, quality, angular_tolerance, tessellate, compute_edges, normals_len, debug)
+
+    if CACHE.use_cache:
+        CACHE.put(key, mesh)
+
+    if instances is not None:
+        instances[key] = mesh
+
+    return mesh
+
+
+def tessellate_async(
+    executor,
+    shapes,
+    quality: float,
+    angular_tolerance: float,
+    tessellate=True,
+    compute_edges=True,
+    normals_len=0,
+    debug=False,
+    instances=None,
+):
+    """Like tessellate(), but the tessellation runs in the process pool executor.
+
+    Returns a Future of the mesh. Cache lookups and updates stay in the calling process.
+    Instances of the same shape share one Future.
+    """
+    compound = Compound._makeCompound(shapes) if len(shapes) > 1 else shapes[0]
+
+    with Timer(debug, "", "serialize", 3):
+        brep = serialize_shape(compound)
+
+    key = mesh_key(compound, quality, angular_tolerance, tessellate, compute_edges, normals_len, brep=brep)
+    if instances is not None and key in instances:
+        return instances[key]
+
+    mesh = CACHE.get(key) if CACHE.use_cache else None
+    if mesh is not None:
+        future = Future()
+        future.set_result(mesh)
+    else:
+        future = executor.submit(
+            _tessellate_brep, brep, quality, angular_tolerance, tessellate, compute_edges, normals_len
+        )
+
+    if instances is not None:
+        instances[key] = future
+
+    if mesh is None and CACHE.use_cache:
+
+        def cache_result(future):
+            if not future.cancelled() and future.exception() is None:
+                CACHE.put(key, future.result())
+
+        future.add_done_callback(cache_result)
+
+    return future
+
+
+def get_executor(parallel):
+    """Process pool for parallel=True (one worker per core) or parallel=<number of workers>, else None"""
+    if parallel is None or parallel is False:
+        return None
+    return ProcessPoolExecutor(max_workers=None if parallel is True else parallel)
 
 
 def discretize_edge(edge, deflection=0.1):
@@ -300,4 +1104,67 @@ def discretize_edge(edge, deflection=0.1):
     for i in range(len(points) - 1):
         edges.append((points[i], points[i + 1]))
 
-    return np.asarray(edges, dtype=np.float32)
\ No newline at end of file
+    return np.asarray(edges, dtype=np.float32)
+
+
+# number of edges discretized by one task of a process pool
+EDGE_CHUNK_SIZE = 512
+
+
+def _discretize(edges, deflection):
+    """Points (n, 3) and polyline offsets of edges, see polyline_segments"""
+    adaptor = BRepAdaptor_Curve()
+    discretizer = GCPnts_QuasiUniformDeflection()
+
+    points = np.empty((max(16 * len(edges), 1), 3), dtype=np.float32)
+    offsets = np.zeros(len(edges) + 1, dtype=np.uint32)
+    size = 0
+
+    for i, edge in enumerate(edges):
+        adaptor.Initialize(edge)
+        discretizer.Initialize(adaptor, deflection, adaptor.FirstParameter(), adaptor.LastParameter())
+
+        if not discretizer.IsDone():
+            raise AssertionError("Discretizer not done.")
+
+        count = discretizer.NbPoints()
+        if size + count > len(points):
+            points = np.concatenate((points, np.empty((max(len(points), count), 3), dtype=np.float32)))
+
+        points[size : size + count] = [discretizer.Value(j).Coord() for j in range(1, count + 1)]
+        size += count
+        offsets[i + 1] = size
+
+    return points[:size], offsets
+
+
+def _discretize_brep(brep, deflection):
+    # Runs in a worker process, the edges are handed over as BREP of a compound
+    iterator = TopoDS_Iterator(deserialize_shape(brep))
+    edges = []
+    while iterator.More():
+        edges.append(TopoDS.Edge_s(iterator.Value()))
+        iterator.Next()
+    return _discretize(edges, deflection)
+
+
+def discretize_edges(edges, deflection=0.1, executor=None):
+    """Discretize edges into line segments (n, 2, 3), like discretize_edge for all edges at once.
+
+    With a process pool executor (see get_executor) chunks of EDGE_CHUNK_SIZE edges are discretized in parallel.
+    """
+    if executor is None or len(edges) <= EDGE_CHUNK_SIZE:
+        return polyline_segments(*_discretize(edges, deflection))
+
+    futures = [
+        executor.submit(
+            _discretize_brep, serialize_shape(Compound._makeCompound(edges[i : i + EDGE_CHUNK_SIZE])), deflection
+        )
+        for i in range(0, len(edges), EDGE_CHUNK_SIZE)
+    ]
+    try:
+        return np.concatenate([polyline_segments(*future.result()) for future in futures])
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
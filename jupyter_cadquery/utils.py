@@ -1,7 +1,12 @@
+import asyncio
+from concurrent.futures import Future
+import hashlib
 import math
 import numpy as np
+import threading
 import time
 import warnings
+import weakref
 from webcolors import name_to_rgb, hex_to_rgb, rgb_to_hex
 import ipywidgets as widgets
 
@@ -58,6 +63,132 @@ def flatten(nested_list):
     return [y for x in nested_list for y in x]
 
 
+def index_dtype(count):
+    """Narrowest unsigned integer type for indices into count vertices"""
+    return np.uint16 if count <= 2**16 else np.uint32
+
+
+def polyline_segments(points, offsets):
+    """Line segments (n, 2, 3) of polylines stored as one array of points and the offsets of the polylines.
+
+    offsets has one entry more than there are polylines, the last one being the number of points.
+    """
+    points = np.asarray(points).reshape(-1, 3)
+    keep = np.ones(max(len(points) - 1, 0), dtype=bool)
+
+    # no segment from the last point of a polyline to the first point of the next one
+    ends = np.asarray(offsets, dtype=np.int64)[1:-1] - 1
+    keep[ends[(ends >= 0) & (ends < len(keep))]] = False
+
+    starts = np.flatnonzero(keep)
+    return np.stack((points[starts], points[starts + 1]), axis=1)
+
+
+# Quantization
+
+
+def quantize_mesh(mesh):
+    """Copy of mesh with int16 vertices and octahedron encoded int16 normals, see dequantize_mesh.
+
+    Vertices are stored relative to the center of their bounding box in 65535 steps per axis. Since the bounding box
+    determines the linear deflection, the position error is below 0.004 * quality / deviation (4% of the deflection
+    for the default deviation 0.1). Normals deviate by less than 0.05 degrees.
+    """
+    if "dequantize" in mesh or len(mesh["vertices"]) == 0:
+        return mesh
+
+    vertices = np.asarray(mesh["vertices"], dtype=np.float64)
+    lower, upper = vertices.min(axis=0), vertices.max(axis=0)
+    offset = (lower + upper) / 2
+    scale = (upper - lower) / (2 * 32767)
+    scale[scale == 0] = 1.0
+
+    result = dict(mesh)
+    result["vertices"] = np.rint((vertices - offset) / scale).clip(-32767, 32767).astype(np.int16)
+    result["normals"] = _oct_encode(mesh["normals"])
+    result["dequantize"] = np.stack((scale, offset))
+    return result
+
+
+def dequantize_mesh(mesh):
+    """Vertices and normals of a mesh as float32 arrays (n, 3), for quantized and plain meshes"""
+    if "dequantize" not in mesh:
+        return mesh["vertices"], mesh["normals"]
+
+    scale, offset = mesh["dequantize"]
+    return (mesh["vertices"] * scale + offset).astype(np.float32), _oct_decode(mesh["normals"])
+
+
+def _oct_encode(normals):
+    normals = np.asarray(normals, dtype=np.float64).reshape(-1, 3)
+    norm = np.abs(normals).sum(axis=1, keepdims=True)
+    norm[norm == 0] = 1.0
+    x, y, z = (normals / norm).T
+
+    # the lower half of the octahedron is folded over the upper half
+    lower = z < 0
+    u = np.where(lower, (1 - np.abs(y)) * np.where(x >= 0, 1.0, -1.0), x)
+    v = np.where(lower, (1 - np.abs(x)) * np.where(y >= 0, 1.0, -1.0), y)
+    return np.rint(np.column_stack((u, v)) * 32767).astype(np.int16)
+
+
+def _oct_decode(encoded):
+    u, v = (np.asarray(encoded, dtype=np.float32).reshape(-1, 2) / 32767).T
+    z = 1 - np.abs(u) - np.abs(v)
+    t = np.maximum(-z, 0)
+    normals = np.column_stack((u - np.where(u >= 0, t, -t), v - np.where(v >= 0, t, -t), z))
+    return (normals / np.linalg.norm(normals, axis=1, keepdims=True)).astype(np.float32)
+
+
+# Content hashes
+
+# content hashes of read-only arrays (e.g. from the tessellation cache): id -> (weak reference, hash)
+HASHES = {}
+
+
+def array_hash(array):
+    """Content hash of an array, memoized for read-only arrays"""
+    memo = HASHES.get(id(array))
+    if memo is not None and memo[0]() is array:
+        return memo[1]
+
+    digest = hashlib.blake2b(np.ascontiguousarray(array).data, digest_size=16)
+    digest.update(f"{array.dtype.str}{array.shape}".encode())
+    result = digest.hexdigest()
+
+    if not array.flags.writeable:
+        try:
+            HASHES[id(array)] = (weakref.ref(array, lambda _, key=id(array): HASHES.pop(key, None)), result)
+        except TypeError:
+            pass
+    return result
+
+
+def fingerprint(obj):
+    """Content hash of (nested dicts, lists and tuples of) NumPy arrays and plain values"""
+    digest = hashlib.blake2b(digest_size=16)
+
+    def update(obj):
+        if isinstance(obj, np.ndarray):
+            digest.update(array_hash(obj).encode())
+        elif isinstance(obj, dict):
+            digest.update(b"{")
+            for key in sorted(obj, key=str):
+                digest.update(str(key).encode())
+                update(obj[key])
+            digest.update(b"}")
+        elif isinstance(obj, (list, tuple)):
+            digest.update(b"[")
+            for value in obj:
+                update(value)
+            digest.update(b"]")
+        else:
+            digest.update(repr(obj).encode())
+
+    update(obj)
+    return digest.hexdigest()
+
+
 # CAD helpers
 
 
@@ -196,6 +327,116 @@ class Progress:
             self.progress.value += 1
 
 
+class Cancelled(Exception):
+    """Raised by the worker of a cancelled non-blocking show"""
+
+
+class CancellableProgress:
+    """Progress proxy that counts the updates and stops the worker of a cancelled show at the next update"""
+
+    def __init__(self, progress, cancelled):
+        self.progress = progress
+        self.cancelled = cancelled
+        self.count = 0
+
+    def check(self):
+        """Stop the worker of a cancelled show without counting a step, e.g. while estimating"""
+        if self.cancelled.is_set():
+            raise Cancelled("show was cancelled")
+
+    def update(self):
+        self.check()
+        self.count += 1
+        if self.progress is not None:
+            self.progress.update()
+
+    def __getattr__(self, name):
+        return getattr(self.progress, name)
+
+
+class ShowHandle:
+    """Handle of a non-blocking show.
+
+    work(progress) runs in a worker thread. finish(result of work) then runs in the thread of the running
+    event loop (the Jupyter kernel) if there is one, else in result(). Widgets are only created by finish.
+    """
+
+    def __init__(self, work, finish=None, progress=None, total=None):
+        self.total = total
+        self.cancelled = threading.Event()
+        self._progress = CancellableProgress(progress, self.cancelled)
+        self._finish_func = finish
+        self._work = Future()
+        self._finished = Future()
+        self._lock = threading.Lock()
+
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+
+        self._thread = threading.Thread(target=self._run, args=(work,), daemon=True)
+        self._thread.start()
+
+    def _run(self, work):
+        try:
+            self._work.set_result(work(self._progress))
+        except BaseException as ex:
+            self._work.set_exception(ex)
+            self._set(exception=ex)
+            return
+
+        if self._finish_func is None:
+            self._set(result=self._work.result())
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(self._finish)
+
+    def _set(self, result=None, exception=None):
+        with self._lock:
+            if not self._finished.done():
+                if exception is None:
+                    self._finished.set_result(result)
+                else:
+                    self._finished.set_exception(exception)
+
+    def _finish(self):
+        with self._lock:
+            if self._finished.done():
+                return
+            try:
+                if self.cancelled.is_set():
+                    raise Cancelled("show was cancelled")
+                self._finished.set_result(self._finish_func(self._work.result()))
+            except Exception as ex:
+                self._finished.set_exception(ex)
+
+    @property
+    def progress(self):
+        """Number of finished steps and total number of steps (or None)"""
+        return (self._progress.count, self.total)
+
+    def done(self):
+        return self._finished.done()
+
+    def cancel(self):
+        """Stop the show at the next finished part, returns False if it is already done"""
+        self.cancelled.set()
+        if self._work.done():
+            self._set(exception=Cancelled("show was cancelled"))
+        return not self._finished.done() or isinstance(self._finished.exception(), Cancelled)
+
+    def result(self, timeout=None):
+        """Wait for the show and return its result, raises Cancelled for a cancelled show"""
+        self._work.result(timeout)
+        if self._finish_func is not None:
+            self._finish()
+        return self._finished.result()
+
+    def __repr__(self):
+        state = "cancelled" if self.cancelled.is_set() else "done" if self.done() else "running"
+        return f"<ShowHandle {state}, progress {self._progress.count}/{self.total}>"
+
+
 def px(w):
     return f"{w}px"
 
@@ -16,63 +16,243 @@
 
 from jupyter_cadquery.cadquery.cad_objects import to_assembly
 from jupyter_cadquery.defaults import get_defaults
-from jupyter_cadquery.cad_objects import _combined_bb
+from jupyter_cadquery.cad_objects import _coarse, _combined_bb, _postprocess, _signature, same_signature
 from jupyter_cadquery.defaults import get_default, get_defaults
 from jupyter_cadquery.cadquery import PartGroup, Part
+from jupyter_cadquery.viewer.protocol import CODECS, encode, encode_arrays
+from jupyter_cadquery.utils import ShowHandle
+
+import json
+import threading
+import time
+import uuid
 
-import pickle
 import zmq
 
 ZMQ_PORT = 5555
 REQUEST_TIMEOUT = 2000
+HEARTBEAT_TIMEOUT = 10000
+REQUEST_RETRIES = 3
+
+# slowest link the request timeouts allow for, in bytes/sec
+MIN_LINK_SPEED = 256 * 1024
+
+# arrays are uploaded in messages of about this size, each one is acknowledged by the viewer
+UPLOAD_CHUNK_SIZE = 4 * 1024 ** 2
 OBJECTS = []
 
+# id and signature of the scene last shown in the viewer
+SCENE = None
+
+# id and config of the scene showing OBJECTS
+OBJECTS_SCENE = None
+
+# speed of the link to the viewer in bytes/sec, measured by uploads of at least SPEED_SAMPLE_SIZE bytes
+LINK_SPEED = None
+SPEED_SAMPLE_SIZE = 1024 ** 2
+
+# compression="auto" compresses uploads on links slower than this (bytes/sec), e.g. not on localhost
+COMPRESSION_SPEED = 100 * 1024 ** 2
+
+
+class Connection:
+    """Persistent connection to the viewer, re-created after a failed request.
+
+    ZMQ sockets are not thread-safe, so a request and all its replies are exchanged while holding lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.context = None
+        self.socket = None
+
+    def connect(self):
+        if self.socket is None:
+            if self.context is None:
+                self.context = zmq.Context()
+            self.socket = self.context.socket(zmq.DEALER)
+            self.socket.setsockopt(zmq.LINGER, 0)
+            self.socket.connect(f"tcp://localhost:{ZMQ_PORT}")
+        return self.socket
+
+    def reset(self):
+        with self.lock:
+            if self.socket is not None:
+                self.socket.close()
+                self.socket = None
+
+    def receive(self, request_id, timeout):
+        """Next reply to request_id, None if nothing arrives within timeout ms.
+
+        Replies to other ids belong to earlier requests that were given up, they are skipped.
+        """
+        deadline = time.time() + timeout / 1000
+        while True:
+            remaining = int((deadline - time.time()) * 1000)
+            if remaining <= 0 or (self.socket.poll(remaining) & zmq.POLLIN) == 0:
+                return None
+
+            reply = json.loads(self.socket.recv())
+            if reply.get("id") == request_id:
+                return reply
+
+
+CONNECTION = Connection()
+
 
 def set_port(port):
     global ZMQ_PORT
     ZMQ_PORT = port
+    CONNECTION.reset()
 
 
-def connect(context):
-    endpoint = f"tcp://localhost:{ZMQ_PORT}"
-    socket = context.socket(zmq.REQ)
-    socket.connect(endpoint)
-    return socket
+def _timeout(nbytes):
+    """Milliseconds to wait for the reply to a message of nbytes, it has to arrive completely first"""
+    return REQUEST_TIMEOUT + int(nbytes / MIN_LINK_SPEED * 1000)
 
 
-def send(data):
-    context = zmq.Context()
-    socket = connect(context)
+def _chunks(arrays):
+    """Split arrays (hash -> array) into dicts of about UPLOAD_CHUNK_SIZE bytes, larger arrays get their own dict"""
+    chunks = [{}]
+    total = 0
+    for key, array in arrays.items():
+        if chunks[-1] and total + array.nbytes > UPLOAD_CHUNK_SIZE:
+            chunks.append({})
+            total = 0
+        chunks[-1][key] = array
+        total += array.nbytes
+    return chunks
 
-    msg = pickle.dumps(data, 4)
-    print(" sending ... ", end="")
-    socket.send(msg)
 
-    retries_left = 3
-    while True:
-        if (socket.poll(REQUEST_TIMEOUT) & zmq.POLLIN) != 0:
-            reply = socket.recv_json()
+def _codec(compression, codecs):
+    """Codec for an upload to a viewer supporting codecs, None for no compression"""
+    if compression is None or compression is False:
+        return None
 
-            if reply["result"] == "success":
-                print("done")
-            else:
-                print("\n", reply["msg"])
-            break
+    if compression == "auto":
+        if LINK_SPEED is None or LINK_SPEED > COMPRESSION_SPEED:
+            return None
+        return next((codec for codec in CODECS if codec in codecs), None)
 
-        retries_left -= 1
+    if compression not in CODECS or compression not in codecs:
+        print(f"\n Compression {compression} is not available, sending uncompressed ... ", end="", flush=True)
+        return None
 
-        # Socket is confused. Close and remove it.
-        socket.setsockopt(zmq.LINGER, 0)
-        socket.close()
-        if retries_left == 0:
+    return compression
+
+
+def send(data, compression=None):
+    """Send data to the viewer and wait for it being rendered.
+
+    The scene is sent first with all arrays referenced by content hash. The viewer answers with the hashes
+    it does not have in its mesh store yet and the codecs it supports, and only these arrays are uploaded,
+    compressed according to compression (see show), in chunks of UPLOAD_CHUNK_SIZE that the viewer
+    acknowledges one by one.
+    The viewer acknowledges the request and sends heartbeats while rendering, so only the silence between two
+    replies is limited (until the acknowledgement REQUEST_TIMEOUT plus the transfer time of the message at
+    MIN_LINK_SPEED, HEARTBEAT_TIMEOUT afterwards).
+    The data is only resent when the viewer did not acknowledge it. Returns the timings in seconds or None.
+    Concurrent calls, e.g. by a non-blocking show and the main thread, are served one after the other.
+    """
+    with CONNECTION.lock:
+        return _send(data, compression)
+
+
+def _send(data, compression):
+    global LINK_SPEED
+
+    if compression is None:
+        compression = get_default("compression")
+
+    start = time.time()
+    arrays = {}
+    msg = encode(data, arrays=arrays)
+    serialized = time.time()
+
+    request_id = uuid.uuid4().hex
+    print(" sending ... ", end="", flush=True)
+
+    timeout = _timeout(sum(memoryview(frame).nbytes for frame in msg))
+    for retry in range(REQUEST_RETRIES):
+        socket = CONNECTION.connect()
+        socket.send_multipart([request_id.encode(), b"scene", *msg], copy=False)
+
+        reply = CONNECTION.receive(request_id, timeout)
+        if reply is not None:
             break
 
-        print("Reconnecting to server…")
-        # Create new connection
-        socket = connect(context)
+        # Socket is confused. Close and remove it.
+        CONNECTION.reset()
+        if retry < REQUEST_RETRIES - 1:
+            print("\nReconnecting to server and resending ...", end="", flush=True)
+    else:
+        print("\n Viewer is not reachable")
+        return None
+
+    uploaded = sent = 0
+    codec = None
+    if reply["result"] == "missing":
+        missing = {key: arrays[key] for key in reply["hashes"]}
+        uploaded = sum(array.nbytes for array in missing.values())
+        codec = _codec(compression, reply.get("codecs", []))
+
+        # all chunks are queued at once, only the time until the next acknowledgement is limited
+        upload_start = time.time()
+        chunks = _chunks(missing)
+        sizes = []
+        for i, chunk in enumerate(chunks):
+            frames = encode_arrays(chunk, codec)
+            sizes.append(sum(memoryview(frame).nbytes for frame in frames))
+            kind = b"arrays" if i == len(chunks) - 1 else b"chunk"
+            socket.send_multipart([request_id.encode(), kind, *frames], copy=False)
+        sent = sum(sizes)
+
+        for size in sizes:
+            reply = CONNECTION.receive(request_id, _timeout(size))
+            if reply is None:
+                CONNECTION.reset()
+                print("\n Viewer did not acknowledge the mesh data")
+                return None
+            if reply["result"] != "received":
+                break
+
+        if sent >= SPEED_SAMPLE_SIZE:
+            LINK_SPEED = sent / max(time.time() - upload_start, 1e-6)
+
+    acknowledged = time.time()
+
+    while reply["result"] in ("ack", "progress"):
+        if reply["result"] == "progress":
+            print(".", end="", flush=True)
+
+        reply = CONNECTION.receive(request_id, HEARTBEAT_TIMEOUT)
+        if reply is None:
+            CONNECTION.reset()
+            print(f"\n No reply from viewer for {HEARTBEAT_TIMEOUT / 1000:.0f} sec, giving up")
+            return None
+
+    end = time.time()
+    timings = {
+        "serialize": serialized - start,
+        "upload": acknowledged - serialized,
+        "render": reply.get("duration", end - acknowledged),
+        "round_trip": end - serialized,
+    }
+
+    if reply["result"] == "success":
+        print(
+            "done ({}, uploaded {:.1f}{} of {:.1f} MB)".format(
+                ", ".join(f"{k}: {v:.2f} sec" for k, v in timings.items()),
+                uploaded / 1024 ** 2,
+                "" if codec is None else f" ({codec}: {sent / 1024 ** 2:.1f})",
+                sum(array.nbytes for array in arrays.values()) / 1024 ** 2,
+            )
+        )
+    else:
+        print("\n", reply["msg"])
+        return None
 
-        print("Resending ...")
-        socket.send(msg)
+    return timings
 
 
 class Progress:
@@ -80,7 +260,7 @@ class Progress:
         print(".", end="", flush=True)
 
 
-def _convert(*cad_objs, **kwargs):
+def _to_part_group(*cad_objs, **kwargs):
     color = kwargs.get("default_color")
     if color is None:
         color = get_default("default_color")
@@ -95,11 +275,20 @@ def _convert(*cad_objs, **kwargs):
     if len(part_group.objects) == 1 and isinstance(part_group.objects[0], PartGroup):
         part_group = part_group.objects[0]
 
+    return part_group
+
+
+def _config(**kwargs):
     # Do not send defaults for postion, rotation unless they are set in kwargs
     config = {k: v for k, v in get_defaults().items() if not k in ("position", "rotation")}
     for k, v in kwargs.items():
         if v is not None:
             config[k] = v
+    return config
+
+
+def _convert(part_group, progress=None, **kwargs):
+    config = _config(**kwargs)
 
     mapping = part_group.to_state()
     shapes = part_group.collect_mapped_shapes(
@@ -111,7 +300,15 @@ def _convert(*cad_objs, **kwargs):
         render_edges=config.get("render_edges"),
         render_normals=config.get("render_normals"),
         timeit=config.get("timeit"),
-        progress=Progress(),
+        progress=Progress() if progress is None else progress,
+        parallel=config.get("parallel"),
+        triangle_budget=config.get("triangle_budget"),
+        weld=config.get("weld"),
+        crease_angle=config.get("crease_angle"),
+        quantize=config.get("quantize"),
+        decimate=config.get("decimate"),
+        decimate_error=config.get("decimate_error"),
+        reorder=config.get("reorder"),
     )
     tree = part_group.to_nav_dict()
     data = {
@@ -119,6 +316,7 @@ def _convert(*cad_objs, **kwargs):
         "type": "data",
         "config": config,
         "count": part_group.count_shapes(),
+        "scene": uuid.uuid4().hex,
     }
     return data
 
@@ -144,6 +342,17 @@ def show(*cad_objs, **kwargs):
     - edge_accuracy:     Presicion of edge discretizaion (default=None)
                          If None, uses: quality / 100
     - optimal_bb:        Use optimal bounding box (default=False)
+    - parallel:          Tessellate parts in parallel processes, True or number of processes (default=False)
+    - triangle_budget:   Approximate maximum number of triangles, small parts are meshed coarser (default=None)
+    - weld:              Merge vertices shared by adjacent faces unless it is a crease (default=False)
+    - crease_angle:      Angle in degrees between normals marking a sharp edge for weld and decimate (default=30)
+    - decimate:          Reduce parts with more triangles to this number by edge collapses (default=None)
+    - decimate_error:    Maximum distance a decimated surface may move, stops decimate earlier (default=None)
+    - reorder:           Reorder triangles and vertices for the GPU vertex cache and less overdraw (default=False)
+    - quantize:          Send int16 vertices, oct encoded normals, error < 0.004*quality/deviation (default=False)
+    - compression:       Viewer uploads: "zlib", "lz4", "zstd", "auto" (slow links only) or False (default="auto")
+    - block:             Wait for the objects being shown, else return a handle with result(), cancel() (default=True)
+    - progressive:       Show a coarse mesh first and refine it in the background, returns a handle (default=False)
     - axes:              Show axes (default=False)
     - axes0:             Show axes at (0,0,0) (default=False)
     - grid:              Show grid (default=False)
@@ -156,6 +365,7 @@ def show(*cad_objs, **kwargs):
     - rotation:          z, y and y rotation angles to apply to position vector (default=(0, 0, 0))
     - zoom:              Zoom factor of view (default=2.5)
     - reset_camera:      Reset camera position, rotation and zoom to default (default=True)
+    - batched:           Merge all parts into one mesh per color, for large assemblies; no animation (default=False)
     - mac_scrollbar:     Prettify scrollbars (default=True)
     - display:           Select display: "sidecar", "cell", "html"
     - tools:             Show the viewer tools like the object tree
@@ -166,17 +376,120 @@ def show(*cad_objs, **kwargs):
     - position = (0, 0, 1) and rotation = (45, 35.264389682, 0)
     """
 
-    data = _convert(*cad_objs, **kwargs)
-    send(data)
+    return _show(_to_part_group(*cad_objs, **kwargs), **kwargs)
+
+
+def _show(part_group, **kwargs):
+    def work(progress, params=kwargs):
+        global SCENE
+
+        data = _convert(part_group, progress, **params)
+        SCENE = None
+        timings = send(data, data["config"].get("compression"))
+        if timings is not None:
+            SCENE = (data["scene"], _signature(part_group, data["config"]))
+        return timings
+
+    def refine(progress):
+        global SCENE
+
+        scene = SCENE
+        data = _convert(part_group, progress, **kwargs)
+        if scene is None:
+            return None
+
+        refined = {"type": "refine", "scene": scene[0], "data": {"shapes": data["data"]["shapes"]}}
+        timings = send(refined, data["config"].get("compression"))
+        if timings is not None:
+            SCENE = (scene[0], _signature(part_group, data["config"]))
+        return timings
+
+    config = _config(**kwargs)
+
+    if config.get("progressive"):
+        work(Progress(), _coarse(kwargs))
+        return ShowHandle(refine, progress=Progress(), total=part_group.count_shapes())
+
+    if not config.get("block"):
+        return ShowHandle(work, progress=Progress(), total=part_group.count_shapes())
+
+    work(Progress())
+
+
+def update(*cad_objs, **kwargs):
+    """Update the CAD objects shown in the viewer
+
+    If only the locations of assemblies or parts changed since the last show or update (e.g. after
+    relocating a MAssembly), the viewer moves the shown parts and neither tessellation nor mesh upload
+    is needed. Otherwise this is the same as show. Valid keywords are the same as for show.
+    """
+    part_group = _to_part_group(*cad_objs, **kwargs)
+
+    if SCENE is not None and same_signature(SCENE[1], _signature(part_group, _config(**kwargs))):
+        data = {"type": "update", "scene": SCENE[0], "locations": part_group.collect_locations()}
+        if send(data) is not None:
+            return
+
+    return _show(part_group, **kwargs)
 
 
 def show_object(obj, **kwargs):
-    global OBJECTS
-    OBJECTS.append(Part(obj, name=f"obj_{len(OBJECTS)}"))
-    show(PartGroup(OBJECTS), **kwargs)
+    """Show obj together with all objects shown with show_object since the last reset
+
+    If the viewer still shows these objects with the same settings, only obj is tessellated and sent,
+    and the viewer adds it to the shown objects.
+    """
+    global OBJECTS, OBJECTS_SCENE, SCENE
+
+    part = Part(obj, name=f"obj_{len(OBJECTS)}")
+    OBJECTS.append(part)
+    part_group = PartGroup(OBJECTS)
+    config = _config(**kwargs)
+
+    if SCENE is not None and OBJECTS_SCENE == (SCENE[0], config):
+        path = (len(OBJECTS) - 1,)
+        shape = part.collect_shapes(
+            loc=None,
+            quality=config.get("quality"),
+            deviation=config.get("deviation"),
+            angular_tolerance=config.get("angular_tolerance"),
+            edge_accuracy=config.get("edge_accuracy"),
+            render_edges=config.get("render_edges"),
+            render_normals=config.get("render_normals"),
+            progress=Progress(),
+            timeit=config.get("timeit"),
+        )
+        shape["ind"] = path
+        _postprocess(
+            {"parts": [shape]},
+            weld=config.get("weld"),
+            crease_angle=config.get("crease_angle"),
+            quantize=config.get("quantize"),
+            decimate=config.get("decimate"),
+            decimate_error=config.get("decimate_error"),
+            reorder=config.get("reorder"),
+            timeit=config.get("timeit"),
+        )
+        data = {
+            "type": "append",
+            "scene": SCENE[0],
+            "data": dict(
+                shapes=shape,
+                mapping={str(part.id): {"path": path, "state": part.to_state()}},
+                tree=part.to_nav_dict(),
+            ),
+        }
+        if send(data, config.get("compression")) is not None:
+            SCENE = (SCENE[0], _signature(part_group, config))
+            return
+
+    # OBJECTS_SCENE needs the result of the show
+    _show(part_group, **{**kwargs, "block": True})
+    OBJECTS_SCENE = None if SCENE is None else (SCENE[0], config)
 
 
 def reset():
-    global OBJECTS
+    global OBJECTS, OBJECTS_SCENE
 
     OBJECTS = []
+    OBJECTS_SCENE = None
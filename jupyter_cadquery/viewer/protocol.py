@@ -0,0 +1,302 @@
+#
+# Copyright 2021 Bernhard Walter
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Wire protocol between viewer client and server
+
+A message is a multipart ZMQ message. The first frame is a JSON header with the message data, all
+further frames are the raw buffers of the NumPy arrays referenced in the header. The arrays are sent
+without copying and rebuilt with np.frombuffer on the server. Values JSON cannot represent are tagged:
+
+- {"__ndarray__": frame, "dtype": dtype, "shape": shape}: NumPy array in frame number "frame"
+- {"__tuple__": [...]}: tuple
+- {"__dict__": [[key, value], ...]}: dict with non string keys
+- {"__bb__": {...}}: BoundingBox
+- {"__shared__": n, "value": {...}} and {"__ref__": n}: a dict referenced more than once, e.g. the
+  mesh of a part with several instances
+- {"__hash__": hash, "dtype": dtype, "shape": shape}: NumPy array sent separately by content hash
+
+Arrays referenced by content hash allow the viewer to keep them in a store and to only ask for the
+arrays it does not know yet (see encode_arrays and decode_arrays). These uploads can be compressed
+with one of the CODECS both sides support: integer arrays are delta encoded along the first axis
+and the bytes of all arrays are shuffled by significance before compression.
+
+Unlike pickle, decoding cannot execute code.
+"""
+
+import json
+import zlib
+
+import numpy as np
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from jupyter_cadquery.ocp_utils import BoundingBox
+from jupyter_cadquery.utils import array_hash
+
+PROTOCOL_VERSION = 2
+
+
+class ProtocolError(Exception):
+    ...
+
+
+# available compression codecs, best first: name -> (compress, decompress)
+CODECS = {}
+if zstandard is not None:
+    CODECS["zstd"] = (
+        lambda data: zstandard.ZstdCompressor(level=3).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    )
+if lz4 is not None:
+    CODECS["lz4"] = (lz4.frame.compress, lz4.frame.decompress)
+CODECS["zlib"] = (lambda data: zlib.compress(data, 1), zlib.decompress)
+
+
+def encode(data, arrays=None):
+    """Encode data into a list of frames for socket.send_multipart(frames, copy=False).
+
+    If the dict arrays is given, NumPy arrays are referenced by content hash and collected in arrays
+    (hash -> array) instead of being added as frames.
+    """
+    buffers = []
+    frames = {}
+    counts = {}
+    shared = {}
+
+    def count(obj):
+        if isinstance(obj, dict):
+            counts[id(obj)] = counts.get(id(obj), 0) + 1
+            if counts[id(obj)] == 1:
+                for value in obj.values():
+                    count(value)
+        elif isinstance(obj, (list, tuple)):
+            for value in obj:
+                count(value)
+
+    def encode_array(array):
+        if array.dtype.hasobject:
+            raise ProtocolError("NumPy arrays of Python objects cannot be sent")
+
+        if arrays is not None:
+            key = array_hash(array)
+            arrays[key] = array
+            return {"__hash__": key, "dtype": array.dtype.str, "shape": list(array.shape)}
+
+        frame = frames.get(id(array))
+        if frame is None:
+            buffers.append(np.ascontiguousarray(array))
+            frame = frames[id(array)] = len(buffers)
+        return {"__ndarray__": frame, "dtype": array.dtype.str, "shape": list(array.shape)}
+
+    def encode_obj(obj):
+        if obj is None or isinstance(obj, (bool, int, float, str)):
+            return obj
+
+        elif isinstance(obj, np.ndarray):
+            return encode_array(obj)
+
+        elif isinstance(obj, np.generic):
+            return obj.item()
+
+        elif isinstance(obj, tuple):
+            return {"__tuple__": [encode_obj(value) for value in obj]}
+
+        elif isinstance(obj, list):
+            return [encode_obj(value) for value in obj]
+
+        elif isinstance(obj, BoundingBox):
+            return {"__bb__": encode_dict(obj.to_dict())}
+
+        elif isinstance(obj, dict):
+            if counts.get(id(obj), 0) > 1:
+                if id(obj) in shared:
+                    return {"__ref__": shared[id(obj)]}
+                shared[id(obj)] = len(shared)
+                return {"__shared__": shared[id(obj)], "value": encode_dict(obj)}
+            return encode_dict(obj)
+
+        raise ProtocolError(f"Type {type(obj).__name__} cannot be sent")
+
+    def encode_dict(obj):
+        if all(isinstance(key, str) for key in obj):
+            return {key: encode_obj(value) for key, value in obj.items()}
+        return {"__dict__": [[encode_obj(key), encode_obj(value)] for key, value in obj.items()]}
+
+    count(data)
+    header = {"version": PROTOCOL_VERSION, "data": encode_obj(data)}
+
+    return [json.dumps(header).encode("utf-8")] + buffers
+
+
+def _header(frames):
+    try:
+        header = json.loads(bytes(_buffer(frames[0])).decode("utf-8"))
+    except (IndexError, ValueError, UnicodeDecodeError) as ex:
+        raise ProtocolError(f"Invalid message header: {ex}")
+
+    if not isinstance(header, dict) or header.get("version") != PROTOCOL_VERSION:
+        raise ProtocolError("Wrong protocol version, client and viewer need the same version of jupyter-cadquery")
+
+    return header
+
+
+def _buffer(frame):
+    return frame.buffer if hasattr(frame, "buffer") else frame
+
+
+def referenced_hashes(frames):
+    """Content hashes of all arrays referenced in the message"""
+    result = []
+
+    def walk(obj):
+        if isinstance(obj, list):
+            for value in obj:
+                walk(value)
+        elif isinstance(obj, dict):
+            if "__hash__" in obj:
+                result.append(obj["__hash__"])
+            else:
+                for value in obj.values():
+                    walk(value)
+
+    walk(_header(frames)["data"])
+    return result
+
+
+def _filters(array):
+    filters = ["delta"] if array.dtype.kind in "iu" and array.ndim > 0 else []
+    return filters + ["shuffle"] if array.dtype.itemsize > 1 else filters
+
+
+def _compress(array, codec):
+    array = np.ascontiguousarray(array)
+    filters = _filters(array)
+
+    if "delta" in filters:
+        delta = array.copy()
+        delta[1:] -= array[:-1]
+        array = delta
+    if "shuffle" in filters:
+        array = array.view(np.uint8).reshape(-1, array.dtype.itemsize).T
+    return CODECS[codec][0](np.ascontiguousarray(array))
+
+
+def _decompress(frame, info, codec):
+    dtype = np.dtype(info["dtype"])
+    data = np.frombuffer(CODECS[codec][1](_buffer(frame)), dtype=np.uint8)
+
+    if "shuffle" in info["filters"]:
+        data = np.ascontiguousarray(data.reshape(dtype.itemsize, -1).T)
+    array = data.view(dtype).reshape(info["shape"])
+    if "delta" in info["filters"]:
+        array = np.cumsum(array, axis=0, dtype=dtype)
+    return array.tobytes()
+
+
+def encode_arrays(arrays, codec=None):
+    """Encode arrays (hash -> array) into frames, compressed with codec (see CODECS) or else not copied"""
+    keys = list(arrays.keys())
+    header = {"version": PROTOCOL_VERSION, "hashes": keys}
+    if codec is None:
+        return [json.dumps(header).encode("utf-8")] + [np.ascontiguousarray(arrays[key]) for key in keys]
+
+    header["codec"] = codec
+    header["arrays"] = [
+        {"dtype": arrays[key].dtype.str, "shape": list(arrays[key].shape), "filters": _filters(arrays[key])}
+        for key in keys
+    ]
+    return [json.dumps(header).encode("utf-8")] + [_compress(arrays[key], codec) for key in keys]
+
+
+def decode_arrays(frames):
+    """Decode the frames of encode_arrays into a dict hash -> buffer"""
+    header = _header(frames)
+    keys = header.get("hashes", [])
+    if len(keys) != len(frames) - 1:
+        raise ProtocolError("Invalid message: number of arrays and hashes differ")
+
+    codec = header.get("codec")
+    if codec is None:
+        return {key: _buffer(frame) for key, frame in zip(keys, frames[1:])}
+
+    if codec not in CODECS:
+        raise ProtocolError(f"Compression {codec} is not supported by the viewer")
+    try:
+        return {
+            key: _decompress(frame, info, codec) for key, frame, info in zip(keys, frames[1:], header["arrays"])
+        }
+    except Exception as ex:
+        # each codec has its own exceptions
+        raise ProtocolError(f"Invalid compressed arrays: {type(ex).__name__} {ex}")
+
+
+def decode(frames, store=None):
+    """Decode the frames of socket.recv_multipart(), zmq.Frame objects are used without copying.
+
+    Arrays referenced by content hash are taken from store (hash -> buffer).
+    """
+    buffers = [_buffer(frame) for frame in frames]
+    header = _header(frames)
+
+    shared = {}
+
+    def decode_obj(obj):
+        if isinstance(obj, list):
+            return [decode_obj(value) for value in obj]
+
+        elif not isinstance(obj, dict):
+            return obj
+
+        elif "__ndarray__" in obj or "__hash__" in obj:
+            dtype = np.dtype(obj["dtype"])
+            if dtype.hasobject:
+                raise ProtocolError("NumPy arrays of Python objects cannot be received")
+            if "__hash__" in obj:
+                buffer = store[obj["__hash__"]]
+            else:
+                buffer = buffers[obj["__ndarray__"]]
+            return np.frombuffer(buffer, dtype=dtype).reshape(obj["shape"])
+
+        elif "__tuple__" in obj:
+            return tuple(decode_obj(value) for value in obj["__tuple__"])
+
+        elif "__dict__" in obj:
+            return {decode_obj(key): decode_obj(value) for key, value in obj["__dict__"]}
+
+        elif "__bb__" in obj:
+            return BoundingBox(obj["__bb__"])
+
+        elif "__shared__" in obj:
+            result = shared[obj["__shared__"]] = decode_obj(obj["value"])
+            return result
+
+        elif "__ref__" in obj:
+            return shared[obj["__ref__"]]
+
+        return {key: decode_obj(value) for key, value in obj.items()}
+
+    try:
+        return decode_obj(header["data"])
+    except (IndexError, KeyError, TypeError, ValueError) as ex:
+        raise ProtocolError(f"Invalid message: {type(ex).__name__} {ex}")
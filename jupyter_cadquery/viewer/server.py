@@ -1,7 +1,9 @@
 import base64
 import base64
 from datetime import datetime
+from collections import OrderedDict
 from time import localtime
+import json
 import os
 import pickle
 import threading
@@ -14,9 +16,12 @@ from jupyter_cadquery.cad_display import CadqueryDisplay
 from jupyter_cadquery.cad_animation import Animation
 from jupyter_cadquery.defaults import get_default, get_defaults, split_args, set_defaults
 from jupyter_cadquery.logo import LOGO_DATA
+from jupyter_cadquery.viewer.protocol import CODECS, decode, decode_arrays, referenced_hashes, ProtocolError
 from jupyter_cadquery.utils import px
 
 VIEWER = None
+HEARTBEAT_INTERVAL = 0.5
+MESH_STORE_SIZE = 1024 ** 3
 
 
 def _log(typ, *msg):
@@ -47,6 +52,63 @@ def debug(*msg):
     _log("D", *msg)
 
 
+class Heartbeat:
+    """Progress bar proxy that sends a heartbeat to the client at most every HEARTBEAT_INTERVAL seconds"""
+
+    def __init__(self, progress, heartbeat):
+        self.progress = progress
+        self.heartbeat = heartbeat
+        self.last = time.time()
+
+    def update(self):
+        self.progress.update()
+        if time.time() - self.last > HEARTBEAT_INTERVAL:
+            self.heartbeat()
+            self.last = time.time()
+
+    def __getattr__(self, name):
+        return getattr(self.progress, name)
+
+
+class MeshStore:
+    """Least recently used store of the arrays received from clients, keyed by content hash"""
+
+    def __init__(self, max_size=MESH_STORE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self.arrays = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.arrays
+
+    def __getitem__(self, key):
+        self.arrays.move_to_end(key)
+        return self.arrays[key]
+
+    def missing(self, keys):
+        return [key for key in dict.fromkeys(keys) if key not in self.arrays]
+
+    def put(self, arrays):
+        for key, buffer in arrays.items():
+            if key not in self.arrays:
+                self.arrays[key] = buffer
+                self.size += memoryview(buffer).nbytes
+
+        while self.size > self.max_size and len(self.arrays) > len(arrays):
+            _, buffer = self.arrays.popitem(last=False)
+            self.size -= memoryview(buffer).nbytes
+
+    def lookup(self, arrays):
+        """Mapping that resolves hashes from arrays first and then from the store"""
+        store = self
+
+        class Lookup:
+            def __getitem__(self, key):
+                return arrays[key] if key in arrays else store[key]
+
+        return Lookup()
+
+
 class Viewer:
     def __init__(self, zmq_port):
         self.zmq_port = zmq_port
@@ -54,10 +116,15 @@ class Viewer:
         self.interactive = None
         self.zmq_server = None
         self.root_group = None
+        self.scene = None
+        self.scene_data = None
+        self.mesh_store = MeshStore()
+        self.pending = {}
+        self.pending_arrays = {}
         self.log_output = widgets.Output(layout=widgets.Layout(height="400px", overflow="scroll"))
         self.log_output.add_class("mac-scrollbar")
 
-    def _display(self, data, logo=False):
+    def _display(self, data, logo=False, heartbeat=None):
         mesh_data = data["data"]
         config = data["config"]
         info(mesh_data["bb"])
@@ -100,10 +167,39 @@ class Viewer:
         self.cad_display.init_progress(data.get("count", 1))
         create_args, add_shape_args = split_args(config)
         self.cad_display._update_settings(**create_args)
-        self.cad_display.add_shapes(**mesh_data, **add_shape_args)
+
+        progress = self.cad_display.progress
+        if heartbeat is not None:
+            self.cad_display.progress = Heartbeat(progress, heartbeat)
+        self.scene = self.scene_data = None
+        try:
+            self.cad_display.add_shapes(**mesh_data, **add_shape_args)
+        finally:
+            self.cad_display.progress = progress
         info(create_args, add_shape_args)
         self.cad_display.info.ready_msg(self.cad_display.cq_view.grid.step)
         self.root_group = self.cad_display.root_group
+        self.scene = data.get("scene")
+        self.scene_data = None if logo else data
+
+    def _append(self, data):
+        """Add the part in data to the shown scene without rendering the shown parts again.
+
+        Returns False if the scene cannot be changed in place, else the part is merged into the scene data.
+        """
+        scene = self.scene_data
+        mesh_data = scene["data"]
+        part = data["data"]
+
+        if not self.cad_display.append_shapes(part["shapes"], part["mapping"], part["tree"]):
+            return False
+
+        mesh_data["shapes"]["parts"].append(part["shapes"])
+        mesh_data["mapping"].update(part["mapping"])
+        mesh_data["tree"]["children"].append(part["tree"])
+        mesh_data["bb"].update(part["shapes"]["bb"])
+        scene["count"] = scene.get("count", 0) + 1
+        return True
 
     def start_viewer(self, cad_width, cad_height, theme):
         info(f"zmq_port:   {self.zmq_port}")
@@ -133,7 +229,7 @@ class Viewer:
         stop_viewer()
 
         context = zmq.Context()
-        socket = context.socket(zmq.REP)
+        socket = context.socket(zmq.ROUTER)
         for i in range(5):
             try:
                 socket.bind(f"tcp://*:{self.zmq_port}")
@@ -145,36 +241,133 @@ class Viewer:
         self.zmq_server = socket
         info("zmq started\n")
 
-        def return_error(error_msg):
-            error(error_msg)
-            socket.send_json({"result": "error", "msg": error_msg})
-
-        def return_success(t):
-            info(f"duration: {time.time() - t:7.2f}")
-            socket.send_json({"result": "success"})
+        def reply(identity, request_id, **kwargs):
+            socket.send_multipart([identity, json.dumps({"id": request_id, **kwargs}).encode()])
 
         def msg_handler():
             while True:
-                msg = socket.recv()
+                frames = socket.recv_multipart(copy=False)
+                if len(frames) < 4:
+                    error("Malformed message")
+                    continue
+
+                identity, request_id, kind, *msg = frames
+                identity, request_id, kind = identity.bytes, request_id.bytes.decode(), kind.bytes
+
+                def return_error(error_msg):
+                    error(error_msg)
+                    reply(identity, request_id, result="error", msg=error_msg)
+
+                def return_success(t):
+                    info(f"duration: {time.time() - t:7.2f}")
+                    reply(identity, request_id, result="success", duration=time.time() - t)
+
+                def heartbeat():
+                    reply(identity, request_id, result="progress")
+
                 try:
-                    data = pickle.loads(msg)
-                except Exception as ex:
+                    if kind == b"scene":
+                        missing = self.mesh_store.missing(referenced_hashes(msg))
+                        if missing:
+                            # Keep the scene until the client has uploaded the unknown arrays
+                            self.pending = {request_id: msg}
+                            self.pending_arrays = {request_id: {}}
+                            info(f"requesting {len(missing)} arrays")
+                            reply(identity, request_id, result="missing", hashes=missing, codecs=list(CODECS))
+                            continue
+
+                        # Tell the client that the request arrived, so that it waits for the result instead of resending
+                        reply(identity, request_id, result="ack")
+                        data = decode(msg, self.mesh_store)
+
+                    elif kind == b"chunk":
+                        # all but the last chunk of the arrays, collected until the last one arrives
+                        if request_id not in self.pending:
+                            return_error("Received arrays for an unknown scene")
+                            continue
+
+                        self.pending_arrays[request_id].update(decode_arrays(msg))
+                        reply(identity, request_id, result="received")
+                        continue
+
+                    elif kind == b"arrays":
+                        scene = self.pending.pop(request_id, None)
+                        if scene is None:
+                            return_error("Received arrays for an unknown scene")
+                            continue
+
+                        reply(identity, request_id, result="ack")
+                        arrays = {**self.pending_arrays.pop(request_id), **decode_arrays(msg)}
+                        data = decode(scene, self.mesh_store.lookup(arrays))
+                        self.mesh_store.put(arrays)
+
+                    else:
+                        return_error(f"Wrong message kind {kind}")
+                        continue
+
+                except ProtocolError as ex:
                     return_error(str(ex))
                     continue
 
-                self.interactive.outputs = ()
-                self.interactive.layout.height = f"0px"
+                if data.get("type") not in ("update", "refine"):
+                    self.interactive.outputs = ()
+                    self.interactive.layout.height = f"0px"
 
                 if data.get("type") == "data":
                     try:
                         t = time.time()
-                        self._display(data)
+                        self._display(data, heartbeat=heartbeat)
                         return_success(t)
 
                     except Exception as ex:
                         error_msg = f"{type(ex).__name__}: {ex}"
                         return_error(error_msg)
 
+                elif data.get("type") == "append":
+                    try:
+                        t = time.time()
+                        if data.get("scene") is None or data.get("scene") != self.scene:
+                            return_error("Viewer shows a different scene, sending it again")
+                        elif not self._append(data):
+                            return_error("Scene cannot be extended in place, sending it again")
+                        else:
+                            return_success(t)
+
+                    except Exception as ex:
+                        error_msg = f"{type(ex).__name__}: {ex}"
+                        return_error(error_msg)
+
+                elif data.get("type") == "refine":
+                    try:
+                        t = time.time()
+                        shapes = data["data"]["shapes"]
+                        if data.get("scene") is None or data.get("scene") != self.scene:
+                            return_error("Viewer shows a different scene, not refined")
+                        elif not self.cad_display.refine_shapes(shapes):
+                            return_error("Scene cannot be refined in place")
+                        else:
+                            self.scene_data["data"]["shapes"] = shapes
+                            return_success(t)
+
+                    except Exception as ex:
+                        error_msg = f"{type(ex).__name__}: {ex}"
+                        return_error(error_msg)
+
+                elif data.get("type") == "update":
+                    try:
+                        t = time.time()
+                        # only the scene the client has sent last can be moved in place
+                        if data.get("scene") is None or data.get("scene") != self.scene:
+                            return_error("Viewer shows a different scene, sending it again")
+                        elif not self.cad_display.update_locations(data["locations"]):
+                            return_error("Scene cannot be updated in place, sending it again")
+                        else:
+                            return_success(t)
+
+                    except Exception as ex:
+                        error_msg = f"{type(ex).__name__}: {ex}"
+                        return_error(error_msg)
+
                 elif data.get("type") == "animation":
                     try:
                         t = time.time()
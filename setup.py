@@ -35,6 +35,7 @@ setup_args = {
     "extras_require": {
         "dev": {"jupyter-packaging", "cookiecutter", "twine", "bumpversion", "black", "pylint", "pyYaml"},
         "prod": {"cadquery==2.1"},
+        "compression": {"lz4", "zstandard"},
     },
     "packages": find_packages(),
     "scripts": ["jcv", "jcv.cmd"],
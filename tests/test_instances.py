@@ -0,0 +1,62 @@
+import pytest
+
+cq = pytest.importorskip("cadquery")
+
+import jupyter_cadquery.tessellator as tessellator
+from jupyter_cadquery.cadquery import Part, PartGroup
+
+COPIES = 5
+
+
+def collect(part_group, parallel):
+    return part_group.collect_mapped_shapes(
+        part_group.to_state(),
+        quality=None,
+        deviation=0.1,
+        angular_tolerance=0.2,
+        edge_accuracy=None,
+        render_edges=True,
+        render_normals=False,
+        parallel=parallel,
+    )
+
+
+def copies():
+    # located copies of one shape share its TShape, so the first tessellation leaves a triangulation at all of them
+    box = cq.Workplane().box(1, 2, 3).edges().fillet(0.2).val()
+    return PartGroup([Part(box.moved(cq.Location(cq.Vector(5 * i, 0, 0))), f"box_{i}") for i in range(COPIES)])
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    monkeypatch.setattr(tessellator.CACHE, "use_cache", False)
+
+    result = []
+    tessellate = tessellator._tessellate
+
+    def counting(*args, **kwargs):
+        result.append(args)
+        return tessellate(*args, **kwargs)
+
+    monkeypatch.setattr(tessellator, "_tessellate", counting)
+    return result
+
+
+def test_copies_are_tessellated_once(calls):
+    shapes = collect(copies(), parallel=False)
+
+    assert len(calls) == 1
+    meshes = [part["shape"] for part in shapes["parts"]]
+    assert all(mesh is meshes[0] for mesh in meshes)
+    assert [part["loc"][0][0] for part in shapes["parts"]] == pytest.approx([5 * i for i in range(COPIES)])
+
+
+def test_shown_again_with_same_quality(calls):
+    part_group = copies()
+    first = collect(part_group, parallel=False)
+    # the triangulation of the first show must not change quality and mesh key
+    second = collect(part_group, parallel=False)
+
+    assert len(calls) == 2
+    assert calls[0][1:] == calls[1][1:]
+    assert first["parts"][0]["bb"] == pytest.approx(second["parts"][0]["bb"])